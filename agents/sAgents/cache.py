@@ -2,9 +2,14 @@
 Shared cache for agent data to avoid repeated API calls.
 """
 
+from medgemma.singleFlight import SingleFlight
+
 # Cache for EHR summaries to avoid repeated API calls
 ehr_summary_cache = {}
 
+# Concurrent misses for the same patient wait for one generation
+_ehr_summary_flight = SingleFlight()
+
 def get_ehr_summary(patient_id: str, generator_func):
     """
     Get EHR summary from cache or generate it.
@@ -17,14 +22,27 @@ def get_ehr_summary(patient_id: str, generator_func):
         The EHR summary
     """
     if patient_id not in ehr_summary_cache:
-        print("cache miss for the patient report, generating new summary...")
-        ehr_summary_cache[patient_id] = generator_func(patient_id)
-        print("EHR summary cached.")
-        # print(ehr_summary_cache[patient_id])
+        summary, shared = _ehr_summary_flight.do(
+            patient_id, lambda: _generate_ehr_summary(patient_id, generator_func)
+        )
+        if shared:
+            print("joined in-flight EHR summary generation.")
+        return summary
     else:
         print("cache hit for the patient ehr summary.")
     return ehr_summary_cache[patient_id]
 
+def _generate_ehr_summary(patient_id: str, generator_func):
+    # Another caller may have finished generating between our miss and now
+    if patient_id in ehr_summary_cache:
+        return ehr_summary_cache[patient_id]
+
+    print("cache miss for the patient report, generating new summary...")
+    ehr_summary_cache[patient_id] = generator_func(patient_id)
+    print("EHR summary cached.")
+    # print(ehr_summary_cache[patient_id])
+    return ehr_summary_cache[patient_id]
+
 def clear_ehr_cache(patient_id: str = None):
     """
     Clear the EHR cache.
@@ -57,7 +57,7 @@ def get_interview_prompt(ehr_summary: str) -> str:
     """
 
 
-def interview_message(patient_id: str, user_message: str = None, conversation_history: list = None, conversation_id: str = None, current_report: str = None) -> Dict[str, Any]:
+def interview_message(patient_id: str, user_message: str = None, conversation_history: list = None, conversation_id: str = None, current_report: str = None, update_report: bool = True) -> Dict[str, Any]:
     """
     Handle interview messages - both starting the interview and processing ongoing messages.
     
@@ -67,6 +67,8 @@ def interview_message(patient_id: str, user_message: str = None, conversation_hi
         conversation_history: List of tuples (role, message) representing the conversation (optional)
         conversation_id: The conversation ID from previous messages (optional)
         current_report: The current state of the medical report (optional)
+        update_report: Update the report in this call; if False it is returned
+            as None and the caller updates it (see orchestrations.report_updates)
     Returns:
         Dictionary containing:
         - message: The assistant's response
@@ -109,6 +111,15 @@ def interview_message(patient_id: str, user_message: str = None, conversation_hi
     updated_history = conversation_history + [('user', user_message)]
     
     
+    # The caller updates the report itself
+    if not update_report:
+        return {
+            'message': assistant_message,
+            'updated_report': None,
+            'patient_id': patient_id,
+            'conversation_id': conv_id
+        }
+    
     # Skip report processing for the first user message
     if len(conversation_history) == 0:
         print("\n" + "="*60)
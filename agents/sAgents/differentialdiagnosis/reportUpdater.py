@@ -19,18 +19,30 @@ if str(_medgemma_dir) not in sys.path:
     sys.path.insert(0, str(_medgemma_dir))
 
 from medgemma.medgemmaClient import MedGemmaClient
+from typing import Tuple
+
+# Incremental mode (update_report): the updater gets the current report and
+# only the messages since the last update, without the EHR (the report
+# already carries the relevant history). Every `consolidate_every` user turns
+# the report is rewritten from the whole interview and the EHR as before.
+incremental_updates = True
+consolidate_every = 5
+
+
+def _instructions(ehrsummary: str = None) -> str:
+    """System prompt of the report updater; without the EHR section if ehrsummary is None."""
+    if ehrsummary is None:
+        ehr_section = """<ehr_data>
+        The relevant EHR history is already in the previous report. Keep it.
+        </ehr_data>"""
+    else:
+        ehr_section = f"""<ehr_data>
+        <ehr_record_start>
+        {ehrsummary}
+        <ehr_record_end>
+        </ehr_data>"""
 
-
-
-def report_updater(patient_id: str, conversation_history: list = None, current_report: str = None) -> str:
-    """
-    Update the patient report based on the conversation history and the ehrsummary.
-
-    """
-    ehrsummary = get_ehr_summary(patient_id, ehr_summary_to_report)
-
-
-    instructions = f"""<role>
+    return f"""<role>
         You are a highly skilled medical assistant with expertise in clinical documentation.
         </role>
 
@@ -62,11 +74,7 @@ def report_updater(patient_id: str, conversation_history: list = None, current_r
             * **No Diagnosis or Assessment**: Do not provide a diagnosis.
         </instructions>
 
-        <ehr_data>
-        <ehr_record_start>
-        {ehrsummary}
-        <ehr_record_end>
-        </ehr_data>
+        {ehr_section}
 
         <output_format>
         The final output MUST be ONLY the full, updated Markdown medical report.
@@ -78,6 +86,16 @@ def report_updater(patient_id: str, conversation_history: list = None, current_r
         if the user has not answered a question dont not presume an answer. For example, if the user has not answered a question about smoking history, do not include any information about smoking in the report.
         </must_not_do>
     """
+
+
+def report_updater(patient_id: str, conversation_history: list = None, current_report: str = None) -> str:
+    """
+    Update the patient report based on the conversation history and the ehrsummary.
+
+    """
+    ehrsummary = get_ehr_summary(patient_id, ehr_summary_to_report)
+
+    instructions = _instructions(ehrsummary)
     
     # If no existing report is provided, use a default template
 
@@ -109,3 +127,63 @@ def report_updater(patient_id: str, conversation_history: list = None, current_r
     
     return updated_report
 
+
+def incremental_report_updater(patient_id: str, new_messages: list, current_report: str) -> str:
+    """
+    Update the patient report with only the interview messages since its
+    last update. The prompt no longer grows with the length of the interview.
+    """
+    user_prompt = f"""
+        <new_interview_messages_start>
+        {new_messages}
+        <new_interview_messages_end>
+
+        <previous_report>
+        {current_report}
+        </previous_report>
+
+        <task_instructions>
+        The `<previous_report>` already covers the earlier part of the interview. Update it using the new messages between the `<new_interview_messages_start>` and `<new_interview_messages_end>` markers.
+        1.  **Integrate New Information**: Add new symptoms or details from the new messages into the appropriate sections.
+        2.  **Update Existing Information**: If the new messages provide more current information, replace outdated details.
+        3.  **Keep Everything Else**: Do not remove information from the previous report just because the new messages don't mention it.
+        4.  **Adhere to Section Titles**: Do not change the existing Markdown section titles.
+        </task_instructions>
+
+        Now, generate the complete and updated medical report based on all system and user instructions. Your response should be the Markdown text of the report only.
+    """
+
+    client = MedGemmaClient(system_prompt=_instructions())
+    response = client.respond(user_prompt)
+    return response['response']
+
+
+def update_report(
+    patient_id: str,
+    conversation_history: list,
+    current_report: str = None,
+    covered: int = 0,
+    consolidated: int = 0
+) -> Tuple[str, bool]:
+    """
+    Update the report incrementally, or in full when it is time to consolidate.
+
+    Args:
+        patient_id: The patient's ID
+        conversation_history: The whole interview so far
+        current_report: The report as of the last update
+        covered: Number of conversation_history entries the report covers
+        consolidated: Number of entries covered by the last full update
+
+    Returns:
+        tuple: (updated report, whether it was a full update)
+    """
+    turns_since_full = sum(1 for role, _ in conversation_history[consolidated:] if role == 'user')
+    if (not incremental_updates or not current_report or not 0 < covered <= len(conversation_history)
+            or turns_since_full >= consolidate_every):
+        return report_updater(patient_id, conversation_history, current_report=current_report), True
+
+    new_messages = conversation_history[covered:]
+    if not new_messages:
+        return current_report, False
+    return incremental_report_updater(patient_id, new_messages, current_report), False
@@ -36,7 +36,8 @@ def second_interview_message(
     conversation_history: list = None,
     current_report: str = None,
     differential_diagnoses: str = None,
-    conversation_id: str = None
+    conversation_id: str = None,
+    update_report: bool = True
 ) -> Dict[str, Any]:
     """
     Handle second interview messages - both starting and processing ongoing messages.
@@ -48,6 +49,9 @@ def second_interview_message(
         current_report: The current medical report
         differential_diagnoses: The differential diagnoses JSON
         conversation_id: The conversation ID from previous messages
+        update_report: Update the report and differential in this call; if
+            False they are returned as None and the caller updates them
+            (see orchestrations.report_updates)
         
     Returns:
         Dictionary containing:
@@ -147,6 +151,15 @@ def second_interview_message(
     assistant_message = response['response']
     conv_id = response.get('conversation_id', None)
     
+    if not update_report:
+        return {
+            'message': assistant_message,
+            'updated_report': None,
+            'updated_differential': None,
+            'patient_id': patient_id,
+            'conversation_id': conv_id
+        }
+    
     # Update conversation history
     updated_history = conversation_history + [('user', user_message), ('assistant', assistant_message)]
     
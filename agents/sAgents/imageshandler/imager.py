@@ -9,7 +9,7 @@ def imagesHandler(patientid, images, report):
     
     Args:
         patientid: Patient identifier
-        images: List of image data (base64 encoded or file paths)
+        images: List of image data ('data' is raw bytes, a PreparedImage or base64)
         report: Current patient report for context
     
     Returns:
@@ -68,11 +68,13 @@ Analyze the provided medical image(s) in the context of the patient's current re
     if images and len(images) > 0:
         first_image = images[0]
         
-        # Decode base64 image data
+        # Raw bytes / PreparedImage are sent as-is; base64 strings are decoded
         if 'data' in first_image:
             try:
-                image_bytes = base64.b64decode(first_image['data'])
-                response = client.respond(user_prompt, image_object=image_bytes)
+                image = first_image['data']
+                if isinstance(image, str):
+                    image = base64.b64decode(image)
+                response = client.respond(user_prompt, image_object=image)
             except Exception as e:
                 print(f"Error decoding image: {e}")
                 response = client.respond(user_prompt)
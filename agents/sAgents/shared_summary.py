@@ -0,0 +1,484 @@
+"""
+Shared patient summary artifact.
+
+The diet, exercise, medicine check and digital twin pipelines all start by
+synthesizing the same patient from the same inputs: the EHR summary and
+the current report. get_patient_summary() builds that synthesis once per
+(EHR version, current report) and hands the same artifact to every
+pipeline, so running the diet and exercise plans for a patient costs one
+summary call instead of two.
+
+    - The EHR version is a hash of the patient's records. It is cached per
+      storage data version (file mtimes and sizes plus this process's
+      writes, see ehr_storage), so the records are only read and hashed
+      again after the EHR store changed.
+    - When the EHR version changes, the cached EHR summary
+      (agents.sAgents.cache) is dropped too, so the new summary is built
+      from the new records.
+    - Every rebuilt summary gets the next `version` number for the patient.
+    - Concurrent requests for the same summary wait for one model call.
+    - A caller that passes its own EHR summary gets a summary built from
+      that one (it is part of the cache key).
+
+The agents downstream of the summaries this replaced (ehrAgent,
+patientSummaryAgent, pca) were written against those agents' schemas.
+`view=` projects the shared summary back onto them without another model
+call: "planning" (diet and exercise), "medication_safety" and
+"patient_context" (digital twin).
+
+Usage:
+    from agents.sAgents.shared_summary import get_patient_summary
+
+    patient_summary = get_patient_summary(patient_id, current_report, view="planning")
+"""
+
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from agents.sAgents.cache import clear_ehr_cache, get_ehr_summary
+from agents.sAgents.differentialdiagnosis.ehrReport import ehr_summary_to_report
+from manageEhr.ehr_manager import get_manager
+from medgemma.medgemmaClient import MedGemmaClient
+from medgemma.singleFlight import SingleFlight
+
+
+def sharedPatientSummaryAgent(patient_id, ehr_summary, current_report):
+    """
+    Structured patient summary covering what every downstream pipeline needs:
+    nutrition and exercise planning, medication safety and health monitoring.
+    """
+    system_prompt = """
+<Role>
+You are a clinical data extraction and synthesis specialist AI trained in medical documentation, clinical pharmacology and clinical reasoning.
+</Role>
+
+<Task>
+Analyze the patient's Electronic Health Record (EHR) summary and current clinical report to produce ONE structured patient summary. The summary is shared by several downstream clinical systems (diet planning, exercise prescription, medication safety checking and health monitoring), so it must contain everything each of them needs.
+</Task>
+
+<Objectives>
+Extract and compute:
+
+• Demographics (age, sex, pregnancy/breastfeeding status)
+• Anthropometrics (height, weight, BMI, BSA)
+• Active medical conditions and relevant past medical history
+• Family history
+• Current medications with dose, route, frequency and indication
+• Allergies and adverse drug reactions with reaction and severity
+• Organ function (renal, hepatic, cardiac) and whether doses need adjustment
+• Relevant laboratory values and abnormalities, with dates
+• Most recent vitals
+• Special populations (pediatric, geriatric, pregnant, renal/hepatic impairment, obese, frail)
+• Clinical risk factors (falls, bleeding, QTc prolongation, cardiovascular, polypharmacy)
+• Contraindications (medication-disease, exercise, dietary)
+• Dietary restrictions and functional limitations
+
+</Objectives>
+
+<Rules>
+
+• Use only the provided data
+• Do NOT fabricate or assume missing information
+• If data is missing, set the value to null and list critical gaps in missing_critical_data
+• Compute BMI, BSA and CrCl when the inputs are available
+• Use exact values with units and include dates for labs and recent changes
+• Use medically accurate terminology
+• Highlight red flags for prescribing in high_risk_flags
+
+</Rules>
+
+<Output Format>
+Return ONLY valid JSON in this exact schema:
+
+{
+  "patient_id": "string",
+  "demographics": {
+    "age": number | null,
+    "age_category": "NEONATE|INFANT|CHILD|ADOLESCENT|ADULT|GERIATRIC" | null,
+    "sex": "MALE|FEMALE|OTHER" | null,
+    "date_of_birth": "YYYY-MM-DD" | null,
+    "pregnancy_status": "PREGNANT|NOT_PREGNANT|UNKNOWN|NOT_APPLICABLE",
+    "breastfeeding": boolean | null
+  },
+  "anthropometrics": {
+    "height_cm": number | null,
+    "weight_kg": number | null,
+    "bmi": number | null,
+    "bsa_m2": number | null
+  },
+  "conditions": [
+    {"condition": "string", "status": "ACTIVE|CHRONIC|RESOLVED|HISTORY_OF", "severity": "SEVERE|MODERATE|MILD" | null}
+  ],
+  "past_diagnoses": [{"diagnosis": "string", "date": "YYYY-MM-DD" | null}],
+  "family_history": ["string"],
+  "medications": [
+    {"medication": "string - generic name", "dose": "string with units", "route": "string", "frequency": "string", "indication": "string" | null, "start_date": "string" | null, "narrow_therapeutic_index": boolean}
+  ],
+  "allergies": [
+    {"allergen": "string", "reaction": "string", "severity": "SEVERE|MODERATE|MILD", "type": "ALLERGY|INTOLERANCE|ADVERSE_EFFECT"}
+  ],
+  "organ_function": {
+    "renal": {"creatinine_mg_dl": number | null, "egfr_ml_min": number | null, "crcl_ml_min": number | null, "renal_impairment": "NONE|MILD|MODERATE|SEVERE|UNKNOWN", "dose_adjustment_required": boolean},
+    "hepatic": {"ast_u_l": number | null, "alt_u_l": number | null, "total_bilirubin_mg_dl": number | null, "albumin_g_dl": number | null, "hepatic_impairment": "NONE|MILD|MODERATE|SEVERE|UNKNOWN", "dose_adjustment_required": boolean},
+    "cardiac": {"ejection_fraction_percent": number | null, "heart_failure": boolean, "qtc_ms": number | null, "arrhythmias": ["string"]}
+  },
+  "lab_results": [{"test": "string", "value": "string with units", "date": "YYYY-MM-DD" | null, "status": "normal|abnormal"}],
+  "lab_abnormalities": ["string"],
+  "recent_vitals": {
+    "blood_pressure": "systolic/diastolic" | null,
+    "heart_rate": number | null,
+    "temperature": number | null,
+    "weight": number | null,
+    "date": "YYYY-MM-DD" | null
+  },
+  "special_populations": {
+    "is_pediatric": boolean,
+    "is_geriatric": boolean,
+    "is_pregnant": boolean,
+    "has_renal_impairment": boolean,
+    "has_hepatic_impairment": boolean,
+    "is_obese": boolean,
+    "is_frail": boolean
+  },
+  "risk_factors": ["string"],
+  "risk_levels": {
+    "fall_risk": "HIGH|MODERATE|LOW",
+    "bleeding_risk": "HIGH|MODERATE|LOW",
+    "qtc_prolongation_risk": "HIGH|MODERATE|LOW",
+    "cardiovascular_risk": "HIGH|MODERATE|LOW",
+    "polypharmacy": boolean
+  },
+  "contraindications": ["string"],
+  "dietary_restrictions": ["string"],
+  "functional_limitations": ["string"],
+  "high_risk_flags": ["string"],
+  "missing_critical_data": ["string"],
+  "clinical_summary": "string - concise narrative summary of the patient's current health status"
+}
+
+No explanations. JSON only.
+</Output Format>
+"""
+
+    user_prompt = f"""
+Create the shared structured patient summary from the following patient data:
+
+Patient ID: {patient_id}
+
+EHR Summary:
+{ehr_summary}
+
+Current Report:
+{current_report}
+"""
+
+    client = MedGemmaClient(system_prompt=system_prompt)
+    response = client.respond(user_prompt)
+    return response['response']
+
+
+# Master switch: when off, every call generates a new summary
+enabled = True
+
+
+def report_hash(current_report: Any) -> str:
+    """Hash of the current report (or another prompt input) as the summary prompt sees it."""
+    if current_report is None:
+        text = ""
+    elif isinstance(current_report, str):
+        text = current_report.strip()
+    else:
+        text = json.dumps(current_report, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class PatientSummaryStore:
+    """Versioned patient summaries, one current artifact per patient."""
+
+    def __init__(self, ehr_manager=None):
+        """
+        Args:
+            ehr_manager: Where the EHR is read from (None = the default manager)
+        """
+        self.ehr_manager = ehr_manager or get_manager()
+        self._artifacts: Dict[str, Dict[str, Any]] = {}
+        self._ehr_versions: Dict[str, tuple] = {}   # patient → (storage data version, EHR version)
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._counters = {"hits": 0, "builds": 0, "shared": 0, "invalidations": 0}
+
+    def get(self, patient_id: str, current_report: Any, ehr_summary: Optional[str] = None,
+            view: Optional[str] = None) -> str:
+        """
+        The patient summary for the current EHR and report, built if needed.
+
+        Args:
+            patient_id: The patient's ID
+            current_report: The report the summary should reflect
+            ehr_summary: EHR summary to build from (None = the cached one)
+            view: Project the summary onto a consumer's schema (see VIEWS)
+        """
+        summary = self.get_artifact(patient_id, current_report, ehr_summary)["summary"]
+        return project(summary, view) if view is not None else summary
+
+    def get_artifact(self, patient_id: str, current_report: Any, ehr_summary: Optional[str] = None) -> Dict[str, Any]:
+        """Like get(), but returns the whole artifact with its version and keys."""
+        ehr_version = self.ehr_version(patient_id)
+        source = report_hash(ehr_summary) if ehr_summary is not None else None
+        key = (patient_id, ehr_version, report_hash(current_report), source)
+
+        if enabled:
+            with self._lock:
+                artifact = self._artifacts.get(patient_id)
+                if artifact is not None and _artifact_key(artifact) == key:
+                    self._counters["hits"] += 1
+                    print(f"cache hit for the shared patient summary (version {artifact['version']}).")
+                    return artifact
+
+        artifact, shared = self._flight.do(key, lambda: self._build(key, current_report, ehr_summary))
+        if shared:
+            with self._lock:
+                self._counters["shared"] += 1
+            print("joined in-flight patient summary generation.")
+        return artifact
+
+    def ehr_version(self, patient_id: str) -> str:
+        """
+        Hash of the patient's EHR records. While the storage's data version
+        (a few stat calls) is unchanged, the last hash is returned without
+        reading the records.
+        """
+        # Taken before reading: a write during the read shows up next call
+        data_version = self.ehr_manager.data_version()
+        with self._lock:
+            known = self._ehr_versions.get(patient_id)
+        if known is not None and known[0] == data_version:
+            return known[1]
+
+        try:
+            records = self.ehr_manager.get_all_patient_ehr_data(patient_id)
+            body = json.dumps(records, sort_keys=True, default=str)
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not read the EHR of {patient_id}: {e}")
+            body = ""
+        version = hashlib.sha256(body.encode("utf-8")).hexdigest()[:16]
+
+        with self._lock:
+            known = self._ehr_versions.get(patient_id)
+            self._ehr_versions[patient_id] = (data_version, version)
+            changed = known is not None and known[1] != version
+        if changed:
+            # The cached EHR summary was built from the old records
+            clear_ehr_cache(patient_id)
+            self.invalidate(patient_id)
+        return version
+
+    def invalidate(self, patient_id: Optional[str] = None):
+        """Drop a patient's summary (or everyone's), e.g. after an EHR edit."""
+        with self._lock:
+            if patient_id is None:
+                self._counters["invalidations"] += len(self._artifacts)
+                self._artifacts.clear()
+            elif self._artifacts.pop(patient_id, None) is not None:
+                self._counters["invalidations"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": enabled, "patients": len(self._artifacts), **self._counters}
+
+    def _build(self, key: tuple, current_report: Any, ehr_summary: Optional[str]) -> Dict[str, Any]:
+        patient_id, ehr_version, digest, source = key
+        # Another caller may have finished building between our miss and now
+        with self._lock:
+            artifact = self._artifacts.get(patient_id)
+            if enabled and artifact is not None and _artifact_key(artifact) == key:
+                return artifact
+
+        print("cache miss for the shared patient summary, generating...")
+        if ehr_summary is None:
+            ehr_summary = get_ehr_summary(patient_id, ehr_summary_to_report)
+        summary = sharedPatientSummaryAgent(patient_id, ehr_summary, current_report)
+
+        with self._lock:
+            previous = self._artifacts.get(patient_id)
+            artifact = {
+                "patient_id": patient_id,
+                "version": (previous["version"] if previous else 0) + 1,
+                "ehr_version": ehr_version,
+                "report_hash": digest,
+                "ehr_summary_hash": source,   # None = built from the cached EHR summary
+                "created_at": time.time(),
+                "summary": summary,
+            }
+            self._counters["builds"] += 1
+            if enabled:
+                self._artifacts[patient_id] = artifact
+        return artifact
+
+
+def _artifact_key(artifact: Dict[str, Any]) -> tuple:
+    return artifact["patient_id"], artifact["ehr_version"], artifact["report_hash"], artifact["ehr_summary_hash"]
+
+
+# ============================================================
+# PER-CONSUMER VIEWS
+# ============================================================
+
+def _parse(summary: Any) -> Optional[Dict[str, Any]]:
+    """The summary as a dict, or None if the model did not return JSON."""
+    if isinstance(summary, dict):
+        return summary
+    if not isinstance(summary, str):
+        return None
+    start, end = summary.find('{'), summary.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        data = json.loads(summary[start:end + 1])
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _section(data: Dict[str, Any], name: str) -> Dict[str, Any]:
+    value = data.get(name)
+    return value if isinstance(value, dict) else {}
+
+
+def _items(data: Dict[str, Any], name: str) -> list:
+    value = data.get(name)
+    return value if isinstance(value, list) else []
+
+
+def _planning_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The ehrAgent schema the diet and exercise agents were written against."""
+    demographics, body = _section(data, "demographics"), _section(data, "anthropometrics")
+    return {
+        "age": demographics.get("age"),
+        "sex": demographics.get("sex"),
+        "height_cm": body.get("height_cm"),
+        "weight_kg": body.get("weight_kg"),
+        "bmi": body.get("bmi"),
+        "conditions": _items(data, "conditions"),
+        "medications": _items(data, "medications"),
+        "allergies": _items(data, "allergies"),
+        "lab_abnormalities": _items(data, "lab_abnormalities"),
+        "risk_factors": _items(data, "risk_factors"),
+        "dietary_restrictions": _items(data, "dietary_restrictions"),
+    }
+
+
+def _medication_safety_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The patientSummaryAgent schema the medicine check agents were written against."""
+    demographics, body = _section(data, "demographics"), _section(data, "anthropometrics")
+    risk_levels = _section(data, "risk_levels")
+    organ_function = dict(_section(data, "organ_function"))
+    if "cardiac" in organ_function and isinstance(organ_function["cardiac"], dict):
+        organ_function["cardiac"] = {**organ_function["cardiac"],
+                                     "qtc_prolongation_risk": risk_levels.get("qtc_prolongation_risk")}
+    medications = _items(data, "medications")
+    return {
+        "patient_id": data.get("patient_id"),
+        "demographics": {
+            **{k: demographics.get(k) for k in ("age", "age_category", "sex", "pregnancy_status", "breastfeeding")},
+            **{k: body.get(k) for k in ("weight_kg", "height_cm", "bmi", "bsa_m2")},
+        },
+        "organ_function": organ_function,
+        "current_medications": medications,
+        "medication_count": len(medications),
+        "polypharmacy": risk_levels.get("polypharmacy", len(medications) >= 5),
+        "allergies": _items(data, "allergies"),
+        "medical_conditions": _items(data, "conditions"),
+        "laboratory_values": _items(data, "lab_results"),
+        "special_populations": _section(data, "special_populations"),
+        "risk_factors": {**risk_levels, "other": _items(data, "risk_factors")},
+        "functional_status": {"limitations": _items(data, "functional_limitations")},
+        "critical_considerations": _items(data, "contraindications"),
+        "missing_critical_data": _items(data, "missing_critical_data"),
+        "high_risk_flags": _items(data, "high_risk_flags"),
+        "clinical_summary": data.get("clinical_summary"),
+    }
+
+
+def _patient_context_view(data: Dict[str, Any]) -> Dict[str, Any]:
+    """The pca schema the digital twin agents were written against."""
+    demographics = _section(data, "demographics")
+    return {
+        "patient_demographics": {
+            "patient_id": data.get("patient_id"),
+            "age": demographics.get("age"),
+            "gender": demographics.get("sex"),
+            "date_of_birth": demographics.get("date_of_birth"),
+        },
+        "medical_history": {
+            "chronic_conditions": [
+                c.get("condition") for c in _items(data, "conditions")
+                if isinstance(c, dict) and c.get("status") in ("ACTIVE", "CHRONIC")
+            ],
+            "past_diagnoses": _items(data, "past_diagnoses"),
+            "family_history": _items(data, "family_history"),
+        },
+        "current_medications": [
+            {
+                "name": m.get("medication"),
+                "dosage": m.get("dose"),
+                "frequency": m.get("frequency"),
+                "prescribed_date": m.get("start_date"),
+                "indication": m.get("indication"),
+            }
+            for m in _items(data, "medications") if isinstance(m, dict)
+        ],
+        "allergies": _items(data, "allergies"),
+        "recent_lab_results": _items(data, "lab_results"),
+        "recent_vitals": _section(data, "recent_vitals"),
+        "risk_factors": _items(data, "risk_factors"),
+        "contraindications": _items(data, "contraindications"),
+        "clinical_summary": data.get("clinical_summary"),
+    }
+
+
+VIEWS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "planning": _planning_view,
+    "medication_safety": _medication_safety_view,
+    "patient_context": _patient_context_view,
+}
+
+
+def project(summary: Any, view: str) -> str:
+    """
+    The shared summary in one consumer's schema, as JSON text.
+    A reply that is not JSON is passed through unchanged.
+    """
+    if view not in VIEWS:
+        raise ValueError(f"Unknown patient summary view: {view}")
+    data = _parse(summary)
+    if data is None:
+        return summary
+    return json.dumps(VIEWS[view](data), indent=2, ensure_ascii=False)
+
+
+_patient_summary_store = None
+_patient_summary_store_lock = threading.Lock()
+
+
+def get_patient_summary_store() -> PatientSummaryStore:
+    """Get the global patient summary store (created on first use)"""
+    global _patient_summary_store
+    with _patient_summary_store_lock:
+        if _patient_summary_store is None:
+            _patient_summary_store = PatientSummaryStore()
+        return _patient_summary_store
+
+
+def get_patient_summary(patient_id: str, current_report: Any, ehr_summary: Optional[str] = None,
+                        view: Optional[str] = None) -> str:
+    """The shared patient summary for the patient's current EHR and report."""
+    return get_patient_summary_store().get(patient_id, current_report, ehr_summary, view)
+
+
+def invalidate_patient_summary(patient_id: Optional[str] = None):
+    """Drop the shared summary of a patient (None = all patients)."""
+    get_patient_summary_store().invalidate(patient_id)
@@ -0,0 +1,76 @@
+"""
+Tests for the shared patient summary's EHR version: cached per storage data
+version, recomputed after the EHR store changes.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from agents.sAgents.shared_summary import PatientSummaryStore
+from ehr_store.resourcetypes import fhir_resource_types
+from manageEhr.ehr_manager import EHRManager
+
+
+@pytest.fixture
+def manager(tmp_path):
+    for resource in fhir_resource_types:
+        (tmp_path / f"{resource}.json").write_text("[]")
+    (tmp_path / "patients.json").write_text(json.dumps([{"id": "p1", "name": "A"}, {"id": "p2", "name": "B"}]))
+    return EHRManager(str(tmp_path))
+
+
+@pytest.fixture
+def reads(manager, monkeypatch):
+    calls = []
+    read = manager.get_all_patient_ehr_data
+
+    def counting(patient_id):
+        calls.append(patient_id)
+        return read(patient_id)
+
+    monkeypatch.setattr(manager, "get_all_patient_ehr_data", counting)
+    return calls
+
+
+def test_unchanged_store_is_not_read_again(manager, reads):
+    store = PatientSummaryStore(manager)
+    version = store.ehr_version("p1")
+    assert [store.ehr_version("p1") for _ in range(5)] == [version] * 5
+    assert reads == ["p1"]
+
+
+def test_write_through_the_storage_changes_the_version(manager, reads):
+    store = PatientSummaryStore(manager)
+    before = store.ehr_version("p1")
+    other = store.ehr_version("p2")
+
+    manager.add_medication({"id": "m1", "patient_id": "p1", "name": "metformin"})
+    assert store.ehr_version("p1") != before
+    # Another patient's records are read again but hash the same
+    assert store.ehr_version("p2") == other
+    assert reads == ["p1", "p2", "p1", "p2"]
+
+
+def test_edit_by_another_process_changes_the_version(manager, reads, tmp_path):
+    store = PatientSummaryStore(manager)
+    before = store.ehr_version("p1")
+
+    (tmp_path / "allergies.json").write_text(json.dumps([{"id": "a1", "patient_id": "p1", "substance": "penicillin"}]))
+    assert store.ehr_version("p1") != before
+    assert len(reads) == 2
+
+
+def test_changed_records_drop_the_cached_summary(manager):
+    store = PatientSummaryStore(manager)
+    store.ehr_version("p1")
+    store._artifacts["p1"] = {"summary": "old"}
+
+    manager.add_allergy({"id": "a1", "patient_id": "p1", "substance": "latex"})
+    store.ehr_version("p1")
+    assert "p1" not in store._artifacts
+    assert store.stats()["invalidations"] == 1
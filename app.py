@@ -1,15 +1,25 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, make_response, copy_current_request_context, g, stream_with_context
 from flask_cors import CORS
+import os
 import sys
 from pathlib import Path
+from datetime import date
 import json
 import traceback
-import base64
 import io
-from PIL import Image
+import queue
+import threading
+import contextvars
 from agents.sAgents.pdfreader import PDFReader
 from orchestrations.imageshandler import images_handler_orchestration, pdf_handler_orchestration
 from ehr_store.patientdata.data_manager import get_daily_logs, get_recent_daily_logs, save_report
+from ehr_store.patientdata.data_manager import get_daily_log_aggregates
+from medgemma.medgemmaClient import warm_transport, stream_tokens_to
+from medgemma.imagePrep import prepare_image, describe as describe_image
+from medgemma.resilience import deadline, deadline_passed, remaining, DeadlineExceeded
+from orchestrations.checkpoints import new_run_id, validate_run_id
+from orchestrations.pipeline_graph import report_steps_to
+from job_manager import get_job_manager, JobQueueFull
 
 # Add paths for imports
 _module_dir = Path(__file__).parent
@@ -26,6 +36,227 @@ CORS(app)
 # Initialize PDF Reader
 pdf_reader = PDFReader() 
 
+# End-to-end budget for one API request. Every model call made while handling
+# the request only gets the time left; clients can ask for less with an
+# X-Request-Timeout header (seconds).
+REQUEST_DEADLINE_SECONDS = 900
+
+
+def _request_timeout() -> float:
+    """Seconds this request may take: REQUEST_DEADLINE_SECONDS, or less if X-Request-Timeout asks."""
+    seconds = REQUEST_DEADLINE_SECONDS
+    try:
+        seconds = min(seconds, float(request.headers.get('X-Request-Timeout', seconds)))
+    except ValueError:
+        pass
+    return seconds
+
+
+@app.before_request
+def start_request_deadline():
+    g.request_deadline = deadline(_request_timeout()).__enter__()
+
+
+@app.teardown_request
+def end_request_deadline(exc):
+    request_deadline = g.pop('request_deadline', None)
+    if request_deadline is not None:
+        request_deadline.__exit__(None, None, None)
+
+
+@app.errorhandler(DeadlineExceeded)
+def deadline_exceeded(e):
+    body = {
+        'error': str(e),
+        'success': False
+    }
+    if g.get('run_id'):
+        body['run_id'] = g.run_id  # retry with {"resume": run_id}
+    return jsonify(body), 504
+
+
+def _run_id(data: dict) -> str:
+    """
+    Checkpoint id for a pipeline request: the `resume` id a client sends
+    back to retry a failed run, otherwise a new one. Kept on `g` so error
+    responses can return it as well.
+
+    Raises:
+        ValueError: If `resume` is not a valid run id
+    """
+    g.run_id = validate_run_id(data['resume']) if data.get('resume') else new_run_id()
+    return g.run_id
+
+
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def _ndjson_event(event: str, data: dict) -> str:
+    return json.dumps({'event': event, **data}, default=str) + "\n"
+
+
+def _stage_output(output):
+    """Agent outputs are mostly JSON strings: send them as JSON so clients can read fields directly."""
+    if isinstance(output, str):
+        try:
+            return json.loads(output)
+        except ValueError:
+            return output
+    return output
+
+
+def _sse_stream(view):
+    """
+    Run a JSON endpoint in a worker thread and stream its progress.
+
+    Server-Sent Events by default; NDJSON (one {"event": ..., ...} object
+    per line) with ?format=ndjson or an Accept: application/x-ndjson header.
+    Pass ?tokens=0 to get only the stage and result events.
+
+    Events:
+        token   {"agent": "...", "token": "..."}  model output as it is generated
+        stage   {"pipeline": "...", "stage": "...", "status": "done", "output": ...}
+                                                  a pipeline stage's output as soon as
+                                                  it is finished ("restored" if taken
+                                                  from a checkpoint, "failed" without output)
+        result  {"status": 200, "body": {...}}   the endpoint's normal JSON reply
+    """
+    ndjson = (request.args.get('format') == 'ndjson'
+              or request.accept_mimetypes.best == 'application/x-ndjson')
+    tokens = request.args.get('tokens', '1').lower() not in ('0', 'false', 'no')
+
+    # Parse the body now: the worker outlives this request context
+    if request.is_json:
+        request.get_json(silent=True)
+    for file in request.files.values():
+        file.stream = io.BytesIO(file.read())
+
+    events = queue.Queue()
+
+    def on_token(agent, token):
+        events.put(("token", {"agent": agent, "token": token}))
+
+    def on_step(pipeline, step, status, output):
+        if status in ("done", "restored"):
+            events.put(("stage", {"pipeline": pipeline, "stage": step, "status": status,
+                                  "output": _stage_output(output)}))
+        elif status == "failed":
+            events.put(("stage", {"pipeline": pipeline, "stage": step, "status": status}))
+
+    # The time left on this request's deadline, handed to the worker explicitly
+    seconds = remaining()
+
+    @copy_current_request_context
+    def run():
+        try:
+            with deadline(seconds), report_steps_to(on_step):
+                if tokens:
+                    with stream_tokens_to(on_token):
+                        response = make_response(view())
+                else:
+                    response = make_response(view())
+            events.put(("result", {"status": response.status_code, "body": response.get_json()}))
+        except DeadlineExceeded as e:
+            response = make_response(deadline_exceeded(e))
+            events.put(("result", {"status": response.status_code, "body": response.get_json()}))
+        except Exception as e:
+            traceback.print_exc()
+            events.put(("result", {"status": 500, "body": {"success": False, "error": str(e)}}))
+        finally:
+            events.put(None)
+
+    # A fresh Context rather than a copy of this one: the worker pushes its own
+    # request and app context (own g), so it can't pop this request's deadline
+    threading.Thread(target=contextvars.Context().run, args=(run,), daemon=True).start()
+
+    def generate():
+        if not ndjson:
+            # Comment line so the client sees the stream open immediately
+            yield ": stream open\n\n"
+        while True:
+            item = events.get()
+            if item is None:
+                return
+            yield _ndjson_event(*item) if ndjson else _sse_event(*item)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson" if ndjson else "text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _submit_job(view, kind: str):
+    """
+    Run a JSON endpoint as a background job (job_manager) and reply 202 with
+    the job id straight away. Poll GET /api/jobs/<job_id> for step progress
+    and, once finished, the endpoint's normal JSON reply.
+    """
+    # Parse the body now: the job outlives this request context
+    if request.is_json:
+        request.get_json(silent=True)
+    seconds = _request_timeout()
+
+    @copy_current_request_context
+    def run():
+        # The job gets the caller's full budget from when it starts, not from when it was queued
+        with deadline(seconds):
+            try:
+                response = make_response(view())
+            except DeadlineExceeded as e:
+                response = make_response(deadline_exceeded(e))
+        return response.status_code, response.get_json()
+
+    try:
+        job = get_job_manager().submit(kind, run)
+    except JobQueueFull as e:
+        response = jsonify({
+            'error': str(e),
+            'success': False
+        })
+        response.headers['Retry-After'] = '30'
+        return response, 503
+
+    return jsonify({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/api/jobs/{job.id}'
+    }), 202
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """
+    Status of a background job started by one of the /async endpoints
+
+    Returns:
+    {
+        "success": true,
+        "job_id": "...",
+        "kind": "digital-twin",
+        "status": "queued" | "running" | "succeeded" | "failed",
+        "created_at": "...", "started_at": "...", "finished_at": "...",
+        "progress": {
+            "steps_finished": 9,
+            "steps_total": 19,
+            "stages": {"digital_twin": {"patient_context": "done", "twin_state": "running", ...}}
+        },
+        "http_status": 200,                    // Once finished: status of the endpoint's reply
+        "result": {...},                       // Once finished: the endpoint's JSON reply
+        "error": null
+    }
+    """
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            'error': f'Job {job_id} not found (finished jobs expire after a while)',
+            'success': False
+        }), 404
+
+    return jsonify({'success': True, **job.to_dict()}), 200
+
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -83,6 +314,9 @@ def unified_chat():
         "message": "Can you describe your chest pain?",
         "message_type": "question",
         "updated_report": "# Medical Report\\n...",
+        "report_version": 4,                   // Bumped on every report update
+        "report_updated_through": 4,           // total_messages the report covers
+        "report_pending": true,                // An update is running in the background
         "differential_diagnoses": null,
         "final_report": null,
         "expects_user_input": true,
@@ -131,6 +365,9 @@ def unified_chat():
             'success': False
         }), 400 if 'required' in str(ve).lower() else 404
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Unexpected error in unified_chat: {str(e)}")
         traceback.print_exc()
@@ -141,6 +378,16 @@ def unified_chat():
         }), 500
 
 
+@app.route('/api/chat/stream', methods=['POST'])
+def unified_chat_stream():
+    """
+    Server-Sent Events variant of /api/chat.
+    Same JSON body; streams the interviewer's tokens as they are generated,
+    then a final "result" event with the regular /api/chat response.
+    """
+    return _sse_stream(unified_chat)
+
+
 @app.route('/api/patients', methods=['GET'])
 def list_patients():
     """List available patients"""
@@ -171,14 +418,16 @@ def generate_exercise_plan():
     {
         "patient_id": "p1",                    // Required: Patient's ID
         "current_report": "...",               // Required: Current clinical report
-        "current_diet": "..."                  // Required: Current diet information
+        "current_diet": "...",                 // Required: Current diet information
+        "resume": "<run_id>"                   // Optional: run_id of a failed run to resume
     }
     
     Returns:
     {
         "success": true,
         "patient_id": "p1",
-        "exercise_plan": "Complete exercise prescription report..."
+        "exercise_plan": "Complete exercise prescription report...",
+        "run_id": "..."                        // Pass as "resume" to retry without redoing finished stages
     }
     """
     try:
@@ -220,13 +469,22 @@ def generate_exercise_plan():
                 'success': False
             }), 400
         
+        try:
+            run_id = _run_id(data)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'success': False
+            }), 400
+
         print(f"🏃 Generating exercise plan for patient: {patient_id}")
         
         # Generate exercise plan
         exercise_plan = exercisePipeline(
             patient_id=patient_id,
             current_report=current_report,
-            current_diet=current_diet
+            current_diet=current_diet,
+            run_id=run_id
         )
         
         print("✅ Exercise plan generated successfully")
@@ -234,19 +492,33 @@ def generate_exercise_plan():
         return jsonify({
             'success': True,
             'patient_id': patient_id,
-            'exercise_plan': exercise_plan
+            'exercise_plan': exercise_plan,
+            'run_id': run_id
         }), 200
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error generating exercise plan: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'error': f'Failed to generate exercise plan: {str(e)}',
             'success': False,
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc(),
+            'run_id': g.get('run_id')
         }), 500
 
 
+@app.route('/api/exercise-plan/async', methods=['POST'])
+def generate_exercise_plan_async():
+    """
+    Background-job variant of /api/exercise-plan.
+    Same JSON body; replies 202 with a job id to poll at /api/jobs/<job_id>.
+    """
+    return _submit_job(generate_exercise_plan, 'exercise-plan')
+
+
 @app.route('/api/diet-plan', methods=['POST'])
 def generate_diet_plan():
     """
@@ -255,14 +527,16 @@ def generate_diet_plan():
     Expected JSON body:
     {
         "patient_id": "p1",                    // Required: Patient's ID
-        "current_report": "..."                // Required: Current clinical report
+        "current_report": "...",               // Required: Current clinical report
+        "resume": "<run_id>"                   // Optional: run_id of a failed run to resume
     }
     
     Returns:
     {
         "success": true,
         "patient_id": "p1",
-        "diet_plan": "Complete diet plan report..."
+        "diet_plan": "Complete diet plan report...",
+        "run_id": "..."
     }
     """
     try:
@@ -298,12 +572,21 @@ def generate_diet_plan():
                 'success': False
             }), 400
         
+        try:
+            run_id = _run_id(data)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'success': False
+            }), 400
+
         print(f"🥗 Generating diet plan for patient: {patient_id}")
         
         # Generate diet plan
         diet_plan = dietPlanner(
             patient_id=patient_id,
-            current_report=current_report
+            current_report=current_report,
+            run_id=run_id
         )
         
         print("✅ Diet plan generated successfully")
@@ -311,19 +594,33 @@ def generate_diet_plan():
         return jsonify({
             'success': True,
             'patient_id': patient_id,
-            'diet_plan': diet_plan
+            'diet_plan': diet_plan,
+            'run_id': run_id
         }), 200
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error generating diet plan: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'error': f'Failed to generate diet plan: {str(e)}',
             'success': False,
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc(),
+            'run_id': g.get('run_id')
         }), 500
 
 
+@app.route('/api/diet-plan/async', methods=['POST'])
+def generate_diet_plan_async():
+    """
+    Background-job variant of /api/diet-plan.
+    Same JSON body; replies 202 with a job id to poll at /api/jobs/<job_id>.
+    """
+    return _submit_job(generate_diet_plan, 'diet-plan')
+
+
 @app.route('/api/first-aid', methods=['POST'])
 def generate_first_aid():
     """
@@ -332,14 +629,16 @@ def generate_first_aid():
     Expected JSON body:
     {
         "patient_id": "p1",                    // Required: Patient's ID
-        "current_symptoms": "..."              // Required: Current emergency symptoms
+        "current_symptoms": "...",             // Required: Current emergency symptoms
+        "resume": "<run_id>"                   // Optional: run_id of a failed run to resume
     }
     
     Returns:
     {
         "success": true,
         "patient_id": "p1",
-        "emergency_report": "Complete emergency response report..."
+        "emergency_report": "Complete emergency response report...",
+        "run_id": "..."
     }
     """
     try:
@@ -374,32 +673,61 @@ def generate_first_aid():
                 'success': False
             }), 400
         
+        try:
+            run_id = _run_id(data)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'success': False
+            }), 400
+
         print(f"🚨 Generating first aid response for patient: {patient_id}")
         
         # Generate first aid response
         emergency_report = firstAidPipeline(
             patient_id=patient_id,
-            current_symptoms=current_symptoms
+            current_symptoms=current_symptoms,
+            run_id=run_id
         )
         
+        if emergency_report is None and deadline_passed():
+            raise DeadlineExceeded("Request deadline exceeded while generating the first aid report")
+
         print("✅ First aid report generated successfully")
         
         return jsonify({
             'success': True,
             'patient_id': patient_id,
-            'emergency_report': emergency_report
+            'emergency_report': emergency_report,
+            'run_id': run_id
         }), 200
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error generating first aid report: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'error': f'Failed to generate first aid report: {str(e)}',
             'success': False,
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc(),
+            'run_id': g.get('run_id')
         }), 500
 
 
+@app.route('/api/first-aid/stream', methods=['POST'])
+def generate_first_aid_stream():
+    """
+    Server-Sent Events (or NDJSON, ?format=ndjson) variant of /api/first-aid.
+    Streams each agent's tokens and each stage's output as the pipeline runs
+    (the emergency_risk stage carries emergency_severity and
+    ems_activation_recommended), then a final "result" event with the regular
+    /api/first-aid response.
+    """
+    return _sse_stream(generate_first_aid)
+
+
 @app.route('/api/medicine-check', methods=['POST'])
 def check_medicine_safety():
     """
@@ -421,7 +749,8 @@ def check_medicine_safety():
                     "indication": "Type 2 Diabetes"
                 }
             ]
-        }
+        },
+        "resume": "<run_id>"                   // Optional: run_id of a failed run to resume
     }
     
     Returns:
@@ -437,7 +766,8 @@ def check_medicine_safety():
             "appropriateness": "...",
             "risk_aggregation": "...",
             "final_report": "..."
-        }
+        },
+        "run_id": "..."
     }
     """
     try:
@@ -481,6 +811,14 @@ def check_medicine_safety():
                 'success': False
             }), 400
         
+        try:
+            run_id = _run_id(data)
+        except ValueError as e:
+            return jsonify({
+                'error': str(e),
+                'success': False
+            }), 400
+
         print(f"💊 Checking medication safety for patient: {patient_id}")
         
         # Get EHR summary
@@ -491,7 +829,8 @@ def check_medicine_safety():
             patient_id=patient_id,
             ehr_summary=ehr_summary,
             current_report=current_report,
-            prescription_data=prescription_data
+            prescription_data=prescription_data,
+            run_id=run_id
         )
         
         print("✅ Medicine safety check completed successfully")
@@ -499,19 +838,33 @@ def check_medicine_safety():
         return jsonify({
             'success': True,
             'patient_id': patient_id,
-            'safety_report': safety_report
+            'safety_report': safety_report,
+            'run_id': run_id
         }), 200
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error checking medicine safety: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'error': f'Failed to check medicine safety: {str(e)}',
             'success': False,
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc(),
+            'run_id': g.get('run_id')
         }), 500
 
 
+@app.route('/api/medicine-check/async', methods=['POST'])
+def check_medicine_safety_async():
+    """
+    Background-job variant of /api/medicine-check.
+    Same JSON body; replies 202 with a job id to poll at /api/jobs/<job_id>.
+    """
+    return _submit_job(check_medicine_safety, 'medicine-check')
+
+
 @app.route('/api/patients/<patient_id>', methods=['GET'])
 def get_patient(patient_id):
     """Get patient EHR summary"""
@@ -594,6 +947,7 @@ def digital_twin_analyze():
             "labs": [],
             "notes": "Feeling good today"
         },
+        "resume": "<run_id>"                   // Optional: run_id of a failed run to resume
     }
     
     Returns:
@@ -621,7 +975,8 @@ def digital_twin_analyze():
         "health_forecast": {...},
         "clinical_alerts": {...},
         "digital_twin_state": {...},
-        "deviation_analysis": {...}
+        "deviation_analysis": {...},
+        "run_id": "..."
     }
     """
     try:
@@ -654,9 +1009,10 @@ def digital_twin_analyze():
         
         print(daily_logs)
         
+        run_id = _run_id(data)  # an invalid `resume` id → 400 below
         
         # Run the pipeline
-        result = digitaltwinpipeline(patient_id, daily_logs)
+        result = digitaltwinpipeline(patient_id, daily_logs, run_id=run_id)
         
         print("✅ Digital Twin Pipeline completed successfully")
         print(f"📈 Health Score: {result['executive_summary']['health_score']}")
@@ -675,7 +1031,8 @@ def digital_twin_analyze():
             'health_forecast': result['health_forecast'],
             'clinical_alerts': result['clinical_alerts'],
             'digital_twin_state': result['digital_twin_state'],
-            'deviation_analysis': result['deviation_analysis']
+            'deviation_analysis': result['deviation_analysis'],
+            'run_id': run_id
         }), 200
     
     except ValueError as ve:
@@ -685,16 +1042,39 @@ def digital_twin_analyze():
             'success': False
         }), 400
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error in digital twin analysis: {str(e)}")
         traceback.print_exc()
         return jsonify({
             'error': f'Failed to complete digital twin analysis: {str(e)}',
             'success': False,
-            'traceback': traceback.format_exc()
+            'traceback': traceback.format_exc(),
+            'run_id': g.get('run_id')
         }), 500
 
 
+@app.route('/api/digital-twin/analyze/async', methods=['POST'])
+def digital_twin_analyze_async():
+    """
+    Background-job variant of /api/digital-twin/analyze.
+    Same JSON body; replies 202 with a job id to poll at /api/jobs/<job_id>.
+    """
+    return _submit_job(digital_twin_analyze, 'digital-twin')
+
+
+@app.route('/api/digital-twin/analyze/stream', methods=['POST'])
+def digital_twin_analyze_stream():
+    """
+    Server-Sent Events (or NDJSON, ?format=ndjson) variant of
+    /api/digital-twin/analyze. Streams each stage's output as soon as it is
+    finished, then a final "result" event with the regular response.
+    """
+    return _sse_stream(digital_twin_analyze)
+
+
 @app.route('/api/digital-twin/quick-check', methods=['POST'])
 def digital_twin_quick_check():
     """
@@ -734,12 +1114,13 @@ def digital_twin_quick_check():
         print(f"🏃 Quick check for patient: {patient_id}")
         
         # Import required agents for quick check
-        from agents.sAgents.digitaltwin.patientContextAgent import pca
+        from agents.sAgents.shared_summary import get_patient_summary
+        from ehr_store.patientdata.data_manager import load_report
         from agents.sAgents.digitaltwin.logsAgent import dailylogsAgent
         from agents.sAgents.digitaltwin.alertGeneratorAgent import alertGeneratorAgent
         
         # Load patient context
-        patient_context = pca(patient_id)
+        patient_context = get_patient_summary(patient_id, load_report(patient_id), view="patient_context")
         patient_context = json.loads(patient_context) if isinstance(patient_context, str) else patient_context
         
         # Process daily logs
@@ -774,6 +1155,9 @@ def digital_twin_quick_check():
             'requires_immediate_attention': alerts.get('alert_summary', {}).get('requires_immediate_attention', False)
         }), 200
     
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         print(f"❌ Error in quick check: {str(e)}")
         traceback.print_exc()
@@ -783,6 +1167,106 @@ def digital_twin_quick_check():
         }), 500
 
 
+@app.route('/api/progress-analysis', methods=['POST'])
+def progress_analysis():
+    """
+    Patient progress analysis (data aggregation, current status, progress &
+    risk, imaging interpretation, clinical report, alerts)
+    
+    Expected JSON body:
+    {
+        "patient_id": "p1",                    // Required: Patient's ID
+        "imaging_data": {...},                 // Optional: Imaging and diagnostic study data
+        "include_detailed_logs": false         // Optional: Add a per-step processing log
+    }
+    
+    Returns:
+    {
+        "success": true,
+        "patient_id": "p1",
+        "progress_analysis": {
+            "pipeline_status": "completed",
+            "aggregated_data": "...",
+            "current_status": "...",
+            "progress_assessment": "...",
+            "imaging_interpretation": "...",
+            "clinical_report": "...",
+            "alerts_recommendations": "...",
+            "executive_summary": {...}
+        }
+    }
+    """
+    try:
+        print("\n" + "="*60)
+        print("📨 Received request to /api/progress-analysis")
+        print("="*60)
+        
+        from orchestrations.patient_progress_analysis_pipeline import patientProgressAnalysisPipeline
+        
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({
+                'error': 'No data provided',
+                'success': False
+            }), 400
+        
+        patient_id = data.get('patient_id')
+        
+        if not patient_id:
+            return jsonify({
+                'error': 'patient_id is required',
+                'success': False
+            }), 400
+        
+        print(f"📈 Analyzing progress for patient: {patient_id}")
+        
+        results = patientProgressAnalysisPipeline(
+            patient_id=patient_id,
+            imaging_data=data.get('imaging_data'),
+            include_detailed_logs=bool(data.get('include_detailed_logs', False))
+        )
+        
+        if results.get('pipeline_status') == 'failed':
+            if deadline_passed():
+                raise DeadlineExceeded("Request deadline exceeded during the progress analysis")
+            return jsonify({
+                'error': f"Progress analysis failed: {results['error']['message']}",
+                'success': False,
+                'progress_analysis': results
+            }), 500
+        
+        print("✅ Progress analysis completed successfully")
+        
+        return jsonify({
+            'success': True,
+            'patient_id': patient_id,
+            'progress_analysis': results
+        }), 200
+    
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
+    except Exception as e:
+        print(f"❌ Error in progress analysis: {str(e)}")
+        traceback.print_exc()
+        return jsonify({
+            'error': f'Failed to complete progress analysis: {str(e)}',
+            'success': False,
+            'traceback': traceback.format_exc()
+        }), 500
+
+
+@app.route('/api/progress-analysis/stream', methods=['POST'])
+def progress_analysis_stream():
+    """
+    Server-Sent Events (or NDJSON, ?format=ndjson) variant of
+    /api/progress-analysis. Streams each agent's output as soon as it is
+    finished, then a final "result" event with the regular response.
+    """
+    return _sse_stream(progress_analysis)
+
+
 @app.route('/api/document-analyzer', methods=['POST'])
 def document_analyzer():
     """
@@ -902,23 +1386,21 @@ def document_analyzer():
             print(f"🖼️  Detected IMAGE file - routing to image handler...")
             
             try:
-                # Read and encode image
+                # Read, validate, downsample and re-encode the image once;
+                # the raw bytes are passed through to the model client
                 file_content = file.read()
                 file.seek(0)
                 
-                # Validate image
-                img = Image.open(io.BytesIO(file_content))
-                img_format = img.format or 'Unknown'
-                img_size = img.size
-                
-                # Convert to base64
-                img_base64 = base64.b64encode(file_content).decode('utf-8')
+                prepared = prepare_image(file_content)
+                img_format = prepared.original_format or 'Unknown'
+                img_size = prepared.original_size
+                print(f"🖼️  Prepared for upload: {describe_image(prepared)}")
                 
                 # Prepare image data
                 images_data = [{
                     'filename': file.filename,
                     'type': 'image',
-                    'data': img_base64,
+                    'data': prepared,
                     'format': img_format,
                     'dimensions': f'{img_size[0]}x{img_size[1]}'
                 }]
@@ -1014,6 +1496,9 @@ def document_analyzer():
             'timestamp': time.strftime('%Y-%m-%d %H:%M:%S')
         }), 200
         
+    except DeadlineExceeded:
+        raise  # → 504 via deadline_exceeded()
+    
     except Exception as e:
         error_trace = traceback.format_exc()
         print(f"\n❌ ERROR in document analyzer:")
@@ -1027,6 +1512,16 @@ def document_analyzer():
         }), 500
 
 
+@app.route('/api/document-analyzer/stream', methods=['POST'])
+def document_analyzer_stream():
+    """
+    Server-Sent Events variant of /api/document-analyzer.
+    Same multipart form; streams the analysis tokens as they are generated,
+    then a final "result" event with the regular response.
+    """
+    return _sse_stream(document_analyzer)
+
+
 @app.route('/api/logs/<patient_id>', methods=['GET'])
 def get_logs(patient_id):
     try:
@@ -1043,5 +1538,49 @@ def get_logs(patient_id):
             'details': str(e)
         }), 500
 
+
+# Longest trend window, in days (100 years)
+MAX_TREND_DAYS = 36600
+
+
+@app.route('/api/logs/<patient_id>/trends', methods=['GET'])
+def get_log_trends(patient_id):
+    """
+    Vitals, medication adherence and exercise aggregated over windows of days,
+    e.g. GET /api/logs/p1/trends?days=7,30,365&end=2026-03-15
+    (end defaults to the date of the latest log).
+    """
+    try:
+        windows = [int(d) for d in request.args.get('days', '7,30,365').split(',') if d.strip()]
+        if not windows or min(windows) <= 0 or max(windows) > MAX_TREND_DAYS:
+            raise ValueError(f"days must be positive integers up to {MAX_TREND_DAYS}")
+        end = request.args.get('end')
+        if end is not None:
+            end = date.fromisoformat(end)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': f'days must be a comma-separated list of positive integers up to {MAX_TREND_DAYS}'
+                     ' and end a YYYY-MM-DD date',
+            'details': str(e)
+        }), 400
+
+    try:
+        return jsonify({
+            'success': True,
+            'patient_id': patient_id,
+            'trends': {str(days): get_daily_log_aggregates(patient_id, days, end) for days in windows}
+        }), 200
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': f'Failed to compute log trends for patient {patient_id}',
+            'details': str(e)
+        }), 500
+
 if __name__ == '__main__':
+    # Pre-connect the shared MedGemma transport so the first agent call skips the TCP
+    # handshake. The debug reloader runs this file twice; only its serving child warms up.
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        warm_transport()
     app.run(debug=True, host='0.0.0.0', port=5000)
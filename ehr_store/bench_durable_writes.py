@@ -0,0 +1,161 @@
+"""
+Benchmark: patient data write throughput under concurrent writers, before
+and after crash-safe writes (ehr_store.durable_files).
+
+Each of --writers threads saves its own patient's report (save_report) or
+appends to its own daily log (append_daily_log) as fast as it can:
+
+    before    the old data_manager writes: json.dump over the file in place
+              (report), load + append + rewrite the whole array (daily
+              log); nothing is fsynced, so a crash can lose or corrupt the file
+    fsync     crash-safe writes with durable_files.group_commit = False:
+              write_file() (temp file, fsync, rename, directory fsync) for
+              the report, DailyLogStore.append() (fsynced O_APPEND) for the
+              daily log; every write pays its own fsyncs
+    group     the default: the same writes go through the directory's
+              journal, and writers waiting at the same time share one
+              journal fsync (group commit); files are fsynced by the
+              background checkpoint
+
+The syncs/write column counts journal syncs per write (group mode).
+
+Runs in a temporary directory under --dir (default: the system temp dir);
+use a directory on the disk the app writes to, fsync costs differ a lot.
+
+Usage:
+    python ehr_store/bench_durable_writes.py [--writers 32] [--writes 50] [--dir /var/lib/medgemma]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from ehr_store import durable_files
+from ehr_store.durable_files import journal_stats, write_file
+from ehr_store.patientdata.daily_log_store import DailyLogStore
+
+_HISTORY_DAYS = 90
+
+
+def _report(i: int) -> dict:
+    return {
+        "patient_id": f"p{i}",
+        "chief_complaint": "Intermittent chest tightness on exertion",
+        "history_of_present_illness": "Three weeks of exertional chest tightness relieved by rest. " * 20,
+        "differential_diagnosis": [{"condition": f"condition {k}", "likelihood": "moderate"} for k in range(10)],
+        "revision": i,
+    }
+
+
+def _log(i: int) -> dict:
+    return {
+        "date": f"2026-{1 + i // 28 % 12:02d}-{1 + i % 28:02d}",
+        "vitals": {"blood_pressure_systolic": 120 + i % 20, "heart_rate": 70 + i % 10},
+        "medications_taken": [{"medication_name": "Metformin 1000mg", "taken": True}],
+        "exercise": {"exercise_minutes": 30, "type": "walking", "intensity": "moderate"},
+        "symptoms": [],
+        "notes": "Felt fine." * 20,
+    }
+
+
+# -- report saves -----------------------------------------------------------
+
+def _report_before(directory: Path, writer: int, i: int):
+    with open(directory / f"p{writer}_report.json", 'w', encoding='utf-8') as f:
+        json.dump(_report(i), f, indent=2, ensure_ascii=False)
+
+
+def _report_durable(directory: Path, writer: int, i: int):
+    write_file(directory / f"p{writer}_report.json",
+               json.dumps(_report(i), indent=2, ensure_ascii=False).encode('utf-8'))
+
+
+# -- daily log appends ------------------------------------------------------
+
+def _seed_logs(directory: Path, writers: int):
+    for writer in range(writers):
+        with open(directory / f"p{writer}_daily_logs.json", 'w', encoding='utf-8') as f:
+            json.dump([_log(i) for i in range(_HISTORY_DAYS)], f, indent=2)
+
+
+def _append_before(directory: Path, writer: int, i: int):
+    path = directory / f"p{writer}_daily_logs.json"
+    with open(path, 'r', encoding='utf-8') as f:
+        logs = json.load(f)
+    logs.append(_log(i))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(logs, f, indent=2, ensure_ascii=False)
+
+
+def _append_durable(store: DailyLogStore):
+    def append(directory: Path, writer: int, i: int):
+        store.append(f"p{writer}", _log(i))
+    return append
+
+
+def _run(write, directory: Path, writers: int, writes: int) -> float:
+    """Writes per second with `writers` threads doing `writes` each."""
+    barrier = threading.Barrier(writers + 1)
+
+    def worker(writer):
+        barrier.wait()
+        for i in range(writes):
+            write(directory, writer, i)
+
+    threads = [threading.Thread(target=worker, args=(w,)) for w in range(writers)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return writers * writes / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--writers", type=int, default=32)
+    parser.add_argument("--writes", type=int, default=50, help="writes per writer")
+    parser.add_argument("--dir", help="parent directory for the temporary store")
+    args = parser.parse_args()
+
+    rows = []
+    for workload in ("save_report", "append_daily_log"):
+        for mode in ("before", "fsync", "group"):
+            durable_files.group_commit = mode == "group"
+            with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+                directory = Path(tmp)
+                if workload == "save_report":
+                    write = _report_before if mode == "before" else _report_durable
+                else:
+                    _seed_logs(directory, args.writers)
+                    if mode == "before":
+                        write = _append_before
+                    else:
+                        store = DailyLogStore(directory)
+                        for writer in range(args.writers):
+                            store.count(f"p{writer}")   # migrate before timing
+                        write = _append_durable(store)
+                before = journal_stats(directory)["fsyncs"]
+                rate = _run(write, directory, args.writers, args.writes)
+                fsyncs = journal_stats(directory)["fsyncs"] - before
+                durable_files.checkpoint(directory)
+                rows.append((workload, mode, rate, fsyncs / (args.writers * args.writes)))
+
+    print(f"\n{args.writers} writers × {args.writes} writes each\n")
+    print(f"{'workload':<18}{'mode':<8}{'durable':>8}{'writes/s':>11}{'syncs/write':>13}")
+    for workload, mode, rate, fsyncs in rows:
+        shared = f"{fsyncs:.2f}" if mode == "group" else "-"
+        print(f"{workload:<18}{mode:<8}{'no' if mode == 'before' else 'yes':>8}{rate:>11.0f}{shared:>13}")
+
+
+if __name__ == "__main__":
+    main()
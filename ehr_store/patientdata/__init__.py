@@ -35,6 +35,10 @@ from .data_manager import (
     
     # Special functions
     append_daily_log,
+    get_recent_daily_logs,
+    get_daily_logs_between,
+    get_daily_log_aggregates,
+    get_daily_log_series,
     
     # Utility functions
     get_all_patient_data,
@@ -88,6 +92,10 @@ __all__ = [
     
     # Special functions
     'append_daily_log',
+    'get_recent_daily_logs',
+    'get_daily_logs_between',
+    'get_daily_log_aggregates',
+    'get_daily_log_series',
     
     # Utility functions
     'get_all_patient_data',
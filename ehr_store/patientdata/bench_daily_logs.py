@@ -0,0 +1,135 @@
+"""
+Benchmark: daily logs as a JSON array vs the append-only log
+(ehr_store.patientdata.daily_log_store).
+
+"before" is the old data_manager path: every append loads the whole
+{patient_id}_daily_logs.json array and writes it back, and every
+get_recent_daily_logs parses the whole file to slice the end. "after"
+appends one line, reads the tail of the file and looks date ranges up in
+the date index.
+
+Writes synthetic histories (one realistic entry per day) to a temporary
+directory for each length.
+
+Usage:
+    python ehr_store/patientdata/bench_daily_logs.py [--days 365 1825] [--calls 50]
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from ehr_store.patientdata.daily_log_store import DailyLogStore
+
+
+def _entry(day: date, i: int) -> dict:
+    return {
+        "date": day.isoformat(),
+        "medications_taken": [{"name": "metformin", "dose": "1000 mg", "taken": i % 7 != 0}],
+        "vitals": {
+            "blood_pressure_systolic": 118 + i % 20,
+            "blood_pressure_diastolic": 76 + i % 10,
+            "heart_rate": 64 + i % 15,
+            "temperature_f": 98.6,
+            "blood_glucose_mg_dl": 95 + i % 40,
+            "weight_lbs": 170 - i % 5,
+            "oxygen_saturation_percent": 98,
+        },
+        "symptoms": [],
+        "exercise": {"exercise_minutes": 20 + i % 30, "type": "walking", "intensity": "moderate"},
+        "nutrition": {"meals": [{"meal": "breakfast", "items": ["oats", "banana", "coffee"]}]},
+        "labs": [],
+        "notes": "Felt fine, slept about seven hours." * 3,
+    }
+
+
+def _before_append(path: Path, entry: dict):
+    with open(path, 'r', encoding='utf-8') as f:
+        logs = json.load(f)
+    logs.append(entry)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(logs, f, indent=2, ensure_ascii=False)
+
+
+def _before_recent(path: Path, n: int) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)[-n:]
+
+
+def _before_between(path: Path, start: str, end: str) -> list:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [e for e in json.load(f) if start <= e.get("date", "") <= end]
+
+
+def _median_ms(fn, calls: int) -> float:
+    times = []
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(i)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, nargs="+", default=[365, 1825])
+    parser.add_argument("--calls", type=int, default=50)
+    args = parser.parse_args()
+
+    rows = []
+    for days in args.days:
+        first = date(2024, 1, 1)
+        history = [_entry(first + timedelta(days=i), i) for i in range(days)]
+        new_day = first + timedelta(days=days)
+        month_start = (first + timedelta(days=days // 2)).isoformat()
+        month_end = (first + timedelta(days=days // 2 + 29)).isoformat()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            legacy = directory / "p1_daily_logs.json"
+            with open(legacy, 'w', encoding='utf-8') as f:
+                json.dump(history, f, indent=2)
+            file_kb = legacy.stat().st_size / 1024
+
+            before = {
+                "append": _median_ms(lambda i: _before_append(legacy, _entry(new_day, i)), args.calls),
+                "last 30": _median_ms(lambda i: _before_recent(legacy, 30), args.calls),
+                "1 month": _median_ms(lambda i: _before_between(legacy, month_start, month_end), args.calls),
+            }
+
+            with open(legacy, 'w', encoding='utf-8') as f:
+                json.dump(history, f, indent=2)
+            store = DailyLogStore(directory)
+            start = time.perf_counter()
+            store.count("p1")
+            migrate_ms = (time.perf_counter() - start) * 1000
+
+            after = {
+                "append": _median_ms(lambda i: store.append("p1", _entry(new_day, i)), args.calls),
+                "last 30": _median_ms(lambda i: store.tail("p1", 30), args.calls),
+                "1 month": _median_ms(lambda i: store.between("p1", month_start, month_end), args.calls),
+            }
+            assert store.between("p1", month_start, month_end) == _before_between(
+                directory / "p1_daily_logs.json.migrated", month_start, month_end)
+            rows.append((days, file_kb, migrate_ms, before, after))
+
+    print(f"\nDaily log operations, median of {args.calls} calls\n")
+    print(f"{'days':>6}{'file KB':>9}{'operation':>11}{'before ms':>11}{'after ms':>10}{'speedup':>9}")
+    for days, file_kb, migrate_ms, before, after in rows:
+        for operation in before:
+            print(f"{days:>6}{file_kb:>9.0f}{operation:>11}{before[operation]:>11.2f}{after[operation]:>10.3f}"
+                  f"{before[operation] / after[operation]:>8.0f}x")
+        print(f"{'':>15}{'migration':>11}{'':>11}{migrate_ms:>10.1f}   (once per patient)")
+
+
+if __name__ == "__main__":
+    main()
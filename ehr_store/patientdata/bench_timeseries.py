@@ -0,0 +1,118 @@
+"""
+Benchmark: windowed daily log aggregates from the JSON logs vs the
+columnar time series (ehr_store.patientdata.timeseries_store).
+
+"before" reads the daily logs and walks the nested dicts in Python to get
+the mean/min/max/last of each vital, dose adherence and exercise minutes
+over the window. "after" is TimeSeriesStore.window() on the memory-mapped
+arrays.
+
+Usage:
+    python ehr_store/patientdata/bench_timeseries.py [--days 365 1825] [--windows 7 30 365] [--calls 200]
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from ehr_store.patientdata.daily_log_store import DailyLogStore
+from ehr_store.patientdata.timeseries_store import TimeSeriesStore, _VITALS
+
+
+def _entry(day: date, i: int) -> dict:
+    return {
+        "date": day.isoformat(),
+        "medications_taken": [
+            {"medication_name": "Metformin 1000mg", "taken": i % 7 != 0},
+            {"medication_name": "Lisinopril 10mg", "taken": True},
+        ],
+        "vitals": {
+            "blood_pressure_systolic": 118 + i % 20,
+            "blood_pressure_diastolic": 76 + i % 10,
+            "heart_rate": 64 + i % 15,
+            "temperature_f": 98.6,
+            "blood_glucose_mg_dl": 95 + i % 40,
+            "weight_lbs": 170 - i % 5,
+            "oxygen_saturation_percent": 97 + i % 3,
+        },
+        "symptoms": [{"symptom": "headache", "severity": "mild"}] if i % 9 == 0 else [],
+        "exercise": {"exercise_minutes": 20 + i % 30, "type": "walking", "intensity": "moderate"},
+        "nutrition": {"meals": [{"meal_time": "morning", "items": ["oats", "banana"]}]},
+        "notes": "Felt fine, slept about seven hours.",
+    }
+
+
+def _before_window(logs: DailyLogStore, patient_id: str, days: int) -> dict:
+    """Aggregates the way analysis code walks the logs today."""
+    entries = logs.all(patient_id)
+    last_day = date.fromisoformat(entries[-1]["date"])
+    first = (last_day - timedelta(days=days - 1)).isoformat()
+    window = [e for e in entries if first <= e["date"] <= last_day.isoformat()]
+
+    measures = {}
+    for column, key in _VITALS.items():
+        values = [e["vitals"][key] for e in window if e.get("vitals", {}).get(key) is not None]
+        measures[column] = {"mean": sum(values) / len(values), "min": min(values), "max": max(values),
+                            "last": values[-1], "count": len(values)} if values else None
+    prescribed = sum(len(e.get("medications_taken") or []) for e in window)
+    taken = sum(1 for e in window for m in e.get("medications_taken") or [] if m.get("taken") is True)
+    minutes = sum(e.get("exercise", {}).get("exercise_minutes", 0) for e in window)
+    return {"measures": measures, "adherence": taken / prescribed if prescribed else None, "exercise": minutes}
+
+
+def _median_us(fn, calls: int) -> float:
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, nargs="+", default=[365, 1825], help="history lengths")
+    parser.add_argument("--windows", type=int, nargs="+", default=[7, 30, 365])
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    rows = []
+    for days in args.days:
+        with tempfile.TemporaryDirectory() as tmp:
+            logs = DailyLogStore(tmp)
+            first = date(2024, 1, 1)
+            logs.replace_all("p1", [_entry(first + timedelta(days=i), i) for i in range(days)])
+            store = TimeSeriesStore(tmp, logs)
+
+            start = time.perf_counter()
+            store.rebuild("p1")
+            build_ms = (time.perf_counter() - start) * 1000
+            append_us = _median_us(
+                lambda: store.append("p1", _entry(first + timedelta(days=days), days),
+                                     logs.append("p1", _entry(first + timedelta(days=days), days))),
+                args.calls)
+
+            for window in args.windows:
+                before = _median_us(lambda: _before_window(logs, "p1", window), max(3, args.calls // 20))
+                after = _median_us(lambda: store.window("p1", window), args.calls)
+                check = store.window("p1", window)["measures"]["heart_rate"]["mean"]
+                assert abs(check - _before_window(logs, "p1", window)["measures"]["heart_rate"]["mean"]) < 1e-9
+                rows.append((days, window, before, after))
+            print(f"{days} days: series built in {build_ms:.1f} ms, log append + series append {append_us:.0f} µs")
+
+    print(f"\nWindowed aggregates, median of {args.calls} calls\n")
+    print(f"{'days':>6}{'window':>8}{'before µs':>12}{'after µs':>10}{'speedup':>9}")
+    for days, window, before, after in rows:
+        print(f"{days:>6}{window:>8}{before:>12.0f}{after:>10.1f}{before / after:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
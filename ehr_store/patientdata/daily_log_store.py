@@ -0,0 +1,400 @@
+"""
+Append-only daily log storage.
+
+Daily logs are kept one JSON object per line in {patient_id}_daily_logs.jsonl,
+next to a small binary index {patient_id}_daily_logs.idx holding one
+(date, byte offset) record per entry:
+
+    - append() writes one line and one index record: O(1), no matter how
+      long the history is.
+    - tail(n) reads the log backwards from the end until it has n entries,
+      so the last 30 days cost the same after a week or after five years.
+    - between(start, end) binary-searches the date index and reads only the
+      matching lines: O(log n + k).
+
+Existing {patient_id}_daily_logs.json array files are converted on first
+access; the original is kept as {patient_id}_daily_logs.json.migrated.
+
+The index can always be rebuilt from the log. If the process stops between
+writing a line and its index record, the missing records are added the
+next time the patient's log is opened. A line is on disk, in the
+directory's journal (ehr_store.durable_files), before append() returns;
+its index record is not, since it can be recovered from the log.
+
+Usage:
+    from ehr_store.patientdata.daily_log_store import DailyLogStore
+
+    store = DailyLogStore(directory)
+    store.append("p1", {"date": "2026-03-01", "vitals": {...}})
+    last_week = store.tail("p1", 7)
+    february = store.between("p1", "2026-02-01", "2026-02-28")
+"""
+
+import bisect
+import json
+import os
+import struct
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ehr_store.durable_files import append_file, recover, remove_file, write_file
+
+# (date ordinal, byte offset of the line); ordinal 0 = entry without a date
+_INDEX_RECORD = struct.Struct('<iq')
+
+# Bytes read per step when reading the log backwards
+tail_block_size = 64 * 1024
+
+DateLike = Union[str, date, datetime]
+
+
+def entry_date(entry: Dict[str, Any]) -> Optional[date]:
+    """The calendar date of a log entry ("date": "YYYY-MM-DD..."), or None."""
+    value = entry.get('date') if isinstance(entry, dict) else None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, str):
+        try:
+            return date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    return None
+
+
+def _as_date(value: DateLike) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _ordinal(entry: Dict[str, Any]) -> int:
+    day = entry_date(entry)
+    return day.toordinal() if day else 0
+
+
+def _encode(entry: Dict[str, Any]) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _decode(line: bytes, path: Path) -> Optional[Dict[str, Any]]:
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        print(f"⚠️  Skipping unreadable line in {path}: {e}")
+        return None
+
+
+class _Index:
+    """In-memory date index of one patient's log, sorted by (date, offset)."""
+
+    __slots__ = ('keys', 'covered')
+
+    def __init__(self, records: List[Tuple[int, int]], covered: int):
+        self.keys = sorted(records)
+        self.covered = covered      # log bytes the index accounts for
+
+    def add(self, ordinal: int, offset: int, end: int):
+        key = (ordinal, offset)
+        if not self.keys or key >= self.keys[-1]:
+            self.keys.append(key)   # the usual case: logs arrive in date order
+        else:
+            bisect.insort(self.keys, key)
+        self.covered = end
+
+
+class DailyLogStore:
+    """Per-patient append-only daily logs with a date index."""
+
+    def __init__(self, directory: Union[str, Path]):
+        """
+        Args:
+            directory: Folder holding the {patient_id}_daily_logs.* files
+        """
+        self.directory = Path(directory)
+        self._indexes: Dict[str, _Index] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+        # Writes that returned before a crash go back into the files first
+        recover(self.directory)
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+
+    def log_path(self, patient_id: str) -> Path:
+        return self.directory / f"{patient_id}_daily_logs.jsonl"
+
+    def index_path(self, patient_id: str) -> Path:
+        return self.directory / f"{patient_id}_daily_logs.idx"
+
+    def legacy_path(self, patient_id: str) -> Path:
+        return self.directory / f"{patient_id}_daily_logs.json"
+
+    def exists(self, patient_id: str) -> bool:
+        return self.log_path(patient_id).exists() or self.legacy_path(patient_id).exists()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def all(self, patient_id: str) -> List[Dict[str, Any]]:
+        """Every entry, in the order it was appended."""
+        path = self.log_path(patient_id)
+        with self._patient_lock(patient_id):
+            self._open(patient_id)
+            if not path.exists():
+                return []
+            with open(path, 'rb') as f:
+                data = f.read()
+        return [entry for entry in (_decode(line, path) for line in data.splitlines()) if entry is not None]
+
+    def tail(self, patient_id: str, n: int) -> List[Dict[str, Any]]:
+        """The last n entries, oldest first, reading the log from the end."""
+        if n <= 0:
+            return []
+        path = self.log_path(patient_id)
+        with self._patient_lock(patient_id):
+            self._open(patient_id)
+            if not path.exists():
+                return []
+            lines = _read_last_lines(path, n)
+        entries = [entry for entry in (_decode(line, path) for line in lines) if entry is not None]
+        return entries[-n:]
+
+    def between(self, patient_id: str, start: Optional[DateLike] = None,
+                end: Optional[DateLike] = None) -> List[Dict[str, Any]]:
+        """
+        Entries dated from start to end (both inclusive, None = open-ended),
+        in the order they were appended. Entries without a date are skipped.
+        """
+        low = _as_date(start).toordinal() if start is not None else 1
+        high = _as_date(end).toordinal() if end is not None else date.max.toordinal()
+        path = self.log_path(patient_id)
+
+        with self._patient_lock(patient_id):
+            index = self._open(patient_id)
+            if index is None or low > high:
+                return []
+            first = bisect.bisect_left(index.keys, (low, -1))
+            last = bisect.bisect_right(index.keys, (high, float('inf')))
+            offsets = sorted(offset for _, offset in index.keys[first:last])
+            if not offsets:
+                return []
+            entries = []
+            with open(path, 'rb') as f:
+                for offset in offsets:
+                    f.seek(offset)
+                    entry = _decode(f.readline(), path)
+                    if entry is not None:
+                        entries.append(entry)
+        return entries
+
+    def size(self, patient_id: str) -> int:
+        """Bytes of the log that are indexed: the whole log, once it has been opened."""
+        with self._patient_lock(patient_id):
+            index = self._open(patient_id)
+            return 0 if index is None else index.covered
+
+    def count(self, patient_id: str, dated_only: bool = False) -> int:
+        """Number of entries (or of entries with a date), from the index."""
+        with self._patient_lock(patient_id):
+            index = self._open(patient_id)
+            if index is None:
+                return 0
+            if dated_only:
+                # Undated entries sort first with ordinal 0
+                return len(index.keys) - bisect.bisect_left(index.keys, (1, -1))
+            return len(index.keys)
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, patient_id: str, entry: Dict[str, Any]) -> int:
+        """Append one entry; returns the byte offset of its line."""
+        line = _encode(entry)
+        path = self.log_path(patient_id)
+        with self._patient_lock(patient_id):
+            index = self._open(patient_id)
+            if index is None:
+                index = self._indexes[patient_id] = _Index([], 0)
+            # The index accounts for the whole log, so the line goes at index.covered
+            offset = append_file(path, line)
+            append_file(self.index_path(patient_id), _INDEX_RECORD.pack(_ordinal(entry), offset), sync=False)
+            index.add(_ordinal(entry), offset, offset + len(line))
+        return offset
+
+    def replace_all(self, patient_id: str, entries: List[Dict[str, Any]]):
+        """Rewrite the whole log (and its index) with the given entries."""
+        with self._patient_lock(patient_id):
+            self._migrate(patient_id)
+            self._indexes[patient_id] = self._write(patient_id, entries)
+
+    def delete(self, patient_id: str):
+        """Remove the log and its index."""
+        with self._patient_lock(patient_id):
+            for path in (self.log_path(patient_id), self.index_path(patient_id)):
+                remove_file(path)
+            self._indexes.pop(patient_id, None)
+
+    def forget(self, patient_id: Optional[str] = None):
+        """Drop the cached index of a patient (or all), e.g. after the files were moved."""
+        with self._lock:
+            if patient_id is None:
+                self._indexes.clear()
+            else:
+                self._indexes.pop(patient_id, None)
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _patient_lock(self, patient_id: str) -> threading.RLock:
+        with self._lock:
+            return self._locks.setdefault(patient_id, threading.RLock())
+
+    def _open(self, patient_id: str) -> Optional[_Index]:
+        """
+        The patient's index, migrating the legacy file and catching the
+        index up with the log first if needed. Called with the patient lock held.
+        """
+        self._migrate(patient_id)
+        path = self.log_path(patient_id)
+        if not path.exists():
+            self._indexes.pop(patient_id, None)
+            return None
+
+        size = path.stat().st_size
+        index = self._indexes.get(patient_id)
+        if index is not None and index.covered == size:
+            return index
+
+        # First use in this process, or the log was written elsewhere
+        index = self._load_index(patient_id, size)
+        if index.covered != size:
+            self._catch_up(patient_id, index, size)
+        self._indexes[patient_id] = index
+        return index
+
+    def _load_index(self, patient_id: str, size: int) -> _Index:
+        """Read the .idx file and work out how much of the log it covers."""
+        index_path = self.index_path(patient_id)
+        records: List[Tuple[int, int]] = []
+        if index_path.exists():
+            raw = index_path.read_bytes()
+            usable = len(raw) - len(raw) % _INDEX_RECORD.size
+            records = [rec for rec in _INDEX_RECORD.iter_unpack(raw[:usable])]
+            if usable != len(raw):
+                # Torn last record: keep the complete ones
+                with open(index_path, 'r+b') as f:
+                    f.truncate(usable)
+
+        if not records:
+            return _Index([], 0)
+
+        # Records are in append order, so the last one is the last indexed line
+        last_offset = records[-1][1]
+        if last_offset >= size:
+            print(f"⚠️  Daily log index of {patient_id} is ahead of the log, rebuilding it")
+            return self._rebuild(patient_id)
+        with open(self.log_path(patient_id), 'rb') as f:
+            f.seek(last_offset)
+            line = f.readline()
+        if not line.endswith(b'\n'):
+            # Torn last line: leave it to _catch_up
+            return _Index(records[:-1], last_offset)
+        return _Index(records, last_offset + len(line))
+
+    def _catch_up(self, patient_id: str, index: _Index, size: int):
+        """Index the lines appended after index.covered."""
+        path = self.log_path(patient_id)
+        added = []
+        with open(path, 'rb') as f:
+            f.seek(index.covered)
+            offset = index.covered
+            for line in f:
+                if not line.endswith(b'\n'):
+                    # Torn write from an interrupted append: end the line so
+                    # the next append starts cleanly, and skip it
+                    print(f"⚠️  Incomplete last line in {path}, skipping it")
+                    with open(path, 'ab') as out:
+                        out.write(b'\n')
+                    offset += len(line) + 1
+                    break
+                entry = _decode(line, path)
+                if entry is not None:
+                    added.append((_ordinal(entry), offset))
+                offset += len(line)
+        with open(self.index_path(patient_id), 'ab') as f:
+            for ordinal, line_offset in added:
+                f.write(_INDEX_RECORD.pack(ordinal, line_offset))
+        for ordinal, line_offset in added:
+            index.add(ordinal, line_offset, offset)
+        index.covered = offset
+
+    def _rebuild(self, patient_id: str) -> _Index:
+        remove_file(self.index_path(patient_id))
+        index = _Index([], 0)
+        self._catch_up(patient_id, index, self.log_path(patient_id).stat().st_size)
+        return index
+
+    def _write(self, patient_id: str, entries: List[Dict[str, Any]]) -> _Index:
+        """Replace the log and index, each through a temp file."""
+        lines, records = [], []
+        offset = 0
+        for entry in entries:
+            line = _encode(entry)
+            lines.append(line)
+            records.append((_ordinal(entry), offset))
+            offset += len(line)
+        # Index first: a new index next to an old log is detected and rebuilt
+        write_file(self.index_path(patient_id), b''.join(_INDEX_RECORD.pack(*r) for r in records))
+        write_file(self.log_path(patient_id), b''.join(lines))
+        return _Index(records, offset)
+
+    def _migrate(self, patient_id: str):
+        """Convert {patient_id}_daily_logs.json to the line format, once."""
+        legacy = self.legacy_path(patient_id)
+        if self.log_path(patient_id).exists() or not legacy.exists():
+            return
+        try:
+            with open(legacy, 'r', encoding='utf-8') as f:
+                content = f.read().strip()
+            entries = json.loads(content) if content else []
+        except (OSError, ValueError) as e:
+            print(f"❌ Could not migrate {legacy}: {e}")
+            return
+        if not isinstance(entries, list):
+            print(f"❌ Could not migrate {legacy}: expected a list of log entries")
+            return
+
+        self._indexes[patient_id] = self._write(patient_id, entries)
+        os.replace(legacy, legacy.with_name(legacy.name + '.migrated'))
+        print(f"✅ Migrated {len(entries)} daily logs of {patient_id} to {self.log_path(patient_id).name}")
+
+
+def _read_last_lines(path: Path, n: int) -> List[bytes]:
+    """The last n lines of a file (fewer if it is shorter), reading backwards."""
+    with open(path, 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        buffer = b''
+        # n complete lines need n + 1 newlines (or the start of the file)
+        while position > 0 and buffer.count(b'\n') <= n:
+            step = min(tail_block_size, position)
+            position -= step
+            f.seek(position)
+            buffer = f.read(step) + buffer
+    lines = buffer.splitlines()
+    if position > 0:
+        lines = lines[1:]   # partial first line
+    return [line for line in lines if line.strip()][-n:]
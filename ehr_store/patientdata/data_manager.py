@@ -2,7 +2,17 @@
 Patient Data Loader/Saver Module
 
 Provides centralized functions to load and save patient-specific data files.
-All files follow the naming pattern: {patient_id}_{data_type}.json
+All files follow the naming pattern: {patient_id}_{data_type}.json,
+except daily logs, which are append-only {patient_id}_daily_logs.jsonl files
+(see daily_log_store.py); old .json daily log files are converted on first use.
+Their vitals, adherence and exercise are also kept as memory-mapped NumPy
+columns in {patient_id}_timeseries.npy (see timeseries_store.py) for fast
+windowed aggregates.
+
+Saves are crash-safe (ehr_store.durable_files): a file is replaced through
+a temp file, so readers and a crash see the old or the new version, and a
+save is on disk (in the directory's journal) when it returns. Deletes go
+through the journal too, so a crash can't bring a deleted file back.
 
 Usage:
     from ehr_store.patientdata.data_manager import (
@@ -23,12 +33,22 @@ import json
 import os
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Union
-from datetime import datetime
+from datetime import date, datetime
+
+from ehr_store.durable_files import remove_file, write_file
+from .daily_log_store import DailyLogStore
+from .timeseries_store import TimeSeriesStore
 
 
 # Base directory for patient data
 PATIENT_DATA_DIR = Path(__file__).parent
 
+# Append-only daily logs with a date index
+_daily_log_store = DailyLogStore(PATIENT_DATA_DIR)
+
+# Columnar vitals/adherence/exercise series, kept in step with the daily logs
+_timeseries_store = TimeSeriesStore(PATIENT_DATA_DIR, _daily_log_store)
+
 
 def _get_file_path(patient_id: str, data_type: str) -> Path:
     """
@@ -45,6 +65,17 @@ def _get_file_path(patient_id: str, data_type: str) -> Path:
     return PATIENT_DATA_DIR / filename
 
 
+def _data_file_paths(patient_id: str, data_type: str) -> List[Path]:
+    """All files that hold one data type (daily logs: log, index and unmigrated .json)."""
+    if data_type == 'daily_logs':
+        return [
+            _daily_log_store.log_path(patient_id),
+            _daily_log_store.index_path(patient_id),
+            _daily_log_store.legacy_path(patient_id),
+        ]
+    return [_get_file_path(patient_id, data_type)]
+
+
 def _load_json(patient_id: str, data_type: str, default: Any = None) -> Any:
     """
     Generic function to load JSON data from a patient file.
@@ -106,12 +137,8 @@ def _save_json(patient_id: str, data_type: str, data: Any, create_backup: bool =
             except Exception as e:
                 print(f"⚠️  Could not create backup: {e}")
         
-        # Ensure directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # Write data
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        # Write data (through a temp file, so a crash can't leave it half-written)
+        write_file(file_path, json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8'))
         
         return True
         
@@ -189,7 +216,7 @@ def load_daily_logs(patient_id: str) -> List[Dict[str, Any]]:
             "symptoms": []
         }
     """
-    return _load_json(patient_id, "daily_logs", default=[])
+    return _daily_log_store.all(patient_id)
 
 
 def save_daily_logs(patient_id: str, daily_logs: List[Dict[str, Any]], create_backup: bool = True) -> bool:
@@ -204,13 +231,35 @@ def save_daily_logs(patient_id: str, daily_logs: List[Dict[str, Any]], create_ba
     Returns:
         bool: True if save was successful
     """
-    return _save_json(patient_id, "daily_logs", daily_logs, create_backup)
+    log_path = _daily_log_store.log_path(patient_id)
+    try:
+        if create_backup and log_path.exists():
+            backup_path = log_path.with_suffix(f'.backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jsonl')
+            try:
+                import shutil
+                shutil.copy2(log_path, backup_path)
+            except Exception as e:
+                print(f"⚠️  Could not create backup: {e}")
+        _daily_log_store.replace_all(patient_id, daily_logs)
+    except Exception as e:
+        print(f"❌ Error saving to {log_path}: {e}")
+        return False
+
+    try:
+        _timeseries_store.rebuild(patient_id)
+    except Exception as e:
+        # The logs were saved; drop the stale series so it is built again on next use
+        print(f"⚠️  Could not rebuild the time series of {patient_id}: {e}")
+        _timeseries_store.delete(patient_id)
+    return True
 
 
 def append_daily_log(patient_id: str, log_entry: Dict[str, Any]) -> bool:
     """
     Append a single daily log entry to existing logs.
     
+    Only the new entry is written; earlier entries are not read or rewritten.
+    
     Args:
         patient_id: Patient identifier
         log_entry: New log entry to append
@@ -223,9 +272,19 @@ def append_daily_log(patient_id: str, log_entry: Dict[str, Any]) -> bool:
         >>> append_daily_log("p1", new_log)
         True
     """
-    logs = load_daily_logs(patient_id)
-    logs.append(log_entry)
-    return save_daily_logs(patient_id, logs, create_backup=False)
+    try:
+        offset = _daily_log_store.append(patient_id, log_entry)
+    except Exception as e:
+        print(f"❌ Error appending to {_daily_log_store.log_path(patient_id)}: {e}")
+        return False
+
+    try:
+        _timeseries_store.append(patient_id, log_entry, offset)
+    except Exception as e:
+        # The log is what counts; the series is checked against it on next use
+        print(f"⚠️  Could not update the time series of {patient_id}: {e}")
+        _timeseries_store.forget(patient_id)
+    return True
 
 
 def get_recent_daily_logs(patient_id: str, number_of_days: int) -> List[Dict[str, Any]]:
@@ -251,15 +310,71 @@ def get_recent_daily_logs(patient_id: str, number_of_days: int) -> List[Dict[str
         >>> for log in last_3_days:
         ...     print(f"Day {log['day']}: BP {log['vitals']['SBP']}/{log['vitals']['DBP']}")
     """
-    # Load all daily logs for the patient
-    all_logs = load_daily_logs(patient_id)
-    
-    # Return the last N entries
+    # Read only the last N entries from the end of the log
     # If number_of_days is greater than available logs, return all logs
-    if not all_logs:
-        return []
+    return _daily_log_store.tail(patient_id, number_of_days)
+
+
+def get_daily_logs_between(patient_id: str, start_date: Optional[Union[str, date]] = None,
+                           end_date: Optional[Union[str, date]] = None) -> List[Dict[str, Any]]:
+    """
+    Fetch the daily logs dated within a range, using the date index.
     
-    return all_logs[-number_of_days:] if number_of_days > 0 else []
+    Args:
+        patient_id: Patient identifier (e.g., "p1", "p2")
+        start_date: First date to include ("YYYY-MM-DD" or date, None = from the first log)
+        end_date: Last date to include ("YYYY-MM-DD" or date, None = up to the latest log)
+    
+    Returns:
+        List of daily log entries in the range, in the order they were logged
+        (entries without a "date" field are never included)
+    
+    Example:
+        >>> february = get_daily_logs_between("p1", "2026-02-01", "2026-02-28")
+    """
+    return _daily_log_store.between(patient_id, start_date, end_date)
+
+
+def get_daily_log_aggregates(patient_id: str, days: int = 30,
+                             end_date: Optional[Union[str, date]] = None) -> Dict[str, Any]:
+    """
+    Aggregate the vitals, medication adherence and exercise of a window of
+    days, from the columnar time series (no JSON is parsed).
+    
+    Args:
+        patient_id: Patient identifier (e.g., "p1", "p2")
+        days: Window length in calendar days (e.g., 7, 30, 365)
+        end_date: Last day of the window (None = the date of the latest log)
+    
+    Returns:
+        Dict with the window's "start", "end", "entries", per-measure
+        "measures" (mean/min/max/last/count), "adherence" (doses taken /
+        doses prescribed) and "exercise_minutes_total"
+    
+    Example:
+        >>> month = get_daily_log_aggregates("p1", 30)
+        >>> print(month["measures"]["systolic_bp"]["mean"], month["adherence"])
+        132.4 0.93
+    """
+    return _timeseries_store.window(patient_id, days, end_date)
+
+
+def get_daily_log_series(patient_id: str, measure: str, start_date: Optional[Union[str, date]] = None,
+                         end_date: Optional[Union[str, date]] = None):
+    """
+    Dates and values of one measure (e.g. "heart_rate", "glucose_mg_dl",
+    "doses_taken", "exercise_minutes") as NumPy arrays, oldest first.
+    
+    Args:
+        patient_id: Patient identifier
+        measure: One of timeseries_store.columns
+        start_date: First date to include (None = from the first log)
+        end_date: Last date to include (None = up to the latest log)
+    
+    Returns:
+        Tuple (dates as datetime64[D] array, float array with NaN for missing values)
+    """
+    return _timeseries_store.series(patient_id, measure, start_date, end_date)
 
 
 # ============================================================================
@@ -575,7 +690,8 @@ def patient_data_exists(patient_id: str) -> Dict[str, bool]:
     ]
     
     return {
-        dtype: _get_file_path(patient_id, dtype).exists()
+        dtype: _daily_log_store.exists(patient_id) if dtype == 'daily_logs'
+        else _get_file_path(patient_id, dtype).exists()
         for dtype in data_types
     }
 
@@ -594,11 +710,12 @@ def list_all_patients() -> List[str]:
     """
     patient_ids = set()
     
-    for file in PATIENT_DATA_DIR.glob("*.json"):
-        # Extract patient ID from filename (e.g., "p1_conversation.json" -> "p1")
-        parts = file.stem.split('_', 1)
-        if len(parts) == 2:
-            patient_ids.add(parts[0])
+    for pattern in ("*.json", "*.jsonl"):
+        for file in PATIENT_DATA_DIR.glob(pattern):
+            # Extract patient ID from filename (e.g., "p1_conversation.json" -> "p1")
+            parts = file.stem.split('_', 1)
+            if len(parts) == 2:
+                patient_ids.add(parts[0])
     
     return sorted(list(patient_ids))
 
@@ -626,17 +743,18 @@ def delete_patient_data(patient_id: str, data_type: Optional[str] = None, create
     """
     try:
         if data_type:
-            # Delete specific file
-            file_path = _get_file_path(patient_id, data_type)
-            if file_path.exists():
+            # Delete specific file(s)
+            file_paths = [p for p in _data_file_paths(patient_id, data_type) if p.exists()]
+            for file_path in file_paths:
                 if create_backup:
-                    backup_path = file_path.with_suffix(f'.deleted_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+                    backup_path = file_path.with_suffix(f'.deleted_{datetime.now().strftime("%Y%m%d_%H%M%S")}{file_path.suffix}')
                     import shutil
-                    shutil.move(file_path, backup_path)
-                else:
-                    file_path.unlink()
-                return True
-            return False
+                    shutil.copy2(file_path, backup_path)
+                remove_file(file_path)
+            if data_type == 'daily_logs':
+                _daily_log_store.forget(patient_id)
+                _timeseries_store.delete(patient_id)
+            return bool(file_paths)
         else:
             # Delete all files for patient
             data_types = [
@@ -646,18 +764,20 @@ def delete_patient_data(patient_id: str, data_type: Optional[str] = None, create
             
             success = True
             for dtype in data_types:
-                file_path = _get_file_path(patient_id, dtype)
-                if file_path.exists():
+                for file_path in _data_file_paths(patient_id, dtype):
+                    if not file_path.exists():
+                        continue
                     try:
                         if create_backup:
-                            backup_path = file_path.with_suffix(f'.deleted_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json')
+                            backup_path = file_path.with_suffix(f'.deleted_{datetime.now().strftime("%Y%m%d_%H%M%S")}{file_path.suffix}')
                             import shutil
-                            shutil.move(file_path, backup_path)
-                        else:
-                            file_path.unlink()
+                            shutil.copy2(file_path, backup_path)
+                        remove_file(file_path)
                     except Exception as e:
                         print(f"❌ Error deleting {file_path}: {e}")
                         success = False
+            _daily_log_store.forget(patient_id)
+            _timeseries_store.delete(patient_id)
             
             return success
             
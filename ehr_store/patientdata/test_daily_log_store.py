@@ -0,0 +1,109 @@
+"""
+Tests for the append-only daily log store: recovery of the date index after
+an interrupted append, and conversion of the old .json array files.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from ehr_store.patientdata.daily_log_store import DailyLogStore, _INDEX_RECORD
+
+
+def _logs(n, start_day=1):
+    return [{"date": f"2026-03-{start_day + i:02d}", "vitals": {"heart_rate": 70 + i}} for i in range(n)]
+
+
+def test_append_and_query(tmp_path):
+    store = DailyLogStore(tmp_path)
+    for entry in _logs(5):
+        store.append("p1", entry)
+    store.append("p1", {"notes": "no date"})
+
+    assert store.count("p1") == 6
+    assert store.count("p1", dated_only=True) == 5
+    assert [e["date"] for e in store.between("p1", "2026-03-02", "2026-03-03")] == ["2026-03-02", "2026-03-03"]
+    assert store.tail("p1", 2) == [_logs(5)[-1], {"notes": "no date"}]
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    store = DailyLogStore(tmp_path)
+    for entry in _logs(3):
+        store.append("p1", entry)
+    # The process stopped halfway through writing a line
+    with open(store.log_path("p1"), "ab") as f:
+        f.write(b'{"date": "2026-03-04", "vit')
+
+    reopened = DailyLogStore(tmp_path)
+    assert reopened.all("p1") == _logs(3)
+    assert reopened.count("p1") == 3
+
+    # The next append starts on a line of its own
+    reopened.append("p1", _logs(1, start_day=5)[0])
+    assert [e["date"] for e in DailyLogStore(tmp_path).all("p1")] == [
+        "2026-03-01", "2026-03-02", "2026-03-03", "2026-03-05"]
+    assert DailyLogStore(tmp_path).between("p1", "2026-03-05", "2026-03-05") == _logs(1, start_day=5)
+
+
+def test_missing_index_tail_is_caught_up(tmp_path):
+    store = DailyLogStore(tmp_path)
+    for entry in _logs(6):
+        store.append("p1", entry)
+    # Lose the last two index records and tear the one before them
+    index_path = store.index_path("p1")
+    raw = index_path.read_bytes()
+    index_path.write_bytes(raw[:3 * _INDEX_RECORD.size + 5])
+
+    reopened = DailyLogStore(tmp_path)
+    assert reopened.count("p1") == 6
+    assert reopened.between("p1", "2026-03-04", "2026-03-06") == _logs(6)[3:]
+    # The index file was repaired, not just the in-memory copy
+    assert index_path.stat().st_size == 6 * _INDEX_RECORD.size
+
+
+def test_index_ahead_of_log_is_rebuilt(tmp_path):
+    store = DailyLogStore(tmp_path)
+    for entry in _logs(4):
+        store.append("p1", entry)
+    log_path = store.log_path("p1")
+    lines = log_path.read_bytes().splitlines(keepends=True)
+    log_path.write_bytes(b"".join(lines[:2]))
+
+    reopened = DailyLogStore(tmp_path)
+    assert reopened.count("p1") == 2
+    assert reopened.between("p1") == _logs(2)
+
+
+def test_legacy_json_is_migrated(tmp_path):
+    legacy = tmp_path / "p1_daily_logs.json"
+    legacy.write_text(json.dumps(_logs(3), indent=2), encoding="utf-8")
+
+    store = DailyLogStore(tmp_path)
+    assert store.exists("p1")
+    assert store.all("p1") == _logs(3)
+    assert not legacy.exists()
+    assert (tmp_path / "p1_daily_logs.json.migrated").exists()
+    assert store.log_path("p1").read_bytes().count(b"\n") == 3
+    assert DailyLogStore(tmp_path).between("p1", "2026-03-02") == _logs(3)[1:]
+
+
+def test_unreadable_legacy_json_is_left_alone(tmp_path):
+    legacy = tmp_path / "p1_daily_logs.json"
+    legacy.write_text("{not json", encoding="utf-8")
+
+    store = DailyLogStore(tmp_path)
+    assert store.all("p1") == []
+    assert legacy.exists()
+    assert not store.log_path("p1").exists()
+
+
+def test_replace_all(tmp_path):
+    store = DailyLogStore(tmp_path)
+    for entry in _logs(5):
+        store.append("p1", entry)
+    store.replace_all("p1", _logs(2, start_day=10))
+
+    assert store.all("p1") == _logs(2, start_day=10)
+    assert DailyLogStore(tmp_path).between("p1", "2026-03-11") == _logs(2, start_day=10)[1:]
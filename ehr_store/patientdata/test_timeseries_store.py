@@ -0,0 +1,154 @@
+"""
+Tests for the columnar daily log time series: windowed aggregates, back-dated
+appends, and rebuilding from the logs after an interrupted append.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from ehr_store.patientdata import timeseries_store
+from ehr_store.patientdata.daily_log_store import DailyLogStore
+from ehr_store.patientdata.timeseries_store import TimeSeriesStore
+
+
+def _entry(day, heart_rate=None, taken=None, minutes=None, symptoms=None):
+    entry = {"date": f"2026-03-{day:02d}", "vitals": {"heart_rate": heart_rate}}
+    if taken is not None:
+        entry["medications_taken"] = [{"name": "metformin", "taken": t} for t in taken]
+    if minutes is not None:
+        entry["exercise"] = {"exercise_minutes": minutes}
+    if symptoms is not None:
+        entry["symptoms"] = symptoms
+    return entry
+
+
+def _stores(path):
+    logs = DailyLogStore(path)
+    return logs, TimeSeriesStore(path, logs)
+
+
+def _log(logs, store, entry, patient_id="p1"):
+    store.append(patient_id, entry, logs.append(patient_id, entry))
+
+
+def test_window_aggregates(tmp_path):
+    logs, store = _stores(tmp_path)
+    _log(logs, store, _entry(1, 70, taken=[True, True], minutes=20))
+    _log(logs, store, _entry(20, 80, taken=[True, False], minutes=30, symptoms=["cough"]))
+    _log(logs, store, _entry(25, None, taken=[False, False]))
+    _log(logs, store, _entry(28, 90, minutes=10))
+
+    week = store.window("p1", 7)
+    assert (week["start"], week["end"], week["entries"]) == ("2026-03-22", "2026-03-28", 2)
+    assert week["measures"]["heart_rate"] == {"mean": 90.0, "min": 90.0, "max": 90.0, "last": 90.0, "count": 1}
+    assert week["adherence"] == 0.0
+    assert week["exercise_minutes_total"] == 10.0
+    assert week["measures"]["glucose_mg_dl"]["count"] == 0 and week["measures"]["glucose_mg_dl"]["mean"] is None
+
+    month = store.windows("p1", (30,))[30]
+    assert month["entries"] == 4
+    assert month["measures"]["heart_rate"] == {"mean": 80.0, "min": 70.0, "max": 90.0, "last": 90.0, "count": 3}
+    assert month["adherence"] == 0.5
+    assert month["exercise_minutes_total"] == 60.0
+    assert month["measures"]["symptom_count"]["count"] == 1
+
+    # An explicit end date, and a window with no logs in it
+    early = store.window("p1", 5, end="2026-03-05")
+    assert early["entries"] == 1 and early["measures"]["heart_rate"]["last"] == 70.0
+    empty = store.window("p1", 3, end="2026-03-10")
+    assert empty["entries"] == 0 and empty["adherence"] is None
+
+
+def test_series_and_back_dated_logs(tmp_path):
+    logs, store = _stores(tmp_path)
+    for day, rate in ((3, 73), (7, 77), (5, 75), (1, 71)):
+        _log(logs, store, _entry(day, rate))
+
+    dates, values = store.series("p1", "heart_rate")
+    assert [str(d) for d in dates] == ["2026-03-01", "2026-03-03", "2026-03-05", "2026-03-07"]
+    assert values.tolist() == [71.0, 73.0, 75.0, 77.0]
+
+    dates, values = store.series("p1", "heart_rate", start="2026-03-02", end="2026-03-05")
+    assert values.tolist() == [73.0, 75.0]
+    with pytest.raises(ValueError):
+        store.series("p1", "not_a_column")
+
+
+def test_undated_entries_have_no_row(tmp_path):
+    logs, store = _stores(tmp_path)
+    _log(logs, store, _entry(1, 70))
+    _log(logs, store, {"notes": "felt fine"})
+    assert store.window("p1", 30)["entries"] == 1
+    # Still in step with the log: reopening doesn't rebuild
+    assert TimeSeriesStore(tmp_path, DailyLogStore(tmp_path))._open("p1")[1] is False
+
+
+def test_grows_past_its_capacity(tmp_path, monkeypatch):
+    monkeypatch.setattr(timeseries_store, "initial_capacity", 4)
+    logs, store = _stores(tmp_path)
+    for day in range(1, 11):
+        _log(logs, store, _entry(day, 60 + day))
+    assert store.series("p1", "heart_rate")[1].tolist() == [60.0 + day for day in range(1, 11)]
+    assert store.window("p1", 10)["entries"] == 10
+
+
+def test_log_written_without_its_row_is_rebuilt(tmp_path):
+    logs, store = _stores(tmp_path)
+    for day in (1, 2):
+        _log(logs, store, _entry(day, 70 + day))
+    store.flush()
+    # The process stopped after writing the log line, before the row
+    logs.append("p1", _entry(3, 73))
+
+    reopened = TimeSeriesStore(tmp_path, DailyLogStore(tmp_path))
+    assert reopened.series("p1", "heart_rate")[1].tolist() == [71.0, 72.0, 73.0]
+
+
+def test_torn_log_line_is_rebuilt_without_it(tmp_path):
+    logs, store = _stores(tmp_path)
+    for day in (1, 2):
+        _log(logs, store, _entry(day, 70 + day))
+    store.flush()
+    with open(logs.log_path("p1"), "ab") as f:
+        f.write(b'{"date": "2026-03-03", "vit')
+
+    logs = DailyLogStore(tmp_path)
+    reopened = TimeSeriesStore(tmp_path, logs)
+    assert reopened.window("p1", 30)["entries"] == 2
+    # Appends continue after the torn line
+    _log(logs, reopened, _entry(4, 74))
+    assert reopened.series("p1", "heart_rate")[1].tolist() == [71.0, 72.0, 74.0]
+    assert TimeSeriesStore(tmp_path, DailyLogStore(tmp_path)).series("p1", "heart_rate")[1].tolist() == \
+        [71.0, 72.0, 74.0]
+
+
+def test_corrupt_or_deleted_array_is_rebuilt(tmp_path):
+    logs, store = _stores(tmp_path)
+    _log(logs, store, _entry(1, 71))
+    store.forget()
+    store.path("p1").write_bytes(b"not an array")
+    assert store.window("p1", 30)["entries"] == 1
+
+    store.delete("p1")
+    assert not store.path("p1").exists()
+    assert store.series("p1", "heart_rate")[1].tolist() == [71.0]
+
+
+def test_unknown_patient_reads_empty_and_gets_no_file(tmp_path):
+    _, store = _stores(tmp_path)
+    window = store.window("nobody", 30)
+    assert window["entries"] == 0
+    assert all(m["count"] == 0 for m in window["measures"].values())
+    dates, values = store.series("nobody", "heart_rate")
+    assert len(dates) == len(values) == 0
+    assert not store.path("nobody").exists()
+
+
+def test_window_near_the_start_of_the_calendar(tmp_path):
+    _, store = _stores(tmp_path)
+    window = store.window("nobody", 10, end="0001-01-03")
+    assert (window["start"], window["end"], window["entries"]) == ("0001-01-01", "0001-01-03", 0)
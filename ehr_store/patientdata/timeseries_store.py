@@ -0,0 +1,393 @@
+"""
+Columnar time series of the daily logs.
+
+Each patient gets {patient_id}_timeseries.npy: a float64 NumPy array with one
+contiguous row per measure (see `columns`) after a row of date ordinals,
+and one slot per dated daily log entry, sorted by date. Missing values are
+NaN. The file is memory-mapped, so opening it costs nothing and a windowed
+aggregate only touches the slots in the window:
+
+    - append() writes one slot (logs arrive in date order, so this is the
+      end of each row; a back-dated log shifts the later slots).
+    - window(patient_id, 30) aggregates the last 30 days (mean, min, max,
+      last value and count per measure, dose adherence, exercise total)
+      in microseconds, without reading any JSON.
+    - series(patient_id, "heart_rate") returns the dates and values as arrays.
+
+The daily logs (daily_log_store.py) stay the source of truth: the array is
+built from them on first use and records how many bytes of the log it
+covers. It is rebuilt whenever that differs from the log's size (e.g. the
+process stopped between writing a log line and its row, or the logs were
+rewritten). A patient without daily logs reads as empty and gets no file.
+Only one process should write a patient's logs at a time.
+
+Usage:
+    from ehr_store.patientdata.timeseries_store import TimeSeriesStore
+
+    store = TimeSeriesStore(directory, daily_log_store)
+    offset = daily_log_store.append("p1", entry)
+    store.append("p1", entry, offset)
+    last_month = store.window("p1", 30)
+    dates, glucose = store.series("p1", "glucose_mg_dl")
+"""
+
+import os
+import threading
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import numpy as np
+
+from .daily_log_store import DailyLogStore, DateLike, _as_date, _encode, entry_date
+
+# Measures kept per log entry, in row order after the dates
+columns = (
+    'systolic_bp',
+    'diastolic_bp',
+    'heart_rate',
+    'temperature_f',
+    'glucose_mg_dl',
+    'weight_lbs',
+    'spo2_percent',
+    'doses_prescribed',
+    'doses_taken',
+    'exercise_minutes',
+    'symptom_count',
+)
+
+# Daily log "vitals" keys of the vital sign measures
+_VITALS = {
+    'systolic_bp': 'blood_pressure_systolic',
+    'diastolic_bp': 'blood_pressure_diastolic',
+    'heart_rate': 'heart_rate',
+    'temperature_f': 'temperature_f',
+    'glucose_mg_dl': 'blood_glucose_mg_dl',
+    'weight_lbs': 'weight_lbs',
+    'spo2_percent': 'oxygen_saturation_percent',
+}
+
+# Entries allocated for a new patient; the file doubles when full
+initial_capacity = 64
+
+_FORMAT_VERSION = 2
+_WIDTH = 1 + len(columns)           # dates + measures
+_COLUMN = {name: i + 1 for i, name in enumerate(columns)}
+_EPOCH = date(1970, 1, 1).toordinal()
+
+
+def _number(value: Any) -> float:
+    if isinstance(value, bool) or value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def row_from_entry(entry: Dict[str, Any]) -> Optional[np.ndarray]:
+    """The date and measures of a daily log entry, or None if it has no date."""
+    day = entry_date(entry)
+    if day is None:
+        return None
+    row = np.full(_WIDTH, np.nan)
+    row[0] = day.toordinal()
+
+    vitals = entry.get('vitals')
+    if isinstance(vitals, dict):
+        for column, key in _VITALS.items():
+            row[_COLUMN[column]] = _number(vitals.get(key))
+
+    medications = entry.get('medications_taken')
+    if isinstance(medications, list) and medications:
+        row[_COLUMN['doses_prescribed']] = len(medications)
+        row[_COLUMN['doses_taken']] = sum(
+            1 for m in medications if isinstance(m, dict) and m.get('taken') is True
+        )
+
+    exercise = entry.get('exercise')
+    minutes = exercise.get('exercise_minutes') if isinstance(exercise, dict) else entry.get('exercise_minutes')
+    row[_COLUMN['exercise_minutes']] = _number(minutes)
+
+    symptoms = entry.get('symptoms')
+    if isinstance(symptoms, list):
+        row[_COLUMN['symptom_count']] = len(symptoms)
+    return row
+
+
+def _value(x) -> Optional[float]:
+    x = float(x)
+    return None if x != x else x
+
+
+class _Series:
+    """
+    A patient's memory-mapped array, shape (1 + len(columns), 1 + capacity).
+    Slot 0 of the first three rows holds the format version, the entry
+    count and the log bytes covered; entries fill slots 1..rows.
+    """
+
+    __slots__ = ('mapping', 'array', 'rows', 'covered')
+
+    def __init__(self, mapping: np.ndarray):
+        self.mapping = mapping
+        # Plain ndarray view of the same memory: slicing a memmap is slower
+        self.array = np.asarray(mapping)
+        self.rows = int(self.array[1, 0])
+        self.covered = int(self.array[2, 0])
+
+    @property
+    def capacity(self) -> int:
+        return self.array.shape[1] - 1
+
+    @property
+    def data(self) -> np.ndarray:
+        return self.array[:, 1:self.rows + 1]
+
+    def set_rows(self, rows: int, covered: int):
+        self.rows = rows
+        self.covered = covered
+        self.array[1, 0] = rows
+        self.array[2, 0] = covered
+
+
+def _empty_series() -> _Series:
+    """An in-memory series with no entries, for patients without daily logs."""
+    return _Series(np.zeros((_WIDTH, 1)))
+
+
+class TimeSeriesStore:
+    """Per-patient columnar arrays of the daily log measures."""
+
+    def __init__(self, directory: Union[str, Path], log_store: DailyLogStore):
+        """
+        Args:
+            directory: Folder for the {patient_id}_timeseries.npy files
+            log_store: Daily logs the arrays are built from
+        """
+        self.directory = Path(directory)
+        self.log_store = log_store
+        self._series: Dict[str, _Series] = {}
+        self._locks: Dict[str, threading.RLock] = {}
+        self._lock = threading.Lock()
+
+    def path(self, patient_id: str) -> Path:
+        return self.directory / f"{patient_id}_timeseries.npy"
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, patient_id: str, entry: Dict[str, Any], offset: int):
+        """
+        Add the row of an entry that was just appended to the daily log at
+        `offset` (what DailyLogStore.append returned).
+        """
+        row = row_from_entry(entry)
+        end = offset + len(_encode(entry))
+        with self._patient_lock(patient_id):
+            # The log already holds the entry: a freshly (re)built array has it too
+            series, rebuilt = self._open(patient_id, covered=offset)
+            if rebuilt:
+                return
+            if row is None:
+                series.set_rows(series.rows, end)
+                return
+            if series.rows == series.capacity:
+                series = self._grow(patient_id, series)
+
+            days = series.data[0]
+            if series.rows == 0 or row[0] >= days[-1]:
+                position = series.rows
+            else:
+                # Back-dated log: keep the entries sorted by date
+                position = int(np.searchsorted(days, row[0], side='right'))
+                series.array[:, position + 2:series.rows + 2] = series.array[:, position + 1:series.rows + 1]
+            series.array[:, position + 1] = row
+            series.set_rows(series.rows + 1, end)
+
+    def rebuild(self, patient_id: str):
+        """Build the array again from the daily logs."""
+        with self._patient_lock(patient_id):
+            self._build(patient_id)
+
+    def delete(self, patient_id: str):
+        """Remove the patient's array; it is rebuilt from the logs on next use."""
+        with self._patient_lock(patient_id):
+            self._series.pop(patient_id, None)
+            path = self.path(patient_id)
+            if path.exists():
+                path.unlink()
+
+    def forget(self, patient_id: Optional[str] = None):
+        """Drop the mapped array of a patient (or all); the next use checks it against the logs."""
+        with self._lock:
+            if patient_id is None:
+                self._series.clear()
+            else:
+                self._series.pop(patient_id, None)
+
+    def flush(self, patient_id: Optional[str] = None):
+        """Write memory-mapped changes to disk now."""
+        with self._lock:
+            targets = list(self._series.values()) if patient_id is None else [self._series.get(patient_id)]
+        for series in targets:
+            if series is not None:
+                series.mapping.flush()
+
+    # ------------------------------------------------------------------
+    # Reads
+    # ------------------------------------------------------------------
+
+    def series(self, patient_id: str, column: str, start: Optional[DateLike] = None,
+               end: Optional[DateLike] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dates (datetime64[D]) and values of one measure from start to end
+        (inclusive, None = open-ended). The values are a copy.
+        """
+        if column not in _COLUMN:
+            raise ValueError(f"Unknown column {column!r}, expected one of {columns}")
+        with self._patient_lock(patient_id):
+            series, _ = self._open(patient_id)
+            days = series.data[0]
+            low = 0 if start is None else int(np.searchsorted(days, _as_date(start).toordinal(), 'left'))
+            high = series.rows if end is None else int(np.searchsorted(days, _as_date(end).toordinal(), 'right'))
+            dates = (days[low:high] - _EPOCH).astype('int64').astype('datetime64[D]')
+            return dates, series.data[_COLUMN[column], low:high].copy()
+
+    def window(self, patient_id: str, days: int, end: Optional[DateLike] = None) -> Dict[str, Any]:
+        """
+        Aggregates over the `days` calendar days ending at `end` (inclusive;
+        None = the date of the latest log).
+
+        Returns:
+            {"start", "end", "days", "entries",
+             "measures": {column: {"mean", "min", "max", "last", "count"}},
+             "adherence": doses taken / doses prescribed, "exercise_minutes_total"}
+            Values are None when nothing was logged for them in the window.
+        """
+        with self._patient_lock(patient_id):
+            series, _ = self._open(patient_id)
+            data = series.data
+            if end is not None:
+                last_day = _as_date(end).toordinal()
+            elif series.rows:
+                last_day = int(data[0, -1])
+            else:
+                last_day = date.today().toordinal()
+            # Clamp to the calendar: a window can't start before year 1
+            first_day = max(1, last_day - days + 1)
+            low = int(data[0].searchsorted(first_day, 'left'))
+            high = int(data[0].searchsorted(last_day, 'right'))
+            block = data[1:, low:high].copy()
+
+        width = high - low
+        valid = block == block              # not NaN
+        count = valid.sum(axis=1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            # fmin/fmax skip NaN; all-NaN measures stay NaN and are reported as None
+            low_values = np.fmin.reduce(block, axis=1, initial=np.nan) if width else block.sum(axis=1)
+            high_values = np.fmax.reduce(block, axis=1, initial=np.nan) if width else low_values
+            block[~valid] = 0.0
+            total = block.sum(axis=1)
+            mean = total / count
+        # Slot of the last logged value of each measure
+        last = block[np.arange(len(columns)), width - 1 - valid[:, ::-1].argmax(axis=1)] if width else mean
+
+        measures = {}
+        for name, n, m, lo, hi, x in zip(columns, count.tolist(), mean.tolist(), low_values.tolist(),
+                                         high_values.tolist(), last.tolist()):
+            if n:
+                measures[name] = {'mean': m, 'min': lo, 'max': hi, 'last': x, 'count': n}
+            else:
+                measures[name] = {'mean': None, 'min': None, 'max': None, 'last': None, 'count': 0}
+
+        prescribed = total[_COLUMN['doses_prescribed'] - 1]
+        return {
+            'start': date.fromordinal(first_day).isoformat(),
+            'end': date.fromordinal(last_day).isoformat(),
+            'days': days,
+            'entries': high - low,
+            'measures': measures,
+            'adherence': _value(total[_COLUMN['doses_taken'] - 1] / prescribed) if prescribed else None,
+            'exercise_minutes_total': _value(total[_COLUMN['exercise_minutes'] - 1]),
+        }
+
+    def windows(self, patient_id: str, days: Iterable[int] = (7, 30, 365),
+                end: Optional[DateLike] = None) -> Dict[int, Dict[str, Any]]:
+        """window() for several lengths, e.g. {7: {...}, 30: {...}, 365: {...}}."""
+        return {n: self.window(patient_id, n, end) for n in days}
+
+    # ------------------------------------------------------------------
+    # Internals
+    # ------------------------------------------------------------------
+
+    def _patient_lock(self, patient_id: str) -> threading.RLock:
+        with self._lock:
+            return self._locks.setdefault(patient_id, threading.RLock())
+
+    def _open(self, patient_id: str, covered: Optional[int] = None) -> Tuple[_Series, bool]:
+        """
+        The patient's array and whether it was just rebuilt. `covered` is the
+        log size the array should account for (None = the whole log; less
+        while an append is in progress).
+        """
+        if not self.log_store.exists(patient_id):
+            # Unknown patient or no logs yet: nothing to build or write
+            self._series.pop(patient_id, None)
+            return _empty_series(), False
+        expected = self.log_store.size(patient_id) if covered is None else covered
+
+        series = self._series.get(patient_id)
+        if series is not None and series.covered == expected:
+            return series, False
+
+        path = self.path(patient_id)
+        if series is None and path.exists():
+            try:
+                array = np.lib.format.open_memmap(path, mode='r+')
+                if array.ndim == 2 and array.shape[0] == _WIDTH and int(array[0, 0]) == _FORMAT_VERSION:
+                    series = _Series(array)
+                    if series.covered == expected:
+                        self._series[patient_id] = series
+                        return series, False
+            except (OSError, ValueError) as e:
+                print(f"⚠️  Could not open {path}: {e}, rebuilding it")
+        if series is not None:
+            print(f"⚠️  {path.name} is out of date with the daily logs, rebuilding it")
+        return self._build(patient_id), True
+
+    def _build(self, patient_id: str) -> _Series:
+        # Size before reading: an append racing the read makes the array look stale, not current
+        covered = self.log_store.size(patient_id)
+        entries = self.log_store.all(patient_id)
+        rows = [row for row in (row_from_entry(e) for e in entries) if row is not None]
+        capacity = max(initial_capacity, 1 << (len(rows) - 1).bit_length() if rows else 0)
+        data = np.array(rows).T if rows else np.empty((_WIDTH, 0))
+        # Stable sort: same-day entries keep their log order
+        data = data[:, np.argsort(data[0], kind='stable')]
+        return self._write(patient_id, data, capacity, covered)
+
+    def _grow(self, patient_id: str, series: _Series) -> _Series:
+        return self._write(patient_id, series.data.copy(), series.capacity * 2, series.covered)
+
+    def _write(self, patient_id: str, data: np.ndarray, capacity: int, covered: int) -> _Series:
+        """Write a new array file through a temp file and map it."""
+        path = self.path(patient_id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.npy.tmp')
+
+        rows = data.shape[1]
+        array = np.lib.format.open_memmap(tmp, mode='w+', dtype=np.float64, shape=(_WIDTH, capacity + 1))
+        array[0, 0] = _FORMAT_VERSION
+        array[:, 1:rows + 1] = data
+        array[1, 0] = rows
+        array[2, 0] = covered
+        array.flush()
+        del array
+        self._series.pop(patient_id, None)
+        os.replace(tmp, path)
+
+        series = _Series(np.lib.format.open_memmap(path, mode='r+'))
+        self._series[patient_id] = series
+        return series
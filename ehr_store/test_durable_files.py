@@ -0,0 +1,217 @@
+"""
+Tests for the crash-safe file writes used by the patient data and EHR stores:
+atomic replaces, group commit, checkpoints and journal replay.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ehr_store import durable_files
+from ehr_store.durable_files import JOURNAL_NAME, append_file, journal_stats, remove_file, write_file
+
+
+def _files(directory):
+    return sorted(name for name in os.listdir(directory) if name != JOURNAL_NAME)
+
+
+def test_write_file_replaces_contents(tmp_path):
+    path = tmp_path / "nested" / "p1_report.json"
+    write_file(path, b'{"v": 1}')
+    write_file(path, b'{"v": 2}')
+
+    assert path.read_bytes() == b'{"v": 2}'
+    assert _files(path.parent) == ["p1_report.json"]
+
+
+def _break_syncs(monkeypatch):
+    def broken_fsync(fd):
+        raise OSError("I/O error")
+
+    monkeypatch.setattr(durable_files.os, "fsync", broken_fsync)
+    monkeypatch.setattr(durable_files.os, "fdatasync", broken_fsync, raising=False)
+
+
+def test_failed_write_keeps_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "p1_report.json"
+    write_file(path, b"old")
+
+    _break_syncs(monkeypatch)
+    with pytest.raises(OSError):
+        write_file(path, b"new")
+
+    assert path.read_bytes() == b"old"
+    assert _files(tmp_path) == ["p1_report.json"]
+
+
+def test_concurrent_writes_leave_one_whole_version(tmp_path):
+    path = tmp_path / "patients.json"
+    payloads = [json.dumps([{"id": i, "notes": "x" * 10000}]).encode() for i in range(16)]
+    threads = [threading.Thread(target=write_file, args=(path, p)) for p in payloads]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert path.read_bytes() in payloads
+    assert _files(tmp_path) == ["patients.json"]
+
+
+def test_append_file_returns_offsets(tmp_path):
+    path = tmp_path / "p1_daily_logs.jsonl"
+    assert append_file(path, b"first\n") == 0
+    assert append_file(path, b"second\n", sync=False) == 6
+    assert append_file(path, b"third\n") == 13
+    assert path.read_bytes() == b"first\nsecond\nthird\n"
+
+
+@pytest.fixture
+def no_background_checkpoints(monkeypatch):
+    """Keep the records in the journal until the test checkpoints or 'crashes'."""
+    monkeypatch.setattr(durable_files, "checkpoint", lambda directory=None: None)
+
+
+def _journal(directory):
+    return durable_files._journals[os.path.abspath(directory)]
+
+
+def _crash(directory):
+    """Drop the directory's journal as if the process died: nothing more is checkpointed."""
+    journal = durable_files._journals.pop(os.path.abspath(directory))
+    os.close(journal._fd)
+
+
+def test_concurrent_writers_share_fsyncs(tmp_path, monkeypatch):
+    real_fdatasync = os.fdatasync
+
+    def slow_fdatasync(fd):
+        time.sleep(0.01)
+        real_fdatasync(fd)
+
+    monkeypatch.setattr(durable_files.os, "fdatasync", slow_fdatasync)
+    barrier = threading.Barrier(32)
+
+    def writer(i):
+        barrier.wait()
+        for n in range(5):
+            write_file(tmp_path / f"p{i}_report.json", f'{{"n": {n}}}'.encode())
+            append_file(tmp_path / f"p{i}_daily_logs.jsonl", f"{n}\n".encode())
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(32)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    stats = journal_stats(tmp_path)
+    assert stats["records"] == 32 * 10
+    assert stats["fsyncs"] <= stats["records"] // 4
+    assert all((tmp_path / f"p{i}_daily_logs.jsonl").read_bytes() == b"0\n1\n2\n3\n4\n" for i in range(32))
+
+
+def test_checkpointed_writes_are_not_replayed(tmp_path, no_background_checkpoints):
+    report, other = tmp_path / "p1_report.json", tmp_path / "p2_report.json"
+    write_file(report, b"v1")
+    write_file(other, b"v1")
+    _journal(tmp_path).checkpoint()
+    assert journal_stats(tmp_path)["checkpoints"] == 1
+    # Same size as the first record: the next one in the file is old but intact
+    write_file(report, b"v2")
+    _crash(tmp_path)
+
+    other.write_bytes(b"edited since")
+    durable_files.recover(tmp_path)
+    assert report.read_bytes() == b"v2"
+    assert other.read_bytes() == b"edited since"
+
+
+def test_replay_restores_writes_lost_in_a_crash(tmp_path, no_background_checkpoints):
+    report, log = tmp_path / "p1_report.json", tmp_path / "p1_daily_logs.jsonl"
+    write_file(report, b"v1")
+    append_file(log, b"first\n")
+    _journal(tmp_path).checkpoint()
+    write_file(report, b"v2")
+    append_file(log, b"second\n")
+    append_file(log, b"third\n")
+    _crash(tmp_path)
+
+    # The files' own pages never reached the disk: old report, torn log
+    report.write_bytes(b"v1")
+    log.write_bytes(b"first\nsec")
+
+    durable_files.recover(tmp_path)
+    assert report.read_bytes() == b"v2"
+    assert log.read_bytes() == b"first\nsecond\nthird\n"
+    assert _files(tmp_path) == ["p1_daily_logs.jsonl", "p1_report.json"]
+
+    # Replayed once: a second restart finds nothing to redo
+    report.write_bytes(b"edited since")
+    _crash(tmp_path)
+    durable_files.recover(tmp_path)
+    assert report.read_bytes() == b"edited since"
+
+
+def test_torn_last_record_is_dropped(tmp_path, no_background_checkpoints):
+    report, other = tmp_path / "p1_report.json", tmp_path / "p2_report.json"
+    write_file(report, b"v1")
+    write_file(other, b"v1")
+    # The second write never returned: its record is torn
+    end = _journal(tmp_path)._written
+    _crash(tmp_path)
+    journal = tmp_path / JOURNAL_NAME
+    raw = bytearray(journal.read_bytes())
+    raw[end - 1] ^= 0xFF
+    journal.write_bytes(bytes(raw))
+    report.unlink()
+    other.unlink()
+
+    durable_files.recover(tmp_path)
+    assert report.read_bytes() == b"v1"
+    assert not other.exists()
+    # The journal takes new records after the dropped one
+    write_file(report, b"v3")
+    _crash(tmp_path)
+    report.write_bytes(b"v1")
+    durable_files.recover(tmp_path)
+    assert report.read_bytes() == b"v3"
+
+
+def test_deleted_file_is_not_brought_back(tmp_path, no_background_checkpoints):
+    report = tmp_path / "p1_report.json"
+    write_file(report, b"v1")
+    remove_file(report)
+    remove_file(tmp_path / "never_written.json")
+    _crash(tmp_path)
+
+    durable_files.recover(tmp_path)
+    assert not report.exists()
+    assert _files(tmp_path) == []
+
+
+def test_failed_fsync_stops_the_journal(tmp_path, monkeypatch):
+    path = tmp_path / "p1_report.json"
+    write_file(path, b"old")
+    with monkeypatch.context() as patch:
+        _break_syncs(patch)
+        with pytest.raises(OSError):
+            write_file(path, b"new")
+
+    # A later fsync could succeed without the lost pages: no more writes until a restart
+    with pytest.raises(OSError):
+        write_file(path, b"newer")
+    assert path.read_bytes() == b"old"
+
+
+def test_without_group_commit_each_write_is_fsynced(tmp_path, monkeypatch):
+    monkeypatch.setattr(durable_files, "group_commit", False)
+    write_file(tmp_path / "p1_report.json", b"v1")
+    assert append_file(tmp_path / "p1_daily_logs.jsonl", b"first\n") == 0
+    remove_file(tmp_path / "p1_report.json")
+    assert os.listdir(tmp_path) == ["p1_daily_logs.jsonl"]
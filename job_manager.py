@@ -0,0 +1,185 @@
+"""
+Job Manager for long-running pipeline endpoints
+Runs pipelines on a bounded worker pool so API requests return straight away
+"""
+import contextvars
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from orchestrations.pipeline_graph import report_steps_to
+
+# Defaults for the global job manager
+max_workers = 2        # jobs running at once
+max_queued = 32        # jobs waiting for a worker before submit() refuses
+retention = 3600       # seconds a finished job (and its result) is kept
+
+_FINISHED_STEP_STATUSES = ("done", "failed", "restored", "skipped", "abandoned")
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting for a worker."""
+
+
+class Job:
+    """One background run of an endpoint: status, step progress and result."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'                 # queued → running → succeeded / failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.http_status: Optional[int] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.stages: Dict[str, Dict[str, str]] = {}   # pipeline → {step: status}
+        self._lock = threading.Lock()
+
+    def on_step(self, pipeline: str, step: str, status: str, output: Any = None):
+        with self._lock:
+            self.stages.setdefault(pipeline, {})[step] = status
+
+    def update(self, **fields):
+        """Set several status fields at once; readers never see half an update."""
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            stages = {pipeline: dict(steps) for pipeline, steps in self.stages.items()}
+            reply = {
+                'job_id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'created_at': _iso(self.created_at),
+                'started_at': _iso(self.started_at),
+                'finished_at': _iso(self.finished_at),
+                'http_status': self.http_status,
+                'result': self.result,
+                'error': self.error
+            }
+        total = sum(len(steps) for steps in stages.values())
+        finished = sum(status in _FINISHED_STEP_STATUSES for steps in stages.values() for status in steps.values())
+        reply['progress'] = {
+            'steps_finished': finished,
+            'steps_total': total,
+            'stages': stages
+        }
+        return reply
+
+
+class JobManager:
+    """Runs jobs on a bounded thread pool and keeps their results for a while"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_queued: Optional[int] = None,
+                 retention: Optional[float] = None):
+        """
+        Args:
+            max_workers: Jobs running at once (None = module default)
+            max_queued: Jobs allowed to wait for a worker (None = module default)
+            retention: Seconds finished jobs are kept (None = module default)
+        """
+        self.max_workers = max_workers or globals()['max_workers']
+        self.max_queued = globals()['max_queued'] if max_queued is None else max_queued
+        self.retention = globals()['retention'] if retention is None else retention
+
+        self._jobs: Dict[str, Job] = {}
+        self._queued = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+
+    def submit(self, kind: str, fn: Callable[[], Tuple[int, Dict[str, Any]]]) -> Job:
+        """
+        Queue fn to run in the background.
+
+        Args:
+            kind: What the job runs (e.g. "digital-twin"), for status replies
+            fn: Returns (http_status, json_body) like the synchronous endpoint
+
+        Returns:
+            The queued Job
+
+        Raises:
+            JobQueueFull: If max_queued jobs are already waiting
+        """
+        self._expire()
+        job = Job(kind)
+        with self._lock:
+            if self._queued >= self.max_queued:
+                raise JobQueueFull(f"{self._queued} jobs are already queued; try again later")
+            self._queued += 1
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {
+            'max_workers': self.max_workers,
+            'max_queued': self.max_queued,
+            'queued': statuses.count('queued'),
+            'running': statuses.count('running'),
+            'retained': len(statuses)
+        }
+
+    def _run(self, job: Job, fn: Callable[[], Tuple[int, Dict[str, Any]]]):
+        with self._lock:
+            self._queued -= 1
+        job.update(status='running', started_at=time.time())
+        outcome = {'http_status': 500, 'status': 'failed', 'error': 'job was interrupted'}
+        try:
+            # A fresh context per job: nothing set by an earlier job on this
+            # worker thread (deadlines, token sinks) carries over
+            http_status, result = contextvars.Context().run(_with_step_listener, job, fn)
+            failed = http_status >= 400
+            outcome = {
+                'http_status': http_status,
+                'result': result,
+                'status': 'failed' if failed else 'succeeded',
+                'error': result.get('error') if failed and isinstance(result, dict) else None
+            }
+        except Exception as e:
+            print(f"❌ Job {job.id} ({job.kind}) failed: {e}")
+            outcome['error'] = str(e)
+        finally:
+            job.update(finished_at=time.time(), **outcome)
+
+    def _expire(self):
+        cutoff = time.time() - self.retention
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values() if j.finished_at is not None and j.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+
+def _with_step_listener(job: Job, fn: Callable[[], Tuple[int, Dict[str, Any]]]):
+    with report_steps_to(job.on_step):
+        return fn()
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Get the global job manager instance (created on first use)"""
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            _job_manager = JobManager()
+        return _job_manager
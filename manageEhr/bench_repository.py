@@ -0,0 +1,121 @@
+"""
+Benchmark: EHR reads with and without the indexed repository
+(manageEhr.ehr_repository).
+
+"before" is the old EHRLoader path: every call parses the whole resource
+file and filters it by patient_id. "after" is EHRManager on top of the
+repository: files are parsed once, then every lookup is a hash index hit
+plus an mtime/size check per file.
+
+Writes a synthetic ehr_store (about one record per patient per resource)
+to a temporary directory for each size.
+
+Usage:
+    python manageEhr/bench_repository.py [--patients 10000 100000] [--calls 1000] [--before-calls 3]
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from manageEhr.ehr_manager import EHRManager
+
+_RESOURCES = {
+    'allergies.json': lambda i, pid: {'allergen': 'penicillin', 'reaction': 'rash', 'severity': 'moderate'},
+    'medications.json': lambda i, pid: {'name': 'metformin', 'dose': '1000 mg', 'frequency': 'BID'},
+    'appointments.json': lambda i, pid: {'doctor_id': f'd{i % 50}', 'date': '2024-03-01', 'status': 'booked'},
+    'encounters.json': lambda i, pid: {'type': 'outpatient', 'date': '2024-02-11', 'reason': 'review'},
+    'lab_results.json': lambda i, pid: {'test': 'HbA1c', 'value': '6.9 %', 'date': '2024-02-11'},
+    'medical_history.json': lambda i, pid: {'condition': 'type 2 diabetes', 'onset': '2015-06-01'},
+    'imaging.json': lambda i, pid: {'modality': 'XR', 'body_site': 'chest', 'date': '2023-11-20'},
+    'observations.json': lambda i, pid: {'code': 'bp', 'value': '138/86', 'date': '2024-02-11'},
+}
+
+
+def _write_store(directory: Path, patients: int, seed: int = 0):
+    rng = random.Random(seed)
+    ids = [f'p{i}' for i in range(patients)]
+    with open(directory / 'patients.json', 'w', encoding='utf-8') as f:
+        json.dump([{'id': pid, 'first_name': 'Test', 'last_name': f'Patient{i}', 'gender': 'female',
+                    'birth_date': '1966-04-02'} for i, pid in enumerate(ids)], f)
+    for filename, make in _RESOURCES.items():
+        records = []
+        for i, pid in enumerate(ids):
+            for _ in range(rng.randint(0, 2)):
+                records.append({'id': f'{filename[:3]}{len(records)}', 'patient_id': pid, **make(i, pid)})
+        rng.shuffle(records)
+        with open(directory / filename, 'w', encoding='utf-8') as f:
+            json.dump(records, f)
+    with open(directory / 'doctors.json', 'w', encoding='utf-8') as f:
+        json.dump([{'id': f'd{i}', 'name': f'Dr {i}'} for i in range(50)], f)
+
+
+def _before_all_data(directory: Path, patient_id: str) -> dict:
+    """The old get_all_patient_ehr_data: parse and filter nine files."""
+    def load(filename):
+        with open(directory / filename, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    data = {'patient': next((p for p in load('patients.json') if p['id'] == patient_id), None)}
+    for filename in _RESOURCES:
+        data[filename[:-5]] = [r for r in load(filename) if r['patient_id'] == patient_id]
+    return data
+
+
+def _median_ms(fn, patient_ids) -> float:
+    times = []
+    for patient_id in patient_ids:
+        start = time.perf_counter()
+        fn(patient_id)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--patients", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--calls", type=int, default=1000, help="lookups with the repository")
+    parser.add_argument("--before-calls", type=int, default=3, help="lookups with the old loader")
+    args = parser.parse_args()
+
+    rows = []
+    for patients in args.patients:
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            _write_store(directory, patients)
+            store_mb = sum(p.stat().st_size for p in directory.iterdir()) / 1e6
+            rng = random.Random(1)
+            sample = [f'p{rng.randrange(patients)}' for _ in range(args.calls)]
+
+            before_ms = _median_ms(lambda pid: _before_all_data(directory, pid), sample[:args.before_calls])
+
+            manager = EHRManager(str(directory))
+            start = time.perf_counter()
+            manager.get_all_patient_ehr_data(sample[0])
+            cold_ms = (time.perf_counter() - start) * 1000
+            after_ms = _median_ms(manager.get_all_patient_ehr_data, sample)
+            by_id_us = _median_ms(manager.get_patient, sample) * 1000
+
+            assert manager.get_all_patient_ehr_data(sample[1]) == _before_all_data(directory, sample[1])
+            rows.append((patients, store_mb, before_ms, cold_ms, after_ms, by_id_us))
+
+    print(f"\nget_all_patient_ehr_data, median of {args.before_calls} (before) / {args.calls} (after) "
+          f"random patients\n")
+    print(f"{'patients':>9}{'store MB':>10}{'before ms':>12}{'first call ms':>15}{'after ms':>11}"
+          f"{'speedup':>10}{'get_patient µs':>16}")
+    for patients, store_mb, before_ms, cold_ms, after_ms, by_id_us in rows:
+        print(f"{patients:>9}{store_mb:>10.1f}{before_ms:>12.1f}{cold_ms:>15.1f}{after_ms:>11.3f}"
+              f"{before_ms / after_ms:>9.0f}x{by_id_us:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,23 @@
 """
 EHR Data Inserter Module
 Provides functions to insert and update EHR data in JSON files.
+
+Writes go through the configured storage backend (ehr_storage.py). Each
+insert/update is atomic; wrap several in transaction() to commit them
+together, all or none, also across a crash (with the JSON backend, readers
+in other threads may see part of a commit while it is being written):
+
+    with inserter.transaction():
+        inserter.insert_medication({...})
+        inserter.insert_lab_result({...})
 """
 
-import json
-import os
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional
 from pathlib import Path
 from datetime import datetime
 
+from .ehr_storage import get_storage, resource_for
+
 
 class EHRInserter:
     """Class to insert and update EHR data in JSON files."""
@@ -26,43 +35,11 @@ class EHRInserter:
             self.base_path = Path(__file__).parent.parent / 'ehr_store'
         else:
             self.base_path = Path(base_path)
+        self.storage = get_storage(self.base_path)
     
-    def _load_json_file(self, filename: str) -> List[Dict[str, Any]]:
-        """
-        Load data from a JSON file.
-        
-        Args:
-            filename: Name of the JSON file to load
-            
-        Returns:
-            List of dictionaries containing the loaded data
-        """
-        file_path = self.base_path / filename
-        
-        if not file_path.exists():
-            return []
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read().strip()
-            if not content:
-                return []
-            return json.loads(content)
-    
-    def _save_json_file(self, filename: str, data: List[Dict[str, Any]]) -> None:
-        """
-        Save data to a JSON file.
-        
-        Args:
-            filename: Name of the JSON file to save
-            data: List of dictionaries to save
-        """
-        file_path = self.base_path / filename
-        
-        # Ensure directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+    def transaction(self):
+        """Commit the writes made inside the with-block together, or none of them."""
+        return self.storage.transaction()
     
     def _add_timestamps(self, data: Dict[str, Any], update: bool = False) -> Dict[str, Any]:
         """
@@ -84,6 +61,34 @@ class EHRInserter:
         
         return data
     
+    def _insert(self, resource: str, data: Dict[str, Any], label: str) -> Dict[str, Any]:
+        """Insert a record with timestamps; ValueError if its ID already exists."""
+        with self.storage.transaction():
+            if data.get('id') is not None and self.storage.get(resource, data['id']) is not None:
+                raise ValueError(f"{label} with ID {data.get('id')} already exists")
+            
+            data = self._add_timestamps(data)
+            self.storage.insert(resource, data)
+        
+        return data
+    
+    def _update(self, resource: str, record_id: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Replace a record, keeping its ID and created_at; None if not found."""
+        with self.storage.transaction():
+            existing = self.storage.get(resource, record_id)
+            if existing is None:
+                return None
+            
+            # Preserve ID and created_at
+            data['id'] = record_id
+            if 'created_at' in existing:
+                data['created_at'] = existing['created_at']
+            
+            data = self._add_timestamps(data, update=True)
+            self.storage.replace(resource, {'id': record_id}, data)
+        
+        return data
+    
     def insert_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """
         Insert a new patient record.
@@ -97,20 +102,7 @@ class EHRInserter:
         Raises:
             ValueError: If patient ID already exists
         """
-        patients = self._load_json_file('patients.json')
-        
-        # Check if patient ID already exists
-        if any(p['id'] == patient_data.get('id') for p in patients):
-            raise ValueError(f"Patient with ID {patient_data.get('id')} already exists")
-        
-        # Add timestamps
-        patient_data = self._add_timestamps(patient_data)
-        
-        # Add to list and save
-        patients.append(patient_data)
-        self._save_json_file('patients.json', patients)
-        
-        return patient_data
+        return self._insert('patients', patient_data, 'Patient')
     
     def update_patient(self, patient_id: str, patient_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -123,24 +115,7 @@ class EHRInserter:
         Returns:
             The updated patient record or None if not found
         """
-        patients = self._load_json_file('patients.json')
-        
-        for i, patient in enumerate(patients):
-            if patient['id'] == patient_id:
-                # Preserve ID and created_at
-                patient_data['id'] = patient_id
-                if 'created_at' in patient:
-                    patient_data['created_at'] = patient['created_at']
-                
-                # Update timestamps
-                patient_data = self._add_timestamps(patient_data, update=True)
-                
-                patients[i] = patient_data
-                self._save_json_file('patients.json', patients)
-                
-                return patient_data
-        
-        return None
+        return self._update('patients', patient_id, patient_data)
     
     def insert_doctor(self, doctor_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -155,16 +130,7 @@ class EHRInserter:
         Raises:
             ValueError: If doctor ID already exists
         """
-        doctors = self._load_json_file('doctors.json')
-        
-        if any(d['id'] == doctor_data.get('id') for d in doctors):
-            raise ValueError(f"Doctor with ID {doctor_data.get('id')} already exists")
-        
-        doctor_data = self._add_timestamps(doctor_data)
-        doctors.append(doctor_data)
-        self._save_json_file('doctors.json', doctors)
-        
-        return doctor_data
+        return self._insert('doctors', doctor_data, 'Doctor')
     
     def insert_allergy(self, allergy_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -179,16 +145,7 @@ class EHRInserter:
         Raises:
             ValueError: If allergy ID already exists
         """
-        allergies = self._load_json_file('allergies.json')
-        
-        if any(a['id'] == allergy_data.get('id') for a in allergies):
-            raise ValueError(f"Allergy with ID {allergy_data.get('id')} already exists")
-        
-        allergy_data = self._add_timestamps(allergy_data)
-        allergies.append(allergy_data)
-        self._save_json_file('allergies.json', allergies)
-        
-        return allergy_data
+        return self._insert('allergies', allergy_data, 'Allergy')
     
     def insert_medication(self, medication_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -203,16 +160,7 @@ class EHRInserter:
         Raises:
             ValueError: If medication ID already exists
         """
-        medications = self._load_json_file('medications.json')
-        
-        if any(m['id'] == medication_data.get('id') for m in medications):
-            raise ValueError(f"Medication with ID {medication_data.get('id')} already exists")
-        
-        medication_data = self._add_timestamps(medication_data)
-        medications.append(medication_data)
-        self._save_json_file('medications.json', medications)
-        
-        return medication_data
+        return self._insert('medications', medication_data, 'Medication')
     
     def update_medication(self, medication_id: str, medication_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -225,21 +173,7 @@ class EHRInserter:
         Returns:
             The updated medication record or None if not found
         """
-        medications = self._load_json_file('medications.json')
-        
-        for i, medication in enumerate(medications):
-            if medication['id'] == medication_id:
-                medication_data['id'] = medication_id
-                if 'created_at' in medication:
-                    medication_data['created_at'] = medication['created_at']
-                
-                medication_data = self._add_timestamps(medication_data, update=True)
-                medications[i] = medication_data
-                self._save_json_file('medications.json', medications)
-                
-                return medication_data
-        
-        return None
+        return self._update('medications', medication_id, medication_data)
     
     def insert_appointment(self, appointment_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -254,16 +188,7 @@ class EHRInserter:
         Raises:
             ValueError: If appointment ID already exists
         """
-        appointments = self._load_json_file('appointments.json')
-        
-        if any(a['id'] == appointment_data.get('id') for a in appointments):
-            raise ValueError(f"Appointment with ID {appointment_data.get('id')} already exists")
-        
-        appointment_data = self._add_timestamps(appointment_data)
-        appointments.append(appointment_data)
-        self._save_json_file('appointments.json', appointments)
-        
-        return appointment_data
+        return self._insert('appointments', appointment_data, 'Appointment')
     
     def update_appointment(self, appointment_id: str, appointment_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -276,21 +201,7 @@ class EHRInserter:
         Returns:
             The updated appointment record or None if not found
         """
-        appointments = self._load_json_file('appointments.json')
-        
-        for i, appointment in enumerate(appointments):
-            if appointment['id'] == appointment_id:
-                appointment_data['id'] = appointment_id
-                if 'created_at' in appointment:
-                    appointment_data['created_at'] = appointment['created_at']
-                
-                appointment_data = self._add_timestamps(appointment_data, update=True)
-                appointments[i] = appointment_data
-                self._save_json_file('appointments.json', appointments)
-                
-                return appointment_data
-        
-        return None
+        return self._update('appointments', appointment_id, appointment_data)
     
     def insert_encounter(self, encounter_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -305,16 +216,7 @@ class EHRInserter:
         Raises:
             ValueError: If encounter ID already exists
         """
-        encounters = self._load_json_file('encounters.json')
-        
-        if any(e['id'] == encounter_data.get('id') for e in encounters):
-            raise ValueError(f"Encounter with ID {encounter_data.get('id')} already exists")
-        
-        encounter_data = self._add_timestamps(encounter_data)
-        encounters.append(encounter_data)
-        self._save_json_file('encounters.json', encounters)
-        
-        return encounter_data
+        return self._insert('encounters', encounter_data, 'Encounter')
     
     def insert_lab_result(self, lab_result_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -329,16 +231,7 @@ class EHRInserter:
         Raises:
             ValueError: If lab result ID already exists
         """
-        lab_results = self._load_json_file('lab_results.json')
-        
-        if any(l['id'] == lab_result_data.get('id') for l in lab_results):
-            raise ValueError(f"Lab result with ID {lab_result_data.get('id')} already exists")
-        
-        lab_result_data = self._add_timestamps(lab_result_data)
-        lab_results.append(lab_result_data)
-        self._save_json_file('lab_results.json', lab_results)
-        
-        return lab_result_data
+        return self._insert('lab_results', lab_result_data, 'Lab result')
     
     def insert_medical_history(self, history_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -353,16 +246,7 @@ class EHRInserter:
         Raises:
             ValueError: If medical history ID already exists
         """
-        history = self._load_json_file('medical_history.json')
-        
-        if any(h['id'] == history_data.get('id') for h in history):
-            raise ValueError(f"Medical history with ID {history_data.get('id')} already exists")
-        
-        history_data = self._add_timestamps(history_data)
-        history.append(history_data)
-        self._save_json_file('medical_history.json', history)
-        
-        return history_data
+        return self._insert('medical_history', history_data, 'Medical history')
     
     def update_medical_history(self, history_id: str, history_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         """
@@ -375,21 +259,7 @@ class EHRInserter:
         Returns:
             The updated medical history record or None if not found
         """
-        history = self._load_json_file('medical_history.json')
-        
-        for i, record in enumerate(history):
-            if record['id'] == history_id:
-                history_data['id'] = history_id
-                if 'created_at' in record:
-                    history_data['created_at'] = record['created_at']
-                
-                history_data = self._add_timestamps(history_data, update=True)
-                history[i] = history_data
-                self._save_json_file('medical_history.json', history)
-                
-                return history_data
-        
-        return None
+        return self._update('medical_history', history_id, history_data)
     
     def insert_imaging(self, imaging_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -404,16 +274,7 @@ class EHRInserter:
         Raises:
             ValueError: If imaging ID already exists
         """
-        imaging = self._load_json_file('imaging.json')
-        
-        if any(i.get('id') == imaging_data.get('id') for i in imaging if i.get('id') is not None):
-            raise ValueError(f"Imaging with ID {imaging_data.get('id')} already exists")
-        
-        imaging_data = self._add_timestamps(imaging_data)
-        imaging.append(imaging_data)
-        self._save_json_file('imaging.json', imaging)
-        
-        return imaging_data
+        return self._insert('imaging', imaging_data, 'Imaging')
     
     def insert_observation(self, observation_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -425,22 +286,21 @@ class EHRInserter:
         Returns:
             The inserted observation record
         """
-        observations = self._load_json_file('observations.json')
-        
-        # Check if patient already has observations
-        patient_id = observation_data.get('patient_id')
-        patient_obs = next((o for o in observations if o['patient_id'] == patient_id), None)
-        
-        if patient_obs:
-            # Add to existing patient's observations
-            if 'observations' not in patient_obs:
-                patient_obs['observations'] = []
-            patient_obs['observations'].extend(observation_data.get('observations', []))
-        else:
-            # Create new patient observation record
-            observations.append(observation_data)
-        
-        self._save_json_file('observations.json', observations)
+        with self.storage.transaction():
+            # Check if patient already has observations
+            patient_id = observation_data.get('patient_id')
+            patient_obs = next(iter(self.storage.find('observations', patient_id=patient_id)), None)
+            
+            if patient_obs:
+                # Add to existing patient's observations (on a copy: stored
+                # records may be shared with readers)
+                merged = dict(patient_obs)
+                merged['observations'] = list(patient_obs.get('observations', []))
+                merged['observations'].extend(observation_data.get('observations', []))
+                self.storage.replace('observations', {'patient_id': patient_id}, merged)
+            else:
+                # Create new patient observation record
+                self.storage.insert('observations', observation_data)
         
         return observation_data
     
@@ -455,16 +315,7 @@ class EHRInserter:
         Returns:
             True if record was deleted, False otherwise
         """
-        records = self._load_json_file(filename)
-        original_length = len(records)
-        
-        records = [r for r in records if r.get('id') != record_id]
-        
-        if len(records) < original_length:
-            self._save_json_file(filename, records)
-            return True
-        
-        return False
+        return self.storage.delete(resource_for(filename), record_id)
 
 
 # Convenience functions for quick access
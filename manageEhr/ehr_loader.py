@@ -1,13 +1,17 @@
 """
 EHR Data Loader Module
 Provides functions to load various EHR data from JSON files.
+
+Reads go through the configured storage backend (ehr_storage.py): the
+JSON files via the indexed EHRRepository, or SQLite. Returned records
+may be shared and must not be modified in place.
 """
 
-import json
-import os
 from typing import List, Dict, Any, Optional
 from pathlib import Path
 
+from .ehr_storage import get_storage, resource_for
+
 
 class EHRLoader:
     """Class to load EHR data from JSON files."""
@@ -25,6 +29,7 @@ class EHRLoader:
             self.base_path = Path(__file__).parent.parent / 'ehr_store'
         else:
             self.base_path = Path(base_path)
+        self.storage = get_storage(self.base_path)
     
     def _load_json_file(self, filename: str) -> List[Dict[str, Any]]:
         """
@@ -40,13 +45,7 @@ class EHRLoader:
             FileNotFoundError: If the file doesn't exist
             json.JSONDecodeError: If the file contains invalid JSON
         """
-        file_path = self.base_path / filename
-        
-        if not file_path.exists():
-            raise FileNotFoundError(f"File not found: {file_path}")
-        
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return self.storage.all(resource_for(filename))
     
     def load_patients(self) -> List[Dict[str, Any]]:
         """Load all patient records."""
@@ -62,8 +61,7 @@ class EHRLoader:
         Returns:
             Patient dictionary if found, None otherwise
         """
-        patients = self.load_patients()
-        return next((p for p in patients if p['id'] == patient_id), None)
+        return self.storage.get('patients', patient_id)
     
     def load_doctors(self) -> List[Dict[str, Any]]:
         """Load all doctor records."""
@@ -79,8 +77,7 @@ class EHRLoader:
         Returns:
             Doctor dictionary if found, None otherwise
         """
-        doctors = self.load_doctors()
-        return next((d for d in doctors if d['id'] == doctor_id), None)
+        return self.storage.get('doctors', doctor_id)
     
     def load_allergies(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -92,12 +89,10 @@ class EHRLoader:
         Returns:
             List of allergy records
         """
-        allergies = self._load_json_file('allergies.json')
-        
         if patient_id:
-            return [a for a in allergies if a['patient_id'] == patient_id]
+            return self.storage.find('allergies', patient_id=patient_id)
         
-        return allergies
+        return self._load_json_file('allergies.json')
     
     def load_medications(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -109,12 +104,10 @@ class EHRLoader:
         Returns:
             List of medication records
         """
-        medications = self._load_json_file('medications.json')
-        
         if patient_id:
-            return [m for m in medications if m['patient_id'] == patient_id]
+            return self.storage.find('medications', patient_id=patient_id)
         
-        return medications
+        return self._load_json_file('medications.json')
     
     def load_appointments(self, patient_id: Optional[str] = None, 
                          doctor_id: Optional[str] = None) -> List[Dict[str, Any]]:
@@ -128,15 +121,13 @@ class EHRLoader:
         Returns:
             List of appointment records
         """
-        appointments = self._load_json_file('appointments.json')
-        
+        criteria = {}
         if patient_id:
-            appointments = [a for a in appointments if a['patient_id'] == patient_id]
-        
+            criteria['patient_id'] = patient_id
         if doctor_id:
-            appointments = [a for a in appointments if a['doctor_id'] == doctor_id]
+            criteria['doctor_id'] = doctor_id
         
-        return appointments
+        return self.storage.find('appointments', **criteria)
     
     def load_encounters(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -148,12 +139,10 @@ class EHRLoader:
         Returns:
             List of encounter records
         """
-        encounters = self._load_json_file('encounters.json')
-        
         if patient_id:
-            return [e for e in encounters if e['patient_id'] == patient_id]
+            return self.storage.find('encounters', patient_id=patient_id)
         
-        return encounters
+        return self._load_json_file('encounters.json')
     
     def load_lab_results(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -165,12 +154,10 @@ class EHRLoader:
         Returns:
             List of lab result records
         """
-        lab_results = self._load_json_file('lab_results.json')
-        
         if patient_id:
-            return [l for l in lab_results if l['patient_id'] == patient_id]
+            return self.storage.find('lab_results', patient_id=patient_id)
         
-        return lab_results
+        return self._load_json_file('lab_results.json')
     
     def load_medical_history(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -182,12 +169,10 @@ class EHRLoader:
         Returns:
             List of medical history records
         """
-        history = self._load_json_file('medical_history.json')
-        
         if patient_id:
-            return [h for h in history if h['patient_id'] == patient_id]
+            return self.storage.find('medical_history', patient_id=patient_id)
         
-        return history
+        return self._load_json_file('medical_history.json')
     
     def load_imaging(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -199,12 +184,10 @@ class EHRLoader:
         Returns:
             List of imaging records
         """
-        imaging = self._load_json_file('imaging.json')
-        
         if patient_id:
-            return [i for i in imaging if i['patient_id'] == patient_id]
+            return self.storage.find('imaging', patient_id=patient_id)
         
-        return imaging
+        return self._load_json_file('imaging.json')
     
     def load_observations(self, patient_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -216,12 +199,10 @@ class EHRLoader:
         Returns:
             List of observation records
         """
-        observations = self._load_json_file('observations.json')
-        
         if patient_id:
-            return [o for o in observations if o['patient_id'] == patient_id]
+            return self.storage.find('observations', patient_id=patient_id)
         
-        return observations       
+        return self._load_json_file('observations.json')       
     
              
     def load_patient_complete_record(self, patient_id: str) -> Dict[str, Any]:
@@ -69,6 +69,10 @@ class EHRManager:
             "observations": self.get_observations(patient_id)
         }
     
+    def data_version(self) -> tuple:
+        """Changes whenever the stored EHR data may have changed (see ehr_storage)."""
+        return self.loader.storage.data_version()
+    
     def add_patient(self, patient_data: Dict[str, Any]) -> Dict[str, Any]:
         """Add a new patient."""
         return self.inserter.insert_patient(patient_data)
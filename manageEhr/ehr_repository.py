@@ -0,0 +1,194 @@
+"""
+EHR Repository Module
+Keeps the ehr_store resource files parsed in memory with hash indexes.
+
+Each resource file (patients.json, medications.json, ...) is parsed once
+and indexed by record `id` and `patient_id` (other fields, e.g.
+`doctor_id`, are indexed on first use). Before every read the file's
+mtime and size are checked; a changed file is parsed and indexed again.
+The JSON storage backend also invalidates a file right after writing it.
+
+Readers never take a lock: a reload builds a new snapshot and swaps it
+in, so a reader sees either the old or the new file, never a mix.
+
+Records are shared between callers and must not be modified in place;
+writes work on their own copy of the file (see ehr_storage.JSONStorage).
+
+Usage:
+    from manageEhr.ehr_repository import get_repository
+
+    repo = get_repository()
+    patient = repo.get('patients.json', 'p1')
+    medications = repo.find('medications.json', patient_id='p1')
+"""
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Fields indexed as soon as a file is loaded; others are indexed on first use
+indexed_fields = ('id', 'patient_id')
+
+
+class _Snapshot:
+    """One parsed version of a resource file and its indexes."""
+
+    __slots__ = ('signature', 'records', 'indexes', 'lock')
+
+    def __init__(self, signature: Optional[Tuple[int, int]], records: List[Dict[str, Any]]):
+        self.signature = signature
+        self.records = records
+        self.indexes: Dict[str, Dict[Any, List[Dict[str, Any]]]] = {}
+        self.lock = threading.Lock()    # guards lazily built indexes only
+        for field in indexed_fields:
+            self.indexes[field] = _build_index(records, field)
+
+    def index(self, field: str) -> Dict[Any, List[Dict[str, Any]]]:
+        index = self.indexes.get(field)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(field)
+                if index is None:
+                    index = _build_index(self.records, field)
+                    self.indexes[field] = index
+        return index
+
+
+def _build_index(records: List[Dict[str, Any]], field: str) -> Dict[Any, List[Dict[str, Any]]]:
+    index: Dict[Any, List[Dict[str, Any]]] = {}
+    for record in records:
+        value = record.get(field)
+        if value is not None:
+            index.setdefault(value, []).append(record)
+    return index
+
+
+class EHRRepository:
+    """In-memory, indexed view of the ehr_store resource files."""
+
+    def __init__(self, base_path: Optional[Union[str, Path]] = None):
+        """
+        Initialize the EHR Repository.
+
+        Args:
+            base_path: Base path to the ehr_store directory.
+                      If None, uses ehr_store directory.
+        """
+        if base_path is None:
+            self.base_path = Path(__file__).parent.parent / 'ehr_store'
+        else:
+            self.base_path = Path(base_path)
+
+        self._snapshots: Dict[str, _Snapshot] = {}
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._counters = {'loads': 0}
+
+    def records(self, filename: str) -> List[Dict[str, Any]]:
+        """
+        All records of a resource file.
+
+        Raises:
+            FileNotFoundError: If the file doesn't exist
+            json.JSONDecodeError: If the file contains invalid JSON
+        """
+        return list(self._snapshot(filename).records)
+
+    def get(self, filename: str, record_id: str) -> Optional[Dict[str, Any]]:
+        """The record with the given `id`, or None."""
+        matches = self._snapshot(filename).index('id').get(record_id)
+        return matches[0] if matches else None
+
+    def find(self, filename: str, **criteria) -> List[Dict[str, Any]]:
+        """
+        Records whose fields equal all the given values, in file order,
+        e.g. find('appointments.json', patient_id='p1', doctor_id='d1').
+        """
+        snapshot = self._snapshot(filename)
+        if not criteria:
+            return list(snapshot.records)
+
+        # Look up the most selective index, then filter on the rest
+        candidates = min(
+            (snapshot.index(field).get(value, []) for field, value in criteria.items()),
+            key=len
+        )
+        return [r for r in candidates if all(r.get(field) == value for field, value in criteria.items())]
+
+    def signature(self, filename: str) -> Optional[Tuple[int, int]]:
+        """(mtime_ns, size) of a resource file, or None if it doesn't exist."""
+        return file_signature(self.base_path / filename)
+
+    def invalidate(self, filename: Optional[str] = None):
+        """Forget a file's snapshot (or all of them) so the next read reloads it."""
+        with self._lock:
+            if filename is None:
+                self._snapshots.clear()
+            else:
+                self._snapshots.pop(filename, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            files = {name: len(snapshot.records) for name, snapshot in self._snapshots.items()}
+            return {'base_path': str(self.base_path), 'files': files, **self._counters}
+
+    def _snapshot(self, filename: str) -> _Snapshot:
+        file_path = self.base_path / filename
+        signature = file_signature(file_path)
+
+        snapshot = self._snapshots.get(filename)
+        if snapshot is not None and snapshot.signature == signature:
+            return snapshot
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(filename, threading.Lock())
+        # One reload per file at a time; readers arriving meanwhile wait for it
+        with load_lock:
+            snapshot = self._snapshots.get(filename)
+            signature = file_signature(file_path)
+            if snapshot is not None and snapshot.signature == signature:
+                return snapshot
+
+            if signature is None:
+                raise FileNotFoundError(f"File not found: {file_path}")
+            with open(file_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            # The file may have been replaced while we read it; keep the
+            # signature from before the read so the next call re-checks
+            snapshot = _Snapshot(signature, records)
+            with self._lock:
+                self._snapshots[filename] = snapshot
+                self._counters['loads'] += 1
+            return snapshot
+
+
+def file_signature(file_path: Path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it doesn't exist."""
+    try:
+        st = os.stat(file_path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+# One repository per ehr_store directory, shared by all loaders
+_repositories: Dict[Path, EHRRepository] = {}
+_repositories_lock = threading.Lock()
+
+
+def get_repository(base_path: Optional[Union[str, Path]] = None) -> EHRRepository:
+    """
+    Get the shared repository for an ehr_store directory.
+
+    Args:
+        base_path: Base path to the ehr_store directory.
+                  If None, uses ehr_store directory.
+    """
+    path = Path(base_path) if base_path is not None else Path(__file__).parent.parent / 'ehr_store'
+    key = path.resolve()
+    with _repositories_lock:
+        if key not in _repositories:
+            _repositories[key] = EHRRepository(path)
+        return _repositories[key]
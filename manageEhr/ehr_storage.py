@@ -0,0 +1,503 @@
+"""
+EHR Storage Module
+Pluggable storage backends behind EHRLoader and EHRInserter.
+
+Both backends store one collection per resource type in
+ehr_store/resourcetypes.py ('patients', 'medications', ...) and offer the
+same operations, so loader and inserter callers don't change:
+
+    all(resource), get(resource, id), find(resource, **criteria),
+    insert(resource, record), replace(resource, match, record),
+    delete(resource, id), transaction(), data_version()
+
+data_version() is cheap (a few stat calls) and changes whenever the stored
+data may have changed, so callers can cache what they derive from it.
+
+JSONStorage is the original layout: one JSON array file per resource in
+ehr_store/. Reads go through the indexed EHRRepository; every write
+rewrites the whole file, serialized by a per-directory lock, through a
+temp file and the directory's journal (ehr_store.durable_files), so a
+crash leaves each file either old or new. A transaction that writes
+several files first saves all of their new contents in one intent file
+(.transaction.json); if the process dies before every file is replaced,
+the next JSONStorage opened on the directory finishes the job, so after
+a crash a transaction is applied completely or not at all. Readers in
+other threads can still see some of a transaction's files replaced
+before the others.
+
+SQLiteStorage keeps every resource in a table of one SQLite database in
+WAL mode (readers don't block the writer). The record is stored as JSON;
+`id`, `patient_id`, `doctor_id` and the resource's main date are copied
+into indexed columns. Every write is a transaction of its own unless it
+runs inside transaction(), which commits a batch of writes atomically.
+
+Select the backend with configure_storage(); migrate the JSON files into
+a database with migrate_json_to_sqlite() (or migrate_json_to_sqlite.py).
+
+Usage:
+    from manageEhr.ehr_storage import configure_storage, get_storage
+
+    configure_storage(backend="sqlite")          # ehr_store/ehr.sqlite3
+    storage = get_storage()
+    with storage.transaction():
+        storage.insert('medications', {...})
+        storage.insert('medications', {...})
+"""
+
+import contextlib
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from ehr_store.resourcetypes import fhir_resource_types
+from ehr_store.durable_files import recover, remove_file, write_file
+from .ehr_repository import file_signature, get_repository
+
+# Which backend EHRLoader/EHRInserter use: "json" or "sqlite"
+backend = "json"
+# SQLite database file (None = ehr.sqlite3 in the ehr_store directory)
+sqlite_path = None
+# Seconds a writer waits for another connection's write lock
+sqlite_timeout = 30.0
+
+DEFAULT_BASE_PATH = Path(__file__).parent.parent / 'ehr_store'
+SQLITE_FILENAME = 'ehr.sqlite3'
+# Intent file of a JSON transaction that writes several files
+TRANSACTION_FILENAME = '.transaction.json'
+
+# Main date of each resource, copied into the indexed `date` column
+_DATE_FIELDS = {
+    'appointments': 'scheduled_time',
+    'encounters': 'encounter_date',
+    'imaging': 'date_uploaded',
+    'lab_results': 'date_conducted',
+    'medical_history': 'diagnosis_date',
+    'medications': 'start_date',
+    'procedures': 'procedure_date',
+}
+_INDEXED_COLUMNS = ('id', 'patient_id', 'doctor_id')
+
+
+def resource_for(filename: str) -> str:
+    """'medications.json' → 'medications'"""
+    return filename[:-len('.json')] if filename.endswith('.json') else filename
+
+
+def _check_resource(resource: str) -> str:
+    if resource not in fhir_resource_types:
+        raise ValueError(f"Unknown resource type: {resource}")
+    return resource
+
+
+def _matches(record: Dict[str, Any], criteria: Dict[str, Any]) -> bool:
+    return all(record.get(field) == value for field, value in criteria.items())
+
+
+class JSONStorage:
+    """One JSON array file per resource (the original ehr_store layout)."""
+
+    name = 'json'
+
+    def __init__(self, base_path: Optional[Union[str, Path]] = None):
+        self.base_path = Path(base_path) if base_path is not None else DEFAULT_BASE_PATH
+        self.repository = get_repository(self.base_path)
+        self._write_lock = threading.RLock()
+        self._local = threading.local()     # this thread's open transaction
+        self._writes = 0                    # files saved by this process
+        # Replay the directory's journal before looking for an intent file
+        recover(self.base_path)
+        with self._write_lock:
+            self._recover()
+
+    # Inside a transaction, reads see this thread's working copy of the file
+    # (including its uncommitted writes); otherwise the indexed repository
+
+    def all(self, resource: str) -> List[Dict[str, Any]]:
+        if self._in_transaction():
+            return list(self._working_copy(resource))
+        return self.repository.records(self._filename(resource))
+
+    def get(self, resource: str, record_id: str) -> Optional[Dict[str, Any]]:
+        if self._in_transaction():
+            return next((r for r in self._working_copy(resource) if r.get('id') == record_id), None)
+        return self.repository.get(self._filename(resource), record_id)
+
+    def find(self, resource: str, **criteria) -> List[Dict[str, Any]]:
+        if self._in_transaction():
+            return [r for r in self._working_copy(resource) if _matches(r, criteria)]
+        return self.repository.find(self._filename(resource), **criteria)
+
+    def insert(self, resource: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self.transaction():
+            records = self._records_for_write(resource)
+            if record.get('id') is not None and any(r.get('id') == record['id'] for r in records):
+                raise ValueError(f"Record with ID {record['id']} already exists in {resource}")
+            records.append(record)
+        return record
+
+    def replace(self, resource: str, match: Dict[str, Any], record: Dict[str, Any]) -> bool:
+        """Replace the first record matching all fields in `match`."""
+        with self.transaction():
+            records = self._records_for_write(resource)
+            for i, existing in enumerate(records):
+                if _matches(existing, match):
+                    records[i] = record
+                    return True
+        return False
+
+    def delete(self, resource: str, record_id: str) -> bool:
+        with self.transaction():
+            records = self._records_for_write(resource)
+            remaining = [r for r in records if r.get('id') != record_id]
+            if len(remaining) == len(records):
+                return False
+            records[:] = remaining
+        return True
+
+    def data_version(self) -> tuple:
+        """
+        Changes whenever a resource file may have changed: every file's mtime
+        and size, plus a count of this process's writes (two writes within the
+        mtime resolution can leave the same size).
+        """
+        return self._writes, tuple(self.repository.signature(self._filename(r)) for r in fhir_resource_types)
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator["JSONStorage"]:
+        """
+        Batch writes: every touched file is read once and written once, at
+        the end, and only if the block doesn't raise. The files are written
+        all or none, even across a crash (see _commit). Other writers in
+        this process wait until it is done.
+        """
+        with self._write_lock:
+            outer = not self._in_transaction()
+            if outer:
+                # A commit that failed part-way in this process is finished first
+                self._recover()
+                self._local.working, self._local.dirty = {}, set()
+            try:
+                yield self
+                if outer:
+                    self._commit({filename: self._local.working[filename] for filename in self._local.dirty})
+            finally:
+                if outer:
+                    self._local.working = self._local.dirty = None
+
+    def _in_transaction(self) -> bool:
+        return getattr(self._local, 'working', None) is not None
+
+    def _working_copy(self, resource: str) -> List[Dict[str, Any]]:
+        """This transaction's copy of a file, read from disk on first use."""
+        filename = self._filename(resource)
+        working = self._local.working
+        if filename not in working:
+            working[filename] = self._read(filename)
+        return working[filename]
+
+    def _records_for_write(self, resource: str) -> List[Dict[str, Any]]:
+        self._local.dirty.add(self._filename(resource))
+        return self._working_copy(resource)
+
+    def _read(self, filename: str) -> List[Dict[str, Any]]:
+        file_path = self.base_path / filename
+        if not file_path.exists():
+            return []
+        with open(file_path, 'r', encoding='utf-8') as f:
+            content = f.read().strip()
+            return json.loads(content) if content else []
+
+    def _commit(self, files: Dict[str, List[Dict[str, Any]]]):
+        """
+        Write a transaction's files. One file is replaced atomically on its
+        own; several are first saved together in the intent file, which is
+        removed once every file is replaced. Until then _recover() can
+        replay it.
+        """
+        intent = self.base_path / TRANSACTION_FILENAME
+        if len(files) > 1:
+            write_file(intent, json.dumps(files, ensure_ascii=False).encode('utf-8'))
+        for filename, records in files.items():
+            self._save(filename, records)
+        if len(files) > 1:
+            remove_file(intent)
+
+    def _recover(self):
+        """Finish a transaction whose intent file was saved but not yet fully applied."""
+        intent = self.base_path / TRANSACTION_FILENAME
+        try:
+            with open(intent, 'r', encoding='utf-8') as f:
+                files = json.load(f)
+        except FileNotFoundError:
+            return
+        print(f"↻ Finishing an interrupted EHR transaction ({', '.join(sorted(files))})")
+        for filename, records in files.items():
+            self._save(filename, records)
+        remove_file(intent)
+
+    def _save(self, filename: str, records: List[Dict[str, Any]]):
+        write_file(self.base_path / filename, json.dumps(records, indent=2, ensure_ascii=False).encode('utf-8'))
+        self._writes += 1
+        # Don't rely on the mtime alone: two writes within its resolution
+        # can leave the same size too
+        self.repository.invalidate(filename)
+
+    @staticmethod
+    def _filename(resource: str) -> str:
+        return f"{_check_resource(resource)}.json"
+
+
+class SQLiteStorage:
+    """All resources in one SQLite database (WAL mode), one table per resource."""
+
+    name = 'sqlite'
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, base_path: Optional[Union[str, Path]] = None):
+        """
+        Args:
+            path: Database file (None = ehr.sqlite3 in base_path)
+            base_path: The ehr_store directory (None = ehr_store/)
+        """
+        base_path = Path(base_path) if base_path is not None else DEFAULT_BASE_PATH
+        self.path = Path(path) if path is not None else base_path / SQLITE_FILENAME
+        self._local = threading.local()
+        self._commits = 0                   # write transactions committed by this process
+        self._commits_lock = threading.Lock()
+        with self.transaction() as conn:
+            for resource in fhir_resource_types:
+                _create_table(conn, resource)
+
+    def all(self, resource: str) -> List[Dict[str, Any]]:
+        return self._select(resource, {})
+
+    def get(self, resource: str, record_id: str) -> Optional[Dict[str, Any]]:
+        if record_id is None:
+            return None
+        rows = self._select(resource, {'id': record_id}, limit=1)
+        return rows[0] if rows else None
+
+    def find(self, resource: str, **criteria) -> List[Dict[str, Any]]:
+        return self._select(resource, criteria)
+
+    def insert(self, resource: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        with self.transaction() as conn:
+            if record.get('id') is not None and self._seqs(conn, resource, {'id': record['id']}):
+                raise ValueError(f"Record with ID {record['id']} already exists in {resource}")
+            conn.execute(
+                f'INSERT INTO "{resource}" (id, patient_id, doctor_id, date, data) VALUES (?, ?, ?, ?, ?)',
+                _row(resource, record)
+            )
+        return record
+
+    def insert_many(self, resource: str, records: List[Dict[str, Any]]) -> int:
+        """Bulk insert as-is, without the duplicate ID check (used by the migration)."""
+        with self.transaction() as conn:
+            conn.executemany(
+                f'INSERT INTO "{_check_resource(resource)}" (id, patient_id, doctor_id, date, data) '
+                f'VALUES (?, ?, ?, ?, ?)', [_row(resource, r) for r in records]
+            )
+        return len(records)
+
+    def replace(self, resource: str, match: Dict[str, Any], record: Dict[str, Any]) -> bool:
+        """Replace the first record matching all fields in `match`."""
+        with self.transaction() as conn:
+            seqs = self._seqs(conn, resource, match, limit=1)
+            if not seqs:
+                return False
+            conn.execute(
+                f'UPDATE "{resource}" SET id = ?, patient_id = ?, doctor_id = ?, date = ?, data = ? WHERE seq = ?',
+                (*_row(resource, record), seqs[0])
+            )
+        return True
+
+    def delete(self, resource: str, record_id: str) -> bool:
+        with self.transaction() as conn:
+            seqs = self._seqs(conn, resource, {'id': record_id})
+            conn.executemany(f'DELETE FROM "{resource}" WHERE seq = ?', [(seq,) for seq in seqs])
+        return bool(seqs)
+
+    def data_version(self) -> tuple:
+        """
+        Changes whenever the database may have changed: the mtime and size of
+        the database and its WAL file (other processes' commits), plus a count
+        of this process's commits.
+        """
+        wal = self.path.with_name(self.path.name + '-wal')
+        return self._commits, file_signature(self.path), file_signature(wal)
+
+    def clear(self, resource: str):
+        with self.transaction() as conn:
+            conn.execute(f'DELETE FROM "{_check_resource(resource)}"')
+
+    @contextlib.contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        One atomic write transaction (BEGIN IMMEDIATE takes the write lock
+        up front, so read-then-write sequences inside it can't interleave
+        with other writers). Nested calls join the outer transaction.
+        """
+        conn = self._connection()
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth = depth
+            if depth == 0:
+                conn.execute('ROLLBACK')
+            raise
+        self._local.depth = depth
+        if depth == 0:
+            conn.execute('COMMIT')
+            with self._commits_lock:
+                self._commits += 1
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), timeout=sqlite_timeout, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _select(self, resource: str, criteria: Dict[str, Any], limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        return [record for _, record in self._scan(self._connection(), resource, criteria, limit)]
+
+    def _seqs(self, conn: sqlite3.Connection, resource: str, criteria: Dict[str, Any],
+              limit: Optional[int] = None) -> List[int]:
+        return [seq for seq, _ in self._scan(conn, resource, criteria, limit)]
+
+    @staticmethod
+    def _scan(conn: sqlite3.Connection, resource: str, criteria: Dict[str, Any],
+              limit: Optional[int] = None) -> List[tuple]:
+        """
+        (seq, record) of the records matching all criteria, in insertion order.
+        The indexed columns hold text, so they only narrow the scan; every
+        criterion is then compared on the record with its original type, as
+        JSONStorage does (find(id=1) does not match an id of "1").
+        """
+        _check_resource(resource)
+        indexed = {field: value for field, value in criteria.items()
+                   if field in _INDEXED_COLUMNS and value is not None}
+        where = ' AND '.join(f'{field} = ?' for field in indexed) or '1'
+        matches = []
+        for seq, data in conn.execute(f'SELECT seq, data FROM "{resource}" WHERE {where} ORDER BY seq',
+                                      tuple(_text(v) for v in indexed.values())):
+            record = json.loads(data)
+            if _matches(record, criteria):
+                matches.append((seq, record))
+                if limit is not None and len(matches) >= limit:
+                    break
+        return matches
+
+
+def _create_table(conn: sqlite3.Connection, resource: str):
+    conn.execute(
+        f'CREATE TABLE IF NOT EXISTS "{resource}" ('
+        f'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+        f'id TEXT, patient_id TEXT, doctor_id TEXT, date TEXT, data TEXT NOT NULL)'
+    )
+    # Not UNIQUE: the JSON files have records without an id (observations)
+    # and some duplicated ids; insert() refuses new duplicates instead
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{resource}_id" ON "{resource}" (id)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{resource}_patient_date" ON "{resource}" (patient_id, date)')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS "{resource}_doctor_date" ON "{resource}" (doctor_id, date)')
+
+
+def _row(resource: str, record: Dict[str, Any]) -> tuple:
+    date = record.get(_DATE_FIELDS.get(resource, 'created_at'))
+    return (
+        _text(record.get('id')), _text(record.get('patient_id')), _text(record.get('doctor_id')),
+        _text(date), json.dumps(record, ensure_ascii=False)
+    )
+
+
+def _text(value: Any) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def migrate_json_to_sqlite(
+    source: Optional[Union[str, Path]] = None,
+    database: Optional[Union[str, Path]] = None,
+    replace: bool = False
+) -> Dict[str, int]:
+    """
+    Copy every resource file of a JSON ehr_store into a SQLite database.
+
+    Args:
+        source: The ehr_store directory (None = ehr_store/)
+        database: Database file (None = ehr.sqlite3 in source)
+        replace: Empty the tables first (otherwise a non-empty table is an error)
+
+    Returns:
+        dict: Records copied per resource
+
+    Raises:
+        ValueError: If a table already has records and replace is False
+            (nothing is written then)
+    """
+    json_storage = JSONStorage(source)
+    sqlite_storage = SQLiteStorage(database, base_path=json_storage.base_path)
+    counts = {}
+    with sqlite_storage.transaction():
+        for resource in fhir_resource_types:
+            records = json_storage._read(f"{resource}.json")
+            if replace:
+                sqlite_storage.clear(resource)
+            elif sqlite_storage.all(resource):
+                raise ValueError(f"{sqlite_storage.path} already has {resource} records; pass replace=True")
+            sqlite_storage.insert_many(resource, records)
+            counts[resource] = len(records)
+    sqlite_storage.close()
+    return counts
+
+
+_storages: Dict[tuple, Any] = {}
+_storages_lock = threading.Lock()
+
+
+def get_storage(base_path: Optional[Union[str, Path]] = None):
+    """
+    Get the configured storage backend for an ehr_store directory.
+
+    Args:
+        base_path: Base path to the ehr_store directory.
+                  If None, uses ehr_store directory.
+    """
+    path = Path(base_path) if base_path is not None else DEFAULT_BASE_PATH
+    key = (backend, path.resolve(), sqlite_path)
+    with _storages_lock:
+        if key not in _storages:
+            if backend == 'json':
+                _storages[key] = JSONStorage(path)
+            elif backend == 'sqlite':
+                _storages[key] = SQLiteStorage(sqlite_path, base_path=path)
+            else:
+                raise ValueError(f"Unknown EHR storage backend: {backend!r} (expected 'json' or 'sqlite')")
+        return _storages[key]
+
+
+def configure_storage(backend: Optional[str] = None, sqlite_path: Optional[Union[str, Path]] = None):
+    """
+    Select the storage backend for EHRLoader/EHRInserters created from now on,
+    e.g. configure_storage(backend="sqlite", sqlite_path="/var/lib/medgemma/ehr.sqlite3").
+    """
+    if backend is not None:
+        if backend not in ('json', 'sqlite'):
+            raise ValueError(f"Unknown EHR storage backend: {backend!r} (expected 'json' or 'sqlite')")
+        globals()['backend'] = backend
+    if sqlite_path is not None:
+        globals()['sqlite_path'] = str(sqlite_path)
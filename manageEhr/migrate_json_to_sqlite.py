@@ -0,0 +1,54 @@
+"""
+Copy the JSON ehr_store into a SQLite database for the "sqlite" storage
+backend (manageEhr.ehr_storage), then check that both hold the same records.
+
+Usage:
+    python manageEhr/migrate_json_to_sqlite.py [--source ehr_store/] [--database ehr_store/ehr.sqlite3] [--replace]
+
+Then select the backend at startup:
+    from manageEhr.ehr_storage import configure_storage
+    configure_storage(backend="sqlite", sqlite_path="ehr_store/ehr.sqlite3")
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from manageEhr.ehr_storage import JSONStorage, SQLiteStorage, migrate_json_to_sqlite
+from ehr_store.resourcetypes import fhir_resource_types
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", help="JSON ehr_store directory (default: ehr_store/)")
+    parser.add_argument("--database", help="SQLite file (default: ehr.sqlite3 in the source directory)")
+    parser.add_argument("--replace", action="store_true", help="empty the tables first")
+    args = parser.parse_args()
+
+    try:
+        counts = migrate_json_to_sqlite(args.source, args.database, replace=args.replace)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    json_storage = JSONStorage(args.source)
+    sqlite_storage = SQLiteStorage(args.database, base_path=json_storage.base_path)
+    mismatched = [
+        resource for resource in fhir_resource_types
+        if sqlite_storage.all(resource) != json_storage._read(f"{resource}.json")
+    ]
+
+    for resource, count in counts.items():
+        print(f"  {resource:<24}{count:>8} records")
+    print(f"{'❌' if mismatched else '✅'} Migrated {sum(counts.values())} records to {sqlite_storage.path}")
+    if mismatched:
+        print(f"   Records differ for: {', '.join(mismatched)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
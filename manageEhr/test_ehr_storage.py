@@ -0,0 +1,168 @@
+"""
+Tests for the EHR storage backends: JSON and SQLite behave the same,
+transactions roll back or commit as a whole, and the JSON store migrates.
+"""
+
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from ehr_store.resourcetypes import fhir_resource_types
+from manageEhr import ehr_storage
+from manageEhr.ehr_inserter import EHRInserter
+from manageEhr.ehr_storage import JSONStorage, SQLiteStorage, TRANSACTION_FILENAME, migrate_json_to_sqlite
+
+MEDICATIONS = [
+    {"id": "m1", "patient_id": "p1", "name": "metformin", "start_date": "2024-01-02"},
+    {"id": "m2", "patient_id": "p2", "name": "lisinopril", "start_date": "2023-05-06"},
+    {"id": "m3", "patient_id": "p1", "name": "atorvastatin", "start_date": "2022-07-08", "doctor_id": "d1"},
+]
+
+
+def _json_store(path: Path) -> Path:
+    path.mkdir(exist_ok=True)
+    for resource in fhir_resource_types:
+        (path / f"{resource}.json").write_text("[]")
+    (path / "medications.json").write_text(json.dumps(MEDICATIONS))
+    (path / "observations.json").write_text(json.dumps([{"patient_id": "p1", "observations": [{"code": "bp"}]}]))
+    return path
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage(request, tmp_path):
+    source = _json_store(tmp_path / "ehr_store")
+    if request.param == "json":
+        return JSONStorage(source)
+    migrate_json_to_sqlite(source, tmp_path / "ehr.sqlite3")
+    return SQLiteStorage(tmp_path / "ehr.sqlite3")
+
+
+def test_reads(storage):
+    assert storage.all("medications") == MEDICATIONS
+    assert storage.get("medications", "m2") == MEDICATIONS[1]
+    assert storage.get("medications", "nope") is None
+    assert storage.find("medications", patient_id="p1") == [MEDICATIONS[0], MEDICATIONS[2]]
+    assert storage.find("medications", patient_id="p1", doctor_id="d1") == [MEDICATIONS[2]]
+    assert storage.find("medications", name="lisinopril") == [MEDICATIONS[1]]
+    # Values keep their type: no match for a number against a string id
+    assert storage.find("medications", id=1) == []
+    with pytest.raises(ValueError):
+        storage.all("not_a_resource")
+
+
+def test_writes(storage):
+    storage.insert("medications", {"id": "m4", "patient_id": "p3", "name": "aspirin"})
+    with pytest.raises(ValueError):
+        storage.insert("medications", {"id": "m4", "patient_id": "p3", "name": "aspirin"})
+    assert storage.replace("medications", {"id": "m1"}, {"id": "m1", "patient_id": "p1", "name": "insulin"})
+    assert not storage.replace("medications", {"id": "nope"}, {"id": "nope"})
+    assert storage.delete("medications", "m2")
+    assert not storage.delete("medications", "m2")
+
+    assert [m["name"] for m in storage.all("medications")] == ["insulin", "atorvastatin", "aspirin"]
+
+
+def test_transaction_commits_together(storage):
+    with storage.transaction():
+        storage.insert("medications", {"id": "m4", "patient_id": "p1", "name": "aspirin"})
+        storage.insert("allergies", {"id": "a1", "patient_id": "p1", "substance": "latex"})
+        # Reads inside the transaction see its writes
+        assert storage.get("medications", "m4") is not None
+    assert storage.get("medications", "m4")["name"] == "aspirin"
+    assert storage.find("allergies", patient_id="p1")[0]["substance"] == "latex"
+
+
+def test_transaction_rolls_back_on_error(storage):
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.insert("medications", {"id": "m4", "patient_id": "p1", "name": "aspirin"})
+            with storage.transaction():           # nested: joins the outer one
+                storage.insert("allergies", {"id": "a1", "patient_id": "p1", "substance": "latex"})
+            raise RuntimeError("validation failed")
+
+    assert storage.get("medications", "m4") is None
+    assert storage.all("allergies") == []
+    # Still usable afterwards
+    storage.insert("allergies", {"id": "a1", "patient_id": "p1", "substance": "latex"})
+    assert len(storage.all("allergies")) == 1
+
+
+def test_inserter_transaction_rolls_back(tmp_path, monkeypatch):
+    source = _json_store(tmp_path / "ehr_store")
+    for backend in ("json", "sqlite"):
+        monkeypatch.setattr(ehr_storage, "backend", backend)
+        monkeypatch.setattr(ehr_storage, "sqlite_path", str(tmp_path / "ehr.sqlite3"))
+        inserter = EHRInserter(str(source))
+        with pytest.raises(ValueError):
+            with inserter.transaction():
+                inserter.insert_medication({"id": f"{backend}-1", "patient_id": "p1", "name": "aspirin"})
+                inserter.insert_medication({"id": f"{backend}-1", "patient_id": "p1", "name": "aspirin"})
+        assert inserter.storage.get("medications", f"{backend}-1") is None
+
+
+def test_interrupted_json_transaction_is_finished_on_open(tmp_path, monkeypatch):
+    source = _json_store(tmp_path / "ehr_store")
+    storage = JSONStorage(source)
+    saved = []
+    real_save = JSONStorage._save
+
+    def crash_after_first_file(self, filename, records):
+        if saved:
+            raise OSError("simulated crash")
+        saved.append(filename)
+        real_save(self, filename, records)
+
+    monkeypatch.setattr(JSONStorage, "_save", crash_after_first_file)
+    with pytest.raises(OSError):
+        with storage.transaction():
+            storage.insert("medications", {"id": "m4", "patient_id": "p1", "name": "aspirin"})
+            storage.insert("allergies", {"id": "a1", "patient_id": "p1", "substance": "latex"})
+    assert (source / TRANSACTION_FILENAME).exists()
+    monkeypatch.setattr(JSONStorage, "_save", real_save)
+
+    # A new process opening the store applies the rest of the transaction
+    reopened = JSONStorage(source)
+    assert not (source / TRANSACTION_FILENAME).exists()
+    assert reopened._read("medications.json")[-1]["id"] == "m4"
+    assert reopened._read("allergies.json") == [{"id": "a1", "patient_id": "p1", "substance": "latex"}]
+
+
+def test_single_file_transaction_needs_no_intent_file(tmp_path, monkeypatch):
+    source = _json_store(tmp_path / "ehr_store")
+    storage = JSONStorage(source)
+    intents = []
+    real_write = ehr_storage.write_file
+    monkeypatch.setattr(ehr_storage, "write_file",
+                        lambda path, data: (intents.append(Path(path).name), real_write(path, data))[1])
+    storage.insert("medications", {"id": "m4", "patient_id": "p1", "name": "aspirin"})
+    assert intents == ["medications.json"]
+
+
+def test_migration(tmp_path):
+    source = _json_store(tmp_path / "ehr_store")
+    database = tmp_path / "ehr.sqlite3"
+
+    counts = migrate_json_to_sqlite(source, database)
+    assert counts["medications"] == 3 and counts["observations"] == 1 and counts["patients"] == 0
+    sqlite = SQLiteStorage(database)
+    for resource in fhir_resource_types:
+        assert sqlite.all(resource) == JSONStorage(source)._read(f"{resource}.json")
+
+    # A second run refuses to duplicate the records, and writes nothing
+    with pytest.raises(ValueError):
+        migrate_json_to_sqlite(source, database)
+    assert len(sqlite.all("medications")) == 3
+
+    assert migrate_json_to_sqlite(source, database, replace=True)["medications"] == 3
+    assert len(sqlite.all("medications")) == 3
+
+
+def test_data_version_changes_on_write(storage):
+    before = storage.data_version()
+    assert storage.data_version() == before
+    storage.insert("allergies", {"id": "a1", "patient_id": "p1", "substance": "latex"})
+    assert storage.data_version() != before
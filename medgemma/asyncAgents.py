@@ -0,0 +1,101 @@
+"""
+Async wrappers for the synchronous agent functions.
+
+Every agent in agents/sAgents follows the same shape: build a prompt,
+create a MedGemmaClient, call respond()/chat(), post-process the reply.
+run_agent_async() drives such a sync function from an event loop without
+rewriting it, using the capture/replay approach of run_agents_batched():
+
+    1. Run the agent in a worker thread until its first model call, which
+       is captured instead of sent, and the agent is unwound.
+    2. Await the captured request on the asyncio transport. No thread is
+       held while the call is in flight.
+    3. Run the agent again. Calls that already have a result return it
+       immediately, the next new call is captured, and so on until the
+       agent returns.
+
+A worker thread is only busy while the agent builds a prompt or parses a
+reply (including any EHR file reads), so hundreds of agents can wait on
+the model at once with a handful of threads. Because the agent is re-run
+from the top once per model call, only wrap agents that are deterministic
+up to their model calls and have no side effects before their last call
+(the same agents that are safe for run_agents_batched()).
+
+Usage:
+    from medgemma.asyncAgents import async_agent, run_agent_async
+    from agents.sAgents.dietplanner.ehr_agent import ehrAgent
+
+    ehrAgentAsync = async_agent(ehrAgent)
+    summaries = await asyncio.gather(*[
+        ehrAgentAsync(pid, ehr, report) for pid, ehr, report in batch
+    ])
+"""
+
+import asyncio
+import functools
+from typing import Any, Callable
+
+from medgemma.batchAgents import _PendingCall, _Replay
+from medgemma.medgemmaClient import agent_replay
+from medgemma.responseCache import ResponseCache
+
+_UNSET = object()
+
+
+async def run_agent_async(agent: Callable, *args, **kwargs) -> Any:
+    """
+    Run a synchronous agent function with its model calls on the asyncio transport.
+
+    Args:
+        agent: Any agent function that talks to MedGemma via MedGemmaClient
+        *args, **kwargs: Passed through to the agent
+
+    Returns:
+        Whatever the agent returns
+    """
+    replay = _Replay()
+
+    while True:
+        result, pending = await asyncio.to_thread(_run_until_call, replay, agent, args, kwargs)
+        if pending is None:
+            return result
+        try:
+            replay.record(True, await _dispatch(pending))
+        except Exception as e:
+            replay.record(False, e)
+
+
+def async_agent(agent: Callable) -> Callable:
+    """Wrap a sync agent function as a coroutine function."""
+
+    @functools.wraps(agent)
+    async def wrapper(*args, **kwargs):
+        return await run_agent_async(agent, *args, **kwargs)
+
+    return wrapper
+
+
+def _run_until_call(replay: _Replay, agent: Callable, args: tuple, kwargs: dict):
+    """(agent's result, None) if it returned, else (_UNSET, its next uncaptured call)."""
+    replay.rewind()
+    token = agent_replay.set(replay)
+    try:
+        return agent(*args, **kwargs), None
+    except _PendingCall as call:
+        return _UNSET, call
+    finally:
+        agent_replay.reset(token)
+
+
+async def _dispatch(pending: _PendingCall) -> Any:
+    """Send a captured call; identical /respond calls from concurrent agents share one request."""
+    client = pending.client
+
+    def send():
+        return client._send_async(pending.endpoint, pending.payload, pending.files, pending.timeout)
+
+    if pending.endpoint != "/respond":
+        return await send()
+
+    key = ResponseCache.make_key(pending.endpoint, pending.payload, pending.files)
+    return await client._coalesce_async(key, send)
@@ -0,0 +1,139 @@
+"""
+Run several independent sync agents with their model calls batched.
+
+Pipeline stages often call a handful of agents back to back that do not
+depend on each other (daily/weekly/monthly log summaries, the memory
+profiles, the medicine safety checks). run_agents_batched() runs them
+together by capturing and replaying their model calls:
+
+    1. Run every agent until its next model call, which is captured.
+    2. Send all captured /respond calls in one /respond_batch round trip
+       (concurrent single calls if the server has no batch endpoint).
+    3. Re-run the agents with the results, repeating until all return.
+
+An agent is re-run from the top once per model call, so only batch agents
+that build a prompt, make one or two calls and have no side effects before
+their last call (the log summaries and medicine checks above).
+
+Usage:
+    from medgemma.batchAgents import run_agents_batched
+
+    daily, weekly, monthly = run_agents_batched([
+        (dailylogsAgent, (patient_id, context, logs)),
+        (weeklylogsAgent, (patient_id, context, weekly_logs)),
+        (monthlylogsAgent, (patient_id, context, monthly_logs)),
+    ])
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from medgemma.medgemmaClient import MedGemmaClient, _send_batch, agent_replay
+
+_UNSET = object()
+
+
+class _PendingCall(BaseException):
+    """
+    Raised inside a sync agent to hand its next model call to run_agents_batched().
+    Derives from BaseException so agents' `except Exception` blocks let it through.
+    """
+
+    def __init__(self, client: MedGemmaClient, endpoint: str, payload: Dict[str, str],
+                 files: Optional[List[Tuple]], timeout: Optional[float]):
+        super().__init__(endpoint)
+        self.client = client
+        self.endpoint = endpoint
+        self.payload = payload
+        self.files = files
+        self.timeout = timeout
+
+
+class _Replay:
+    """Results of the model calls an agent has made so far, in call order."""
+
+    def __init__(self):
+        self._results: List[Tuple[bool, Any]] = []
+        self._index = 0
+
+    def rewind(self):
+        self._index = 0
+
+    def has_result(self) -> bool:
+        """Whether the next model call already has a recorded result."""
+        return self._index < len(self._results)
+
+    def record(self, ok: bool, value: Any):
+        self._results.append((ok, value))
+
+    def resolve(self, client, endpoint, payload, files, timeout) -> Dict[str, Any]:
+        if self._index < len(self._results):
+            ok, value = self._results[self._index]
+            self._index += 1
+            if ok:
+                return value
+            raise value
+        raise _PendingCall(client, endpoint, payload, files, timeout)
+
+
+def run_agents_batched(
+    calls: Sequence[Tuple[Callable, tuple]],
+    return_exceptions: bool = False
+) -> List[Any]:
+    """
+    Args:
+        calls: (agent, args) pairs, or (agent, args, kwargs)
+        return_exceptions: Return an agent's exception in its slot instead
+            of raising it (the other agents still complete)
+
+    Returns:
+        Each agent's return value, in order
+    """
+    replays = [_Replay() for _ in calls]
+    results: List[Any] = [_UNSET] * len(calls)
+
+    while True:
+        pending = []
+        for i, call in enumerate(calls):
+            if results[i] is not _UNSET:
+                continue
+            agent, args, kwargs = call if len(call) == 3 else (*call, {})
+
+            replays[i].rewind()
+            token = agent_replay.set(replays[i])
+            try:
+                results[i] = agent(*args, **kwargs)
+            except _PendingCall as pending_call:
+                pending.append((i, pending_call))
+            except Exception as e:
+                if not return_exceptions:
+                    raise
+                results[i] = e
+            finally:
+                agent_replay.reset(token)
+
+        if not pending:
+            return results
+
+        _dispatch(replays, pending)
+
+
+def _dispatch(replays: List[_Replay], pending: List[Tuple[int, _PendingCall]]):
+    """Send one round of captured calls and record their results."""
+    batched = [(i, c) for i, c in pending if c.endpoint == "/respond"]
+    others = [(i, c) for i, c in pending if c.endpoint != "/respond"]
+
+    if batched:
+        timeout = max((c.timeout for _, c in batched if c.timeout is not None), default=None)
+        try:
+            sent = _send_batch([(c.client, c.payload, c.files) for _, c in batched], timeout)
+        except RuntimeError as e:
+            sent = [e] * len(batched)
+        for (i, _), result in zip(batched, sent):
+            replays[i].record(not isinstance(result, Exception), result)
+
+    # /chat is stateful per conversation; send those one by one
+    for i, c in others:
+        try:
+            replays[i].record(True, c.client._send_direct(c.endpoint, c.payload, c.files, c.timeout))
+        except RuntimeError as e:
+            replays[i].record(False, e)
@@ -0,0 +1,113 @@
+"""
+Benchmark: tail latency with and without hedged requests.
+
+Starts several stand-in replicas where a small share of requests hits a
+latency spike, then runs firstAidPipeline-shaped workloads (8 sequential
+/respond calls) with hedging off and on.
+
+Usage:
+    python medgemma/bench_hedging.py [--pipelines 100] [--replicas 3]
+        [--spike-probability 0.03] [--spike-latency 0.5] [--budget 0.05]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from medgemma import medgemmaClient
+from medgemma.medgemmaClient import (
+    MedGemmaClient, configure_hedging, configure_replicas, get_hedging_stats
+)
+from medgemma.standin_server import StandInServer
+
+CALLS_PER_PIPELINE = 8
+
+
+def _pipeline(_) -> list:
+    """8 sequential stateless calls, like firstAidPipeline."""
+    run_id = uuid.uuid4().hex  # unique prompts: no cache or coalescing effects
+    latencies = []
+    for step in range(CALLS_PER_PIPELINE):
+        start = time.perf_counter()
+        MedGemmaClient("You are a first aid assistant.").respond(f"{run_id} step {step}")
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _quantile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] * 1000
+
+
+def _run(label: str, pipelines: int, threads: int) -> dict:
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        runs = list(pool.map(_pipeline, range(pipelines)))
+    calls = [latency for run in runs for latency in run]
+    totals = [sum(run) for run in runs]
+    return {
+        "label": label,
+        "call_p50": _quantile(calls, 0.50),
+        "call_p99": _quantile(calls, 0.99),
+        "pipe_p50": _quantile(totals, 0.50),
+        "pipe_p99": _quantile(totals, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pipelines", type=int, default=100)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--replicas", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--spike-probability", type=float, default=0.03)
+    parser.add_argument("--spike-latency", type=float, default=0.5)
+    parser.add_argument("--budget", type=float, default=0.05)
+    args = parser.parse_args()
+
+    servers = [
+        StandInServer(
+            latency=args.latency,
+            spike_probability=args.spike_probability,
+            spike_latency=args.spike_latency
+        ).start()
+        for _ in range(args.replicas)
+    ]
+    configure_replicas([s.url for s in servers], health_interval=None)
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            configure_hedging(enabled=False)
+            baseline = _run("no hedging", args.pipelines, args.threads)
+
+            # Delay = each replica's observed p95, learned during the first run
+            configure_hedging(enabled=True, budget=args.budget)
+            hedged = _run(f"hedging ({args.budget:.0%} budget)", args.pipelines, args.threads)
+            stats = get_hedging_stats()
+    finally:
+        configure_hedging(enabled=False)
+        configure_replicas(None)
+        for server in servers:
+            server.stop()
+
+    print(f"\n{args.pipelines} pipelines x {CALLS_PER_PIPELINE} calls, {args.replicas} replicas, "
+          f"{args.latency * 1000:.0f} ms base latency, "
+          f"{args.spike_probability:.0%} of requests +{args.spike_latency * 1000:.0f} ms\n")
+    print(f"{'mode':<24}{'call p50':>10}{'call p99':>10}{'pipe p50':>10}{'pipe p99':>10}   (ms)")
+    for r in (baseline, hedged):
+        print(f"{r['label']:<24}{r['call_p50']:>10.1f}{r['call_p99']:>10.1f}"
+              f"{r['pipe_p50']:>10.1f}{r['pipe_p99']:>10.1f}")
+    print(f"\nhedges sent: {stats['hedges']} of {stats['calls']} calls ({stats['hedge_rate']:.1%}), "
+          f"won: {stats['hedge_wins']}, denied by budget: {stats['denied']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: upload size and latency of image calls with and without
+pre-processing (medgemma.imagePrep).
+
+"before" is the old document_analyzer path: base64-encode the upload,
+decode it again in imagesHandler, and send the original bytes.
+"after" prepares the image once and sends the downsampled raw bytes.
+
+Runs against a local stand-in server, so the measured round trip is
+loopback only; the upload time at a real uplink speed is estimated from
+the byte counts.
+
+Pass your own X-rays as paths, otherwise synthetic samples are used
+(a 16-bit CR chest film, a phone photo of a film, an RGBA screenshot).
+
+Usage:
+    python medgemma/bench_images.py [image ...] [--calls 10] [--uplink-mbps 20]
+"""
+
+import argparse
+import base64
+import contextlib
+import io
+import os
+import sys
+import time
+import uuid
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+import numpy as np
+from PIL import Image
+
+from medgemma import medgemmaClient
+from medgemma.imagePrep import prepare_image
+from medgemma.medgemmaClient import MedGemmaClient
+from medgemma.standin_server import StandInServer
+
+
+def _film(width: int, height: int, seed: int) -> np.ndarray:
+    """Smooth chest-film-like intensity field in [0, 1] with grain."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    cx, cy = width / 2, height / 2
+    lungs = sum(
+        np.exp(-(((x - cx + side * width * 0.18) / (width * 0.14)) ** 2
+                 + ((y - cy) / (height * 0.3)) ** 2))
+        for side in (-1, 1)
+    )
+    body = np.exp(-(((x - cx) / (width * 0.42)) ** 2 + ((y - cy) / (height * 0.55)) ** 2))
+    ribs = 0.08 * (np.sin(y / height * 60) > 0.6) * body
+    field = 0.15 + 0.7 * body - 0.45 * lungs + ribs
+    field += rng.normal(0, 0.02, field.shape).astype(np.float32)
+    return np.clip(field, 0, 1)
+
+
+def _samples() -> list:
+    """(name, encoded bytes) pairs of synthetic X-ray-like uploads."""
+    samples = []
+
+    cr = (_film(3000, 2500, seed=1) * 4095).astype(np.uint16)   # 12-bit detector
+    buf = io.BytesIO()
+    Image.fromarray(cr).save(buf, format="PNG")
+    samples.append(("cr_chest_16bit.png", buf.getvalue()))
+
+    photo = (_film(4032, 3024, seed=2) * 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(photo).convert("RGB").save(buf, format="JPEG", quality=95)
+    samples.append(("phone_photo_of_film.jpg", buf.getvalue()))
+
+    shot = (_film(2000, 1600, seed=3) * 255).astype(np.uint8)
+    buf = io.BytesIO()
+    Image.fromarray(shot).convert("RGBA").save(buf, format="PNG")
+    samples.append(("viewer_screenshot.png", buf.getvalue()))
+
+    return samples
+
+
+def _before(data: bytes) -> float:
+    """Old path: base64 round trip, original bytes uploaded."""
+    start = time.perf_counter()
+    encoded = base64.b64encode(data).decode("utf-8")   # document_analyzer
+    decoded = base64.b64decode(encoded)                # imagesHandler
+    MedGemmaClient("You are a radiologist.").respond(f"{uuid.uuid4().hex} describe", image_object=decoded)
+    return time.perf_counter() - start
+
+
+def _after(data: bytes) -> float:
+    """New path: prepare once, raw bytes uploaded."""
+    start = time.perf_counter()
+    prepared = prepare_image(data)
+    MedGemmaClient("You are a radiologist.").respond(f"{uuid.uuid4().hex} describe", image_object=prepared)
+    return time.perf_counter() - start
+
+
+def _median_ms(fn, data: bytes, calls: int) -> float:
+    times = sorted(fn(data) for _ in range(calls))
+    return times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("images", nargs="*", help="image files (default: synthetic samples)")
+    parser.add_argument("--calls", type=int, default=10)
+    parser.add_argument("--uplink-mbps", type=float, default=20.0)
+    args = parser.parse_args()
+
+    if args.images:
+        samples = [(os.path.basename(p), Path(p).read_bytes()) for p in args.images]
+    else:
+        samples = _samples()
+
+    server = StandInServer().start()
+    medgemmaClient.base_url = server.url
+    rows = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, data in samples:
+                prepared = prepare_image(data)
+
+                medgemmaClient.preprocess_images = False
+                before_ms = _median_ms(_before, data, args.calls)
+                medgemmaClient.preprocess_images = True
+                after_ms = _median_ms(_after, data, args.calls)
+
+                rows.append((name, prepared, len(data), len(prepared.data), before_ms, after_ms))
+    finally:
+        medgemmaClient.preprocess_images = True
+        server.stop()
+
+    bytes_per_ms = args.uplink_mbps * 1e6 / 8 / 1000
+    print(f"\nmedian of {args.calls} calls per image, loopback stand-in server; "
+          f"upload estimated at {args.uplink_mbps:g} Mbit/s\n")
+    print(f"{'image':<26}{'before':>16}{'after':>16}{'bytes':>8}"
+          f"{'loopback ms':>16}{'upload ms':>18}")
+    for name, prepared, before_bytes, after_bytes, before_ms, after_ms in rows:
+        before_dims = f"{prepared.original_size[0]}x{prepared.original_size[1]}"
+        print(f"{name:<26}{before_dims + ' ' + str(before_bytes // 1024) + 'K':>16}"
+              f"{prepared.dimensions + ' ' + str(after_bytes // 1024) + 'K':>16}"
+              f"{1 - after_bytes / before_bytes:>8.0%}"
+              f"{before_ms:>8.1f} →{after_ms:>6.1f}"
+              f"{before_bytes / bytes_per_ms:>9.0f} →{after_bytes / bytes_per_ms:>7.0f}")
+
+
+if __name__ == "__main__":
+    main()
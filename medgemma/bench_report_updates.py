@@ -0,0 +1,121 @@
+"""
+Benchmark: prompt bytes and wall time of the interview report updates,
+full (every turn sends the EHR summary and the whole interview) versus
+incremental (the current report plus the messages since the last update,
+with a full consolidation every `consolidate_every` user turns).
+
+Replays a synthetic interview through the orchestrator's report update,
+one update per turn, against a local stand-in server whose prefill time
+grows with the request size (`--prefill-ms-per-kb`), so the wall time
+reflects prompt length the way a real model server's does.
+
+Usage:
+    python medgemma/bench_report_updates.py [--turns 20] [--consolidate-every 5]
+        [--latency 0.05] [--prefill-ms-per-kb 4]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from medgemma import medgemmaClient
+from medgemma.responseCache import configure_response_cache
+from medgemma.standin_server import StandInServer
+from orchestrations import unified_chat_orchestrator
+from agents.sAgents.differentialdiagnosis import reportUpdater
+
+_PATIENT_ID = "bench-patient"
+
+_EHR_SUMMARY = "\n".join(
+    ["**Demographics:** 58-year-old male, ex-smoker (30 pack-years, quit 2015)."]
+    + [f"- {year}: {entry}" for year in range(2008, 2025) for entry in (
+        "Annual review; BP 142/88, HbA1c 6.9%, LDL 3.1 mmol/L, eGFR 78.",
+        "Metformin 1 g BD, ramipril 5 mg OD, atorvastatin 40 mg ON continued.",
+    )]
+)
+
+_REPORT = "\n".join(
+    ["### Chief Complaint", "Chest tightness on exertion for 3 weeks.", "",
+     "### History of Present Illness"]
+    + [f"- Detail {i}: onset, character, radiation and relieving factors as reported." for i in range(12)]
+    + ["", "### Relevant Past Medical History", "Type 2 diabetes, hypertension, dyslipidaemia.", "",
+       "### Current Medications", "Metformin, ramipril, atorvastatin."]
+)
+
+_QUESTIONS = [
+    "When did the tightness start, and what were you doing?",
+    "Does it spread anywhere, like your arm, jaw or back?",
+    "How long does each episode last, and what makes it go away?",
+    "Have you had any shortness of breath, sweating or nausea with it?",
+    "Has it ever come on at rest or woken you at night?",
+]
+
+
+def _answer(turn: int) -> str:
+    return (f"(turn {turn}) It started about three weeks ago when I was walking uphill to work. "
+            f"It feels like a band across my chest and eases after a few minutes of rest.")
+
+
+def _replay(turns: int, incremental: bool, consolidate_every: int) -> float:
+    """One report update per turn of a synthetic interview; returns seconds."""
+    reportUpdater.incremental_updates = incremental
+    reportUpdater.consolidate_every = consolidate_every
+    session = {
+        'patient_id': _PATIENT_ID, 'conversation_history': [], 'current_report': None,
+        'report_history_covered': 0, 'report_consolidated_through': 0,
+    }
+    start = time.perf_counter()
+    for turn in range(1, turns + 1):
+        session['conversation_history'].append(('assistant', _QUESTIONS[turn % len(_QUESTIONS)]))
+        session['conversation_history'].append(('user', _answer(turn)))
+        session.update(unified_chat_orchestrator._initial_interview_report_update(session))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--consolidate-every", type=int, default=reportUpdater.consolidate_every)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds to first token")
+    parser.add_argument("--prefill-ms-per-kb", type=float, default=4.0)
+    args = parser.parse_args()
+
+    # The EHR summary is generated once per patient and cached; seed the
+    # cache the report updater reads so no EHR is needed
+    sys.modules[reportUpdater.get_ehr_summary.__module__].ehr_summary_cache[_PATIENT_ID] = _EHR_SUMMARY
+    configure_response_cache(enabled=False)
+
+    server = StandInServer(latency=args.latency, prefill_per_kb=args.prefill_ms_per_kb / 1000,
+                           reply_text=_REPORT).start()
+    medgemmaClient.base_url = server.url
+    rows = []
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name, incremental in (("full", False), (f"incremental (K={args.consolidate_every})", True)):
+                server.reset_stats()
+                seconds = _replay(args.turns, incremental, args.consolidate_every)
+                stats = server.stats
+                rows.append((name, stats["requests"], stats["bytes_received"], seconds))
+    finally:
+        reportUpdater.incremental_updates = True
+        server.stop()
+
+    print(f"\n{args.turns}-turn interview, one report update per turn; stand-in server with "
+          f"{args.latency * 1000:g} ms prefill + {args.prefill_ms_per_kb:g} ms per KB of request\n")
+    print(f"{'mode':<22}{'calls':>7}{'prompt KB':>12}{'KB / call':>12}{'wall s':>9}")
+    for name, requests, sent, seconds in rows:
+        print(f"{name:<22}{requests:>7}{sent / 1024:>12.1f}{sent / 1024 / max(requests, 1):>12.1f}{seconds:>9.2f}")
+    full, incremental = rows
+    print(f"\nincremental sends {1 - incremental[2] / full[2]:.0%} fewer bytes "
+          f"in {1 - incremental[3] / full[3]:.0%} less time")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark: per-call overhead of bare requests.post vs the pooled transport.
+
+Runs a local stand-in server with zero model latency, so every millisecond
+measured is client/transport overhead (TCP handshake, session setup, etc).
+
+Usage:
+    python medgemma/bench_transport.py [--calls 500] [--threads 8]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+import requests
+
+from medgemma import medgemmaClient
+from medgemma.medgemmaClient import MedGemmaClient, configure_transport
+from medgemma.standin_server import StandInServer
+
+
+def _bare_call(url: str, messages: str):
+    # What MedGemmaClient.respond did before the shared transport
+    response = requests.post(f"{url}/respond", data={"messages": messages}, timeout=30)
+    response.json()
+
+
+def _client_call(_url: str, _messages: str):
+    MedGemmaClient("You are a medical assistant.").respond("Hello MedGemma")
+
+
+def _run(label: str, server: StandInServer, call, calls: int, threads: int) -> dict:
+    messages = json.dumps([
+        {"role": "system", "content": [{"type": "text", "text": "You are a medical assistant."}]},
+        {"role": "user", "content": [{"type": "text", "text": "Hello MedGemma"}]},
+    ])
+    latencies = []
+
+    def timed(_):
+        start = time.perf_counter()
+        call(server.url, messages)
+        latencies.append(time.perf_counter() - start)
+
+    server.reset_stats()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(timed, range(calls)))
+    wall = time.perf_counter() - start
+
+    stats = server.stats
+    latencies.sort()
+    return {
+        "label": label,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "calls_per_s": calls / wall,
+        "connections": stats["connections"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    server = StandInServer().start()
+    medgemmaClient.base_url = server.url
+    # Every call is identical; measure the transport, not request coalescing
+    medgemmaClient.coalesce_requests = False
+    configure_transport(pool_maxsize=args.threads)
+    try:
+        # Client output is noisy; the benchmark prints its own table
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [
+                _run("bare requests.post", server, _bare_call, args.calls, args.threads),
+                _run("pooled transport", server, _client_call, args.calls, args.threads),
+            ]
+    finally:
+        server.stop()
+
+    print(f"\n{args.calls} calls, {args.threads} threads, zero server latency\n")
+    print(f"{'mode':<22}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'calls/s':>10}{'TCP conns':>11}")
+    for r in results:
+        print(f"{r['label']:<22}{r['mean_ms']:>10.2f}{r['p50_ms']:>10.2f}"
+              f"{r['p99_ms']:>10.2f}{r['calls_per_s']:>10.0f}{r['connections']:>11}")
+
+
+if __name__ == "__main__":
+    main()
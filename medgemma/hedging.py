@@ -0,0 +1,146 @@
+"""
+Hedged requests for idempotent model calls.
+
+A stateless /respond call that has not answered after `delay` seconds
+(by default the replica's observed p95) is sent again to a different
+replica. Whichever answers first wins and the other is cancelled, which
+closes its connection.
+
+Hedges are budgeted with a token bucket: every primary call earns `ratio`
+tokens (capped at `burst`) and a hedge costs one, so hedges never exceed
+`ratio` of the traffic.
+
+Used by MedGemmaClient when hedging is enabled:
+
+    from medgemma.medgemmaClient import configure_hedging, configure_replicas
+
+    configure_replicas(["http://gpu-1:8000", "http://gpu-2:8000"])
+    configure_hedging(enabled=True, budget=0.05)
+"""
+
+import asyncio
+import concurrent.futures
+import contextvars
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Defaults
+budget_ratio = 0.05     # max share of calls that may be hedged
+budget_burst = 10.0     # max hedges that can be saved up
+min_delay = 0.05        # never hedge sooner than this (seconds)
+
+
+class HedgeBudget:
+    """Token bucket limiting hedges to a share of primary calls."""
+
+    def __init__(self, ratio: float = budget_ratio, burst: float = budget_burst):
+        self.ratio = ratio
+        self.burst = burst
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "hedges": 0, "hedge_wins": 0, "denied": 0}
+
+    def on_call(self):
+        with self._lock:
+            self._counters["calls"] += 1
+            self._tokens = min(self.burst, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            # Tolerance: ten calls at ratio 0.1 add up to 0.9999..., not 1
+            if self._tokens >= 1.0 - 1e-9:
+                self._tokens = max(0.0, self._tokens - 1.0)
+                self._counters["hedges"] += 1
+                return True
+            self._counters["denied"] += 1
+            return False
+
+    def on_hedge_win(self):
+        with self._lock:
+            self._counters["hedge_wins"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._counters["calls"]
+            return {
+                **self._counters,
+                "hedge_rate": round(self._counters["hedges"] / calls, 4) if calls else 0.0,
+            }
+
+
+async def race(
+    attempt: Callable[[], Awaitable[Any]],
+    get_delay: Callable[[], Optional[float]],
+    budget: HedgeBudget
+) -> Any:
+    """
+    Run attempt(); if it is still pending after get_delay() seconds and the
+    budget allows, run a second attempt() and return the first success.
+
+    get_delay() is called once the first attempt has started, so it can
+    look at which replica that attempt went to. None means "do not hedge".
+    """
+    budget.on_call()
+    primary = asyncio.ensure_future(attempt())
+    await asyncio.sleep(0)  # let the primary pick its replica
+
+    delay = get_delay()
+    if delay is None:
+        return await primary
+
+    done, _ = await asyncio.wait({primary}, timeout=max(delay, min_delay))
+    if done or not budget.try_spend():
+        return await primary
+
+    hedge = asyncio.ensure_future(attempt())
+    pending = {primary, hedge}
+    first_error: Optional[BaseException] = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is hedge:
+                        budget.on_hedge_win()
+                    return task.result()
+                first_error = first_error or task.exception()
+        raise first_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+# Event loop used to hedge calls made from synchronous code
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def run_sync(coro) -> Any:
+    """
+    Run a coroutine on the background hedging loop and wait for its result.
+    The coroutine runs in a copy of the caller's context, so context
+    variables such as the request deadline are visible to it.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="medgemma-hedging", daemon=True).start()
+    loop = _loop
+    context = contextvars.copy_context()
+    result: concurrent.futures.Future = concurrent.futures.Future()
+
+    def copy_outcome(task: asyncio.Task):
+        if task.cancelled():
+            result.cancel()
+        elif task.exception() is not None:
+            result.set_exception(task.exception())
+        else:
+            result.set_result(task.result())
+
+    def start():
+        task = context.run(loop.create_task, coro)
+        task.add_done_callback(copy_outcome)
+
+    loop.call_soon_threadsafe(start)
+    return result.result()
@@ -0,0 +1,212 @@
+"""
+Image pre-processing before upload to the model server.
+
+The model only sees images at its vision encoder's input resolution
+(896x896 for MedGemma), so uploading a 10 MB photo or a 3000x3000 X-ray
+just costs upload time and server-side decoding. prepare_image():
+
+    1. Decodes the image once (JPEGs are decoded at reduced size directly).
+    2. Applies the EXIF orientation.
+    3. Normalizes the color mode: grayscale becomes 8-bit grayscale
+       (X-rays, including 16-bit ones, which are windowed to their full
+       range, and RGB photos of films), everything else becomes RGB
+       (alpha flattened onto white).
+    4. Downsamples so the longest side is at most `max_side`.
+    5. Re-encodes as `image_format` at `quality`.
+
+If the original already fits and is smaller than the re-encoded result,
+the original bytes are kept so nothing is re-compressed for no gain.
+
+The result is a PreparedImage holding raw bytes; pass it (or bytes, a PIL
+image or a path) as `image_object` to MedGemmaClient.respond()/chat().
+
+Usage:
+    from medgemma.imagePrep import prepare_image
+
+    prepared = prepare_image(upload_bytes)
+    client.respond("Describe this X-ray", image_object=prepared)
+"""
+
+import io
+import os
+from typing import Optional, Tuple, Union
+
+from PIL import Image, ImageChops, ImageOps
+
+# Defaults (the MedGemma vision encoder works on 896x896 inputs)
+max_side = 896
+image_format = "JPEG"   # "JPEG", "PNG" or "WEBP"
+quality = 90            # JPEG/WEBP quality
+gray_tolerance = 12     # max channel difference for an RGB image to be sent as grayscale
+
+_CONTENT_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp"}
+_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+_8BIT_MODES = {"1", "L", "LA", "P", "RGB", "RGBA"}
+
+
+class PreparedImage:
+    """An image ready to upload: encoded bytes plus what was done to it."""
+
+    __slots__ = ("data", "format", "size", "mode", "original_format", "original_size", "original_bytes")
+
+    def __init__(self, data: bytes, format: str, size: Tuple[int, int], mode: str,
+                 original_format: Optional[str], original_size: Tuple[int, int], original_bytes: int):
+        self.data = data
+        self.format = format
+        self.size = size
+        self.mode = mode
+        self.original_format = original_format
+        self.original_size = original_size
+        self.original_bytes = original_bytes
+
+    @property
+    def content_type(self) -> str:
+        return _CONTENT_TYPES.get(self.format, "application/octet-stream")
+
+    @property
+    def filename(self) -> str:
+        return f"image.{_EXTENSIONS.get(self.format, 'bin')}"
+
+    @property
+    def dimensions(self) -> str:
+        return f"{self.size[0]}x{self.size[1]}"
+
+    def __repr__(self):
+        return (f"PreparedImage({self.original_format} {self.original_size[0]}x{self.original_size[1]} "
+                f"{self.original_bytes} B -> {self.format} {self.dimensions} {len(self.data)} B)")
+
+
+def prepare_image(
+    image: Union[bytes, bytearray, str, Image.Image, PreparedImage],
+    max_side: Optional[int] = None,
+    image_format: Optional[str] = None,
+    quality: Optional[int] = None
+) -> PreparedImage:
+    """
+    Downsample, color-normalize and re-encode an image for upload.
+
+    Args:
+        image: Encoded image bytes, a file path, a PIL image, or an
+            already prepared image (returned as-is)
+        max_side: Longest side in pixels (None = module default, 0 = no limit)
+        image_format: Output format (None = module default)
+        quality: JPEG/WEBP quality (None = module default)
+
+    Returns:
+        PreparedImage
+
+    Raises:
+        ValueError: If the data is not a readable image
+    """
+    if isinstance(image, PreparedImage):
+        return image
+
+    max_side = globals()["max_side"] if max_side is None else max_side
+    image_format = (image_format or globals()["image_format"]).upper()
+    quality = globals()["quality"] if quality is None else quality
+
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            raw = f.read()
+    elif isinstance(image, (bytes, bytearray)):
+        raw = bytes(image)
+    elif isinstance(image, Image.Image):
+        raw = None
+    else:
+        raise TypeError(f"Unsupported image type: {type(image)}. Expected bytes, path, PIL.Image or PreparedImage.")
+
+    try:
+        img = Image.open(io.BytesIO(raw)) if raw is not None else image
+        original_format = img.format
+        original_size = img.size
+        original_mode = img.mode
+        if raw is not None and max_side:
+            # JPEG: let the decoder scale by 1/2, 1/4 or 1/8 on the way in
+            img.draft(img.mode, (max_side, max_side))
+        img = ImageOps.exif_transpose(img)
+        img = _normalize_mode(img)
+    except (OSError, SyntaxError) as e:
+        raise ValueError(f"Not a readable image: {e}") from e
+
+    resized = bool(max_side) and max(img.size) > max_side
+    if resized:
+        # Bicubic is plenty: the model's processor resamples again anyway
+        img.thumbnail((max_side, max_side), Image.BICUBIC)
+
+    if img.mode == "RGB" and _is_gray(img):
+        img = img.convert("L")
+
+    out = io.BytesIO()
+    if image_format == "PNG":
+        img.save(out, format="PNG", optimize=True)
+    else:
+        img.save(out, format=image_format, quality=quality, optimize=True)
+    data = out.getvalue()
+
+    # Already small enough in a format the server takes: don't re-compress
+    if (raw is not None and not resized and img.size == original_size and len(raw) <= len(data)
+            and original_format in _CONTENT_TYPES and original_mode in _8BIT_MODES):
+        return PreparedImage(raw, original_format, original_size, original_mode,
+                             original_format, original_size, len(raw))
+
+    return PreparedImage(data, image_format, img.size, img.mode,
+                         original_format, original_size, len(raw) if raw is not None else len(data))
+
+
+def _normalize_mode(img: Image.Image) -> Image.Image:
+    """8-bit grayscale for grayscale images, RGB for everything else."""
+    if img.mode in ("L", "RGB"):
+        return img
+
+    if img.mode in ("I;16", "I;16B", "I;16L", "I", "F"):
+        # High bit depth (typical for X-rays): stretch the used range to 8 bits
+        img = img.convert("F")
+        low, high = img.getextrema()
+        scale = 255.0 / (high - low) if high > low else 0.0
+        return img.point(lambda v: (v - low) * scale).convert("L")
+
+    if img.mode == "1":
+        return img.convert("L")
+
+    if img.mode == "LA" or (img.mode == "P" and _is_gray_palette(img)):
+        return _flatten_alpha(img.convert("LA"))
+
+    if img.mode in ("RGBA", "PA", "P") or "transparency" in img.info:
+        return _flatten_alpha(img.convert("RGBA"))
+
+    return img.convert("RGB")
+
+
+def _flatten_alpha(img: Image.Image) -> Image.Image:
+    """Composite an image with alpha onto white."""
+    mode = "L" if img.mode == "LA" else "RGB"
+    background = Image.new(mode, img.size, 255 if mode == "L" else (255, 255, 255))
+    background.paste(img.convert(mode), mask=img.getchannel("A"))
+    return background
+
+
+def _is_gray(img: Image.Image) -> bool:
+    """Whether an RGB image is grayscale (e.g. a photo or scan of a film)."""
+    r, g, b = img.split()
+    return (ImageChops.difference(r, g).getextrema()[1] <= gray_tolerance
+            and ImageChops.difference(g, b).getextrema()[1] <= gray_tolerance)
+
+
+def _is_gray_palette(img: Image.Image) -> bool:
+    palette = img.getpalette() or []
+    return all(palette[i] == palette[i + 1] == palette[i + 2] for i in range(0, len(palette) - 2, 3))
+
+
+def describe(image: PreparedImage) -> str:
+    """One-line summary for logs."""
+    saved = 1 - len(image.data) / image.original_bytes if image.original_bytes else 0
+    return (f"{image.original_size[0]}x{image.original_size[1]} {image.original_format} "
+            f"({image.original_bytes / 1024:.0f} KB) → {image.dimensions} {image.format} "
+            f"({len(image.data) / 1024:.0f} KB, {saved:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    for path in sys.argv[1:]:
+        print(f"{os.path.basename(path)}: {describe(prepare_image(path))}")
@@ -1,10 +1,35 @@
 import requests
+from requests.adapters import HTTPAdapter
+import asyncio
+import contextlib
+import contextvars
+import copy
 import json
 import os
 import io
-from typing import Optional, Dict, Any, List, Tuple, Union, TYPE_CHECKING
+import sys
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Iterator, List, Tuple, Union, TYPE_CHECKING
+from pathlib import Path
 from PIL import Image
 
+# Add paths for imports (this file is also run/imported directly, e.g. t.py)
+_backend_dir = Path(__file__).parent.parent
+if str(_backend_dir) not in sys.path:
+    sys.path.insert(0, str(_backend_dir))
+
+from medgemma.responseCache import ResponseCache, get_response_cache
+from medgemma.singleFlight import AsyncSingleFlight, SingleFlight
+from medgemma.replicaPool import Lease, ReplicaPool
+from medgemma.hedging import HedgeBudget, race, run_sync
+from medgemma.imagePrep import PreparedImage, prepare_image
+from medgemma.resilience import (
+    DeadlineExceeded, ModelServerError, call_with_retries, call_with_retries_async,
+    deadline_passed, get_breaker, is_server_fault, open_circuits, timeout_for
+)
+
 if TYPE_CHECKING:
     from pypdf import PdfReader
 else:
@@ -16,18 +41,527 @@ else:
         except ImportError:
             PdfReader = None
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
 base_url = "http://0.0.0.0:8000"
 
+# Set with configure_replicas() to spread calls over several model servers
+# instead of base_url
+replica_urls: Optional[List[str]] = None
+
+# Connection pool settings for the shared transport
+pool_connections = 4      # number of distinct hosts kept in the pool
+pool_maxsize = 32         # max keep-alive connections per host
+pool_block = True         # wait for a free connection instead of opening extras
+async_pool_limit = 100    # max concurrent connections for the asyncio transport
+
+# Per-attempt request timeouts in seconds (None = wait forever); a request
+# deadline (resilience.deadline) cuts them further
+respond_timeout = 1008
+chat_timeout = 1008
+
+# Endpoints that are safe to retry (see resilience.call_with_retries)
+idempotent_endpoints = {"/respond", "/respond_batch"}
+
+# Concurrent identical /respond calls share one in-flight request
+coalesce_requests = True
+
+# Hedged /respond calls (needs replicas and aiohttp); see configure_hedging()
+hedge_requests = False
+hedge_delay: Optional[float] = None   # seconds, None = the replica's observed p95
+
+# Worker threads for respond_batch() when the server has no /respond_batch
+batch_max_workers = 8
+
+# Downsample and re-encode images before upload (see medgemma.imagePrep)
+preprocess_images = True
+
+
+# ============================================================
+# SHARED HTTP TRANSPORT
+# ============================================================
+
+class MedGemmaTransport:
+    """
+    Process-wide pooled HTTP session shared by every MedGemmaClient.
+
+    Agents create a new MedGemmaClient per call, so the connection pool
+    lives here instead of on the client. Connections to the model server
+    are kept alive and reused across clients and threads.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = pool_connections,
+        pool_maxsize: int = pool_maxsize,
+        pool_block: bool = pool_block,
+        keep_alive: bool = True
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+
+        self._lock = threading.Lock()
+        self._session: Optional[requests.Session] = None
+        self._adapter: Optional[HTTPAdapter] = None
+
+    @property
+    def session(self) -> requests.Session:
+        """Lazily build the pooled session (thread-safe)."""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=self.pool_block
+                    )
+                    session = requests.Session()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    session.headers["Connection"] = "keep-alive" if self.keep_alive else "close"
+                    self._adapter = adapter
+                    self._session = session
+        return self._session
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        """POST through the shared connection pool."""
+        return self.session.post(url, **kwargs)
+
+    def preconnect(self, url: str = base_url, connections: int = 1, timeout: float = 5.0) -> int:
+        """
+        Open keep-alive connections to the model server ahead of the first call.
+
+        Args:
+            url: Server URL to connect to
+            connections: Number of connections to open (capped at pool_maxsize)
+            timeout: Connect timeout in seconds for each connection
+
+        Returns:
+            Number of connections successfully opened
+        """
+        self.session.headers  # builds the adapter on first use
+        pool = self._adapter.poolmanager.connection_from_url(url)
+
+        opened = []
+        try:
+            for _ in range(min(connections, self.pool_maxsize)):
+                conn = pool._get_conn()
+                conn.timeout = timeout
+                try:
+                    if not conn.is_connected:
+                        conn.connect()
+                except Exception as e:
+                    pool._put_conn(conn)
+                    print(f"⚠️  Could not pre-connect to {url}: {e}")
+                    break
+                opened.append(conn)
+        finally:
+            for conn in opened:
+                pool._put_conn(conn)
+
+        return len(opened)
+
+    def close(self):
+        """Close every pooled connection. The next call opens a new pool."""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+
+_transport: Optional[MedGemmaTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> MedGemmaTransport:
+    """Get the global transport instance"""
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = MedGemmaTransport()
+    return _transport
+
+
+def configure_transport(
+    pool_connections: int = pool_connections,
+    pool_maxsize: int = pool_maxsize,
+    pool_block: bool = pool_block,
+    keep_alive: bool = True
+) -> MedGemmaTransport:
+    """
+    Replace the global transport with one using the given pool settings.
+    Existing pooled connections are closed.
+    """
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = MedGemmaTransport(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            keep_alive=keep_alive
+        )
+    return _transport
+
+
+def warm_transport(connections: int = 4) -> int:
+    """
+    Pre-connect the shared transport to the model server.
+    Call once at app startup so the first agent call skips the TCP handshake.
+    """
+    opened = 0
+    for url in replica_urls or [base_url]:
+        count = get_transport().preconnect(url.rstrip("/"), connections)
+        print(f"🔌 MedGemma transport warmed: {count}/{connections} connection(s) to {url}")
+        opened += count
+    return opened
+
+
+# ============================================================
+# MODEL SERVER REPLICAS
+# ============================================================
+
+_replica_pool: Optional[ReplicaPool] = None
+_replica_pools: Dict[Tuple[str, ...], ReplicaPool] = {}
+_replica_lock = threading.Lock()
+
+
+def configure_replicas(urls: Optional[List[str]], **pool_kwargs) -> Optional[ReplicaPool]:
+    """
+    Route every MedGemmaClient through a pool of model server replicas
+    (see replicaPool.ReplicaPool for the keyword arguments).
+    Pass None to go back to the single base_url.
+    """
+    global _replica_pool, replica_urls
+    with _replica_lock:
+        if _replica_pool is not None:
+            _replica_pool.close()
+        replica_urls = list(urls) if urls else None
+        _replica_pool = ReplicaPool(replica_urls, **pool_kwargs) if replica_urls else None
+    return _replica_pool
+
+
+def get_replica_pool(urls: Optional[List[str]] = None) -> Optional[ReplicaPool]:
+    """The global pool, or a shared pool for an explicit list of replica URLs."""
+    if not urls:
+        return _replica_pool
+    key = tuple(url.rstrip("/") for url in urls)
+    with _replica_lock:
+        if key not in _replica_pools:
+            _replica_pools[key] = ReplicaPool(list(key))
+        return _replica_pools[key]
+
+
+def get_replica_stats() -> Optional[List[Dict[str, Any]]]:
+    """Per-replica health, outstanding requests and latency of the global pool."""
+    return _replica_pool.stats() if _replica_pool is not None else None
+
+
+_hedge_budget = HedgeBudget()
+
+
+def configure_hedging(
+    enabled: bool = True,
+    delay: Optional[float] = None,
+    budget: float = 0.05,
+    burst: float = 10.0
+):
+    """
+    Turn request hedging for /respond on or off.
+
+    Args:
+        enabled: Master switch
+        delay: Seconds before sending the duplicate (None = the primary
+            replica's observed p95 latency)
+        budget: Max share of /respond calls that may be hedged
+        burst: Max hedges that can be saved up during quiet periods
+    """
+    global hedge_requests, hedge_delay, _hedge_budget
+    hedge_requests = enabled
+    hedge_delay = delay
+    _hedge_budget = HedgeBudget(ratio=budget, burst=burst)
+
+
+def get_hedging_stats() -> Dict[str, Any]:
+    """Calls seen, hedges sent, hedges that won, and hedges denied by the budget."""
+    return _hedge_budget.stats()
+
+
+# ============================================================
+# ASYNCIO TRANSPORT
+# ============================================================
+
+class MedGemmaAsyncTransport:
+    """
+    Pooled aiohttp sessions for the async client API.
+
+    aiohttp sessions are bound to an event loop, so one session (and one
+    bounded connection pool) is kept per running loop.
+    """
+
+    def __init__(self, limit: int = async_pool_limit, keepalive_timeout: float = 60.0):
+        self.limit = limit
+        self.keepalive_timeout = keepalive_timeout
+        self._sessions = weakref.WeakKeyDictionary()
+
+    def session(self) -> "aiohttp.ClientSession":
+        """Get the pooled session for the running event loop."""
+        if aiohttp is None:
+            raise ImportError("aiohttp is required for the async MedGemma API. Install with: pip install aiohttp")
+
+        loop = asyncio.get_running_loop()
+        session = self._sessions.get(loop)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, keepalive_timeout=self.keepalive_timeout)
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[loop] = session
+        return session
+
+    async def post(
+        self,
+        url: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]] = None,
+        timeout: Optional[float] = None
+    ) -> Tuple[int, str]:
+        """
+        POST form fields (+ optional files) and return (status_code, body_text).
+        Without files the body is url-encoded, with files it is multipart,
+        matching what requests sends for the sync client.
+        """
+        session = self.session()
+
+        form = aiohttp.FormData()
+        for name, value in payload.items():
+            form.add_field(name, value)
+        for name, (filename, content, content_type) in files or []:
+            form.add_field(name, content, filename=filename, content_type=content_type)
+
+        async with session.post(
+            url, data=form, timeout=aiohttp.ClientTimeout(total=timeout)
+        ) as response:
+            return response.status, await response.text()
+
+    async def close(self):
+        """Close the session owned by the running event loop."""
+        loop = asyncio.get_running_loop()
+        session = self._sessions.pop(loop, None)
+        if session is not None:
+            await session.close()
+
+
+_async_transport = MedGemmaAsyncTransport()
+
+
+def get_async_transport() -> MedGemmaAsyncTransport:
+    """Get the global asyncio transport instance"""
+    return _async_transport
+
+
+async def close_async_transport():
+    """Close pooled async connections. Call before the event loop shuts down."""
+    await _async_transport.close()
+
+
+# Set by run_agents_batched() or run_agent_async() while it drives a sync agent's model calls
+agent_replay = contextvars.ContextVar("agent_replay", default=None)
+
+# While set (see stream_tokens_to), respond()/chat() stream from the model
+# server and call sink(agent_name, token) for every chunk as it arrives
+token_sink = contextvars.ContextVar("token_sink", default=None)
+
+
+class stream_tokens_to:
+    """
+    Context manager forwarding model tokens from every respond()/chat() call
+    made inside it (however deep in an agent pipeline) to a callback.
+
+    The calls still return the complete response, so pipelines need no changes:
+
+        with stream_tokens_to(lambda agent, token: queue.put((agent, token))):
+            report = firstAidPipeline(patient_id, symptoms)
+    """
+
+    def __init__(self, sink):
+        self.sink = sink
+        self._token = None
+
+    def __enter__(self):
+        self._token = token_sink.set(self.sink)
+        return self
+
+    def __exit__(self, *exc):
+        token_sink.reset(self._token)
+        return False
+
+
+# Single-flight groups for /respond, keyed by ResponseCache.make_key()
+_respond_flight = SingleFlight()
+_respond_flight_async = AsyncSingleFlight()
+
+
+def get_coalescing_stats() -> Dict[str, Dict[str, int]]:
+    """How many /respond calls led a request vs joined one already in flight."""
+    return {"sync": _respond_flight.stats(), "async": _respond_flight_async.stats()}
+
+
+# Server URLs that answered 404 to /respond_batch
+_batch_unsupported = set()
+
+
+def _send_batch(
+    calls: List[Tuple["MedGemmaClient", Dict[str, str], Optional[List[Tuple]]]],
+    timeout: Optional[float] = None
+) -> List[Union[Dict[str, Any], RuntimeError]]:
+    """
+    Send several built /respond requests (client, payload, files) in one
+    round trip to /respond_batch.
+
+    Falls back to concurrent single /respond calls when the server lacks
+    the endpoint, or when tokens are being streamed (stream_tokens_to).
+    Each item is the parsed response or the RuntimeError it failed with.
+    """
+    if not calls:
+        return []
+
+    client = calls[0][0]
+    if token_sink.get() is not None or _batch_unsupported.issuperset(client._endpoints()):
+        return _send_concurrently(calls, timeout)
+
+    return call_with_retries(lambda tried: _send_batch_once(calls, timeout, tried))
+
+
+def _send_batch_once(calls, timeout, tried) -> List[Union[Dict[str, Any], RuntimeError]]:
+    client = calls[0][0]
+    timeout = timeout_for(timeout)
+
+    requests_field = []
+    multipart = []
+    for i, (_, payload, files) in enumerate(calls):
+        requests_field.append(payload)
+        for _, (filename, content, content_type) in files or []:
+            multipart.append((f"files_{i}", (filename, content, content_type)))
+
+    with client._route("/respond_batch", {}, tried) as lease:
+        try:
+            print(f"🔄 Sending batch of {len(calls)} request(s) to medgemma server...")
+            response = get_transport().post(
+                f"{lease.url}/respond_batch",
+                data={"requests": json.dumps(requests_field)},
+                files=multipart or None,
+                timeout=timeout
+            )
+            lease.failed = response.status_code >= 500
+            print(f"✅ Received response: {response.status_code}")
+        except requests.exceptions.Timeout:
+            print(f"❌ Request timed out after {timeout} seconds")
+            raise _timed_out(f"{lease.url}/respond_batch")
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Request failed: {str(e)}")
+            raise _unreachable(e)
+
+    if response.status_code == 404:
+        print("⚠️  Model server has no /respond_batch, sending requests concurrently")
+        _batch_unsupported.add(lease.url)
+        return _send_concurrently(calls, timeout)
+
+    data = client._handle_response(response)
+    items = data.get("responses", [])
+    if len(items) != len(calls):
+        raise RuntimeError(f"Batch returned {len(items)} response(s) for {len(calls)} request(s)")
+
+    results = []
+    for item in items:
+        if "error" in item:
+            status = item.get("status", 500)
+            results.append(ModelServerError(
+                f"API Error {status}:\n{item['error']}", status, retryable=_is_retryable_status(status)
+            ))
+        else:
+            results.append(item)
+    return results
+
+
+def _send_concurrently(calls, timeout) -> List[Union[Dict[str, Any], RuntimeError]]:
+    def send_one(client, payload, files):
+        try:
+            return client._send_direct("/respond", payload, files, timeout)
+        except RuntimeError as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=min(batch_max_workers, len(calls))) as pool:
+        # copy_context: each worker sees this thread's token sink
+        futures = [
+            pool.submit(contextvars.copy_context().run, send_one, *call)
+            for call in calls
+        ]
+        return [f.result() for f in futures]
+
+
+def _is_retryable_status(status_code: int) -> bool:
+    return status_code == 429 or status_code >= 500
+
+
+def _timed_out(url: str) -> RuntimeError:
+    if deadline_passed():
+        return DeadlineExceeded(f"Request deadline exceeded waiting for medgemma server. URL: {url}")
+    return ModelServerError(f"Medgemma server timed out. URL: {url}", retryable=True)
+
+
+def _unreachable(error: Exception) -> ModelServerError:
+    return ModelServerError(f"Failed to connect to medgemma server: {str(error)}", retryable=True)
+
+
+def _read_files(files: Optional[List[Tuple]]) -> Optional[List[Tuple]]:
+    """Read multipart file objects into bytes (and close them)."""
+    if not files:
+        return files
+
+    read = []
+    for name, (filename, file_obj, content_type) in files:
+        if isinstance(file_obj, (bytes, bytearray)):
+            read.append((name, (filename, bytes(file_obj), content_type)))
+            continue
+        try:
+            read.append((name, (filename, file_obj.read(), content_type)))
+        finally:
+            file_obj.close()
+    return read
+
+
 class MedGemmaClient:
     """
     /respond  → PURE STATELESS (no history at all)
     /chat     → Stateful (backend stores memory)
+
+    respond_async() / chat_async() are the asyncio equivalents.
     """
 
-    def __init__(self, system_prompt: str):
+    def __init__(
+        self,
+        system_prompt: str,
+        agent_name: Optional[str] = None,
+        replicas: Optional[List[str]] = None
+    ):
         self.base_url = base_url.rstrip("/")
         self.system_prompt = system_prompt
 
+        # Replica pool to route through (None = always use base_url);
+        # defaults to the pool set with configure_replicas()
+        self.pool = get_replica_pool(replicas)
+
+        # Used for per-agent cache switches and stats; defaults to the
+        # name of the agent function that created this client
+        self.agent_name = agent_name or sys._getframe(1).f_code.co_name
+
         # Only used for /chat
         self.conversation_id: Optional[str] = None
         self.system_sent_to_server = False
@@ -41,7 +575,7 @@ class MedGemmaClient:
         role: str,
         text: Optional[str],
         image_path: Optional[str] = None,
-        image_object: Optional[Union[Image.Image, bytes]] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
         pdf_object: Optional[Union[bytes, str]] = None
     ) -> Tuple[Dict[str, Any], Optional[List[Tuple]]]:
 
@@ -70,6 +604,10 @@ class MedGemmaClient:
             })
 
         # Handle image from path
+        if image_path and os.path.exists(image_path) and preprocess_images:
+            image_object = prepare_image(image_path)
+            image_path = None
+
         if image_path and os.path.exists(image_path):
             filename = os.path.basename(image_path)
 
@@ -85,20 +623,18 @@ class MedGemmaClient:
                 ("files", (filename, file_obj, "image/png"))
             ]
         
-        # Handle image from object (PIL Image or bytes)
+        # Handle image from object (PIL Image, bytes or PreparedImage)
         elif image_object is not None:
-            image_bytes, filename = self._process_image_object(image_object)
+            image_bytes, filename, content_type = self._process_image_object(image_object)
             
             content.append({
                 "type": "image",
                 "image_file": filename
             })
             
-            # Create BytesIO object from bytes
-            file_obj = io.BytesIO(image_bytes)
-            
+            # Raw bytes go straight into the multipart body
             files = [
-                ("files", (filename, file_obj, "image/png"))
+                ("files", (filename, image_bytes, content_type))
             ]
 
         message = {
@@ -112,19 +648,31 @@ class MedGemmaClient:
     # HELPER METHODS FOR IMAGE AND PDF PROCESSING
     # ============================================================
 
-    def _process_image_object(self, image_object: Union[Image.Image, bytes]) -> Tuple[bytes, str]:
+    def _process_image_object(
+        self,
+        image_object: Union[Image.Image, bytes, PreparedImage]
+    ) -> Tuple[bytes, str, str]:
         """
-        Process image object (PIL Image or bytes) and return bytes and filename.
+        Process image object (PIL Image, bytes or PreparedImage) and return
+        bytes, filename and content type.
+
+        With preprocess_images on, the image is downsampled and re-encoded
+        by medgemma.imagePrep (a PreparedImage is sent as-is).
         
         Args:
-            image_object: PIL Image object or image bytes
+            image_object: PIL Image object, image bytes or PreparedImage
             
         Returns:
-            Tuple of (image_bytes, filename)
+            Tuple of (image_bytes, filename, content_type)
         """
+        if isinstance(image_object, PreparedImage) or (
+                preprocess_images and isinstance(image_object, (bytes, bytearray, Image.Image))):
+            prepared = prepare_image(image_object)
+            return prepared.data, prepared.filename, prepared.content_type
+
         if isinstance(image_object, bytes):
             # Already bytes, use as-is
-            return image_object, "image.png"
+            return image_object, "image.png", "image/png"
         
         elif isinstance(image_object, Image.Image):
             # Convert PIL Image to bytes
@@ -132,7 +680,7 @@ class MedGemmaClient:
             # Save as PNG to preserve quality
             image_object.save(byte_arr, format='PNG')
             byte_arr.seek(0)
-            return byte_arr.getvalue(), "image.png"
+            return byte_arr.getvalue(), "image.png", "image/png"
         
         else:
             raise TypeError(f"Unsupported image type: {type(image_object)}. Expected PIL.Image or bytes.")
@@ -194,30 +742,17 @@ class MedGemmaClient:
         return "\n".join(text_parts)
 
     # ============================================================
-    # PURE STATELESS RESPONSE
+    # REQUEST BUILDERS
     # ============================================================
 
-    def respond(
+    def _respond_request(
         self,
         user_text: str,
         image_path: Optional[str] = None,
-        image_object: Optional[Union[Image.Image, bytes]] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
         pdf_object: Optional[Union[bytes, str]] = None
-    ) -> Dict[str, Any]:
-        """
-        Completely stateless.
-        Sends only:
-            system
-            user
-        Gets single response.
-        No memory stored anywhere.
-        
-        Args:
-            user_text: The user's text message
-            image_path: Optional path to an image file
-            image_object: Optional PIL Image object or image bytes
-            pdf_object: Optional PDF bytes or file path (will be converted to text)
-        """
+    ) -> Tuple[Dict[str, str], Optional[List[Tuple]]]:
+        """Build the form payload and files for a /respond call."""
 
         system_msg = {
             "role": "system",
@@ -241,56 +776,24 @@ class MedGemmaClient:
         # print("=" * 60)
         # print("files received in client: ", user_msg)
 
-        if image_object is not None:
-            print("Image object provided, size in bytes:", len(image_object) if isinstance(image_object, bytes) else "N/A")
+        if image_object is not None and files:
+            print("Image object provided, upload size in bytes:", len(files[0][1][1]))
 
-        try:
-            print("🔄 Sending request to medgemma server...")
-            response = requests.post(
-                f"{self.base_url}/respond",
-                data={
-                    "messages": json.dumps(messages)
-                },
-                files=files,
-                timeout=1008
-            )
-            print(f"✅ Received response: {response.status_code}")
-        except requests.exceptions.Timeout:
-            print("❌ Request timed out after 100 seconds")
-            raise RuntimeError(f"Medgemma server timed out. URL: {self.base_url}/respond")
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Request failed: {str(e)}")
-            raise RuntimeError(f"Failed to connect to medgemma server: {str(e)}")
-        finally:
-            if files:
-                files[0][1][1].close()
-
-        return self._handle_response(response)
+        payload = {
+            "messages": json.dumps(messages)
+        }
 
-    # ============================================================
-    # STATEFUL CHAT (SERVER MEMORY)
-    # ============================================================
+        return payload, files
 
-    def chat(
+    def _chat_request(
         self,
         user_text: str,
         image_path: Optional[str] = None,
-        image_object: Optional[Union[Image.Image, bytes]] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
         pdf_object: Optional[Union[bytes, str]] = None,
         conversation_id: Optional[str] = None
-    ) -> Dict[str, Any]:
-        """
-        Uses backend memory.
-        Sends system prompt only once.
-        Sends only new user message.
-        
-        Args:
-            user_text: The user's message
-            image_path: Optional path to an image file
-            image_object: Optional PIL Image object or image bytes
-            pdf_object: Optional PDF bytes or file path (will be converted to text)
-            conversation_id: Optional conversation ID to use (overrides internal state)
-        """
+    ) -> Tuple[Dict[str, str], Optional[List[Tuple]]]:
+        """Build the form payload and files for a /chat call."""
 
         messages = []
 
@@ -331,17 +834,266 @@ class MedGemmaClient:
         # print(f"📍 URL: {self.base_url}/chat")
         # print("=" * 60)
 
-        try:
-            response = requests.post(
-                f"{self.base_url}/chat",
-                data=payload,
-                files=files,
-            )
-        finally:
-            if files:
-                files[0][1][1].close()
+        return payload, files
 
-        data = self._handle_response(response)
+    # ============================================================
+    # PURE STATELESS RESPONSE
+    # ============================================================
+
+    def respond(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Completely stateless.
+        Sends only:
+            system
+            user
+        Gets single response.
+        No memory stored anywhere.
+        
+        Args:
+            user_text: The user's text message
+            image_path: Optional path to an image file
+            image_object: Optional PIL Image object, image bytes or PreparedImage
+            pdf_object: Optional PDF bytes or file path (will be converted to text)
+        """
+        payload, files = self._respond_request(user_text, image_path, image_object, pdf_object)
+        files = _read_files(files)
+        key = ResponseCache.make_key("/respond", payload, files)
+
+        cache = get_response_cache()
+        use_cache = cache.is_enabled_for(self.agent_name)
+
+        def fetch():
+            if use_cache:
+                cached = self._cache_lookup(cache, key)
+                if cached is not None:
+                    return cached
+
+            data = self._send("/respond", payload, files, timeout=respond_timeout)
+            if use_cache:
+                cache.put(key, data)
+            return data
+
+        return self._coalesce(key, fetch)
+
+    async def respond_async(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Awaitable version of respond().
+        Runs on the asyncio transport, so one event loop can keep many
+        model calls in flight without a thread per call.
+        """
+        payload, files = await self._build_request_async(
+            self._respond_request, user_text, image_path, image_object, pdf_object
+        )
+        key = ResponseCache.make_key("/respond", payload, files)
+
+        cache = get_response_cache()
+        use_cache = cache.is_enabled_for(self.agent_name)
+
+        async def fetch():
+            if use_cache:
+                cached = self._cache_lookup(cache, key)
+                if cached is not None:
+                    return cached
+
+            data = await self._send_async("/respond", payload, files, timeout=respond_timeout)
+            if use_cache:
+                cache.put(key, data)
+            return data
+
+        return await self._coalesce_async(key, fetch)
+
+    def respond_batch(
+        self,
+        requests_list: List[Union[str, Dict[str, Any]]]
+    ) -> List[Union[Dict[str, Any], RuntimeError]]:
+        """
+        Several independent stateless requests in one round trip.
+
+        Args:
+            requests_list: Items are either user_text strings or dicts of
+                respond() arguments (user_text, image_path, image_object,
+                pdf_object) plus an optional "system_prompt" overriding
+                this client's
+
+        Returns:
+            One entry per request, in order: the response dict, or the
+            RuntimeError that request failed with (like
+            asyncio.gather(return_exceptions=True))
+        """
+        cache = get_response_cache()
+        use_cache = cache.is_enabled_for(self.agent_name)
+
+        results: List[Any] = [None] * len(requests_list)
+        keys: List[Optional[str]] = [None] * len(requests_list)
+        to_send = []
+
+        for i, item in enumerate(requests_list):
+            if isinstance(item, str):
+                item = {"user_text": item}
+            item = dict(item)
+            system_prompt = item.pop("system_prompt", None)
+            client = self if system_prompt is None else MedGemmaClient(system_prompt, agent_name=self.agent_name)
+
+            payload, files = client._respond_request(**item)
+            files = _read_files(files)
+
+            if use_cache:
+                keys[i] = cache.make_key("/respond", payload, files)
+                cached = cache.get(keys[i], self.agent_name)
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            to_send.append((i, client, payload, files))
+
+        if agent_replay.get() is not None:
+            # Under run_agents_batched()/run_agent_async(): one captured call at a time
+            sent = []
+            for _, client, payload, files in to_send:
+                try:
+                    sent.append(client._send("/respond", payload, files, respond_timeout))
+                except RuntimeError as e:
+                    sent.append(e)
+        else:
+            sent = _send_batch([call[1:] for call in to_send], timeout=respond_timeout)
+
+        for (i, *_), result in zip(to_send, sent):
+            results[i] = result
+            if use_cache and not isinstance(result, Exception):
+                cache.put(keys[i], result)
+
+        return results
+
+    def respond_stream(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None
+    ) -> Iterator[str]:
+        """
+        Streaming version of respond().
+        Yields the reply text chunk by chunk as the model generates it.
+        """
+        payload, files = self._respond_request(user_text, image_path, image_object, pdf_object)
+        for event in self._stream_events("/respond", payload, files, timeout=respond_timeout):
+            if event.get("token"):
+                yield event["token"]
+
+    def _cache_lookup(self, cache, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached response for a stateless request, or None."""
+        replay = agent_replay.get()
+        if replay is not None and replay.has_result():
+            # run_agents_batched()/run_agent_async() already fetched this one; the miss was counted
+            return None
+
+        cached = cache.get(key, self.agent_name)
+        if cached is not None:
+            print(f"⚡ Response cache hit ({self.agent_name})")
+        return cached
+
+    def _coalesce(self, key: str, fetch) -> Dict[str, Any]:
+        """
+        Run fetch() once for all concurrent callers with the same request key.
+        Callers that joined an in-flight request get their own copy of the reply.
+        """
+        if not coalesce_requests or agent_replay.get() is not None:
+            # Under run_agents_batched()/run_agent_async() the batch is sent as one request instead
+            return fetch()
+
+        data, shared = _respond_flight.do(key, fetch)
+        if shared:
+            print(f"🔗 Joined in-flight request ({self.agent_name})")
+            return copy.deepcopy(data)
+        return data
+
+    async def _coalesce_async(self, key: str, fetch) -> Dict[str, Any]:
+        """Awaitable version of _coalesce()."""
+        if not coalesce_requests:
+            return await fetch()
+
+        data, shared = await _respond_flight_async.do(key, fetch)
+        if shared:
+            print(f"🔗 Joined in-flight request ({self.agent_name})")
+            return copy.deepcopy(data)
+        return data
+
+    # ============================================================
+    # STATEFUL CHAT (SERVER MEMORY)
+    # ============================================================
+
+    def chat(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Uses backend memory.
+        Sends system prompt only once.
+        Sends only new user message.
+        
+        Args:
+            user_text: The user's message
+            image_path: Optional path to an image file
+            image_object: Optional PIL Image object, image bytes or PreparedImage
+            pdf_object: Optional PDF bytes or file path (will be converted to text)
+            conversation_id: Optional conversation ID to use (overrides internal state)
+        """
+        payload, files = self._chat_request(user_text, image_path, image_object, pdf_object, conversation_id)
+        data = self._send("/chat", payload, files, timeout=chat_timeout)
+        return self._remember_conversation(data)
+
+    async def chat_async(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None,
+        conversation_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Awaitable version of chat(). Shares conversation state with chat().
+        """
+        payload, files = await self._build_request_async(
+            self._chat_request, user_text, image_path, image_object, pdf_object, conversation_id
+        )
+        data = await self._send_async("/chat", payload, files, timeout=chat_timeout)
+        return self._remember_conversation(data)
+
+    def chat_stream(
+        self,
+        user_text: str,
+        image_path: Optional[str] = None,
+        image_object: Optional[Union[Image.Image, bytes, PreparedImage]] = None,
+        pdf_object: Optional[Union[bytes, str]] = None,
+        conversation_id: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Streaming version of chat(). Yields reply chunks as they are generated;
+        the conversation_id is remembered once the stream completes.
+        """
+        payload, files = self._chat_request(user_text, image_path, image_object, pdf_object, conversation_id)
+        for event in self._stream_events("/chat", payload, files, timeout=chat_timeout):
+            if event.get("token"):
+                yield event["token"]
+            if event.get("done"):
+                self._remember_conversation(event)
+
+    def _remember_conversation(self, data: Dict[str, Any]) -> Dict[str, Any]:
 
         # Save conversation_id returned by backend
         if "conversation_id" in data:
@@ -360,20 +1112,352 @@ class MedGemmaClient:
         self.conversation_id = None
         self.system_sent_to_server = False
 
+    # ============================================================
+    # TRANSPORT
+    # ============================================================
+
+    def _send(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """POST a built request through the shared transport and parse the reply."""
+
+        replay = agent_replay.get()
+        if replay is not None:
+            # Running under run_agents_batched()/run_agent_async(): hand the request to the batch
+            return replay.resolve(self, endpoint, payload, _read_files(files), timeout)
+
+        return self._send_direct(endpoint, payload, _read_files(files), timeout)
+
+    def _send_direct(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Send now, retrying idempotent calls. `files` must hold bytes."""
+        if endpoint not in idempotent_endpoints:
+            return self._send_once(endpoint, payload, files, timeout)
+        return call_with_retries(lambda tried: self._send_once(endpoint, payload, files, timeout, tried))
+
+    def _send_once(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """One attempt: streamed, hedged or a plain POST, within the request deadline."""
+        timeout = timeout_for(timeout)
+
+        sink = token_sink.get()
+        if sink is not None:
+            return self._send_streaming(endpoint, payload, files, timeout, sink, tried)
+
+        if self._can_hedge(endpoint):
+            return run_sync(self._send_hedged(endpoint, payload, files, timeout, tried))
+
+        return self._post(endpoint, payload, files, timeout, tried)
+
+    def _post(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        with self._route(endpoint, payload, tried) as lease:
+            try:
+                print("🔄 Sending request to medgemma server...")
+                response = get_transport().post(
+                    f"{lease.url}{endpoint}",
+                    data=payload,
+                    files=files,
+                    timeout=timeout
+                )
+                lease.failed = response.status_code >= 500
+                print(f"✅ Received response: {response.status_code}")
+            except requests.exceptions.Timeout:
+                print(f"❌ Request timed out after {timeout} seconds")
+                raise _timed_out(f"{lease.url}{endpoint}")
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Request failed: {str(e)}")
+                raise _unreachable(e)
+            finally:
+                for _, (_, file_obj, _) in files or []:
+                    if hasattr(file_obj, "close"):
+                        file_obj.close()
+
+        data = self._handle_response(response)
+        self._pin_conversation(endpoint, data, lease)
+        return data
+
+    def _endpoints(self) -> List[str]:
+        """Every server this client may send to."""
+        if self.pool is None:
+            return [self.base_url]
+        return [replica.url for replica in self.pool.replicas]
+
+    @contextlib.contextmanager
+    def _route(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        tried: Optional[List[str]] = None
+    ) -> Iterator[Lease]:
+        """
+        Pick the server for one request: base_url, or a replica from the pool.
+        /chat calls for a known conversation go to the replica that owns it.
+        `tried` lists replicas this request already went to; they are avoided
+        and the chosen one is appended.
+        """
+        if self.pool is None:
+            lease = Lease(self.base_url)
+            with self._guard(lease):
+                yield lease
+            return
+
+        conversation_id = payload.get("conversation_id") if endpoint == "/chat" else None
+        exclude = set(tried or ()) | open_circuits(self._endpoints())
+        with self.pool.acquire(conversation_id, exclude=exclude) as lease:
+            if tried is not None:
+                tried.append(lease.url)
+            with self._guard(lease):
+                yield lease
+
+    @contextlib.contextmanager
+    def _guard(self, lease: Lease) -> Iterator[Lease]:
+        """Fail fast if the server's circuit is open; record the outcome otherwise."""
+        breaker = get_breaker(lease.url)
+        breaker.before_call()
+        try:
+            yield lease
+        except BaseException as e:
+            if is_server_fault(e):
+                breaker.record_failure()
+            else:
+                # Cancelled, out of deadline or a rejected request: not the server's fault
+                lease.cancelled = True
+                breaker.record_cancelled()
+            raise
+        if lease.failed:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+
+    def _can_hedge(self, endpoint: str) -> bool:
+        """Only idempotent /respond calls with a second replica to go to are hedged."""
+        return (
+            hedge_requests
+            and endpoint == "/respond"
+            and aiohttp is not None
+            and self.pool is not None
+            and len(self.pool.replicas) > 1
+        )
+
+    async def _send_hedged(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Send on the asyncio transport, duplicating to another replica if slow.
+        Both attempts are added to `tried`, so a retry avoids either replica.
+        """
+        tried = [] if tried is None else tried
+        primary = len(tried)  # index this call's first replica will get
+
+        def attempt():
+            return self._post_async(endpoint, payload, files, timeout, tried=tried)
+
+        def get_delay() -> Optional[float]:
+            if hedge_delay is not None:
+                return hedge_delay
+            return self.pool.latency_quantile(tried[primary], 0.95) if len(tried) > primary else None
+
+        return await race(attempt, get_delay, _hedge_budget)
+
+    def _pin_conversation(self, endpoint: str, data: Dict[str, Any], lease: Lease):
+        """Remember which replica holds a /chat conversation's history."""
+        if self.pool is not None and endpoint == "/chat" and data.get("conversation_id"):
+            self.pool.pin(data["conversation_id"], lease.url)
+
+    def _send_streaming(self, endpoint, payload, files, timeout, sink, tried=None) -> Dict[str, Any]:
+        """Stream a request, forwarding tokens to sink, and return the full response."""
+        parts = []
+        data: Dict[str, Any] = {}
+
+        try:
+            for event in self._stream_events(endpoint, payload, files, timeout, tried):
+                if event.get("token"):
+                    parts.append(event["token"])
+                    sink(self.agent_name, event["token"])
+                if event.get("done"):
+                    data = {k: v for k, v in event.items() if k not in ("done", "token")}
+        except ModelServerError as e:
+            if parts:
+                # Tokens already went to the sink; a retry would repeat them
+                e.retryable = False
+            raise
+
+        data.setdefault("response", "".join(parts))
+        return data
+
+    def _stream_events(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        POST to the streaming variant of an endpoint (/respond_stream, /chat_stream)
+        and yield its server-sent events: {"token": ...} per chunk, then
+        {"done": true, ...} with the final fields (e.g. conversation_id).
+
+        Servers without streaming support (404) get a regular request and the
+        whole reply comes back as a single chunk.
+        """
+        files = _read_files(files)  # kept as bytes so the fallback can resend them
+        timeout = timeout_for(timeout)
+        error = None
+
+        with self._route(endpoint, payload, tried) as lease:
+            try:
+                print("🔄 Streaming request to medgemma server...")
+                response = get_transport().post(
+                    f"{lease.url}{endpoint}_stream",
+                    data=payload,
+                    files=files,
+                    timeout=timeout,
+                    stream=True
+                )
+            except requests.exceptions.Timeout:
+                print(f"❌ Request timed out after {timeout} seconds")
+                raise _timed_out(f"{lease.url}{endpoint}_stream")
+            except requests.exceptions.RequestException as e:
+                print(f"❌ Request failed: {str(e)}")
+                raise _unreachable(e)
+
+            with response:
+                lease.failed = response.status_code >= 500
+                if response.status_code not in (200, 404):
+                    # Raised after the route, like _post: a 4xx is not the server's failure
+                    error = (response.status_code, response.text)
+                elif response.status_code == 200:
+                    response.encoding = "utf-8"
+                    try:
+                        for line in response.iter_lines(decode_unicode=True):
+                            if not line or not line.startswith("data:"):
+                                continue
+                            event = json.loads(line[len("data:"):].strip())
+                            if event.get("done"):
+                                self._pin_conversation(endpoint, event, lease)
+                            yield event
+                    except requests.exceptions.RequestException as e:
+                        raise ModelServerError(f"Medgemma stream interrupted: {str(e)}")
+                    return
+
+        if error is not None:
+            self._parse_response(*error)
+
+        # 404: no streaming support on this server
+        data = self._post(endpoint, payload, files, timeout, tried)
+        yield {"token": data.get("response", "")}
+        yield {"done": True, **data}
+
+    async def _build_request_async(self, builder, *args) -> Tuple[Dict[str, str], Optional[List[Tuple]]]:
+        """
+        Run a request builder for the async API.
+        PDF extraction and image encoding are CPU/disk bound, so they are moved
+        off the event loop; plain text requests are built inline.
+        """
+        has_attachment = any(arg is not None for arg in args[1:4])
+        if has_attachment:
+            payload, files = await asyncio.to_thread(builder, *args)
+        else:
+            payload, files = builder(*args)
+        return payload, _read_files(files)
+
+    async def _send_async(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """POST a built request through the asyncio transport and parse the reply."""
+        if endpoint not in idempotent_endpoints:
+            return await self._send_once_async(endpoint, payload, files, timeout)
+        return await call_with_retries_async(
+            lambda tried: self._send_once_async(endpoint, payload, files, timeout, tried)
+        )
+
+    async def _send_once_async(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        timeout = timeout_for(timeout)
+        if self._can_hedge(endpoint):
+            return await self._send_hedged(endpoint, payload, files, timeout, tried)
+        return await self._post_async(endpoint, payload, files, timeout, tried)
+
+    async def _post_async(
+        self,
+        endpoint: str,
+        payload: Dict[str, str],
+        files: Optional[List[Tuple]],
+        timeout: Optional[float] = None,
+        tried: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        with self._route(endpoint, payload, tried) as lease:
+            try:
+                status, text = await get_async_transport().post(
+                    f"{lease.url}{endpoint}", payload, files, timeout
+                )
+                lease.failed = status >= 500
+            except asyncio.TimeoutError:
+                raise _timed_out(f"{lease.url}{endpoint}")
+            except aiohttp.ClientError as e:
+                raise _unreachable(e)
+
+        data = self._parse_response(status, text)
+        self._pin_conversation(endpoint, data, lease)
+        return data
+
     # ============================================================
     # RESPONSE HANDLER
     # ============================================================
 
     def _handle_response(self, response):
+        return self._parse_response(response.status_code, response.text)
 
-        if response.status_code != 200:
-            raise RuntimeError(
-                f"API Error {response.status_code}:\n{response.text}"
+    def _parse_response(self, status_code: int, text: str) -> Dict[str, Any]:
+
+        if status_code != 200:
+            raise ModelServerError(
+                f"API Error {status_code}:\n{text}",
+                status_code,
+                retryable=_is_retryable_status(status_code)
             )
 
         try:
-            return response.json()
+            return json.loads(text)
         except Exception:
             raise RuntimeError(
-                f"Invalid JSON response:\n{response.text}"
-            )
\ No newline at end of file
+                f"Invalid JSON response:\n{text}"
+            )
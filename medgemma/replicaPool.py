@@ -0,0 +1,280 @@
+"""
+Client-side load balancing over several MedGemma model server replicas.
+
+Routing:
+    /respond, /respond_batch  - least outstanding requests among healthy
+                                replicas (ties go to the lower latency)
+    /chat                     - pinned to the replica that owns the
+                                conversation_id, since the conversation
+                                history lives in that server's memory
+
+Health:
+    passive - `failure_threshold` consecutive failures (connection errors or
+              5xx) eject a replica for `eject_seconds`
+    active  - a background thread probes every replica each
+              `health_interval` seconds; a failed probe ejects it, a
+              successful probe reinstates it
+
+If every replica is ejected, requests are spread over all of them rather
+than failing outright.
+
+Usage:
+    from medgemma.medgemmaClient import configure_replicas, get_replica_stats
+
+    configure_replicas(["http://gpu-1:8000", "http://gpu-2:8000"])
+    ...
+    print(get_replica_stats())
+"""
+
+import collections
+import contextlib
+import itertools
+import threading
+import time
+from typing import Any, Collection, Dict, Iterator, List, Optional
+
+import requests
+
+# Defaults
+health_interval = 10.0     # seconds between active health checks
+health_path = "/"          # probed with HEAD; any status below 500 is healthy
+health_timeout = 2.0
+failure_threshold = 3      # consecutive failures before ejection
+eject_seconds = 30.0
+max_pinned_conversations = 10000
+
+
+class Replica:
+    """One model server endpoint and its live counters."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.latencies = collections.deque(maxlen=256)
+
+    def is_healthy(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+class Lease:
+    """
+    A routed request. Set `failed` for failures that did not raise (e.g.
+    5xx), and `cancelled` for errors that are not the replica's fault.
+    """
+
+    def __init__(self, url: str, replica: Optional[Replica] = None):
+        self.url = url
+        self.replica = replica
+        self.failed = False
+        self.cancelled = False
+
+
+class ReplicaPool:
+    """Least-outstanding-requests balancer with health checks and /chat pinning."""
+
+    def __init__(
+        self,
+        urls: List[str],
+        health_interval: Optional[float] = health_interval,
+        health_path: str = health_path,
+        failure_threshold: int = failure_threshold,
+        eject_seconds: float = eject_seconds
+    ):
+        """
+        Args:
+            urls: Replica base URLs
+            health_interval: Seconds between active health checks (None = passive only)
+            health_path: Path probed with HEAD by the health checker
+            failure_threshold: Consecutive failures before a replica is ejected
+            eject_seconds: How long a passively ejected replica sits out
+        """
+        if not urls:
+            raise ValueError("ReplicaPool needs at least one replica URL")
+
+        self.replicas = [Replica(url) for url in urls]
+        self.health_interval = health_interval
+        self.health_path = health_path
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+
+        self._lock = threading.Lock()
+        self._by_url = {r.url: r for r in self.replicas}
+        self._pins: "collections.OrderedDict[str, Replica]" = collections.OrderedDict()
+        self._rotation = itertools.cycle(range(len(self.replicas)))
+
+        self._stop = threading.Event()
+        self._health_thread: Optional[threading.Thread] = None
+        if health_interval:
+            self._health_thread = threading.Thread(target=self._health_loop, daemon=True)
+            self._health_thread.start()
+
+    # ============================================================
+    # ROUTING
+    # ============================================================
+
+    @contextlib.contextmanager
+    def acquire(
+        self,
+        conversation_id: Optional[str] = None,
+        exclude: Collection[str] = ()
+    ) -> Iterator[Lease]:
+        """
+        Pick a replica for one request and track it while the request runs.
+        Exceptions raised inside the block count as a failure of that replica.
+
+        Args:
+            conversation_id: /chat conversation to route to its owner
+            exclude: Replica URLs to avoid if any other is healthy (e.g. the
+                one a hedged request is already waiting on)
+        """
+        with self._lock:
+            replica = self._pick(conversation_id, exclude)
+            replica.outstanding += 1
+            replica.requests += 1
+
+        lease = Lease(replica.url, replica)
+        start = time.perf_counter()
+        try:
+            yield lease
+        except Exception:
+            lease.failed = not lease.cancelled
+            raise
+        except BaseException:
+            # Cancelled or abandoned (e.g. a closed stream): neither a
+            # failure nor a meaningful latency sample
+            lease.cancelled = True
+            raise
+        finally:
+            self._release(replica, time.perf_counter() - start, lease)
+
+    def pin(self, conversation_id: str, url: str):
+        """Route future /chat calls for this conversation to the given replica."""
+        replica = self._by_url.get(url.rstrip("/"))
+        if replica is None or not conversation_id:
+            return
+        with self._lock:
+            self._pins[conversation_id] = replica
+            self._pins.move_to_end(conversation_id)
+            while len(self._pins) > max_pinned_conversations:
+                self._pins.popitem(last=False)
+
+    def _pick(self, conversation_id: Optional[str], exclude: Collection[str] = ()) -> Replica:
+        now = time.time()
+
+        if conversation_id is not None:
+            pinned = self._pins.get(conversation_id)
+            if pinned is not None:
+                if pinned.is_healthy(now):
+                    self._pins.move_to_end(conversation_id)
+                    return pinned
+                print(f"⚠️  Replica {pinned.url} owning conversation {conversation_id} is down; "
+                      f"the conversation moves to another replica and loses its server-side history")
+                del self._pins[conversation_id]
+
+        candidates = [r for r in self.replicas if r.is_healthy(now)] or self.replicas
+        if exclude:
+            candidates = [r for r in candidates if r.url not in exclude] or candidates
+
+        # Rotate the starting point so equal replicas share the load
+        offset = next(self._rotation)
+        ordered = candidates[offset % len(candidates):] + candidates[:offset % len(candidates)]
+        return min(ordered, key=lambda r: (r.outstanding, r.latency_ewma or 0.0))
+
+    def _release(self, replica: Replica, elapsed: float, lease: Lease):
+        with self._lock:
+            replica.outstanding -= 1
+            if lease.cancelled:
+                return
+            if lease.failed:
+                replica.failures += 1
+                replica.consecutive_failures += 1
+                if replica.consecutive_failures >= self.failure_threshold:
+                    self._eject(replica, self.eject_seconds)
+                return
+
+            replica.consecutive_failures = 0
+            replica.latencies.append(elapsed)
+            if replica.latency_ewma is None:
+                replica.latency_ewma = elapsed
+            else:
+                replica.latency_ewma = 0.8 * replica.latency_ewma + 0.2 * elapsed
+
+    def _eject(self, replica: Replica, seconds: float):
+        if replica.is_healthy(time.time()):
+            print(f"⚠️  Ejecting MedGemma replica {replica.url} for {seconds:.0f}s")
+        replica.ejected_until = time.time() + seconds
+
+    def latency_quantile(self, url: str, q: float, min_samples: int = 20) -> Optional[float]:
+        """Observed latency quantile (seconds) of a replica, None until enough samples."""
+        replica = self._by_url.get(url.rstrip("/"))
+        if replica is None:
+            return None
+        with self._lock:
+            latencies = sorted(replica.latencies)
+        if len(latencies) < min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+
+    # ============================================================
+    # HEALTH CHECKS
+    # ============================================================
+
+    def check_health(self) -> Dict[str, bool]:
+        """Probe every replica once; returns {url: healthy}."""
+        results = {}
+        with requests.Session() as session:
+            for replica in self.replicas:
+                try:
+                    response = session.head(f"{replica.url}{self.health_path}", timeout=health_timeout)
+                    healthy = response.status_code < 500
+                except requests.exceptions.RequestException:
+                    healthy = False
+
+                with self._lock:
+                    if healthy:
+                        if not replica.is_healthy(time.time()):
+                            print(f"✅ MedGemma replica {replica.url} is back")
+                        replica.ejected_until = 0.0
+                        replica.consecutive_failures = 0
+                    else:
+                        self._eject(replica, self.health_interval or self.eject_seconds)
+                results[replica.url] = healthy
+        return results
+
+    def _health_loop(self):
+        while not self._stop.wait(self.health_interval):
+            self.check_health()
+
+    def close(self):
+        """Stop the background health checker."""
+        self._stop.set()
+
+    # ============================================================
+    # STATS
+    # ============================================================
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-replica health, queue depth and latency."""
+        now = time.time()
+        with self._lock:
+            pins = collections.Counter(r.url for r in self._pins.values())
+            out = []
+            for r in self.replicas:
+                latencies = sorted(r.latencies)
+                out.append({
+                    "url": r.url,
+                    "healthy": r.is_healthy(now),
+                    "outstanding": r.outstanding,
+                    "requests": r.requests,
+                    "failures": r.failures,
+                    "latency_ewma_ms": round(r.latency_ewma * 1000, 2) if r.latency_ewma is not None else None,
+                    "latency_p50_ms": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else None,
+                    "latency_p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 2) if latencies else None,
+                    "pinned_conversations": pins.get(r.url, 0),
+                })
+            return out
@@ -0,0 +1,270 @@
+"""
+Retries, circuit breaking and end-to-end deadlines for model calls.
+
+Deadlines:
+    `with deadline(120): ...` sets an absolute deadline for everything run
+    inside it, including every agent call made deep inside an
+    orchestration. Each call's timeout is cut to the time left, and once
+    the deadline has passed calls fail immediately with DeadlineExceeded.
+    app.py opens one per incoming HTTP request.
+
+Retries:
+    Idempotent calls (/respond) that fail with a retryable ModelServerError
+    (connection error, timeout, 429, 5xx) are retried up to `max_attempts`
+    times with exponential backoff and full jitter, never sleeping past the
+    deadline. With a replica pool each retry prefers a replica not tried yet.
+
+Circuit breaker:
+    One per server URL. `failure_threshold` consecutive failures open it;
+    while open, calls to that server fail fast with CircuitOpenError
+    instead of waiting on a dead server. After `reset_timeout` seconds one
+    trial call is let through (half-open); success closes it again. Only
+    server faults count as failures (see is_server_fault): a call cut
+    short by the caller's own deadline, or a request the server rejected
+    with a non-retryable 4xx, says nothing about the server's health.
+"""
+
+import asyncio
+import contextvars
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+# Retry defaults
+max_attempts = 3
+backoff_base = 0.5     # seconds
+backoff_max = 8.0
+
+# Circuit breaker defaults
+failure_threshold = 5
+reset_timeout = 30.0
+
+
+class ModelServerError(RuntimeError):
+    """A model server call failed. `retryable` is set for transient failures."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, retryable: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retryable = retryable
+
+
+class CircuitOpenError(ModelServerError):
+    """The server's circuit breaker is open; the call was not sent."""
+
+
+class DeadlineExceeded(RuntimeError):
+    """The request's end-to-end deadline passed before the call could complete."""
+
+
+# ============================================================
+# DEADLINES
+# ============================================================
+
+_deadline = contextvars.ContextVar("request_deadline", default=None)
+
+
+class deadline:
+    """
+    Context manager giving everything inside it `seconds` to finish.
+    Nested deadlines never extend an outer one.
+    """
+
+    def __init__(self, seconds: Optional[float]):
+        self.seconds = seconds
+        self._token = None
+
+    def __enter__(self):
+        at = _deadline.get()
+        if self.seconds is not None:
+            mine = time.monotonic() + self.seconds
+            at = mine if at is None else min(at, mine)
+        self._token = _deadline.set(at)
+        return self
+
+    def __exit__(self, *exc):
+        _deadline.reset(self._token)
+        return False
+
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current deadline (None = no deadline)."""
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def timeout_for(timeout: Optional[float]) -> Optional[float]:
+    """
+    Cut a call's timeout to the time left before the deadline.
+    Raises DeadlineExceeded if there is no time left.
+    """
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded before calling the model server")
+    return left if timeout is None else min(timeout, left)
+
+
+def deadline_passed() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+# ============================================================
+# CIRCUIT BREAKER
+# ============================================================
+
+class CircuitBreaker:
+    """Closed → open after consecutive failures → half-open after a cool-down."""
+
+    def __init__(self, url: str, failure_threshold: int = failure_threshold, reset_timeout: float = reset_timeout):
+        self.url = url
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if now - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def is_open(self) -> bool:
+        """Whether a call right now would be rejected."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            return state == "open" or (state == "half_open" and self._trial_in_flight)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+        raise CircuitOpenError(f"Circuit open for medgemma server {self.url}; not sending request")
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                print(f"✅ Circuit closed for medgemma server {self.url}")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            trial_failed = self._trial_in_flight
+            self._trial_in_flight = False
+            if trial_failed or self._failures >= self.failure_threshold:
+                if self._opened_at is None or trial_failed:
+                    print(f"⚠️  Circuit opened for medgemma server {self.url} "
+                          f"after {self._failures} consecutive failure(s)")
+                self._opened_at = time.monotonic()
+
+    def record_cancelled(self):
+        """The call was abandoned; free the half-open trial slot."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+def is_server_fault(error: BaseException) -> bool:
+    """Whether a failed call should count against the server it went to."""
+    if isinstance(error, DeadlineExceeded):
+        return False
+    if isinstance(error, ModelServerError) and not error.retryable \
+            and error.status_code is not None and error.status_code < 500:
+        return False
+    return isinstance(error, Exception)
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(url: str) -> CircuitBreaker:
+    """The circuit breaker for a server URL (created on first use)."""
+    with _breakers_lock:
+        breaker = _breakers.get(url)
+        if breaker is None:
+            breaker = _breakers[url] = CircuitBreaker(url)
+        return breaker
+
+
+def open_circuits(urls: Iterable[str]) -> Set[str]:
+    """The URLs among `urls` whose breaker would reject a call right now."""
+    return {url for url in urls if url in _breakers and _breakers[url].is_open()}
+
+
+def breaker_states() -> Dict[str, str]:
+    with _breakers_lock:
+        return {url: breaker.state for url, breaker in _breakers.items()}
+
+
+# ============================================================
+# RETRIES
+# ============================================================
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for the given (0-based) retry."""
+    return random.uniform(0, min(backoff_max, backoff_base * (2 ** attempt)))
+
+
+def _next_delay(error: ModelServerError, attempt: int) -> Optional[float]:
+    """Seconds to wait before retrying, or None to give up."""
+    if not error.retryable or attempt + 1 >= max_attempts:
+        return None
+    delay = backoff_delay(attempt)
+    left = remaining()
+    if left is not None and left <= delay:
+        return None
+    print(f"↻ Model call failed ({error}); retry {attempt + 1}/{max_attempts - 1} in {delay:.2f}s")
+    return delay
+
+
+def call_with_retries(fn: Callable[[List[str]], Any]) -> Any:
+    """
+    Run fn(tried) with bounded retries. `tried` collects the server URLs
+    used so far so the router can prefer a different replica.
+    """
+    tried: List[str] = []
+    attempt = 0
+    while True:
+        try:
+            return fn(tried)
+        except ModelServerError as e:
+            delay = _next_delay(e, attempt)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        attempt += 1
+
+
+async def call_with_retries_async(fn: Callable[[List[str]], Awaitable[Any]]) -> Any:
+    """Awaitable version of call_with_retries()."""
+    tried: List[str] = []
+    attempt = 0
+    while True:
+        try:
+            return await fn(tried)
+        except ModelServerError as e:
+            delay = _next_delay(e, attempt)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        attempt += 1
@@ -0,0 +1,307 @@
+"""
+Content-addressed response cache for MedGemmaClient.respond().
+
+/respond is pure: the same system prompt, user text and attachments always
+describe the same request. Responses are stored under a SHA-256 of the full
+request (endpoint, form fields and every attached file's bytes), so an
+unchanged EHR summary or meal list is answered from cache instead of
+re-running the model.
+
+Tiers:
+    memory  - LRU bounded by entry count and total bytes
+    disk    - optional, one JSON file per entry, bounded by total bytes
+
+The cache is opt-in and off by default. Agents are identified by the name of
+the function that created the MedGemmaClient (e.g. "ehr_summary_to_report",
+"nutritionalAgent") and can be switched on/off individually.
+
+Usage:
+    from medgemma.responseCache import configure_response_cache, get_response_cache
+
+    configure_response_cache(enabled=True, ttl=6 * 3600, disk_dir="/var/cache/medgemma")
+    get_response_cache().disable_agent("interview_message")
+
+    print(get_response_cache().stats())
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# Defaults for the global cache
+max_entries = 1024
+max_bytes = 64 * 1024 * 1024          # memory tier
+disk_max_bytes = 512 * 1024 * 1024    # disk tier
+default_ttl = None                    # seconds, None = never expires
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional disk) cache of /respond results."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        max_entries: int = max_entries,
+        max_bytes: int = max_bytes,
+        ttl: Optional[float] = default_ttl,
+        disk_dir: Optional[str] = None,
+        disk_max_bytes: int = disk_max_bytes,
+        agents_enabled_by_default: bool = True
+    ):
+        """
+        Args:
+            enabled: Master switch for the cache
+            max_entries: Max entries kept in memory
+            max_bytes: Max total size of entries kept in memory
+            ttl: Entry lifetime in seconds (None = no expiry)
+            disk_dir: Directory for the disk tier (None = memory only)
+            disk_max_bytes: Max total size of the disk tier
+            agents_enabled_by_default: Whether agents not listed via
+                enable_agent()/disable_agent() use the cache
+        """
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_bytes = disk_max_bytes
+        self.agents_enabled_by_default = agents_enabled_by_default
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._memory_bytes = 0
+        self._enabled_agents: Set[str] = set()
+        self._disabled_agents: Set[str] = set()
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._agent_counters: Dict[str, Dict[str, int]] = {}
+
+        self._disk_bytes = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+            self._disk_bytes = sum(f.stat().st_size for f in self.disk_dir.glob("*/*.json"))
+
+    # ============================================================
+    # PER-AGENT SWITCHES
+    # ============================================================
+
+    def enable_agent(self, agent_name: str):
+        with self._lock:
+            self._disabled_agents.discard(agent_name)
+            self._enabled_agents.add(agent_name)
+
+    def disable_agent(self, agent_name: str):
+        with self._lock:
+            self._enabled_agents.discard(agent_name)
+            self._disabled_agents.add(agent_name)
+
+    def is_enabled_for(self, agent_name: Optional[str]) -> bool:
+        """Whether calls made by this agent should go through the cache."""
+        if not self.enabled:
+            return False
+        if agent_name in self._disabled_agents:
+            return False
+        if agent_name in self._enabled_agents:
+            return True
+        return self.agents_enabled_by_default
+
+    # ============================================================
+    # KEYS
+    # ============================================================
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, str], files: Optional[List[Tuple]] = None) -> str:
+        """
+        Hash the full request. `files` must already hold bytes
+        (see medgemmaClient._read_files).
+        """
+        digest = hashlib.sha256()
+        digest.update(endpoint.encode("utf-8"))
+        for name in sorted(payload):
+            digest.update(b"\0" + name.encode("utf-8") + b"\0" + str(payload[name]).encode("utf-8"))
+        for name, (filename, content, content_type) in files or []:
+            digest.update(b"\0file\0" + name.encode("utf-8") + b"\0" + str(content_type).encode("utf-8") + b"\0")
+            digest.update(content)
+        return digest.hexdigest()
+
+    # ============================================================
+    # LOOKUP / STORE
+    # ============================================================
+
+    def get(self, key: str, agent_name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Return a fresh copy of the cached response, or None on a miss."""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, body = entry
+                if self._is_fresh(stored_at, now):
+                    self._memory.move_to_end(key)
+                    self._count(agent_name, "memory_hits")
+                    return json.loads(body)
+                self._drop_memory(key)
+
+        if self.disk_dir is not None:
+            body = self._read_disk(key, now)
+            if body is not None:
+                with self._lock:
+                    self._store_memory(key, now, body)
+                    self._count(agent_name, "disk_hits")
+                return json.loads(body)
+
+        with self._lock:
+            self._count(agent_name, "misses")
+        return None
+
+    def put(self, key: str, response: Dict[str, Any]):
+        """Store a response in every enabled tier."""
+        body = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+
+        with self._lock:
+            self._store_memory(key, now, body)
+            self._counters["stores"] += 1
+
+        if self.disk_dir is not None:
+            self._write_disk(key, now, body)
+
+    def clear(self):
+        """Drop every entry from both tiers (counters are kept)."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            if self.disk_dir is not None:
+                for f in self.disk_dir.glob("*/*.json"):
+                    f.unlink(missing_ok=True)
+                self._disk_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters, overall and per agent."""
+        with self._lock:
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "enabled": self.enabled,
+                **self._counters,
+                "hits": hits,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_bytes": self._disk_bytes,
+                "agents": {name: dict(c) for name, c in self._agent_counters.items()},
+            }
+
+    # ============================================================
+    # INTERNALS
+    # ============================================================
+
+    def _is_fresh(self, stored_at: float, now: float) -> bool:
+        return self.ttl is None or now - stored_at < self.ttl
+
+    def _count(self, agent_name: Optional[str], counter: str):
+        self._counters[counter] += 1
+        per_agent = self._agent_counters.setdefault(
+            agent_name or "unknown", {"hits": 0, "misses": 0}
+        )
+        per_agent["misses" if counter == "misses" else "hits"] += 1
+
+    def _store_memory(self, key: str, stored_at: float, body: str):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (stored_at, body)
+        self._memory_bytes += size
+
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._counters["evictions"] += 1
+
+    def _drop_memory(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str, now: float) -> Optional[str]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        if not self._is_fresh(record.get("stored_at", 0), now):
+            self._remove_disk(path)
+            return None
+        return record["body"]
+
+    def _write_disk(self, key: str, stored_at: float, body: str):
+        path = self._disk_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "body": body}, f, ensure_ascii=False)
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write response cache entry {path}: {e}")
+            return
+
+        with self._lock:
+            self._disk_bytes += path.stat().st_size - previous
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _remove_disk(self, path: Path):
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _evict_disk(self):
+        """Remove the least recently written entries until under budget."""
+        def mtime(f: Path) -> float:
+            try:
+                return f.stat().st_mtime
+            except FileNotFoundError:
+                return 0.0
+
+        for f in sorted(self.disk_dir.glob("*/*.json"), key=mtime):
+            with self._lock:
+                if self._disk_bytes <= self.disk_max_bytes:
+                    return
+                self._counters["evictions"] += 1
+            self._remove_disk(f)
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache() -> ResponseCache:
+    """Get the global response cache instance"""
+    return _response_cache
+
+
+def configure_response_cache(**kwargs) -> ResponseCache:
+    """
+    Replace the global response cache. Accepts the ResponseCache arguments,
+    e.g. configure_response_cache(enabled=True, ttl=3600, disk_dir="cache/").
+    """
+    global _response_cache
+    _response_cache = ResponseCache(**kwargs)
+    return _response_cache
@@ -0,0 +1,139 @@
+"""
+Single-flight request coalescing.
+
+When several callers ask for the same thing at the same time, only the
+first one (the leader) does the work; the others wait for it and share its
+result or exception. Nothing is remembered after the call completes, so
+this complements the response cache rather than replacing it.
+
+Usage:
+    flight = SingleFlight()
+    result, shared = flight.do(key, lambda: expensive(key))
+
+    aflight = AsyncSingleFlight()
+    result, shared = await aflight.do(key, lambda: expensive_async(key))
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Thread-based single-flight group."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._counters = {"leaders": 0, "shared": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn once per key among concurrent callers.
+
+        Returns:
+            (result, shared) - shared is True when the result came from
+            another caller's in-flight call
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._counters["leaders"] += 1
+                    leader = True
+                else:
+                    call.waiters += 1
+                    self._counters["shared"] += 1
+                    leader = False
+
+            if leader:
+                return self._lead(key, call, fn), False
+
+            call.done.wait()
+            if call.error is None:
+                return call.result, True
+            if isinstance(call.error, Exception):
+                raise call.error
+            # The leader was interrupted (KeyboardInterrupt, async replay
+            # hand-off, ...) rather than failing; take over as a new leader.
+
+    def _lead(self, key: Hashable, call: _Call, fn: Callable[[], Any]) -> Any:
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._counters, "in_flight": len(self._calls)}
+
+
+class AsyncSingleFlight:
+    """asyncio single-flight group. Keys are scoped to the running event loop."""
+
+    def __init__(self):
+        self._calls: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._counters = {"leaders": 0, "shared": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Awaitable equivalent of SingleFlight.do()."""
+        loop = asyncio.get_running_loop()
+        scoped_key = (id(loop), key)
+
+        while True:
+            future = self._calls.get(scoped_key)
+            if future is None:
+                break
+            self._counters["shared"] += 1
+            try:
+                # shield: a cancelled follower must not cancel the leader's call
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                if not future.cancelled() or _cancelling():
+                    raise
+                # The leader was cancelled rather than failing; take over as a new leader
+
+        future = loop.create_future()
+        self._calls[scoped_key] = future
+        self._counters["leaders"] += 1
+        try:
+            result = await fn()
+            future.set_result(result)
+            return result, False
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody waited on is not logged
+            future.exception()
+            raise
+        except BaseException:
+            # Cancelled or interrupted: followers retry instead of sharing it
+            future.cancel()
+            raise
+        finally:
+            self._calls.pop(scoped_key, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._counters, "in_flight": len(self._calls)}
+
+
+def _cancelling() -> bool:
+    """Whether the current task itself has been asked to cancel."""
+    task = asyncio.current_task()
+    cancelling = getattr(task, "cancelling", None)
+    return bool(cancelling()) if cancelling is not None else False
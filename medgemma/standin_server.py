@@ -0,0 +1,225 @@
+"""
+Local stand-in for the MedGemma model server.
+
+Implements the same HTTP surface as the real endpoint (/respond and /chat,
+multipart form with a JSON "messages" field, the streaming variants
+/respond_stream and /chat_stream, and /respond_batch unless batch=False)
+but answers instantly or after a configurable delay. Used by the benchmarks in this folder so they can run
+without a GPU.
+
+Timing model: `latency` is the time to the first token (prefill) and
+`token_latency` the time per generated token; `prefill_per_kb` adds prefill
+time per KB of request body, for prompts that grow. The non-streaming endpoints
+reply once every token is generated. With `spike_probability` set, that
+share of requests waits an extra `spike_latency` (GC pause, noisy
+neighbour, ...) to model tail latency, and `error_rate` of requests are
+answered with 503 to model transient server errors.
+
+Usage:
+    from medgemma.standin_server import StandInServer
+
+    server = StandInServer(latency=0.05).start()
+    print(server.url)      # e.g. http://127.0.0.1:54321
+    ...
+    server.stop()
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like uvicorn
+    disable_nagle_algorithm = True  # uvicorn sets TCP_NODELAY too
+
+    def setup(self):
+        super().setup()
+        with self.server.stats_lock:
+            self.server.stats["connections"] += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+
+        with self.server.stats_lock:
+            self.server.stats["requests"] += 1
+            self.server.stats["bytes_received"] += len(body)
+
+        owner = self.server.owner
+        if self.path == "/respond_batch" and owner.batch:
+            self._respond_batch(owner, body)
+            return
+
+        endpoint = self.path[:-len("_stream")] if self.path.endswith("_stream") else self.path
+        if endpoint not in ("/respond", "/chat"):
+            self._send_json(404, {"detail": "Not Found"})
+            return
+
+        if owner.error_rate and random.random() < owner.error_rate:
+            self._send_json(503, {"detail": "Service Unavailable"})
+            return
+
+        final = {}
+        if endpoint == "/chat":
+            final["conversation_id"] = self._form_field(body, "conversation_id") or str(uuid.uuid4())
+
+        time.sleep(owner.prefill_delay(len(body)))
+
+        if endpoint != self.path:
+            self._stream_tokens(owner, final)
+            return
+
+        if owner.token_latency:
+            time.sleep(owner.token_latency * len(owner.tokens()))
+        self._send_json(200, {"response": owner.reply_text, **final})
+
+    def _respond_batch(self, owner, body: bytes):
+        """All requests in a batch are generated together, so it costs one call's time."""
+        items = json.loads(self._form_field(body, "requests") or "[]")
+        with self.server.stats_lock:
+            self.server.stats["batched_requests"] += len(items)
+
+        time.sleep(owner.prefill_delay(len(body)))
+        if owner.token_latency:
+            time.sleep(owner.token_latency * len(owner.tokens()))
+        self._send_json(200, {"responses": [{"response": owner.reply_text} for _ in items]})
+
+    def _stream_tokens(self, owner, final: dict):
+        """Send the reply as server-sent events over a chunked response."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        for i, token in enumerate(owner.tokens()):
+            if i and owner.token_latency:
+                time.sleep(owner.token_latency)
+            self._write_chunk({"token": token})
+        self._write_chunk({"done": True, "response": owner.reply_text, **final})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _write_chunk(self, event: dict):
+        data = f"data: {json.dumps(event)}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _form_field(self, body: bytes, name: str) -> Optional[str]:
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            values = parse_qs(body.decode("utf-8")).get(name)
+            return values[0] if values else None
+
+        marker = f'name="{name}"'.encode("utf-8")
+        start = body.find(marker)
+        if start == -1:
+            return None
+        start = body.find(b"\r\n\r\n", start) + 4
+        end = body.find(b"\r\n", start)
+        return body[start:end].decode("utf-8")
+
+
+class _StandInHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients may drop a connection mid-reply (cancelled hedges, closed
+        # streams); that is expected, not a server error
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+class StandInServer:
+    """Threaded stand-in MedGemma server running in the background."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0,
+                 reply_text: str = "stand-in response", token_latency: float = 0.0,
+                 batch: bool = True, spike_probability: float = 0.0, spike_latency: float = 0.0,
+                 error_rate: float = 0.0, prefill_per_kb: float = 0.0):
+        self.host = host
+        self.port = port
+        self.error_rate = error_rate
+        self.batch = batch
+        self.spike_probability = spike_probability
+        self.spike_latency = spike_latency
+        self.latency = latency
+        self.prefill_per_kb = prefill_per_kb
+        self.token_latency = token_latency
+        self.reply_text = reply_text
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def prefill_delay(self, prompt_bytes: int = 0) -> float:
+        """Time to first token for one request, including any injected spike."""
+        delay = self.latency + self.prefill_per_kb * prompt_bytes / 1024
+        if self.spike_probability and random.random() < self.spike_probability:
+            return delay + self.spike_latency
+        return delay
+
+    def tokens(self) -> list:
+        """reply_text split into word tokens (whitespace kept) for streaming."""
+        words = self.reply_text.split(" ")
+        return [w + " " for w in words[:-1]] + [words[-1]]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self._httpd.server_address[1]}"
+
+    @property
+    def stats(self) -> dict:
+        with self._httpd.stats_lock:
+            return dict(self._httpd.stats)
+
+    def reset_stats(self):
+        with self._httpd.stats_lock:
+            for key in self._httpd.stats:
+                self._httpd.stats[key] = 0
+
+    def start(self) -> "StandInServer":
+        httpd = _StandInHTTPServer((self.host, self.port), _StandInHandler)
+        httpd.owner = self
+        httpd.stats_lock = threading.Lock()
+        httpd.stats = {"connections": 0, "requests": 0, "batched_requests": 0, "bytes_received": 0}
+
+        self._httpd = httpd
+        self._thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+if __name__ == "__main__":
+    server = StandInServer(port=8000).start()
+    print(f"Stand-in MedGemma server listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,98 @@
+"""
+Tests for the async agent wrappers, against the local stand-in model server.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma import medgemmaClient
+from medgemma.asyncAgents import async_agent, run_agent_async
+from medgemma.medgemmaClient import MedGemmaClient, close_async_transport
+from medgemma.standin_server import StandInServer
+
+
+@pytest.fixture
+def server(monkeypatch):
+    server = StandInServer(latency=0.2, reply_text="ok").start()
+    monkeypatch.setattr(medgemmaClient, "base_url", server.url)
+    yield server
+    server.stop()
+
+
+def summarize(patient_id: str, notes: str) -> dict:
+    """A typical agent: two model calls, the second built from the first reply."""
+    client = MedGemmaClient("You are a medical assistant.")
+    first = client.respond(f"Summarize the notes of {patient_id}: {notes}")
+    second = client.respond(f"Check this summary of {patient_id}: {first['response']}")
+    return {"patient_id": patient_id, "summary": first["response"], "check": second["response"]}
+
+
+def test_run_agent_async_returns_the_agent_result(server):
+    async def main():
+        try:
+            return await run_agent_async(summarize, "p1", notes="stable")
+        finally:
+            await close_async_transport()
+
+    assert asyncio.run(main()) == {"patient_id": "p1", "summary": "ok", "check": "ok"}
+    assert server.stats["requests"] == 2
+
+
+def test_many_agents_share_one_loop_without_a_thread_each(server):
+    summarize_async = async_agent(summarize)
+    peak_threads = 0
+
+    async def watch(done: asyncio.Event):
+        nonlocal peak_threads
+        while not done.is_set():
+            # Agents run in the loop's default executor ("asyncio_N" threads)
+            workers = sum(1 for t in threading.enumerate() if t.name.startswith("asyncio"))
+            peak_threads = max(peak_threads, workers)
+            await asyncio.sleep(0.01)
+
+    async def main():
+        done = asyncio.Event()
+        watcher = asyncio.create_task(watch(done))
+        try:
+            return await asyncio.gather(*[summarize_async(f"p{i}", "stable") for i in range(100)])
+        finally:
+            done.set()
+            await watcher
+            await close_async_transport()
+
+    start = time.perf_counter()
+    results = asyncio.run(main())
+    elapsed = time.perf_counter() - start
+
+    assert [r["patient_id"] for r in results] == [f"p{i}" for i in range(100)]
+    assert server.stats["requests"] == 200
+    # Two rounds of 0.2 s model calls, not 100 agents × 2 calls in sequence
+    assert elapsed < 10
+    # Threads only build prompts and parse replies; none waits on the model
+    assert 0 < peak_threads < 50
+
+
+def test_model_errors_reach_the_agent(server):
+    def fragile(patient_id: str):
+        client = MedGemmaClient("You are a medical assistant.")
+        try:
+            return client.respond(f"Hello {patient_id}")["response"]
+        except RuntimeError as e:
+            return f"failed: {type(e).__name__}"
+
+    server.stop()
+
+    async def main():
+        try:
+            return await run_agent_async(fragile, "p1")
+        finally:
+            await close_async_transport()
+
+    assert asyncio.run(main()).startswith("failed")
@@ -0,0 +1,102 @@
+"""
+Tests for hedged requests: the token-bucket budget and race().
+"""
+
+import asyncio
+import contextvars
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma.hedging import HedgeBudget, race, run_sync
+
+
+def _attempts(*latencies, errors=()):
+    """attempt() whose n-th call sleeps latencies[n] and returns n (or raises if n in errors)."""
+    started = []
+
+    async def attempt():
+        n = len(started)
+        started.append(n)
+        await asyncio.sleep(latencies[n])
+        if n in errors:
+            raise RuntimeError(f"attempt {n} failed")
+        return n
+
+    return attempt, started
+
+
+def test_budget_allows_ratio_of_calls():
+    budget = HedgeBudget(ratio=0.1, burst=10)
+    allowed = 0
+    for _ in range(100):
+        budget.on_call()
+        allowed += budget.try_spend()
+
+    assert allowed == 10
+    stats = budget.stats()
+    assert (stats["calls"], stats["hedges"], stats["denied"]) == (100, 10, 90)
+
+
+def test_budget_exhaustion_and_burst_cap():
+    budget = HedgeBudget(ratio=0.5, burst=2)
+    for _ in range(20):
+        budget.on_call()
+    # Only `burst` hedges were saved up
+    assert [budget.try_spend() for _ in range(3)] == [True, True, False]
+    assert budget.stats()["denied"] == 1
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    budget = HedgeBudget(ratio=1.0, burst=1)
+    attempt, started = _attempts(1.0, 0.01)
+
+    assert asyncio.run(race(attempt, lambda: 0.05, budget)) == 1
+    assert started == [0, 1]
+    assert budget.stats()["hedge_wins"] == 1
+
+
+def test_no_hedge_once_the_budget_is_spent():
+    budget = HedgeBudget(ratio=0.0, burst=1)
+    attempt, started = _attempts(0.2, 0.01)
+
+    assert asyncio.run(race(attempt, lambda: 0.05, budget)) == 0
+    assert started == [0]
+    assert budget.stats()["denied"] == 1
+
+
+def test_fast_primary_and_no_delay_are_not_hedged():
+    budget = HedgeBudget(ratio=1.0, burst=5)
+    attempt, started = _attempts(0.01, 0.01)
+    assert asyncio.run(race(attempt, lambda: 0.5, budget)) == 0
+
+    attempt, started_none = _attempts(0.1, 0.01)
+    assert asyncio.run(race(attempt, lambda: None, budget)) == 0
+    assert (started, started_none) == ([0], [0])
+    assert budget.stats()["hedges"] == 0
+
+
+def test_failed_hedge_falls_back_to_the_primary():
+    budget = HedgeBudget(ratio=1.0, burst=1)
+    attempt, _ = _attempts(0.2, 0.01, errors={1})
+    assert asyncio.run(race(attempt, lambda: 0.05, budget)) == 0
+
+
+def test_both_failing_raises_the_first_error():
+    budget = HedgeBudget(ratio=1.0, burst=1)
+    attempt, _ = _attempts(0.2, 0.01, errors={0, 1})
+    with pytest.raises(RuntimeError, match="attempt 1 failed"):
+        asyncio.run(race(attempt, lambda: 0.05, budget))
+
+
+def test_run_sync_sees_the_callers_context():
+    marker = contextvars.ContextVar("marker", default=None)
+
+    async def read():
+        return marker.get()
+
+    marker.set("request-1")
+    assert run_sync(read()) == "request-1"
@@ -0,0 +1,95 @@
+"""
+Tests for image pre-processing before upload.
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma.imagePrep import PreparedImage, prepare_image
+
+
+def _encode(img: Image.Image, format: str, **kwargs) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format=format, **kwargs)
+    return out.getvalue()
+
+
+def _photo(width: int, height: int) -> Image.Image:
+    """A noisy color image, so JPEG can't shrink it to nothing."""
+    rng = np.random.default_rng(0)
+    return Image.fromarray(rng.integers(0, 255, (height, width, 3), dtype=np.uint8), "RGB")
+
+
+def test_large_photo_is_downsampled_and_reencoded():
+    raw = _encode(_photo(3000, 2000), "PNG")
+    prepared = prepare_image(raw)
+
+    assert prepared.size == (896, 597)
+    assert prepared.format == "JPEG"
+    assert prepared.content_type == "image/jpeg"
+    assert prepared.original_size == (3000, 2000)
+    assert prepared.original_bytes == len(raw)
+    assert len(prepared.data) < len(raw)
+    assert Image.open(io.BytesIO(prepared.data)).size == (896, 597)
+
+
+def test_small_image_keeps_its_original_bytes():
+    raw = _encode(_photo(64, 64), "JPEG", quality=50)
+    prepared = prepare_image(raw)
+
+    assert prepared.data == raw
+    assert prepared.size == (64, 64)
+
+
+def test_sixteen_bit_xray_is_windowed_to_eight_bit_gray():
+    xray = np.linspace(1000, 5000, 256 * 256).reshape(256, 256).astype(np.uint16)
+    prepared = prepare_image(_encode(Image.fromarray(xray), "PNG"), image_format="PNG")
+
+    assert prepared.mode == "L"
+    pixels = np.asarray(Image.open(io.BytesIO(prepared.data)))
+    # The used range 1000..5000 is stretched to the full 0..255
+    assert (pixels.min(), pixels.max()) == (0, 255)
+
+
+def test_gray_photo_of_a_film_is_sent_as_grayscale():
+    gray = Image.new("RGB", (1200, 1200), (120, 122, 119))
+    prepared = prepare_image(_encode(gray, "PNG"))
+    assert prepared.mode == "L"
+    assert prepared.size == (896, 896)
+
+
+def test_alpha_is_flattened_onto_white():
+    transparent = Image.new("RGBA", (2000, 1000), (255, 0, 0, 0))
+    prepared = prepare_image(_encode(transparent, "PNG"))
+
+    assert prepared.mode == "L"          # fully transparent → plain white, i.e. gray
+    assert Image.open(io.BytesIO(prepared.data)).getpixel((10, 10)) >= 250
+
+
+def test_exif_orientation_is_applied():
+    portrait = _photo(1000, 2000)
+    exif = Image.Exif()
+    exif[0x0112] = 6                      # rotated 90°: displayed as landscape
+    prepared = prepare_image(_encode(portrait, "JPEG", exif=exif))
+    assert prepared.size[0] > prepared.size[1]
+
+
+def test_other_inputs():
+    img = _photo(1000, 500)
+    from_pil = prepare_image(img, max_side=100)
+    assert from_pil.size == (100, 50)
+    assert prepare_image(from_pil) is from_pil
+    assert prepare_image(_encode(img, "PNG"), max_side=0).size == (1000, 500)
+
+    with pytest.raises(ValueError):
+        prepare_image(b"not an image")
+    with pytest.raises(TypeError):
+        prepare_image(12345)
+    assert isinstance(from_pil, PreparedImage)
@@ -0,0 +1,119 @@
+"""
+Tests for the replica pool: least-outstanding-requests routing, passive
+ejection, /chat pinning and the active health check.
+"""
+
+import sys
+from contextlib import ExitStack
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma.replicaPool import ReplicaPool
+from medgemma.standin_server import StandInServer
+
+URLS = ["http://gpu-1:8000", "http://gpu-2:8000", "http://gpu-3:8000"]
+
+
+def _pool(**kwargs) -> ReplicaPool:
+    return ReplicaPool(URLS, health_interval=None, **kwargs)
+
+
+def test_routes_to_the_replica_with_fewest_outstanding_requests():
+    pool = _pool()
+    with ExitStack() as stack:
+        first = [stack.enter_context(pool.acquire()).url for _ in range(3)]
+        # One request each before any replica gets a second
+        assert sorted(first) == URLS
+
+        with ExitStack() as inner:
+            second = [inner.enter_context(pool.acquire()).url for _ in range(2)]
+            idle = next(url for url in URLS if url not in second)
+            # The only replica with a single request in flight
+            assert inner.enter_context(pool.acquire()).url == idle
+        assert [r["outstanding"] for r in pool.stats()] == [1, 1, 1]
+
+    assert [r["outstanding"] for r in pool.stats()] == [0, 0, 0]
+
+
+def test_ties_go_to_the_lower_latency_replica():
+    pool = _pool()
+    for replica, latency in zip(pool.replicas, (0.5, 0.1, 0.9)):
+        replica.latency_ewma = latency
+    for _ in range(5):
+        with pool.acquire() as lease:
+            assert lease.url == URLS[1]
+
+
+def test_exclude_avoids_a_replica_while_others_are_healthy():
+    pool = ReplicaPool(URLS[:2], health_interval=None)
+    for _ in range(4):
+        with pool.acquire(exclude=[URLS[0]]) as lease:
+            assert lease.url == URLS[1]
+
+
+def test_consecutive_failures_eject_a_replica():
+    pool = _pool(failure_threshold=2, eject_seconds=60)
+    bad = pool.replicas[0]
+    bad.latency_ewma = 0.0          # preferred while healthy
+    for other in pool.replicas[1:]:
+        other.latency_ewma = 1.0
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            with pool.acquire() as lease:
+                assert lease.url == bad.url
+                raise RuntimeError("connection refused")
+
+    assert not pool.stats()[0]["healthy"]
+    for _ in range(4):
+        with pool.acquire() as lease:
+            assert lease.url != bad.url
+
+
+def test_cancelled_requests_are_not_failures():
+    pool = _pool(failure_threshold=1)
+    with pytest.raises(KeyboardInterrupt):
+        with pool.acquire():
+            raise KeyboardInterrupt()
+    assert [r["failures"] for r in pool.stats()] == [0, 0, 0]
+    assert all(r["healthy"] for r in pool.stats())
+
+
+def test_all_ejected_still_routes():
+    pool = _pool(failure_threshold=1)
+    for replica in pool.replicas:
+        pool._eject(replica, 60)
+    with pool.acquire() as lease:
+        assert lease.url in URLS
+
+
+def test_chat_is_pinned_to_its_replica_until_it_goes_down():
+    pool = _pool()
+    pool.pin("conv-1", URLS[2])
+    with pool.acquire(), pool.acquire():
+        # Busier than the others, but it owns the conversation
+        for _ in range(3):
+            with pool.acquire(conversation_id="conv-1") as lease:
+                assert lease.url == URLS[2]
+
+    pool._eject(pool.replicas[2], 60)
+    with pool.acquire(conversation_id="conv-1") as lease:
+        assert lease.url != URLS[2]
+    assert pool.stats()[2]["pinned_conversations"] == 0
+
+
+def test_health_check_ejects_and_reinstates():
+    server = StandInServer().start()
+    pool = ReplicaPool([server.url, "http://127.0.0.1:1"], health_interval=None)
+    try:
+        assert pool.check_health() == {server.url: True, "http://127.0.0.1:1": False}
+        assert [r["healthy"] for r in pool.stats()] == [True, False]
+
+        pool._eject(pool.replicas[0], 60)
+        pool.check_health()
+        assert pool.stats()[0]["healthy"]
+    finally:
+        server.stop()
@@ -0,0 +1,191 @@
+"""
+Tests for deadlines, retries and the circuit breaker, including which
+errors count against a server.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma import resilience
+from medgemma.medgemmaClient import MedGemmaClient
+from medgemma.replicaPool import Lease, ReplicaPool
+from medgemma.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, ModelServerError, call_with_retries,
+    deadline, get_breaker, is_server_fault, timeout_for
+)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("http://gpu-1:8000", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    breaker.before_call()
+    breaker.record_success()          # resets the streak
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_half_open_lets_one_trial_through(clock):
+    breaker = CircuitBreaker("http://gpu-1:8000", failure_threshold=1, reset_timeout=30)
+    breaker.before_call()
+    breaker.record_failure()
+
+    clock.now += 30
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()         # only one trial at a time
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_and_cancelled_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("http://gpu-1:8000", failure_threshold=1, reset_timeout=30)
+    breaker.before_call()
+    breaker.record_failure()
+    clock.now += 30
+
+    breaker.before_call()
+    breaker.record_cancelled()
+    breaker.before_call()             # the slot is free again
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29
+    assert breaker.state == "open"
+
+
+def test_which_errors_are_server_faults():
+    assert is_server_fault(ModelServerError("503", status_code=503, retryable=True))
+    assert is_server_fault(ModelServerError("timed out", retryable=True))
+    assert is_server_fault(ModelServerError("stream interrupted"))
+    assert is_server_fault(RuntimeError("Invalid JSON response"))
+    assert not is_server_fault(DeadlineExceeded("deadline"))
+    assert not is_server_fault(ModelServerError("400", status_code=400))
+    assert not is_server_fault(ModelServerError("422", status_code=422))
+    assert is_server_fault(ModelServerError("429", status_code=429, retryable=True))
+    assert not is_server_fault(KeyboardInterrupt())
+
+
+def _guarded(client: MedGemmaClient, lease: Lease, error: BaseException):
+    with pytest.raises(type(error)):
+        with client._guard(lease):
+            raise error
+
+
+def test_guard_ignores_deadlines_and_bad_requests():
+    url = "http://guard-test-1:8000"
+    client = MedGemmaClient("test", agent_name="test")
+    for _ in range(resilience.failure_threshold * 2):
+        _guarded(client, Lease(url), DeadlineExceeded("client deadline"))
+        _guarded(client, Lease(url), ModelServerError("API Error 400", status_code=400))
+    assert get_breaker(url).state == "closed"
+
+    for _ in range(resilience.failure_threshold):
+        _guarded(client, Lease(url), ModelServerError("API Error 503", status_code=503, retryable=True))
+    assert get_breaker(url).state == "open"
+
+
+def test_guard_counts_5xx_leases_as_failures():
+    url = "http://guard-test-2:8000"
+    client = MedGemmaClient("test", agent_name="test")
+    for _ in range(resilience.failure_threshold):
+        with client._guard(Lease(url)) as lease:
+            lease.failed = True
+    assert get_breaker(url).state == "open"
+
+
+def test_deadlines_do_not_eject_pool_replicas():
+    pool = ReplicaPool(["http://gpu-1:8000"], health_interval=None, failure_threshold=1)
+    client = MedGemmaClient("test", agent_name="test")
+    client.pool = pool
+    with pytest.raises(DeadlineExceeded):
+        with client._route("/respond", {}) as lease:
+            raise DeadlineExceeded("client deadline")
+    assert pool.stats()[0]["healthy"]
+    assert pool.stats()[0]["failures"] == 0
+    assert lease.cancelled
+
+
+def test_timeout_is_cut_to_the_deadline():
+    assert timeout_for(30) == 30
+    with deadline(10):
+        assert timeout_for(30) <= 10
+        assert timeout_for(None) <= 10
+        with deadline(60):            # nested deadlines never extend
+            assert timeout_for(None) <= 10
+    with deadline(0):
+        with pytest.raises(DeadlineExceeded):
+            timeout_for(30)
+
+
+def test_retries_only_retryable_errors(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 0.0)
+    calls = []
+
+    def flaky(tried):
+        calls.append(list(tried))
+        tried.append(f"http://gpu-{len(calls)}:8000")
+        if len(calls) < 3:
+            raise ModelServerError("503", status_code=503, retryable=True)
+        return "ok"
+
+    assert call_with_retries(flaky) == "ok"
+    # Each attempt sees the replicas already tried
+    assert calls == [[], ["http://gpu-1:8000"], ["http://gpu-1:8000", "http://gpu-2:8000"]]
+
+    calls.clear()
+
+    def rejected(tried):
+        calls.append(1)
+        raise ModelServerError("400", status_code=400)
+
+    with pytest.raises(ModelServerError):
+        call_with_retries(rejected)
+    assert calls == [1]
+
+
+def test_no_retry_past_the_deadline(monkeypatch):
+    monkeypatch.setattr(resilience, "backoff_delay", lambda attempt: 5.0)
+    calls = []
+
+    def failing(tried):
+        calls.append(1)
+        raise ModelServerError("503", status_code=503, retryable=True)
+
+    start = time.monotonic()
+    with deadline(1):
+        with pytest.raises(ModelServerError):
+            call_with_retries(failing)
+    assert calls == [1]
+    assert time.monotonic() - start < 1
@@ -0,0 +1,115 @@
+"""
+Tests for the content-addressed /respond cache: keys, hits and misses,
+expiry, LRU eviction and the disk tier.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma import responseCache
+from medgemma.responseCache import ResponseCache
+
+
+def _key(text: str, files=None) -> str:
+    return ResponseCache.make_key("/respond", {"system": "You are a dietitian.", "user": text}, files)
+
+
+class _Clock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_key_covers_fields_and_file_bytes():
+    image = [("file", ("meal.jpg", b"\xff\xd8 one", "image/jpeg"))]
+    other_image = [("file", ("meal.jpg", b"\xff\xd8 two", "image/jpeg"))]
+
+    assert _key("hello") == _key("hello")
+    assert _key("hello") != _key("hello!")
+    assert _key("hello", image) != _key("hello", other_image)
+    assert ResponseCache.make_key("/respond", {"a": "1", "b": "2"}) == \
+        ResponseCache.make_key("/respond", {"b": "2", "a": "1"})
+
+
+def test_miss_then_hit_returns_a_copy():
+    cache = ResponseCache(enabled=True)
+    key = _key("plan a meal")
+
+    assert cache.get(key, "nutritionalAgent") is None
+    cache.put(key, {"response": "oats", "tags": ["breakfast"]})
+    hit = cache.get(key, "nutritionalAgent")
+    hit["tags"].append("changed")
+
+    assert cache.get(key, "nutritionalAgent") == {"response": "oats", "tags": ["breakfast"]}
+    stats = cache.stats()
+    assert (stats["misses"], stats["memory_hits"], stats["hit_rate"]) == (1, 2, round(2 / 3, 4))
+    assert stats["agents"]["nutritionalAgent"] == {"hits": 2, "misses": 1}
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(responseCache.time, "time", clock)
+    cache = ResponseCache(enabled=True, ttl=60)
+    key = _key("plan a meal")
+    cache.put(key, {"response": "oats"})
+
+    clock.now += 59
+    assert cache.get(key) == {"response": "oats"}
+    clock.now += 2
+    assert cache.get(key) is None
+    assert cache.stats()["memory_entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResponseCache(enabled=True, max_entries=2)
+    a, b, c = _key("a"), _key("b"), _key("c")
+    cache.put(a, {"response": "a"})
+    cache.put(b, {"response": "b"})
+    cache.get(a)                      # a is now the most recently used
+    cache.put(c, {"response": "c"})
+
+    assert cache.get(b) is None
+    assert cache.get(a) == {"response": "a"}
+    assert cache.get(c) == {"response": "c"}
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_tier_survives_a_restart_and_expires(tmp_path, monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(responseCache.time, "time", clock)
+    key = _key("summarize the EHR")
+    ResponseCache(enabled=True, ttl=60, disk_dir=str(tmp_path)).put(key, {"response": "summary"})
+
+    restarted = ResponseCache(enabled=True, ttl=60, disk_dir=str(tmp_path))
+    assert restarted.get(key) == {"response": "summary"}
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 61
+    assert ResponseCache(enabled=True, ttl=60, disk_dir=str(tmp_path)).get(key) is None
+    assert list(tmp_path.glob("*/*.json")) == []
+
+
+def test_disk_tier_stays_under_its_budget(tmp_path):
+    cache = ResponseCache(enabled=True, disk_dir=str(tmp_path), disk_max_bytes=600)
+    for i in range(10):
+        cache.put(_key(f"meal {i}"), {"response": "x" * 100})
+
+    assert cache.stats()["disk_bytes"] <= 600
+    assert sum(f.stat().st_size for f in tmp_path.glob("*/*.json")) == cache.stats()["disk_bytes"]
+
+
+def test_agent_switches():
+    cache = ResponseCache(enabled=True)
+    cache.disable_agent("interview_message")
+    assert not cache.is_enabled_for("interview_message")
+    assert cache.is_enabled_for("nutritionalAgent")
+
+    opt_in = ResponseCache(enabled=True, agents_enabled_by_default=False)
+    opt_in.enable_agent("ehr_summary_to_report")
+    assert opt_in.is_enabled_for("ehr_summary_to_report")
+    assert not opt_in.is_enabled_for("nutritionalAgent")
+    assert not ResponseCache().is_enabled_for("ehr_summary_to_report")
@@ -0,0 +1,181 @@
+"""
+Tests for single-flight coalescing, thread-based and asyncio.
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from medgemma.singleFlight import AsyncSingleFlight, SingleFlight
+
+
+class _Interrupted(BaseException):
+    """Stands in for a leader interrupted rather than failing (e.g. KeyboardInterrupt)."""
+
+
+def _run_threads(n, target):
+    results = [None] * n
+    barrier = threading.Barrier(n)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target(i)
+        except BaseException as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"response": "ok"}
+
+    results = _run_threads(8, lambda i: flight.do("key", fetch))
+
+    assert len(calls) == 1
+    assert all(result == {"response": "ok"} for result, _ in results)
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert flight.stats() == {"leaders": 1, "shared": 7, "in_flight": 0}
+
+
+def test_different_keys_and_later_calls_run_separately():
+    flight = SingleFlight()
+    assert flight.do("a", lambda: 1) == (1, False)
+    assert flight.do("b", lambda: 2) == (2, False)
+    assert flight.do("a", lambda: 3) == (3, False)
+
+
+def test_leader_error_is_shared():
+    flight = SingleFlight()
+
+    def fetch():
+        time.sleep(0.2)
+        raise RuntimeError("model unavailable")
+
+    results = _run_threads(4, lambda i: flight.do("key", fetch))
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["leaders"] == 1
+
+
+def test_follower_takes_over_from_an_interrupted_leader():
+    flight = SingleFlight()
+    leader_started = threading.Event()
+    calls = []
+
+    def interrupted():
+        calls.append("leader")
+        leader_started.set()
+        time.sleep(0.2)
+        raise _Interrupted()
+
+    def fetch():
+        calls.append("follower")
+        return "ok"
+
+    def leader():
+        try:
+            flight.do("key", interrupted)
+        except _Interrupted:
+            pass
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    leader_started.wait()
+    assert flight.do("key", fetch) == ("ok", False)
+    thread.join()
+    assert calls == ["leader", "follower"]
+
+
+def test_async_concurrent_callers_share_one_call():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        return await asyncio.gather(*[flight.do("key", fetch) for _ in range(10)])
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False] + [True] * 9
+    assert flight.stats() == {"leaders": 1, "shared": 9, "in_flight": 0}
+
+
+def test_async_follower_takes_over_from_a_cancelled_leader():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fetch(name):
+        calls.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", lambda: fetch("leader")))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("key", lambda: fetch("follower"))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    results = asyncio.run(main())
+    # One follower became the new leader; the others shared its call
+    assert calls == ["leader", "follower"]
+    assert sorted(results, key=lambda r: r[1]) == [("follower", False), ("follower", True), ("follower", True)]
+
+
+def test_async_cancelled_follower_leaves_the_leader_running():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("key", fetch))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == ("ok", False)
+
+
+def test_async_leader_error_is_shared():
+    flight = AsyncSingleFlight()
+
+    async def fetch():
+        await asyncio.sleep(0.02)
+        raise RuntimeError("model unavailable")
+
+    async def main():
+        return await asyncio.gather(*[flight.do("key", fetch) for _ in range(3)], return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert flight.stats()["leaders"] == 1
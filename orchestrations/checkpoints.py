@@ -0,0 +1,180 @@
+"""
+Stage checkpoints for pipeline_graph pipelines.
+
+Every completed step's output is written to disk under the run's id,
+together with a SHA-256 of the step's inputs. Running the same pipeline
+again with that run id (a resume or a retry from the frontend) restores
+every step whose inputs hash the same instead of calling the model again;
+steps whose inputs changed, and everything after them, run as usual.
+
+Layout: one directory per run, one JSON file per step:
+
+    <directory>/<run_id>/<pipeline>.<step>.json
+        {"input_hash": "...", "saved_at": 1700000000.0, "output": ...}
+
+Outputs that are not JSON-serializable are not checkpointed. Runs older
+than `ttl` are deleted.
+
+Usage:
+    from orchestrations.checkpoints import configure_checkpoints, new_run_id
+
+    configure_checkpoints(directory="/var/lib/medgemma/checkpoints", ttl=6 * 3600)
+
+    run_id = new_run_id()
+    report = digitaltwinpipeline(patient_id, logs, run_id=run_id)
+    # ... the request fails in a late stage; retry with the same run_id:
+    report = digitaltwinpipeline(patient_id, logs, run_id=run_id)
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Defaults for the global store
+default_directory = Path(__file__).parent.parent / "ehr_store" / "checkpoints"
+default_ttl = 24 * 3600      # seconds a run is kept
+prune_interval = 600         # seconds between sweeps for expired runs
+
+_RUN_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_run_id() -> str:
+    return uuid.uuid4().hex
+
+
+def validate_run_id(run_id: str) -> str:
+    """Raise ValueError unless run_id is safe to use as a directory name."""
+    if not isinstance(run_id, str) or not _RUN_ID.match(run_id):
+        raise ValueError(f"Invalid run_id: {run_id!r} (expected 1-64 letters, digits, '-' or '_')")
+    return run_id
+
+
+def input_hash(pipeline: str, step: str, fn: Any, args: list, kwargs: Dict[str, Any]) -> Optional[str]:
+    """
+    Hash of everything a step's output depends on: the step, the function
+    and its argument values. None if the arguments are not JSON-serializable.
+    """
+    try:
+        body = json.dumps(
+            [pipeline, step, f"{getattr(fn, '__module__', '')}.{getattr(fn, '__qualname__', fn)}", args, kwargs],
+            sort_keys=True, ensure_ascii=False
+        )
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """Step outputs on disk, per run id."""
+
+    def __init__(self, enabled: bool = True, directory: Optional[str] = None, ttl: Optional[float] = default_ttl):
+        """
+        Args:
+            enabled: Master switch (when off, nothing is read or written)
+            directory: Where runs are stored (None = ehr_store/checkpoints)
+            ttl: Seconds a run is kept after its last write (None = forever)
+        """
+        self.enabled = enabled
+        self.directory = Path(directory) if directory else default_directory
+        self.ttl = ttl
+
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+        self._counters = {"restored": 0, "saved": 0, "misses": 0, "unserializable": 0}
+
+    def get(self, run_id: str, pipeline: str, step: str, digest: Optional[str]) -> Tuple[bool, Any]:
+        """(True, output) if the step already ran with the same inputs, else (False, None)."""
+        if not self.enabled or digest is None:
+            return False, None
+        path = self._path(run_id, pipeline, step)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            record = None
+
+        with self._lock:
+            if record is None or record.get("input_hash") != digest:
+                self._counters["misses"] += 1
+                return False, None
+            self._counters["restored"] += 1
+        return True, record["output"]
+
+    def put(self, run_id: str, pipeline: str, step: str, digest: Optional[str], output: Any):
+        if not self.enabled or digest is None:
+            return
+        try:
+            body = json.dumps({"input_hash": digest, "saved_at": time.time(), "output": output}, ensure_ascii=False)
+        except (TypeError, ValueError):
+            with self._lock:
+                self._counters["unserializable"] += 1
+            return
+
+        path = self._path(run_id, pipeline, step)
+        tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write checkpoint {path}: {e}")
+            return
+
+        with self._lock:
+            self._counters["saved"] += 1
+            prune = self.ttl is not None and time.time() - self._last_prune > prune_interval
+            if prune:
+                self._last_prune = time.time()
+        if prune:
+            self.prune()
+
+    def has_run(self, run_id: str) -> bool:
+        return (self.directory / validate_run_id(run_id)).is_dir()
+
+    def delete_run(self, run_id: str):
+        shutil.rmtree(self.directory / validate_run_id(run_id), ignore_errors=True)
+
+    def prune(self):
+        """Delete runs not written to within the ttl."""
+        if self.ttl is None or not self.directory.is_dir():
+            return
+        cutoff = time.time() - self.ttl
+        for run_dir in self.directory.iterdir():
+            try:
+                if run_dir.is_dir() and run_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(run_dir, ignore_errors=True)
+            except FileNotFoundError:
+                continue
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "directory": str(self.directory), **self._counters}
+
+    def _path(self, run_id: str, pipeline: str, step: str) -> Path:
+        return self.directory / validate_run_id(run_id) / f"{pipeline}.{step}.json"
+
+
+_checkpoint_store = CheckpointStore()
+
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Get the global checkpoint store instance"""
+    return _checkpoint_store
+
+
+def configure_checkpoints(**kwargs) -> CheckpointStore:
+    """
+    Replace the global checkpoint store. Accepts the CheckpointStore
+    arguments, e.g. configure_checkpoints(directory="checkpoints/", ttl=3600).
+    """
+    global _checkpoint_store
+    _checkpoint_store = CheckpointStore(**kwargs)
+    return _checkpoint_store
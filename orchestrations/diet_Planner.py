@@ -2,53 +2,55 @@ from agents.sAgents.dietplanner.final_reporter import finalReporter
 from agents.sAgents.dietplanner.diet_planner import dietPlanner as generateDietPlan
 from agents.sAgents.dietplanner.validation_agent import validationAgent
 from agents.sAgents.dietplanner.contraindication_agent import contraindicationAgent
-from agents.sAgents.dietplanner.ehr_agent import ehrAgent
 from agents.sAgents.dietplanner.nutrition_agent import nutritionAgent
-from agents.sAgents.cache import get_ehr_summary
-from agents.sAgents.differentialdiagnosis.ehrReport import ehr_summary_to_report
+from agents.sAgents.shared_summary import get_patient_summary
+from orchestrations.pipeline_graph import Pipeline, Step
 import json
 
 
-def dietPlanner(patient_id,current_report):
-    # Step 1: Get EHR summary
-    print('ehr_summary fetching')
-    ehr_summary = get_ehr_summary(patient_id, ehr_summary_to_report)
-    # get patient summary
-    print('patient summary fetching')
-    patient_summary = ehrAgent(patient_id, ehr_summary, current_report)
-    print('patient summary:', patient_summary)
-    print('nutrition requirements fetching')
+def _patient_summary(patient_id, current_report):
+    # Shared with the other pipelines for the same EHR and report
+    return get_patient_summary(patient_id, current_report, view="planning")
 
-    # Step 2: Analyze nutrition requirements
-    nutrition_requirements = nutritionAgent(patient_id, patient_summary)
-    print('nutrition requirements:', nutrition_requirements)
-    print('identifying contraindications')
 
+# Every step needs the one before it, so this pipeline is a single chain;
+# the graph still records per-step timings
+_pipeline = Pipeline("diet", [
+    # Step 1: Get the (shared) patient summary
+    Step("patient_summary", _patient_summary, inputs=["patient_id", "current_report"]),
+    # Step 2: Analyze nutrition requirements
+    Step("nutrition_requirements", nutritionAgent, inputs=["patient_id", "patient_summary"]),
     # Step 3: Identify contraindications
-    contraindications = contraindicationAgent(patient_id, patient_summary, nutrition_requirements)
-    print('contraindications:', contraindications)
-    print('generating diet plan')
-
+    Step("contraindications", contraindicationAgent,
+         inputs=["patient_id", "patient_summary", "nutrition_requirements"]),
     # Step 4: Generate diet plan
-    diet_plan = generateDietPlan(patient_id, patient_summary, nutrition_requirements, contraindications)
-    print('diet plan:', diet_plan)
-    print('validating diet plan')
-
+    Step("diet_plan", generateDietPlan,
+         inputs=["patient_id", "patient_summary", "nutrition_requirements", "contraindications"]),
     # Step 5: Validate diet plan
-    validation = validationAgent(patient_id, patient_summary, diet_plan, contraindications)
-    print('validation result:', validation)
-    print('generating final report')
-
+    Step("validation", validationAgent, inputs=["patient_id", "patient_summary", "diet_plan", "contraindications"]),
     # Step 6: Generate final report
-    final_report = finalReporter(
-        patient_id=patient_id,
-        patient_summary=patient_summary,
-        nutrition_requirements=nutrition_requirements,
-        diet_plan=diet_plan,
-        validation=validation
-    )
-    print('final report:', final_report)
-    return final_report
-
-
-dietPlanner(patient_id='p1', current_report='Patient has diabetes and hypertension.')
\ No newline at end of file
+    Step("final_report", finalReporter, kwargs={
+        "patient_id": "patient_id",
+        "patient_summary": "patient_summary",
+        "nutrition_requirements": "nutrition_requirements",
+        "diet_plan": "diet_plan",
+        "validation": "validation",
+    }),
+])
+
+
+def dietPlanner(patient_id,current_report, run_id=None):
+    print('running diet pipeline')
+    run = _pipeline.run(run_id=run_id, patient_id=patient_id, current_report=current_report)
+
+    print('patient summary:', run['patient_summary'])
+    print('nutrition requirements:', run['nutrition_requirements'])
+    print('contraindications:', run['contraindications'])
+    print('diet plan:', run['diet_plan'])
+    print('validation result:', run['validation'])
+    print('final report:', run['final_report'])
+    return run['final_report']
+
+
+if __name__ == "__main__":
+    dietPlanner(patient_id='p1', current_report='Patient has diabetes and hypertension.')
@@ -6,14 +6,284 @@ from agents.sAgents.digitaltwin.finalreport import digitalTwinState
 from agents.sAgents.digitaltwin.logsAgent import dailylogsAgent, weeklylogsAgent, monthlylogsAgent
 from agents.sAgents.digitaltwin.forecastAgent import forecastAgent
 from agents.sAgents.digitaltwin.memoryAgents import dailyProfile, WeeklyProfile, monthlyProfile
-from agents.sAgents.digitaltwin.patientContextAgent import pca
 from agents.sAgents.digitaltwin.symptomsCorelatorAgent import symptomsCorelatorAgent
 from agents.sAgents.digitaltwin.diffReasoner import diffreasoner
+from agents.sAgents.shared_summary import get_patient_summary
 from ehr_store.patientdata.data_manager import append_daily_log, load_report
 from ehr_store.patientdata.data_manager import get_recent_daily_logs
+from orchestrations.pipeline_graph import Pipeline, Step
 import json
 
-def digitaltwinpipeline(patient_id: str, input_logs: dict):
+# Max agent calls of one digital twin run in flight at once
+max_concurrency = 5
+
+
+def _json(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+# =============================================================================
+# STEPS
+# Each step parses its agent's JSON output; see _build_pipeline() for the
+# dependencies between them.
+# =============================================================================
+
+def _patient_context(patient_id, patient_report):
+    # The shared patient summary: built from the cached EHR summary, not the
+    # raw records, and reused by the other pipelines for the same report
+    print("  📋 Loading patient context from EHR...")
+    patient_context = _json(get_patient_summary(patient_id, patient_report, view="patient_context"))
+    print("  ✅ Patient context loaded successfully")
+    return patient_context
+
+
+def _weekly_logs(patient_id):
+    return get_recent_daily_logs(patient_id, number_of_days=7)
+
+
+def _monthly_logs(patient_id):
+    return get_recent_daily_logs(patient_id, number_of_days=30)
+
+
+def _nutrition_analysis(patient_id, input_logs):
+    print("  📋 Enriching nutrition data...")
+    try:
+        if "nutrition" in input_logs:
+            print("  🔍 Nutrition data found, analyzing...")
+            print(f"  📊 Original Nutrition Data: {input_logs.get('nutrition', 'None')}")
+            nutrition_analysis = _json(nutritionalAgent(input_logs.get("nutrition", None)))
+            print("  ✅ Nutrition data enriched successfully")
+        else:
+            print(" ⚠️  No nutrition data provided, skipping enrichment")
+            nutrition_analysis = None
+    except Exception as e:
+        print(f"  ⚠️  Error enriching nutrition data: {e}")
+        nutrition_analysis = None
+    return nutrition_analysis
+
+
+def _daily_log(patient_id, input_logs, nutrition_analysis, weekly_logs, monthly_logs):
+    # Waits for the weekly/monthly reads so they don't see today's log. When
+    # a resumed run restores this step from its checkpoint, the log is not
+    # appended a second time.
+    daily_log = dict(input_logs)
+    if nutrition_analysis is not None:
+        # Update daily logs with enriched nutrition data
+        daily_log["nutrition_enriched"] = nutrition_analysis
+        print("new dailylogs are ")
+
+        # appent these logs to daily logs
+        append_daily_log(patient_id, daily_log)
+    return daily_log
+
+
+def _daily_logs_summary(patient_id, patient_context, daily_log):
+    print("  📋 Processing daily logs...")
+    return _json(dailylogsAgent(patient_id, patient_context, daily_log))
+
+
+def _weekly_logs_summary(patient_id, patient_context, weekly_logs):
+    print("  📋 Processing weekly logs...")
+    return _json(weeklylogsAgent(patient_id, patient_context, weekly_logs))
+
+
+def _monthly_logs_summary(patient_id, patient_context, monthly_logs):
+    print("  📋 Processing monthly logs...")
+    return _json(monthlylogsAgent(patient_id, patient_context, monthly_logs))
+
+
+def _daily_memory_profile(patient_id, patient_context, weekly_logs_summary, patient_report):
+    print("  🧠 Creating daily memory profile...")
+    return _json(dailyProfile(patient_id, patient_context, weekly_logs_summary, patient_report))
+
+
+def _weekly_memory_profile(patient_id, patient_context, weekly_logs_summary, patient_report):
+    print("  🧠 Creating weekly memory profile...")
+    return _json(WeeklyProfile(patient_id, patient_context, weekly_logs_summary, patient_report))
+
+
+def _monthly_memory_profile(patient_id, patient_context, monthly_logs_summary, patient_report):
+    print("  🧠 Creating monthly memory profile...")
+    return _json(monthlyProfile(patient_id, patient_context, monthly_logs_summary, patient_report))
+
+
+def _med_adherence_analysis(patient_id, patient_context, weekly_logs_summary):
+    print("  🔬 Analyzing medication adherence...")
+    return _json(medicationAdherenceAgent(
+        patient_id,
+        patient_context,
+        weekly_logs_summary
+    ))
+
+
+def _lifestyle_evaluation(patient_id, patient_context, monthly_logs_summary, patient_report):
+    print("  🔬 Evaluating lifestyle factors...")
+    return _json(lifestyleEvalAgent(
+        patient_id,
+        patient_context,
+        monthly_logs_summary,
+        patient_report
+    ))
+
+
+def _symptoms_correlation(patient_id, patient_context, weekly_logs_summary, patient_report, weekly_memory_profile):
+    print("  🔬 Correlating symptom patterns...")
+    return _json(symptomsCorelatorAgent(
+        patient_id,
+        patient_context,
+        weekly_logs_summary,
+        patient_report,
+        weekly_memory_profile
+    ))
+
+
+def _health_forecast(patient_id, patient_context, daily_logs_summary, weekly_logs_summary, monthly_logs_summary,
+                     med_adherence_analysis, lifestyle_evaluation, symptoms_correlation):
+    print("  🔮 Generating health trajectory forecast...")
+    health_forecast = _json(forecastAgent(
+        patient_id,
+        patient_context,
+        daily_logs_summary,
+        weekly_logs_summary,
+        monthly_logs_summary,
+        med_adherence_analysis,
+        lifestyle_evaluation,
+        symptoms_correlation
+    ))
+    print("  ✅ Health forecast generated successfully")
+    return health_forecast
+
+
+def _clinical_alerts(patient_id, patient_context, daily_logs_summary, weekly_logs_summary, monthly_logs_summary,
+                     health_forecast):
+    print("  🚨 Generating clinical alerts...")
+    clinical_alerts = _json(alertGeneratorAgent(
+        patient_id,
+        patient_context,
+        daily_logs_summary,
+        weekly_logs_summary,
+        monthly_logs_summary,
+        health_forecast
+    ))
+    print(clinical_alerts)
+    return clinical_alerts
+
+
+def _twin_state(patient_id, weekly_memory_profile, med_adherence_analysis, lifestyle_evaluation,
+                symptoms_correlation, health_forecast, clinical_alerts):
+    print("  🎯 Generating digital twin state...")
+    twin_state = _json(digitalTwinState(
+        patient_id,
+        weekly_memory_profile,
+        med_adherence_analysis,
+        lifestyle_evaluation,
+        symptoms_correlation,
+        health_forecast,
+        clinical_alerts
+    ))
+    
+    # Display state summary
+    current_state = twin_state.get("current_health_state", {})
+    print(f"  📊 Twin State Summary:")
+    print(f"     • Overall Status: {current_state.get('overall_status', 'N/A')}")
+    print(f"     • Health Score: {current_state.get('overall_health_score', 'N/A')}")
+    print(f"     • Trajectory: {current_state.get('health_trajectory', 'N/A')}")
+    print("  ✅ Digital twin state generated successfully")
+    return twin_state
+
+
+def _deviation_analysis(patient_id, patient_context, health_forecast, twin_state, weekly_memory_profile,
+                        monthly_memory_profile, clinical_alerts, med_adherence_analysis, lifestyle_evaluation,
+                        symptoms_correlation):
+    print("  📊 Analyzing trajectory deviations...")
+    deviation_analysis = _json(diffreasoner(
+        patient_id,
+        patient_context,
+        health_forecast,
+        twin_state,
+        weekly_memory_profile,
+        monthly_memory_profile,
+        clinical_alerts,
+        med_adherence_analysis,
+        lifestyle_evaluation,
+        symptoms_correlation
+    ))
+    
+    # Display deviation summary
+    deviation_status = deviation_analysis.get("deviation_analysis", {})
+    print(f"  📊 Deviation Analysis:")
+    print(f"     • Status: {deviation_status.get('overall_deviation_status', 'N/A')}")
+    print(f"     • Severity: {deviation_status.get('deviation_severity_score', 'N/A')}")
+    alignment = deviation_status.get('trajectory_comparison', {}).get('alignment', 'N/A')
+    print(f"     • Alignment: {alignment}")
+    print("  ✅ Deviation analysis completed successfully")
+    return deviation_analysis
+
+
+def _build_pipeline(max_workers: int) -> Pipeline:
+    """
+    The digital twin as a dependency graph. Steps start as soon as their
+    inputs are ready, which gives these waves (model calls on the critical
+    path marked *):
+
+        1. patient_context*, nutrition_analysis, weekly/monthly logs (read
+           from disk, before today's log is appended)
+        2. daily/weekly*/monthly logs summaries
+        3. daily/weekly*/monthly memory profiles, medication adherence,
+           lifestyle evaluation
+        4. symptoms correlation* (needs the weekly memory profile)
+        5. health forecast*   6. clinical alerts*   7. twin state*
+        8. deviation analysis*
+    """
+    return Pipeline("digital_twin", [
+        # STAGE 1: CONTEXT & DATA PREPARATION
+        Step("patient_context", _patient_context, inputs=["patient_id", "patient_report"]),
+        Step("weekly_logs", _weekly_logs, inputs=["patient_id"]),
+        Step("monthly_logs", _monthly_logs, inputs=["patient_id"]),
+        Step("nutrition_analysis", _nutrition_analysis, inputs=["patient_id", "input_logs"]),
+        Step("daily_log", _daily_log,
+             inputs=["patient_id", "input_logs", "nutrition_analysis", "weekly_logs", "monthly_logs"]),
+        Step("daily_logs_summary", _daily_logs_summary, inputs=["patient_id", "patient_context", "daily_log"]),
+        Step("weekly_logs_summary", _weekly_logs_summary, inputs=["patient_id", "patient_context", "weekly_logs"]),
+        Step("monthly_logs_summary", _monthly_logs_summary,
+             inputs=["patient_id", "patient_context", "monthly_logs"]),
+        # STAGE 2: MEMORY LAYER
+        Step("daily_memory_profile", _daily_memory_profile,
+             inputs=["patient_id", "patient_context", "weekly_logs_summary", "patient_report"]),
+        Step("weekly_memory_profile", _weekly_memory_profile,
+             inputs=["patient_id", "patient_context", "weekly_logs_summary", "patient_report"]),
+        Step("monthly_memory_profile", _monthly_memory_profile,
+             inputs=["patient_id", "patient_context", "monthly_logs_summary", "patient_report"]),
+        # STAGE 3: PARALLEL ANALYSIS
+        Step("med_adherence_analysis", _med_adherence_analysis,
+             inputs=["patient_id", "patient_context", "weekly_logs_summary"]),
+        Step("lifestyle_evaluation", _lifestyle_evaluation,
+             inputs=["patient_id", "patient_context", "monthly_logs_summary", "patient_report"]),
+        Step("symptoms_correlation", _symptoms_correlation,
+             inputs=["patient_id", "patient_context", "weekly_logs_summary", "patient_report",
+                     "weekly_memory_profile"]),
+        # STAGE 4: PREDICTIVE LAYER
+        Step("health_forecast", _health_forecast,
+             inputs=["patient_id", "patient_context", "daily_logs_summary", "weekly_logs_summary",
+                     "monthly_logs_summary", "med_adherence_analysis", "lifestyle_evaluation",
+                     "symptoms_correlation"]),
+        # STAGE 5: ALERT GENERATION
+        Step("clinical_alerts", _clinical_alerts,
+             inputs=["patient_id", "patient_context", "daily_logs_summary", "weekly_logs_summary",
+                     "monthly_logs_summary", "health_forecast"]),
+        # STAGE 6: STATE CONSOLIDATION
+        Step("twin_state", _twin_state,
+             inputs=["patient_id", "weekly_memory_profile", "med_adherence_analysis", "lifestyle_evaluation",
+                     "symptoms_correlation", "health_forecast", "clinical_alerts"]),
+        # STAGE 7: DEVIATION ANALYSIS
+        Step("deviation_analysis", _deviation_analysis,
+             inputs=["patient_id", "patient_context", "health_forecast", "twin_state", "weekly_memory_profile",
+                     "monthly_memory_profile", "clinical_alerts", "med_adherence_analysis",
+                     "lifestyle_evaluation", "symptoms_correlation"]),
+    ], max_workers=max_workers)
+
+
+def digitaltwinpipeline(patient_id: str, input_logs: dict, run_id: str = None):
     """
     Digital Twin Pipeline - Comprehensive health monitoring and predictive analytics system.
     
@@ -26,7 +296,7 @@ def digitaltwinpipeline(patient_id: str, input_logs: dict):
     ┌─────────────────────────────────────────────────────────────┐
     │  STAGE 1: CONTEXT & DATA PREPARATION                        │
     ├─────────────────────────────────────────────────────────────┤
-    │  1. patientContextAgent → Load EHR baseline                 │
+    │  1. shared patient summary → Load EHR baseline              │
     │  2. nutritionalAgent → Enrich logs with nutritional data    │
     │  3. logsAgent (daily/weekly/monthly) → Temporal summaries   │
     └──────────────────────────┬──────────────────────────────────┘
@@ -74,6 +344,10 @@ def digitaltwinpipeline(patient_id: str, input_logs: dict):
     │  OUTPUT: Final Report + EHR Update                          │
     └─────────────────────────────────────────────────────────────┘
     
+    The stages group the agents logically; at run time every agent starts
+    as soon as its inputs exist, so stages 1-3 overlap and at most
+    `max_concurrency` agents run at once (see _build_pipeline).
+    
     Args:
         patient_id: Unique patient identifier
         input_logs: Dictionary containing:
@@ -93,6 +367,8 @@ def digitaltwinpipeline(patient_id: str, input_logs: dict):
                 "monthly_logs": [list of ~30 daily logs],
                 "previous_monthly_logs": [list of previous month]
             }
+        run_id: Checkpoint id; calling again with the same id resumes the
+            run, skipping the agents whose inputs have not changed
     
     Returns:
         dict: Comprehensive digital twin report including:
@@ -109,273 +385,33 @@ def digitaltwinpipeline(patient_id: str, input_logs: dict):
     print(f"🚀 Starting Digital Twin Pipeline for Patient: {patient_id}")
     print("=" * 80)
 
-    weekly_logs = get_recent_daily_logs(patient_id, number_of_days=7)
-    monthly_logs = get_recent_daily_logs(patient_id, number_of_days=30)
-
     patient_report = load_report(patient_id)  # Load previous patient report for context (if available)
 
-    # =============================================================================
-    # STAGE 1: CONTEXT & DATA PREPARATION
-    # =============================================================================
-    print("\n📋 STAGE 1: CONTEXT & DATA PREPARATION")
+    # STAGES 1-7 run as a dependency graph: every agent starts as soon as
+    # the outputs it reads exist (see _build_pipeline)
+    print(f"\n🕸️  Running stages 1-7 (up to {max_concurrency} agents at once)")
     print("-" * 80)
-    
-    # 1.1 Load Patient Context from EHR
-    print("  [1/3] Loading patient context from EHR...")
-    try:
-        patient_context = pca(patient_id)
-        patient_context = json.loads(patient_context) if isinstance(patient_context, str) else patient_context
-        print("  ✅ Patient context loaded successfully")
-    except Exception as e:
-        print(f"  ❌ Error loading patient context: {e}")
-        raise
-    
-    # 1.2 Enrich Nutrition Data
-    print("  [2/3] Enriching nutrition data...")
-    try:
-
-
-        if "nutrition" in input_logs:
-            print("  🔍 Nutrition data found, analyzing...")
-            print(f"  📊 Original Nutrition Data: {input_logs.get('nutrition', 'None')}")
-            nutrition_analysis = nutritionalAgent(input_logs.get("nutrition", None))
-            nutrition_analysis = json.loads(nutrition_analysis) if isinstance(nutrition_analysis, str) else nutrition_analysis
-            # Update daily logs with enriched nutrition data
-            input_logs["nutrition_enriched"] = nutrition_analysis
-            
-            print("  ✅ Nutrition data enriched successfully")
-            print("new dailylogs are ")
-
-            # appent these logs to daily logs
-            append_daily_log(patient_id, input_logs)
-
+    run = _build_pipeline(max_concurrency).run(
+        run_id=run_id,
+        patient_id=patient_id,
+        input_logs=input_logs,
+        patient_report=patient_report
+    )
 
-        else:
-            print(" ⚠️  No nutrition data provided, skipping enrichment")
-            nutrition_analysis = None
-    except Exception as e:
-        print(f"  ⚠️  Error enriching nutrition data: {e}")
-        nutrition_analysis = None
-    
-    # 1.3 Process Logs at Different Time Scales
-    print("  [3/3] Processing temporal logs...")
-    try:
-        # Daily logs processing
-        daily_logs_summary = dailylogsAgent(
-            patient_id,
-            patient_context,
-            input_logs
-        )
-        daily_logs_summary = json.loads(daily_logs_summary) if isinstance(daily_logs_summary, str) else daily_logs_summary
-        
-        # Weekly logs processing
-        weekly_logs_summary = weeklylogsAgent(
-            patient_id,
-            patient_context,
-            weekly_logs
-        )
-        weekly_logs_summary = json.loads(weekly_logs_summary) if isinstance(weekly_logs_summary, str) else weekly_logs_summary
-        
-        # Monthly logs processing
-        monthly_logs_summary = monthlylogsAgent(
-            patient_id,
-            patient_context,
-            monthly_logs
-        )
-        monthly_logs_summary = json.loads(monthly_logs_summary) if isinstance(monthly_logs_summary, str) else monthly_logs_summary
-        
-        print("  ✅ All temporal logs processed successfully")
-    except Exception as e:
-        print(f"  ❌ Error processing logs: {e}")
-        raise
-    
-    # =============================================================================
-    # STAGE 2: MEMORY LAYER
-    # =============================================================================
-    print("\n🧠 STAGE 2: MEMORY LAYER")
-    print("-" * 80)
-    
-    try:
-        # Daily memory profile
-        print("  [1/3] Creating daily memory profile...")
-        daily_memory_profile = dailyProfile(patient_id, patient_context, weekly_logs_summary, patient_report)
-        daily_memory_profile = json.loads(daily_memory_profile) if isinstance(daily_memory_profile, str) else daily_memory_profile
-        
-        # Weekly memory profile
-        print("  [2/3] Creating weekly memory profile...")
-        weekly_memory_profile = WeeklyProfile(patient_id, patient_context, weekly_logs_summary, patient_report)
-        weekly_memory_profile = json.loads(weekly_memory_profile) if isinstance(weekly_memory_profile, str) else weekly_memory_profile
-        
-        # Monthly memory profile
-        print("  [3/3] Creating monthly memory profile...")
-        monthly_memory_profile = monthlyProfile(patient_id, patient_context, monthly_logs_summary, patient_report)
-        monthly_memory_profile = json.loads(monthly_memory_profile) if isinstance(monthly_memory_profile, str) else monthly_memory_profile
-        
-        print("  ✅ All memory profiles created successfully")
-    except Exception as e:
-        print(f"  ❌ Error creating memory profiles: {e}")
-        raise
-    
-    # =============================================================================
-    # STAGE 3: PARALLEL ANALYSIS
-    # =============================================================================
-    print("\n🔬 STAGE 3: PARALLEL ANALYSIS")
-    print("-" * 80)
-    
-    try:
-        # Medication Adherence Analysis
-        print("  [1/3] Analyzing medication adherence...")
-        med_adherence_analysis = medicationAdherenceAgent(
-            patient_id,
-            patient_context,
-            weekly_logs_summary
-        )
-        med_adherence_analysis = json.loads(med_adherence_analysis) if isinstance(med_adherence_analysis, str) else med_adherence_analysis
-        
-        # Lifestyle Evaluation
-        print("  [2/3] Evaluating lifestyle factors...")
-        lifestyle_evaluation = lifestyleEvalAgent(
-            patient_id,
-            patient_context,
-            monthly_logs_summary,
-            patient_report
-        )
-        lifestyle_evaluation = json.loads(lifestyle_evaluation) if isinstance(lifestyle_evaluation, str) else lifestyle_evaluation
-        
-        # Symptoms Correlation
-        print("  [3/3] Correlating symptom patterns...")
-        symptoms_correlation = symptomsCorelatorAgent(
-            patient_id,
-            patient_context,
-            weekly_logs_summary,
-            patient_report,
-            weekly_memory_profile
-        )
-        symptoms_correlation = json.loads(symptoms_correlation) if isinstance(symptoms_correlation, str) else symptoms_correlation
-        
-        print("  ✅ All parallel analyses completed successfully")
-    except Exception as e:
-        print(f"  ❌ Error in parallel analysis: {e}")
-        raise
-    
-    
-    # =============================================================================
-    # STAGE 4: PREDICTIVE LAYER
-    # =============================================================================
-    print("\n🔮 STAGE 4: PREDICTIVE LAYER")
-    print("-" * 80)
-    
-    try:
-        print("  [1/1] Generating health trajectory forecast...")
-        health_forecast = forecastAgent(
-            patient_id,
-            patient_context,
-            daily_logs_summary,
-            weekly_logs_summary,
-            monthly_logs_summary,
-            med_adherence_analysis,
-            lifestyle_evaluation,
-            symptoms_correlation
-        )
-        health_forecast = json.loads(health_forecast) if isinstance(health_forecast, str) else health_forecast
-        print("  ✅ Health forecast generated successfully")
-    except Exception as e:
-        print(f"  ❌ Error generating forecast: {e}")
-        raise
-    
-    # =============================================================================
-    # STAGE 5: ALERT GENERATION
-    # =============================================================================
-    print("\n🚨 STAGE 5: ALERT GENERATION")
-    print("-" * 80)
-    
-    try:
-        print("  [1/1] Generating clinical alerts...")
-        clinical_alerts = alertGeneratorAgent(
-            patient_id,
-            patient_context,
-            daily_logs_summary,
-            weekly_logs_summary,
-            monthly_logs_summary,
-            health_forecast
-        )
-        clinical_alerts = json.loads(clinical_alerts) if isinstance(clinical_alerts, str) else clinical_alerts
-        print(clinical_alerts)
-        # Display alert summary
-    #     alert_summary = clinical_alerts.get("alert_summary", {})
-    #     print(f"  📊 Alert Summary:")
-    #     print(f"     • Critical: {alert_summary.get('critical_count', 0)}")
-    #     print(f"     • High: {alert_summary.get('high_priority_count', 0)}")
-    #     print(f"     • Medium: {alert_summary.get('medium_priority_count', 0)}")
-    #     print(f"     • Low: {alert_summary.get('low_priority_count', 0)}")
-    #     print("  ✅ Clinical alerts generated successfully")
-    except Exception as e:
-        print(f"  ❌ Error generating alerts: {e}")
-        raise
-    
-    # =============================================================================
-    # STAGE 6: STATE CONSOLIDATION
-    # =============================================================================
-    print("\n🎯 STAGE 6: STATE CONSOLIDATION")
-    print("-" * 80)
-    
-    try:
-        print("  [1/1] Generating digital twin state...")
-        twin_state = digitalTwinState(
-            patient_id,
-            weekly_memory_profile,
-            med_adherence_analysis,
-            lifestyle_evaluation,
-            symptoms_correlation,
-            health_forecast,
-            clinical_alerts
-        )
-        twin_state = json.loads(twin_state) if isinstance(twin_state, str) else twin_state
-        
-        # Display state summary
-        current_state = twin_state.get("current_health_state", {})
-        print(f"  📊 Twin State Summary:")
-        print(f"     • Overall Status: {current_state.get('overall_status', 'N/A')}")
-        print(f"     • Health Score: {current_state.get('overall_health_score', 'N/A')}")
-        print(f"     • Trajectory: {current_state.get('health_trajectory', 'N/A')}")
-        print("  ✅ Digital twin state generated successfully")
-    except Exception as e:
-        print(f"  ❌ Error generating twin state: {e}")
-        raise
-    
-    # =============================================================================
-    # STAGE 7: DEVIATION ANALYSIS
-    # =============================================================================
-    print("\n📊 STAGE 7: DEVIATION ANALYSIS")
-    print("-" * 80)
-    
-    try:
-        print("  [1/1] Analyzing trajectory deviations...")
-        deviation_analysis = diffreasoner(
-            patient_id,
-            patient_context,
-            health_forecast,
-            twin_state,
-            weekly_memory_profile,
-            monthly_memory_profile,
-            clinical_alerts,
-            med_adherence_analysis,
-            lifestyle_evaluation,
-            symptoms_correlation
-        )
-        deviation_analysis = json.loads(deviation_analysis) if isinstance(deviation_analysis, str) else deviation_analysis
-        
-        # Display deviation summary
-        deviation_status = deviation_analysis.get("deviation_analysis", {})
-        print(f"  📊 Deviation Analysis:")
-        print(f"     • Status: {deviation_status.get('overall_deviation_status', 'N/A')}")
-        print(f"     • Severity: {deviation_status.get('deviation_severity_score', 'N/A')}")
-        alignment = deviation_status.get('trajectory_comparison', {}).get('alignment', 'N/A')
-        print(f"     • Alignment: {alignment}")
-        print("  ✅ Deviation analysis completed successfully")
-    except Exception as e:
-        print(f"  ❌ Error in deviation analysis: {e}")
-        raise
+    patient_context = run['patient_context']
+    daily_logs_summary = run['daily_logs_summary']
+    weekly_logs_summary = run['weekly_logs_summary']
+    monthly_logs_summary = run['monthly_logs_summary']
+    daily_memory_profile = run['daily_memory_profile']
+    weekly_memory_profile = run['weekly_memory_profile']
+    monthly_memory_profile = run['monthly_memory_profile']
+    med_adherence_analysis = run['med_adherence_analysis']
+    lifestyle_evaluation = run['lifestyle_evaluation']
+    symptoms_correlation = run['symptoms_correlation']
+    health_forecast = run['health_forecast']
+    clinical_alerts = run['clinical_alerts']
+    twin_state = run['twin_state']
+    deviation_analysis = run['deviation_analysis']
     
     # =============================================================================
     # FINAL OUTPUT
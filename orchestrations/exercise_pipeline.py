@@ -6,61 +6,72 @@ from agents.sAgents.exerciseplanner.functional_agent import functionalAgent
 from agents.sAgents.exerciseplanner.risk_agent import riskAgent
 from agents.sAgents.exerciseplanner.summarizer_first import exerciseAgent
 
-from agents.sAgents.dietplanner.ehr_agent import ehrAgent
 from agents.sAgents.cache import get_ehr_summary
+from agents.sAgents.shared_summary import get_patient_summary
 from agents.sAgents.differentialdiagnosis.ehrReport import ehr_summary_to_report
+from orchestrations.pipeline_graph import Pipeline, Step
 import json
 
-def exercisePipeline(patient_id, current_report, current_diet):
-        # Step 1: Get EHR summary
-    print('ehr_summary fetching')
-    ehr_summary = get_ehr_summary(patient_id, ehr_summary_to_report)
-    # get patient summary
-    print('patient summary fetching')
-    patient_summary = ehrAgent(patient_id, ehr_summary, current_report)
-    print('patient summary:', patient_summary)
 
-    print('exercise requirements fetching')
-    # Step 2: Analyze exercise requirements
-    exercise_requirements = exerciseAgent(patient_id, ehr_summary, current_report, current_diet)
-    print('exercise requirements:', exercise_requirements)
-    # Step 3: Exercise Risk Stratification Agent
-    print('exercise risk stratification')
-    exercise_risk = riskAgent(patient_id, patient_summary, current_report)
-    print('risk stratification:', exercise_risk)
-
-    # functional capacity assessment
-    print('functional capacity assessment')
-    functional_capacity = functionalAgent(patient_id, patient_summary, exercise_risk)
-    print('functional capacity:', functional_capacity)
+def _ehr_summary(patient_id):
+    return get_ehr_summary(patient_id, ehr_summary_to_report)
 
-    # Step 4: Identify contraindications
-    print('identifying contraindications')
-    contraindications = contraindicationAgent(patient_id, patient_summary, exercise_requirements, exercise_risk, functional_capacity)
-    print('contraindications:', contraindications)
 
-    # Step 5: Generate exercise prescription
-    print('generating exercise prescription')
-    exercise_plan = exercisePrescriptorAgent(patient_id, patient_summary, exercise_requirements, exercise_risk, functional_capacity, contraindications)
-    print('exercise plan:', exercise_plan)
+def _patient_summary(patient_id, current_report):
+    # Shared with the other pipelines for the same EHR and report. Built from
+    # the same cached EHR summary as the ehr_summary step, so it is not passed
+    # in: that would key a separate artifact from the diet pipeline's.
+    return get_patient_summary(patient_id, current_report, view="planning")
 
-    # Step 6: Validate exercise prescription
-    print('validating exercise prescription')
-    validation = validationAgent(patient_id, patient_summary, exercise_plan, exercise_risk, current_diet, contraindications)
-    print('validation result:', validation)
 
+# exerciseAgent only needs the EHR summary, so it runs alongside the
+# patient summary → risk → functional capacity chain
+_pipeline = Pipeline("exercise", [
+    # Step 1: Get the EHR summary and the (shared) patient summary
+    Step("ehr_summary", _ehr_summary, inputs=["patient_id"]),
+    Step("patient_summary", _patient_summary, inputs=["patient_id", "current_report"]),
+    # Step 2: Analyze exercise requirements
+    Step("exercise_requirements", exerciseAgent,
+         inputs=["patient_id", "ehr_summary", "current_report", "current_diet"]),
+    # Step 3: Exercise risk stratification, then functional capacity
+    Step("exercise_risk", riskAgent, inputs=["patient_id", "patient_summary", "current_report"]),
+    Step("functional_capacity", functionalAgent, inputs=["patient_id", "patient_summary", "exercise_risk"]),
+    # Step 4: Identify contraindications
+    Step("contraindications", contraindicationAgent,
+         inputs=["patient_id", "patient_summary", "exercise_requirements", "exercise_risk", "functional_capacity"]),
+    # Step 5: Generate exercise prescription
+    Step("exercise_plan", exercisePrescriptorAgent,
+         inputs=["patient_id", "patient_summary", "exercise_requirements", "exercise_risk",
+                 "functional_capacity", "contraindications"]),
+    # Step 6: Validate exercise prescription
+    Step("validation", validationAgent,
+         inputs=["patient_id", "patient_summary", "exercise_plan", "exercise_risk", "current_diet",
+                 "contraindications"]),
     # Step 7: Generate final report
-    print('generating final report')
-    final_report = finalReporter(
-        patient_id=patient_id,
-        patient_summary=patient_summary,
-        risk_assessment=exercise_risk,
-        functional_capacity=functional_capacity,
-        exercise_plan=exercise_plan,
-        validation_result=validation
-    )
-    print('final report:', final_report)
-    return final_report
+    Step("final_report", finalReporter, kwargs={
+        "patient_id": "patient_id",
+        "patient_summary": "patient_summary",
+        "risk_assessment": "exercise_risk",
+        "functional_capacity": "functional_capacity",
+        "exercise_plan": "exercise_plan",
+        "validation_result": "validation",
+    }),
+])
+
+
+def exercisePipeline(patient_id, current_report, current_diet, run_id=None):
+    print('running exercise pipeline')
+    run = _pipeline.run(run_id=run_id, patient_id=patient_id, current_report=current_report, current_diet=current_diet)
+
+    print('patient summary:', run['patient_summary'])
+    print('exercise requirements:', run['exercise_requirements'])
+    print('risk stratification:', run['exercise_risk'])
+    print('functional capacity:', run['functional_capacity'])
+    print('contraindications:', run['contraindications'])
+    print('exercise plan:', run['exercise_plan'])
+    print('validation result:', run['validation'])
+    print('final report:', run['final_report'])
+    return run['final_report']
 
 
 if __name__ == "__main__":
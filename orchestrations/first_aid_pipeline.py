@@ -26,198 +26,218 @@ from agents.sAgents.firstAid.final_reporter import finalReporter
 
 from agents.sAgents.cache import get_ehr_summary
 from agents.sAgents.differentialdiagnosis.ehrReport import ehr_summary_to_report
+from orchestrations.pipeline_graph import Pipeline, Step
 import json
 
 
-def firstAidPipeline(patient_id, current_symptoms):
-    """
-    Execute the complete first-aid emergency response pipeline.
-    
-    Args:
-        patient_id (str): Patient identifier
-        current_symptoms (str): Description of current emergency symptoms/situation
-        
-    Returns:
-        str: Comprehensive emergency response report
-    """
-    
-    print('=' * 70)
-    print('FIRST AID EMERGENCY RESPONSE PIPELINE')
-    print('=' * 70)
-    
-    # Step 1: Get EHR Summary
+# Each step prints its progress; failures are reported by firstAidPipeline()
+
+def _ehr_summary(patient_id):
     print('\n[1/9] Retrieving patient EHR summary...')
-    try:
-        ehr_summary = get_ehr_summary(patient_id, ehr_summary_to_report)
-        print('✓ EHR summary retrieved successfully')
-        print(f'   Patient ID: {patient_id}')
-    except Exception as e:
-        print(f'✗ Error retrieving EHR summary: {e}')
-        return None
-    
-    # Step 2: Emergency Risk Analysis
+    ehr_summary = get_ehr_summary(patient_id, ehr_summary_to_report)
+    print('✓ EHR summary retrieved successfully')
+    print(f'   Patient ID: {patient_id}')
+    return ehr_summary
+
+
+def _emergency_risk(patient_id, ehr_summary, current_symptoms):
     print('\n[2/9] Analyzing emergency risk...')
-    try:
-        emergency_risk = emergencyRiskAnalyzer(patient_id, ehr_summary, current_symptoms)
-        print('✓ Emergency risk analysis completed')
-        
-        # Parse risk assessment to display key info
-        try:
-            risk_data = json.loads(emergency_risk)
-            severity = risk_data.get('emergency_severity', 'UNKNOWN')
-            print(f'   Emergency Severity: {severity}')
-            print(f'   EMS Recommended: {risk_data.get("ems_activation_recommended", "Unknown")}')
-        except:
-            print('   (Risk assessment data available)')
-            
-    except Exception as e:
-        print(f'✗ Error in emergency risk analysis: {e}')
-        return None
+    emergency_risk = emergencyRiskAnalyzer(patient_id, ehr_summary, current_symptoms)
+    print('✓ Emergency risk analysis completed')
     
-    # Step 3: Red Flag Detection
-    print('\n[3/9] Detecting critical red flags...')
+    # Parse risk assessment to display key info
     try:
-        red_flags = redFlagDetector(patient_id, emergency_risk, ehr_summary)
-        print('✓ Red flag detection completed')
-        
-        # Parse red flags to display count
-        try:
-            red_flag_data = json.loads(red_flags)
-            flag_count = red_flag_data.get('red_flags_detected', 0)
-            urgency = red_flag_data.get('overall_urgency', 'UNKNOWN')
-            print(f'   Red Flags Detected: {flag_count}')
-            print(f'   Overall Urgency: {urgency}')
-        except:
-            print('   (Red flag data available)')
-            
-    except Exception as e:
-        print(f'✗ Error in red flag detection: {e}')
-        return None
+        risk_data = json.loads(emergency_risk)
+        severity = risk_data.get('emergency_severity', 'UNKNOWN')
+        print(f'   Emergency Severity: {severity}')
+        print(f'   EMS Recommended: {risk_data.get("ems_activation_recommended", "Unknown")}')
+    except:
+        print('   (Risk assessment data available)')
+    return emergency_risk
+
+
+def _red_flags(patient_id, emergency_risk, ehr_summary):
+    print('\n[3/9] Detecting critical red flags...')
+    red_flags = redFlagDetector(patient_id, emergency_risk, ehr_summary)
+    print('✓ Red flag detection completed')
     
-    # Step 4: First-Aid Prescription
-    print('\n[4/9] Generating first-aid instructions...')
+    # Parse red flags to display count
     try:
-        first_aid_plan = firstAidPrescriptor(patient_id, emergency_risk, red_flags, ehr_summary)
-        print('✓ First-aid prescription generated')
-        
-        # Parse to show EMS status
-        try:
-            aid_data = json.loads(first_aid_plan)
-            ems_req = aid_data.get('first_aid_plan', {}).get('ems_activation', {}).get('required', False)
-            print(f'   EMS Activation Required: {ems_req}')
-        except:
-            print('   (First-aid plan available)')
-            
-    except Exception as e:
-        print(f'✗ Error generating first-aid instructions: {e}')
-        return None
+        red_flag_data = json.loads(red_flags)
+        flag_count = red_flag_data.get('red_flags_detected', 0)
+        urgency = red_flag_data.get('overall_urgency', 'UNKNOWN')
+        print(f'   Red Flags Detected: {flag_count}')
+        print(f'   Overall Urgency: {urgency}')
+    except:
+        print('   (Red flag data available)')
+    return red_flags
+
+
+def _first_aid_plan(patient_id, emergency_risk, red_flags, ehr_summary):
+    print('\n[4/9] Generating first-aid instructions...')
+    first_aid_plan = firstAidPrescriptor(patient_id, emergency_risk, red_flags, ehr_summary)
+    print('✓ First-aid prescription generated')
     
-    # Step 5: Contraindication & Safety Check
-    print('\n[5/9] Performing safety and contraindication checks...')
+    # Parse to show EMS status
     try:
-        safety_check = contraindicationSafetyChecker(
-            patient_id, first_aid_plan, emergency_risk, ehr_summary
-        )
-        print('✓ Safety check completed')
-        
-        # Parse safety status
-        try:
-            safety_data = json.loads(safety_check)
-            safety_status = safety_data.get('overall_safety_status', 'UNKNOWN')
-            print(f'   Safety Status: {safety_status}')
-            absolute_contras = len(safety_data.get('absolute_contraindications', []))
-            if absolute_contras > 0:
-                print(f'   ⚠ Absolute Contraindications Found: {absolute_contras}')
-        except:
-            print('   (Safety check data available)')
-            
-    except Exception as e:
-        print(f'✗ Error in safety check: {e}')
-        return None
+        aid_data = json.loads(first_aid_plan)
+        ems_req = aid_data.get('first_aid_plan', {}).get('ems_activation', {}).get('required', False)
+        print(f'   EMS Activation Required: {ems_req}')
+    except:
+        print('   (First-aid plan available)')
+    return first_aid_plan
+
+
+def _safety_check(patient_id, first_aid_plan, emergency_risk, ehr_summary):
+    print('\n[5/9] Performing safety and contraindication checks...')
+    safety_check = contraindicationSafetyChecker(
+        patient_id, first_aid_plan, emergency_risk, ehr_summary
+    )
+    print('✓ Safety check completed')
     
-    # Step 6: Escalation & Notification Planning
-    print('\n[6/9] Determining escalation level and notifications...')
+    # Parse safety status
     try:
-        escalation_plan = escalationAgent(
-            patient_id, emergency_risk, red_flags, first_aid_plan, safety_check
-        )
-        print('✓ Escalation plan created')
-        
-        # Parse escalation level
-        try:
-            escalation_data = json.loads(escalation_plan)
-            esc_level = escalation_data.get('escalation_level', 'UNKNOWN')
-            print(f'   Escalation Level: {esc_level}')
-        except:
-            print('   (Escalation plan available)')
-            
-    except Exception as e:
-        print(f'✗ Error in escalation planning: {e}')
-        return None
+        safety_data = json.loads(safety_check)
+        safety_status = safety_data.get('overall_safety_status', 'UNKNOWN')
+        print(f'   Safety Status: {safety_status}')
+        absolute_contras = len(safety_data.get('absolute_contraindications', []))
+        if absolute_contras > 0:
+            print(f'   ⚠ Absolute Contraindications Found: {absolute_contras}')
+    except:
+        print('   (Safety check data available)')
+    return safety_check
+
+
+def _escalation_plan(patient_id, emergency_risk, red_flags, first_aid_plan, safety_check):
+    print('\n[6/9] Determining escalation level and notifications...')
+    escalation_plan = escalationAgent(
+        patient_id, emergency_risk, red_flags, first_aid_plan, safety_check
+    )
+    print('✓ Escalation plan created')
     
-    # Step 7: Event Logging
-    print('\n[7/9] Creating emergency event log...')
+    # Parse escalation level
     try:
-        event_log = eventLogger(
-            patient_id, emergency_risk, red_flags, first_aid_plan, 
-            safety_check, escalation_plan
-        )
-        print('✓ Event log created')
-        print('   (Comprehensive audit trail generated)')
-            
-    except Exception as e:
-        print(f'✗ Error in event logging: {e}')
-        return None
-    
-    # Step 8: Validation
+        escalation_data = json.loads(escalation_plan)
+        esc_level = escalation_data.get('escalation_level', 'UNKNOWN')
+        print(f'   Escalation Level: {esc_level}')
+    except:
+        print('   (Escalation plan available)')
+    return escalation_plan
+
+
+def _event_log(patient_id, emergency_risk, red_flags, first_aid_plan, safety_check, escalation_plan):
+    print('\n[7/9] Creating emergency event log...')
+    event_log = eventLogger(
+        patient_id, emergency_risk, red_flags, first_aid_plan, 
+        safety_check, escalation_plan
+    )
+    print('✓ Event log created')
+    print('   (Comprehensive audit trail generated)')
+    return event_log
+
+
+def _validation(patient_id, emergency_risk, red_flags, first_aid_plan, safety_check, escalation_plan, event_log):
     print('\n[8/9] Validating emergency response plan...')
+    validation_result = validationAgent(
+        patient_id, emergency_risk, red_flags, first_aid_plan,
+        safety_check, escalation_plan, event_log
+    )
+    print('✓ Validation completed')
+    
+    # Parse validation status
     try:
-        validation_result = validationAgent(
-            patient_id, emergency_risk, red_flags, first_aid_plan,
-            safety_check, escalation_plan, event_log
-        )
-        print('✓ Validation completed')
+        validation_data = json.loads(validation_result)
+        val_status = validation_data.get('overall_validation_status', 'UNKNOWN')
+        approved = validation_data.get('approval_decision', {}).get('approved_for_execution', False)
+        print(f'   Validation Status: {val_status}')
+        print(f'   Approved for Execution: {approved}')
         
-        # Parse validation status
-        try:
-            validation_data = json.loads(validation_result)
-            val_status = validation_data.get('overall_validation_status', 'UNKNOWN')
-            approved = validation_data.get('approval_decision', {}).get('approved_for_execution', False)
-            print(f'   Validation Status: {val_status}')
-            print(f'   Approved for Execution: {approved}')
-            
-            # Show critical issues if any
-            critical_issues = validation_data.get('critical_issues', [])
-            if critical_issues:
-                print(f'   ⚠ Critical Issues: {len(critical_issues)}')
-                for issue in critical_issues[:3]:  # Show first 3
-                    print(f'      - {issue.get("description", "Unknown issue")}')
-        except:
-            print('   (Validation data available)')
-            
-    except Exception as e:
-        print(f'✗ Error in validation: {e}')
-        return None
-    
-    # Step 9: Final Report Generation
+        # Show critical issues if any
+        critical_issues = validation_data.get('critical_issues', [])
+        if critical_issues:
+            print(f'   ⚠ Critical Issues: {len(critical_issues)}')
+            for issue in critical_issues[:3]:  # Show first 3
+                print(f'      - {issue.get("description", "Unknown issue")}')
+    except:
+        print('   (Validation data available)')
+    return validation_result
+
+
+def _final_report(patient_id, emergency_risk, red_flags, first_aid_plan, safety_check,
+                  escalation_plan, event_log, validation_result):
     print('\n[9/9] Generating final emergency report...')
-    try:
-        final_report = finalReporter(
-            patient_id, emergency_risk, red_flags, first_aid_plan,
-            safety_check, escalation_plan, event_log, validation_result
-        )
-        print('✓ Final report generated')
-        print('   (Comprehensive emergency response report ready)')
-            
-    except Exception as e:
-        print(f'✗ Error generating final report: {e}')
+    final_report = finalReporter(
+        patient_id, emergency_risk, red_flags, first_aid_plan,
+        safety_check, escalation_plan, event_log, validation_result
+    )
+    print('✓ Final report generated')
+    print('   (Comprehensive emergency response report ready)')
+    return final_report
+
+
+# Each step reads the previous steps' outputs, so the critical path is
+# the whole chain; declared as a graph for the shared executor and timings
+_pipeline = Pipeline("first_aid", [
+    Step("ehr_summary", _ehr_summary, inputs=["patient_id"]),
+    Step("emergency_risk", _emergency_risk, inputs=["patient_id", "ehr_summary", "current_symptoms"]),
+    Step("red_flags", _red_flags, inputs=["patient_id", "emergency_risk", "ehr_summary"]),
+    Step("first_aid_plan", _first_aid_plan, inputs=["patient_id", "emergency_risk", "red_flags", "ehr_summary"]),
+    Step("safety_check", _safety_check,
+         inputs=["patient_id", "first_aid_plan", "emergency_risk", "ehr_summary"]),
+    Step("escalation_plan", _escalation_plan,
+         inputs=["patient_id", "emergency_risk", "red_flags", "first_aid_plan", "safety_check"]),
+    Step("event_log", _event_log,
+         inputs=["patient_id", "emergency_risk", "red_flags", "first_aid_plan", "safety_check",
+                 "escalation_plan"]),
+    Step("validation_result", _validation,
+         inputs=["patient_id", "emergency_risk", "red_flags", "first_aid_plan", "safety_check",
+                 "escalation_plan", "event_log"]),
+    Step("final_report", _final_report,
+         inputs=["patient_id", "emergency_risk", "red_flags", "first_aid_plan", "safety_check",
+                 "escalation_plan", "event_log", "validation_result"]),
+])
+
+_FAILURE_MESSAGES = {
+    "ehr_summary": "Error retrieving EHR summary",
+    "emergency_risk": "Error in emergency risk analysis",
+    "red_flags": "Error in red flag detection",
+    "first_aid_plan": "Error generating first-aid instructions",
+    "safety_check": "Error in safety check",
+    "escalation_plan": "Error in escalation planning",
+    "event_log": "Error in event logging",
+    "validation_result": "Error in validation",
+    "final_report": "Error generating final report",
+}
+
+
+def firstAidPipeline(patient_id, current_symptoms, run_id=None):
+    """
+    Execute the complete first-aid emergency response pipeline.
+    
+    Args:
+        patient_id (str): Patient identifier
+        current_symptoms (str): Description of current emergency symptoms/situation
+        run_id (str): Checkpoint id; calling again with the same id skips
+            the stages that already completed with the same inputs
+        
+    Returns:
+        str: Comprehensive emergency response report
+    """
+    
+    print('=' * 70)
+    print('FIRST AID EMERGENCY RESPONSE PIPELINE')
+    print('=' * 70)
+    
+    run = _pipeline.run(raise_errors=False, run_id=run_id, patient_id=patient_id, current_symptoms=current_symptoms)
+    if run.failed:
+        print(f'✗ {_FAILURE_MESSAGES[run.failed]}: {run.errors[run.failed]}')
         return None
     
     print('\n' + '=' * 70)
     print('PIPELINE COMPLETED SUCCESSFULLY')
     print('=' * 70)
     
-    return final_report
+    return run['final_report']
 
 
 if __name__ == "__main__":
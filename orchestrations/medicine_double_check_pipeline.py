@@ -5,7 +5,7 @@ Validates prescribed medications against patient's current condition and past hi
 Provides comprehensive safety assessment with clear APPROVE/DISAPPROVE decision.
 
 Pipeline Flow:
-1. Patient Summary → Extract clinical data
+1. Patient Summary → Extract clinical data (shared with the other pipelines)
 2. Prescription Parser → Structure prescription data
 3. Contraindication Agent → Check contraindications
 4. Interaction Agent → Check drug interactions
@@ -14,6 +14,16 @@ Pipeline Flow:
 7. Risk Aggregation Agent → Aggregate all risks
 8. Final Reporter Agent → Generate medicine safety report
 
+Steps 1-2 run concurrently, then steps 3-4 and 5-6 as two concurrent
+batches, on the orchestrations.pipeline_graph executor.
+
+Fast reject (on by default): if step 3 finds an absolute contraindication
+or step 4 a CONTRAINDICATED interaction, the pipeline returns a compact
+DISAPPROVE with that evidence right away instead of waiting for steps 5-8.
+
+The patient summary is the shared artifact from agents.sAgents.shared_summary:
+built once per EHR version and current report for all pipelines.
+
 Usage:
     from orchestrations.medicine_double_check_pipeline import medicineDoubleCheckPipeline
     
@@ -37,7 +47,6 @@ Usage:
     )
 """
 
-from agents.sAgents.medicineDoubleChecker.patient_summary_agent import patientSummaryAgent
 from agents.sAgents.medicineDoubleChecker.prescription_parser_agent import prescriptionParserAgent
 from agents.sAgents.medicineDoubleChecker.contraindication_agent import contraindicationAgent
 from agents.sAgents.medicineDoubleChecker.interaction_agent import interactionAgent
@@ -45,10 +54,182 @@ from agents.sAgents.medicineDoubleChecker.dose_safety_agent import doseSafetyAge
 from agents.sAgents.medicineDoubleChecker.clinical_appropriateness_agent import clinicalAppropriatenessAgent
 from agents.sAgents.medicineDoubleChecker.risk_aggregation_agent import riskAggregationAgent
 from agents.sAgents.medicineDoubleChecker.final_reporter_agent import finalReporterAgent
+from agents.sAgents.shared_summary import get_patient_summary
+from medgemma.batchAgents import run_agents_batched
+from orchestrations.pipeline_graph import Pipeline, Step
 import json
 
 
-def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescription_data):
+# Skip dose safety, appropriateness, risk aggregation and the final report
+# when a contraindication or interaction check already rules the prescription
+# out (see _hard_stops)
+fast_reject = True
+
+
+def _patient_summary(patient_id, ehr_summary, current_report):
+    return get_patient_summary(patient_id, current_report, ehr_summary, view="medication_safety")
+
+
+def _hard_stop_checks(patient_summary, parsed_prescription):
+    # Steps 3-4 only depend on the patient summary and the parsed prescription,
+    # so their model calls go to the server as one batch
+    return run_agents_batched([
+        (contraindicationAgent, (patient_summary, parsed_prescription)),
+        (interactionAgent, (patient_summary, parsed_prescription)),
+    ], return_exceptions=True)
+
+
+def _other_checks(patient_summary, parsed_prescription):
+    # Steps 5-6, batched the same way and sent alongside steps 3-4
+    return run_agents_batched([
+        (doseSafetyAgent, (patient_summary, parsed_prescription)),
+        (clinicalAppropriatenessAgent, (patient_summary, parsed_prescription)),
+    ], return_exceptions=True)
+
+
+def _risk_aggregation(hard_stop_checks, other_checks, patient_summary):
+    for check in hard_stop_checks + other_checks:
+        if isinstance(check, Exception):
+            raise check
+    contraindication, interactions = hard_stop_checks
+    dose_check, appropriateness = other_checks
+    return riskAggregationAgent(contraindication, interactions, dose_check, appropriateness, patient_summary)
+
+
+def _final_report(risk_aggregation, patient_summary, prescription_data, hard_stop_checks, other_checks):
+    contraindication, interactions = hard_stop_checks
+    dose_check, appropriateness = other_checks
+    return finalReporterAgent(
+        risk_aggregation,
+        patient_summary,
+        json.dumps(prescription_data),
+        contraindication,
+        interactions,
+        dose_check,
+        appropriateness
+    )
+
+
+def _load_json(text):
+    """Parse an agent reply that may wrap its JSON in prose or a code fence."""
+    if not isinstance(text, str):
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        start, end = text.find('{'), text.rfind('}')
+        if start == -1 or end <= start:
+            return None
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            return None
+
+
+def _hard_stops(hard_stop_checks):
+    """
+    Evidence that rules the prescription out: absolute contraindications
+    and CONTRAINDICATED interactions. Empty if there are none (or a check
+    failed, in which case the full pipeline reports the error).
+    """
+    if any(isinstance(check, Exception) for check in hard_stop_checks):
+        return []
+    contraindication, interactions = hard_stop_checks
+    evidence = []
+
+    data = _load_json(contraindication)
+    if isinstance(data, dict):
+        for med in data.get('contraindication_analysis') or []:
+            if not isinstance(med, dict):
+                continue
+            medication = med.get('medication', 'unknown')
+            for item in med.get('absolute_contraindications') or []:
+                if not isinstance(item, dict):
+                    # e.g. "absolute_contraindications": ["renal failure"]
+                    evidence.append({'source': 'contraindication', 'medication': medication, 'finding': str(item)})
+                    continue
+                evidence.append({
+                    'source': 'contraindication',
+                    'medication': medication,
+                    'finding': item.get('contraindication'),
+                    'patient_factor': item.get('patient_factor'),
+                    'severity': item.get('severity'),
+                    'evidence': item.get('evidence'),
+                    'alternatives': item.get('alternative_medications', []),
+                })
+            for item in med.get('disease_specific_contraindications') or []:
+                if isinstance(item, dict) and item.get('contraindication_type') == 'ABSOLUTE':
+                    evidence.append({
+                        'source': 'contraindication',
+                        'medication': medication,
+                        'finding': item.get('mechanism'),
+                        'patient_factor': item.get('disease'),
+                    })
+    elif isinstance(contraindication, str) and (
+            '"type": "ABSOLUTE"' in contraindication or '"contraindication_type": "ABSOLUTE"' in contraindication):
+        evidence.append({'source': 'contraindication', 'finding': 'Absolute contraindication reported'})
+
+    data = _load_json(interactions)
+    if isinstance(data, dict):
+        for item in data.get('interaction_analysis') or []:
+            if not isinstance(item, dict):
+                continue
+            details = item.get('interaction_details')
+            if isinstance(details, dict) and details.get('severity') == 'CONTRAINDICATED':
+                evidence.append({
+                    'source': 'interaction',
+                    'medications': item.get('interacting_drugs', []),
+                    'finding': details.get('mechanism_details'),
+                    'evidence': details.get('documentation'),
+                })
+    elif isinstance(interactions, str) and '"severity": "CONTRAINDICATED"' in interactions:
+        evidence.append({'source': 'interaction', 'finding': 'Contraindicated interaction reported'})
+
+    return evidence
+
+
+def _build_pipeline(fast_reject: bool) -> Pipeline:
+    # Steps 1 and 2 are independent, as are steps 3-6
+    return Pipeline("medicine_double_check", [
+        Step("patient_summary", _patient_summary, inputs=["patient_id", "ehr_summary", "current_report"]),
+        Step("parsed_prescription", prescriptionParserAgent, inputs=["prescription_data"]),
+        Step("hard_stop_checks", _hard_stop_checks, inputs=["patient_summary", "parsed_prescription"],
+             stop_when=(lambda checks: bool(_hard_stops(checks))) if fast_reject else None),
+        Step("other_checks", _other_checks, inputs=["patient_summary", "parsed_prescription"]),
+        Step("risk_aggregation", _risk_aggregation, inputs=["hard_stop_checks", "other_checks", "patient_summary"]),
+        Step("final_report", _final_report,
+             inputs=["risk_aggregation", "patient_summary", "prescription_data", "hard_stop_checks",
+                     "other_checks"]),
+    ])
+
+
+def _fast_reject_report(results, hard_stops):
+    """Compact DISAPPROVE verdict returned when a hard stop short-circuits the pipeline."""
+    medications = set()
+    for item in hard_stops:
+        names = [item['medication']] if item.get('medication') else item.get('medications') or []
+        medications.update(name for name in (names if isinstance(names, list) else [names])
+                           if isinstance(name, str))
+    medications = sorted(medications)
+    results['fast_reject'] = True
+    results['final_report'] = json.dumps({
+        "executive_summary": {
+            "overall_determination": "DISAPPROVE",
+            "overall_safety_status": "UNSAFE",
+            "primary_reason_for_determination": (
+                f"{len(hard_stops)} hard stop(s): absolute contraindication or contraindicated interaction"
+                + (f" involving {', '.join(medications)}" if medications else "")
+            ),
+            "prescriber_action_required": True,
+        },
+        "hard_stops": hard_stops,
+        "note": "Fast reject: dose safety, clinical appropriateness and risk aggregation were not run"
+    }, indent=2)
+    return results
+
+
+def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescription_data, fast_reject=None,
+                                run_id=None):
     """
     Orchestrates comprehensive medication safety verification.
     
@@ -57,6 +238,10 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
         ehr_summary: Complete EHR data from get_ehr_summary()
         current_report: Detailed report of patient's current condition
         prescription_data: Structured prescription information
+        fast_reject: Return a compact DISAPPROVE as soon as the contraindication
+            or interaction check finds a hard stop (None = module default)
+        run_id: Checkpoint id; calling again with the same id skips the
+            steps that already completed with the same inputs
     
     Returns:
         dict: Complete medicine safety report with APPROVE/DISAPPROVE decision
@@ -70,11 +255,21 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     print("="*80 + "\n")
     
     results = {}
+    if fast_reject is None:
+        fast_reject = globals()['fast_reject']
+    run = _build_pipeline(fast_reject).run(
+        raise_errors=False,
+        run_id=run_id,
+        patient_id=patient_id,
+        ehr_summary=ehr_summary,
+        current_report=current_report,
+        prescription_data=prescription_data
+    )
     
     # Step 1: Patient Summary
     print("📋 Step 1/8: Extracting Patient Clinical Summary...")
     try:
-        patient_summary = patientSummaryAgent(patient_id, ehr_summary, current_report)
+        patient_summary = run.result('patient_summary')
         results['patient_summary'] = patient_summary
         print("✓ Patient summary extracted")
         print(f"   Key factors: Demographics, organ function, current medications")
@@ -85,7 +280,7 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     # Step 2: Prescription Parser
     print("\n💊 Step 2/8: Parsing Prescription Data...")
     try:
-        parsed_prescription = prescriptionParserAgent(prescription_data)
+        parsed_prescription = run.result('parsed_prescription')
         results['parsed_prescription'] = parsed_prescription
         print("✓ Prescription parsed and standardized")
         print(f"   High-alert medications identified: {parsed_prescription.count('high_alert_medication')}")
@@ -93,10 +288,14 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
         print(f"✗ Error in prescription parsing: {e}")
         return {"error": "Prescription parsing failed", "details": str(e)}
     
+    # Steps 3-4 and 5-6 ran as two concurrent batches
+    contraindication, interactions = run.result('hard_stop_checks')
+
     # Step 3: Contraindication Check
     print("\n⚠️  Step 3/8: Checking Contraindications...")
     try:
-        contraindication = contraindicationAgent(patient_summary, parsed_prescription)
+        if isinstance(contraindication, Exception):
+            raise contraindication
         results['contraindication'] = contraindication
         
         # Count critical contraindications
@@ -116,7 +315,8 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     # Step 4: Drug Interaction Analysis
     print("\n🔄 Step 4/8: Analyzing Drug Interactions...")
     try:
-        interactions = interactionAgent(patient_summary, parsed_prescription)
+        if isinstance(interactions, Exception):
+            raise interactions
         results['interactions'] = interactions
         
         # Count interaction severities
@@ -135,10 +335,25 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
         print(f"✗ Error in interaction analysis: {e}")
         return {"error": "Interaction analysis failed", "details": str(e)}
     
+    # Fast reject: a hard stop in steps 3-4 ended the run; steps 5-8 were not waited for
+    if run.stopped_by:
+        hard_stops = _hard_stops((contraindication, interactions))
+        print("\n" + "="*80)
+        print("MEDICINE SAFETY REPORT - FINAL DECISION")
+        print("="*80)
+        print(f"Decision: ❌ DISAPPROVED (fast reject: {len(hard_stops)} hard stop(s))")
+        for item in hard_stops[:3]:
+            print(f"  • [{item['source']}] {item.get('finding')}")
+        print("="*80 + "\n")
+        return _fast_reject_report(results, hard_stops)
+    
+    dose_check, appropriateness = run.result('other_checks')
+    
     # Step 5: Dose Safety Check
     print("\n💉 Step 5/8: Verifying Dose Safety...")
     try:
-        dose_check = doseSafetyAgent(patient_summary, parsed_prescription)
+        if isinstance(dose_check, Exception):
+            raise dose_check
         results['dose_check'] = dose_check
         
         # Check for unsafe doses
@@ -158,7 +373,8 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     # Step 6: Clinical Appropriateness
     print("\n📊 Step 6/8: Evaluating Clinical Appropriateness...")
     try:
-        appropriateness = clinicalAppropriatenessAgent(patient_summary, parsed_prescription)
+        if isinstance(appropriateness, Exception):
+            raise appropriateness
         results['appropriateness'] = appropriateness
         
         # Check appropriateness status
@@ -178,13 +394,7 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     # Step 7: Risk Aggregation
     print("\n⚖️  Step 7/8: Aggregating Overall Risk Assessment...")
     try:
-        risk_aggregation = riskAggregationAgent(
-            contraindication,
-            interactions,
-            dose_check,
-            appropriateness,
-            patient_summary
-        )
+        risk_aggregation = run.result('risk_aggregation')
         results['risk_aggregation'] = risk_aggregation
         
         # Parse risk level
@@ -204,15 +414,7 @@ def medicineDoubleCheckPipeline(patient_id, ehr_summary, current_report, prescri
     # Step 8: Final Report Generation
     print("\n📝 Step 8/8: Generating Medicine Safety Report...")
     try:
-        final_report = finalReporterAgent(
-            risk_aggregation,
-            patient_summary,
-            json.dumps(prescription_data),
-            contraindication,
-            interactions,
-            dose_check,
-            appropriateness
-        )
+        final_report = run.result('final_report')
         results['final_report'] = final_report
         
         # Parse final decision
@@ -11,7 +11,14 @@ from datetime import datetime
 from ehr_store.patientdata.data_manager import get_report
 
 from agents.sAgents.cache import get_ehr_summary
-from agents.sAgents.differentialdiagnosis import ehr_summary_to_report
+from agents.sAgents.differentialdiagnosis.ehrReport import ehr_summary_to_report
+from orchestrations.pipeline_graph import report_step
+
+# Stage names reported to step listeners (see pipeline_graph.report_steps_to),
+# so streaming clients get each agent's output as soon as it is ready
+_PIPELINE = "patient_progress_analysis"
+_STAGES = ("aggregated_data", "current_status", "progress_assessment", "imaging_interpretation",
+           "clinical_report", "alerts_recommendations")
 
 def patientProgressAnalysisPipeline(
     patient_id,
@@ -67,6 +74,9 @@ def patientProgressAnalysisPipeline(
                 log_entry["data"] = data
             results["processing_log"].append(log_entry)
     
+    for stage in _STAGES:
+        report_step(_PIPELINE, stage, "pending")
+
     try:
         # =================================================================
         # STEP 1: DATA AGGREGATION
@@ -92,6 +102,7 @@ def patientProgressAnalysisPipeline(
             imaging_data=imaging_data
         )
         results["aggregated_data"] = aggregated_data
+        report_step(_PIPELINE, "aggregated_data", "done", aggregated_data)
         log_step("Data Aggregation", "completed", "Data successfully aggregated and normalized")
         print("✓ Data aggregation completed")
         
@@ -110,6 +121,7 @@ def patientProgressAnalysisPipeline(
             patient_id=patient_id
         )
         results["current_status"] = current_status
+        report_step(_PIPELINE, "current_status", "done", current_status)
         log_step("Current Status Analysis", "completed", "Current clinical status assessed")
         print("✓ Current status analysis completed")
         
@@ -129,6 +141,7 @@ def patientProgressAnalysisPipeline(
             patient_id=patient_id
         )
         results["progress_assessment"] = progress_assessment
+        report_step(_PIPELINE, "progress_assessment", "done", progress_assessment)
         log_step("Progress & Risk Assessment", "completed", "Progress analyzed and risks stratified")
         print("✓ Progress and risk assessment completed")
         
@@ -148,6 +161,7 @@ def patientProgressAnalysisPipeline(
             patient_id=patient_id
         )
         results["imaging_interpretation"] = imaging_interpretation
+        report_step(_PIPELINE, "imaging_interpretation", "done", imaging_interpretation)
         log_step("Imaging & Diagnostics Interpretation", "completed", "Imaging and diagnostics interpreted")
         print("✓ Imaging and diagnostics interpretation completed")
         
@@ -169,6 +183,7 @@ def patientProgressAnalysisPipeline(
             patient_id=patient_id
         )
         results["clinical_report"] = clinical_report
+        report_step(_PIPELINE, "clinical_report", "done", clinical_report)
         log_step("Clinical Report Generation", "completed", "Comprehensive clinical report generated")
         print("✓ Clinical report generation completed")
         
@@ -191,6 +206,7 @@ def patientProgressAnalysisPipeline(
             patient_id=patient_id
         )
         results["alerts_recommendations"] = alerts_recommendations
+        report_step(_PIPELINE, "alerts_recommendations", "done", alerts_recommendations)
         log_step("Alerts & Recommendations", "completed", "Alerts and recommendations generated")
         print("✓ Alerts and recommendations completed")
         
@@ -0,0 +1,369 @@
+"""
+Dependency-graph executor for agent pipelines.
+
+A pipeline declares its steps and the named values each step needs. A
+value is either a pipeline input (passed to run()) or another step's
+output. Every step whose inputs are ready runs straight away on a bounded
+thread pool, so a pipeline takes as long as its critical path instead of
+the sum of its steps.
+
+Usage:
+    from orchestrations.pipeline_graph import Pipeline, Step
+
+    pipeline = Pipeline("exercise", [
+        Step("patient_summary", ehrAgent, inputs=["patient_id", "ehr_summary", "current_report"]),
+        Step("requirements", exerciseAgent, inputs=["patient_id", "ehr_summary", "current_report", "current_diet"]),
+        Step("risk", riskAgent, inputs=["patient_id", "patient_summary", "current_report"]),
+        ...
+    ])
+    run = pipeline.run(patient_id="p1", ehr_summary=..., current_report=..., current_diet=...)
+    run.outputs["risk"], run.timings["risk"]
+
+Failure policy, per step (`on_error`):
+    "fail"     the pipeline stops scheduling new steps and run() re-raises
+               the step's exception once the running steps have finished
+    "skip"     the step and everything downstream of it are skipped
+    "default"  the step's output becomes `default` and dependents still run
+
+Early exit: a step with `stop_when` ends the run as soon as its output
+satisfies the predicate. Nothing new is scheduled, steps still running
+are abandoned (their threads finish in the background and the results are
+dropped) and run() returns with `stopped_by` set. A predicate that raises
+is logged and treated as false.
+
+Checkpoints: run(run_id=...) saves every completed step's output under
+that run id (orchestrations.checkpoints). Running again with the same id
+restores the steps whose inputs are unchanged instead of calling them, so
+a retry after a late failure only redoes the failed part.
+
+Progress: inside `with report_steps_to(listener):` every pipeline run
+calls listener(pipeline, step, status, output) as its steps move through
+"pending" → "running" → "done" / "failed", or end up "restored",
+"skipped" or "abandoned". `output` is the step's output for "done" and
+"restored", None otherwise. Orchestrations that don't run on a Pipeline
+can report their stages the same way with report_step().
+
+Worker threads run each step in a copy of the caller's context, so the
+request deadline (medgemma.resilience), token streaming and step
+listeners still apply.
+"""
+
+import contextvars
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from orchestrations.checkpoints import get_checkpoint_store, input_hash, validate_run_id
+
+# Max steps of one pipeline run in flight at once
+max_workers = 4
+
+ON_ERROR_POLICIES = ("fail", "skip", "default")
+
+# While set (see report_steps_to), pipeline runs call
+# listener(pipeline, step, status, output) whenever a step changes status
+step_listener = contextvars.ContextVar("step_listener", default=None)
+
+
+class report_steps_to:
+    """
+    Context manager reporting the step progress of every pipeline run
+    started inside it (however deep in an orchestration) to a callback:
+
+        with report_steps_to(lambda pipeline, step, status, output: print(step, status)):
+            report = digitaltwinpipeline(patient_id, logs)
+    """
+
+    def __init__(self, listener: Callable[[str, str, str, Any], None]):
+        self.listener = listener
+        self._token = None
+
+    def __enter__(self):
+        self._token = step_listener.set(self.listener)
+        return self
+
+    def __exit__(self, *exc):
+        step_listener.reset(self._token)
+        return False
+
+
+def report_step(pipeline: str, step: str, status: str, output: Any = None):
+    """Report a step's status (and output) to the current step listener, if any."""
+    listener = step_listener.get()
+    if listener is None:
+        return
+    try:
+        listener(pipeline, step, status, output)
+    except Exception as e:
+        # Progress reporting never fails a pipeline
+        print(f"⚠️  Step listener failed for {pipeline}.{step}: {e}")
+
+
+class Step:
+    """One node of a pipeline: `fn(*inputs, **kwargs)` → output named `name`."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        inputs: Sequence[str] = (),
+        kwargs: Optional[Dict[str, str]] = None,
+        on_error: str = "fail",
+        default: Any = None,
+        stop_when: Optional[Callable[[Any], bool]] = None
+    ):
+        """
+        Args:
+            name: Output name other steps refer to
+            fn: Called with the named values, positionally in `inputs` order
+            inputs: Names of the values passed positionally
+            kwargs: {parameter: value name} for values passed by keyword
+            on_error: "fail", "skip" or "default" (see module docstring)
+            default: Output used when the step fails with on_error="default"
+            stop_when: Predicate on the step's output; if true the run
+                stops early (see module docstring)
+        """
+        if on_error not in ON_ERROR_POLICIES:
+            raise ValueError(f"Unknown on_error policy for step '{name}': {on_error}")
+        self.name = name
+        self.fn = fn
+        self.inputs = list(inputs)
+        self.kwargs = dict(kwargs or {})
+        self.on_error = on_error
+        self.default = default
+        self.stop_when = stop_when
+
+    @property
+    def needs(self) -> List[str]:
+        return self.inputs + [source for source in self.kwargs.values() if source not in self.inputs]
+
+
+class PipelineRun:
+    """Outputs, errors and per-step timings of one run."""
+
+    def __init__(self, pipeline: str, run_id: Optional[str] = None):
+        self.pipeline = pipeline
+        self.run_id = run_id
+        self.outputs: Dict[str, Any] = {}
+        self.errors: Dict[str, BaseException] = {}
+        self.skipped: List[str] = []
+        self.failed: Optional[str] = None        # step whose failure stopped the run
+        self.stopped_by: Optional[str] = None    # step whose stop_when ended the run early
+        self.abandoned: List[str] = []           # steps still running at the early exit
+        self.restored: List[str] = []            # steps taken from a checkpoint
+        self.timings: Dict[str, float] = {}      # step → seconds
+        self.started: Dict[str, float] = {}      # step → seconds after the run started
+        self.wall_time = 0.0
+
+    def __getitem__(self, name: str) -> Any:
+        return self.outputs[name]
+
+    def get(self, name: str, default: Any = None) -> Any:
+        return self.outputs.get(name, default)
+
+    def result(self, name: str) -> Any:
+        """A step's output, or raise the error it failed with."""
+        if name in self.errors and name not in self.outputs:
+            raise self.errors[name]
+        if name not in self.outputs:
+            raise RuntimeError(f"Step '{name}' of {self.pipeline} did not run")
+        return self.outputs[name]
+
+    @property
+    def step_time(self) -> float:
+        """Sum of all step durations (the wall time if run sequentially)."""
+        return sum(self.timings.values())
+
+    def summary(self) -> str:
+        lines = [f"⏱️  {self.pipeline}: {self.wall_time:.2f}s wall, {self.step_time:.2f}s of steps"
+                 + (f" (run {self.run_id})" if self.run_id else "")]
+        for name, started in sorted(self.started.items(), key=lambda item: item[1]):
+            status = "failed" if name in self.errors else "ok"
+            lines.append(f"   {name:<28} +{started:6.2f}s {self.timings.get(name, 0.0):6.2f}s  {status}")
+        if self.restored:
+            lines.append(f"   restored from checkpoint: {', '.join(self.restored)}")
+        if self.stopped_by:
+            lines.append(f"   stopped early by: {self.stopped_by}")
+        if self.abandoned:
+            lines.append(f"   abandoned: {', '.join(self.abandoned)}")
+        if self.skipped:
+            lines.append(f"   skipped: {', '.join(self.skipped)}")
+        return "\n".join(lines)
+
+
+class Pipeline:
+    """A set of steps wired together by the names of their inputs."""
+
+    def __init__(self, name: str, steps: Sequence[Step], max_workers: Optional[int] = None):
+        self.name = name
+        self.steps = {step.name: step for step in steps}
+        if len(self.steps) != len(steps):
+            raise ValueError(f"Pipeline '{name}' has duplicate step names")
+        self.max_workers = max_workers
+        self._check_acyclic()
+
+    def run(self, raise_errors: bool = True, run_id: Optional[str] = None, **inputs) -> PipelineRun:
+        """
+        Run every step as soon as its inputs are available.
+
+        Args:
+            raise_errors: Re-raise the error of a failed on_error="fail"
+                step; if False the run is returned with `failed` set
+            run_id: Checkpoint the steps under this id and restore the
+                ones already done with the same inputs (None = no checkpoints)
+            **inputs: Values the steps need that no step produces
+
+        Returns:
+            PipelineRun
+
+        Raises:
+            ValueError: If a step needs a value nobody provides, or the
+                run_id is not a valid id
+            Exception: The first error of a step with on_error="fail"
+        """
+        self._check_inputs(inputs)
+        if run_id is not None:
+            validate_run_id(run_id)
+        run = PipelineRun(self.name, run_id)
+        store = get_checkpoint_store() if run_id is not None else None
+        values = dict(inputs)
+        pending = dict(self.steps)
+        running: Dict[Future, str] = {}
+        digests: Dict[str, Optional[str]] = {}
+        failure: Optional[BaseException] = None
+        start = time.perf_counter()
+
+        for name in self.steps:
+            report_step(self.name, name, "pending")
+
+        workers = min(self.max_workers or max_workers, len(self.steps)) or 1
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"pipeline-{self.name}")
+        try:
+            while True:
+                while failure is None and run.stopped_by is None:
+                    self._skip_unreachable(pending, run)
+                    restored = False
+                    for name in [n for n, step in pending.items() if all(v in values for v in step.needs)]:
+                        step = pending.pop(name)
+                        if store is not None:
+                            digests[name] = self._digest(step, values)
+                            found, output = store.get(run_id, self.name, name, digests[name])
+                            if found:
+                                # Restored outputs can make more steps ready, so go round again
+                                values[name] = run.outputs[name] = output
+                                run.restored.append(name)
+                                report_step(self.name, name, "restored", output)
+                                self._check_stop(step, values[name], run)
+                                restored = True
+                                continue
+                        running[pool.submit(contextvars.copy_context().run, self._call, step, values, run, start)] = name
+                    if not restored:
+                        break
+
+                if run.stopped_by is not None:
+                    run.abandoned = sorted(running.values())
+                    break
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    step = self.steps[name]
+                    try:
+                        values[name] = run.outputs[name] = future.result()
+                    except Exception as e:
+                        run.errors[name] = e
+                        report_step(self.name, name, "failed")
+                        if step.on_error == "default":
+                            values[name] = run.outputs[name] = step.default
+                        elif step.on_error == "skip":
+                            run.skipped.append(name)
+                        elif failure is None:
+                            failure = e
+                            run.failed = name
+                        continue
+                    report_step(self.name, name, "done", values[name])
+                    if store is not None:
+                        store.put(run_id, self.name, name, digests.get(name), values[name])
+                    self._check_stop(step, values[name], run)
+        finally:
+            # After an early exit, don't wait for the abandoned steps
+            pool.shutdown(wait=run.stopped_by is None, cancel_futures=True)
+
+        run.wall_time = time.perf_counter() - start
+        run.skipped.extend(name for name in pending if name not in run.skipped)
+        for name in run.skipped:
+            if name not in run.errors:
+                report_step(self.name, name, "skipped")
+        for name in run.abandoned:
+            report_step(self.name, name, "abandoned")
+        print(run.summary())
+        if failure is not None:
+            print(f"✗ {self.name}: step '{run.failed}' failed: {failure}")
+            if raise_errors:
+                raise failure
+        return run
+
+    def _digest(self, step: Step, values: Dict[str, Any]) -> Optional[str]:
+        args = [values[name] for name in step.inputs]
+        kwargs = {param: values[source] for param, source in step.kwargs.items()}
+        return input_hash(self.name, step.name, step.fn, args, kwargs)
+
+    def _check_stop(self, step: Step, output: Any, run: PipelineRun):
+        if step.stop_when is None or run.stopped_by is not None:
+            return
+        try:
+            stop = step.stop_when(output)
+        except Exception as e:
+            # A broken predicate must not fail a step that succeeded; run on
+            print(f"⚠️  {self.name}: stop_when for step '{step.name}' raised {type(e).__name__}: {e}")
+            return
+        if stop:
+            run.stopped_by = step.name
+
+    def _call(self, step: Step, values: Dict[str, Any], run: PipelineRun, start: float) -> Any:
+        args = [values[name] for name in step.inputs]
+        kwargs = {param: values[source] for param, source in step.kwargs.items()}
+        began = time.perf_counter()
+        run.started[step.name] = began - start
+        report_step(self.name, step.name, "running")
+        try:
+            return step.fn(*args, **kwargs)
+        finally:
+            run.timings[step.name] = time.perf_counter() - began
+
+    def _skip_unreachable(self, pending: Dict[str, Step], run: PipelineRun):
+        """Drop pending steps that depend on a skipped step."""
+        changed = True
+        while changed:
+            changed = False
+            for name, step in list(pending.items()):
+                if any(need in run.skipped for need in step.needs):
+                    del pending[name]
+                    run.skipped.append(name)
+                    changed = True
+
+    def _check_inputs(self, inputs: Dict[str, Any]):
+        for step in self.steps.values():
+            missing = [n for n in step.needs if n not in self.steps and n not in inputs]
+            if missing:
+                raise ValueError(f"Pipeline '{self.name}': step '{step.name}' needs {missing}, "
+                                 f"which no step produces and run() was not given")
+
+    def _check_acyclic(self):
+        state: Dict[str, str] = {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline '{self.name}' has a cycle: {' → '.join(path + [name])}")
+            state[name] = "visiting"
+            for need in self.steps[name].needs:
+                if need in self.steps:
+                    visit(need, path + [name])
+            state[name] = "done"
+
+        for name in self.steps:
+            visit(name, [])
@@ -0,0 +1,152 @@
+"""
+Background report updates for the interview chat.
+
+Rewriting the interview report (report_updater) is a second model call
+per turn that the patient doesn't need to wait for: the next question can
+go out as soon as the interviewer has it. schedule() queues the update
+instead, and it runs off the response path:
+
+    - Per session, updates run one at a time, in order.
+    - An update starts `debounce_seconds` after the last turn that asked
+      for one, so rapid turns coalesce into a single update. Each update
+      reads the session when it starts, so it covers every turn so far.
+    - Every applied update bumps the session's `report_version` and sets
+      `report_updated_through` (the message count it covers), so the
+      frontend can tell whether the report it shows is fresh.
+    - flush() runs whatever is pending right away and waits for it; phase
+      transitions call it before they read the report.
+
+Usage:
+    from orchestrations.report_updates import get_report_updates
+
+    updates = get_report_updates()
+    updates.schedule(conversation_id, lambda session: {
+        'current_report': report_updater(patient_id, session['conversation_history'], session['current_report'])
+    })
+    ...
+    updates.flush(conversation_id)   # the report is now up to date
+"""
+import contextvars
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from session_manager import get_session_manager
+
+# Seconds to wait after a turn for more turns before updating the report
+debounce_seconds = 0.75
+
+
+class _SessionUpdates:
+    """Update bookkeeping for one conversation"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.run_lock = threading.Lock()   # one update at a time per session
+        self.requested = 0                 # turns that asked for an update
+        self.applied = 0                   # turns covered by the applied updates
+        self.update_fn: Optional[Callable] = None
+        self.timer: Optional[threading.Timer] = None
+
+
+class BackgroundReportUpdates:
+    """Debounced, per-session ordered report updates"""
+
+    def __init__(self, session_manager=None, debounce: Optional[float] = None):
+        """
+        Args:
+            session_manager: Where sessions live (None = the global one)
+            debounce: Seconds to wait for more turns (None = module default)
+        """
+        self.session_manager = session_manager or get_session_manager()
+        self.debounce = debounce_seconds if debounce is None else debounce
+        self._sessions: Dict[str, _SessionUpdates] = {}
+        self._lock = threading.Lock()
+
+    def schedule(self, conversation_id: str, update_fn: Callable[[Dict[str, Any]], Dict[str, Any]]) -> int:
+        """
+        Ask for a report update.
+
+        Args:
+            conversation_id: The main conversation ID of the session
+            update_fn: Called with the session as it is when the update
+                starts; returns the session fields to update. Later calls
+                replace the function of a pending update.
+
+        Returns:
+            int: Number of updates asked for so far in this session
+        """
+        state = self._state(conversation_id)
+        with state.lock:
+            state.requested += 1
+            state.update_fn = update_fn
+            if state.timer is not None:
+                state.timer.cancel()
+            # Timer threads start with an empty context: the update doesn't
+            # stream tokens into, or run under the deadline of, this request
+            state.timer = threading.Timer(self.debounce, self._run, (conversation_id, state))
+            state.timer.daemon = True
+            state.timer.start()
+            return state.requested
+
+    def flush(self, conversation_id: str):
+        """Apply any pending update now and wait until it is done."""
+        state = self._state(conversation_id)
+        with state.lock:
+            if state.applied >= state.requested:
+                return
+            if state.timer is not None:
+                state.timer.cancel()
+        # Run in a fresh context, as the timer would have
+        contextvars.Context().run(self._run, conversation_id, state)
+
+    def is_pending(self, conversation_id: str) -> bool:
+        with self._lock:
+            state = self._sessions.get(conversation_id)
+        if state is None:
+            return False
+        with state.lock:
+            return state.applied < state.requested
+
+    def forget(self, conversation_id: str):
+        """Drop a finished session's bookkeeping."""
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def _state(self, conversation_id: str) -> _SessionUpdates:
+        with self._lock:
+            if conversation_id not in self._sessions:
+                self._sessions[conversation_id] = _SessionUpdates()
+            return self._sessions[conversation_id]
+
+    def _run(self, conversation_id: str, state: _SessionUpdates):
+        with state.run_lock:
+            with state.lock:
+                target = state.requested
+                update_fn = state.update_fn
+            if target <= state.applied:
+                return   # covered by an update that ran in the meantime
+
+            session = self.session_manager.get_session(conversation_id)
+            try:
+                if session is not None:
+                    covered = session['message_counts']['total']
+                    updates = update_fn(session)
+                    updates['report_version'] = session.get('report_version', 0) + 1
+                    updates['report_updated_through'] = covered
+                    self.session_manager.update_session(conversation_id, updates)
+                    print(f"📝 Report updated in the background (version {updates['report_version']}, "
+                          f"through message {covered})")
+            except Exception as e:
+                # The report stays at its previous version; the next turn tries again
+                print(f"⚠️  Background report update failed for {conversation_id}: {e}")
+            finally:
+                with state.lock:
+                    state.applied = target
+
+
+_report_updates = BackgroundReportUpdates()
+
+
+def get_report_updates() -> BackgroundReportUpdates:
+    """Get the global background report updater instance"""
+    return _report_updates
@@ -0,0 +1,102 @@
+"""
+Tests for pipeline checkpoints: a run restored with the same run id reuses
+the steps whose inputs hash the same and reruns the rest.
+"""
+
+import sys
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from orchestrations import checkpoints
+from orchestrations.checkpoints import CheckpointStore, input_hash, new_run_id
+from orchestrations.pipeline_graph import Pipeline, Step
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CheckpointStore(directory=str(tmp_path))
+    monkeypatch.setattr(checkpoints, "_checkpoint_store", store)
+    return store
+
+
+def _pipeline(calls, fail_report=False):
+    def summary(patient_id, logs):
+        calls["summary"] += 1
+        return f"{patient_id}: {len(logs)} logs"
+
+    def risk(patient_id):
+        calls["risk"] += 1
+        return {"patient_id": patient_id, "level": "low"}
+
+    def report(summary, risk):
+        calls["report"] += 1
+        if fail_report:
+            raise RuntimeError("model timed out")
+        return {"summary": summary, "risk": risk["level"]}
+
+    return Pipeline("test", [
+        Step("summary", summary, inputs=["patient_id", "logs"]),
+        Step("risk", risk, inputs=["patient_id"]),
+        Step("report", report, inputs=["summary", "risk"]),
+    ])
+
+
+def test_same_inputs_are_restored(store):
+    calls = Counter()
+    run_id = new_run_id()
+    first = _pipeline(calls).run(run_id=run_id, patient_id="p1", logs=[1, 2])
+    second = _pipeline(calls).run(run_id=run_id, patient_id="p1", logs=[1, 2])
+
+    assert calls == {"summary": 1, "risk": 1, "report": 1}
+    assert sorted(second.restored) == ["report", "risk", "summary"]
+    assert second.outputs == first.outputs
+
+
+def test_changed_input_reruns_dependent_steps(store):
+    calls = Counter()
+    run_id = new_run_id()
+    _pipeline(calls).run(run_id=run_id, patient_id="p1", logs=[1, 2])
+    run = _pipeline(calls).run(run_id=run_id, patient_id="p1", logs=[1, 2, 3])
+
+    assert run.restored == ["risk"]
+    assert calls == {"summary": 2, "risk": 1, "report": 2}
+    assert run["report"]["summary"] == "p1: 3 logs"
+
+
+def test_retry_after_failure_reruns_only_the_failed_step(store):
+    calls = Counter()
+    run_id = new_run_id()
+    with pytest.raises(RuntimeError):
+        _pipeline(calls, fail_report=True).run(run_id=run_id, patient_id="p1", logs=[1])
+    run = _pipeline(calls).run(run_id=run_id, patient_id="p1", logs=[1])
+
+    assert sorted(run.restored) == ["risk", "summary"]
+    assert calls == {"summary": 1, "risk": 1, "report": 2}
+
+
+def test_other_run_ids_and_no_run_id_start_fresh(store):
+    calls = Counter()
+    _pipeline(calls).run(run_id=new_run_id(), patient_id="p1", logs=[])
+    _pipeline(calls).run(run_id=new_run_id(), patient_id="p1", logs=[])
+    _pipeline(calls).run(patient_id="p1", logs=[])
+
+    assert calls == {"summary": 3, "risk": 3, "report": 3}
+
+
+def test_store_is_keyed_by_input_hash(store):
+    run_id = new_run_id()
+    digest = input_hash("test", "risk", len, ["p1"], {})
+    store.put(run_id, "test", "risk", digest, {"level": "high"})
+
+    assert store.get(run_id, "test", "risk", digest) == (True, {"level": "high"})
+    assert store.get(run_id, "test", "risk", input_hash("test", "risk", len, ["p2"], {})) == (False, None)
+    assert input_hash("test", "risk", len, [object()], {}) is None
+
+
+def test_invalid_run_id_is_rejected(store):
+    with pytest.raises(ValueError):
+        _pipeline(Counter()).run(run_id="../etc", patient_id="p1", logs=[])
@@ -0,0 +1,130 @@
+"""
+Tests for the pipeline dependency-graph executor: scheduling, the per-step
+failure policies and early exit with stop_when.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from orchestrations.pipeline_graph import Pipeline, Step, report_steps_to
+
+
+def _boom(*args):
+    raise RuntimeError("model unavailable")
+
+
+def test_steps_get_their_inputs():
+    pipeline = Pipeline("test", [
+        Step("double", lambda x: x * 2, inputs=["x"]),
+        Step("total", lambda a, b=0: a + b, inputs=["double"], kwargs={"b": "x"}),
+    ])
+    run = pipeline.run(x=5)
+
+    assert run.outputs == {"double": 10, "total": 15}
+
+
+def test_missing_input_and_cycles_are_rejected():
+    with pytest.raises(ValueError):
+        Pipeline("test", [Step("a", len, inputs=["nobody"])]).run()
+    with pytest.raises(ValueError):
+        Pipeline("test", [Step("a", len, inputs=["b"]), Step("b", len, inputs=["a"])])
+    with pytest.raises(ValueError):
+        Step("a", len, on_error="retry")
+
+
+def test_on_error_fail_raises_and_stops_scheduling():
+    ran = []
+    pipeline = Pipeline("test", [
+        Step("broken", _boom, inputs=["x"]),
+        Step("after", lambda b: ran.append(b), inputs=["broken"]),
+    ])
+    with pytest.raises(RuntimeError, match="model unavailable"):
+        pipeline.run(x=1)
+
+    run = pipeline.run(raise_errors=False, x=1)
+    assert run.failed == "broken"
+    assert "after" in run.skipped
+    assert ran == []
+    with pytest.raises(RuntimeError):
+        run.result("broken")
+
+
+def test_on_error_skip_skips_downstream_only():
+    pipeline = Pipeline("test", [
+        Step("broken", _boom, inputs=["x"], on_error="skip"),
+        Step("downstream", lambda b: b, inputs=["broken"]),
+        Step("independent", lambda x: x + 1, inputs=["x"]),
+    ])
+    run = pipeline.run(x=1)
+
+    assert sorted(run.skipped) == ["broken", "downstream"]
+    assert run.outputs == {"independent": 2}
+    assert isinstance(run.errors["broken"], RuntimeError)
+    assert run.failed is None
+
+
+def test_on_error_default_feeds_dependents():
+    pipeline = Pipeline("test", [
+        Step("risk", _boom, inputs=["x"], on_error="default", default={"level": "unknown"}),
+        Step("report", lambda risk: f"risk: {risk['level']}", inputs=["risk"]),
+    ])
+    run = pipeline.run(x=1)
+
+    assert run["report"] == "risk: unknown"
+    assert "risk" in run.errors
+    assert run.skipped == []
+
+
+def test_stop_when_ends_the_run_early():
+    release = threading.Event()
+    ran = []
+
+    def slow(x):
+        release.wait(5)
+        return x
+
+    pipeline = Pipeline("test", [
+        Step("triage", lambda x: {"emergency": True}, inputs=["x"], stop_when=lambda out: out["emergency"]),
+        Step("slow", slow, inputs=["x"]),
+        Step("plan", lambda t: ran.append(t), inputs=["triage"]),
+    ])
+    try:
+        run = pipeline.run(x=1)
+    finally:
+        release.set()
+
+    assert run.stopped_by == "triage"
+    assert run["triage"] == {"emergency": True}
+    assert "plan" in run.skipped
+    assert run.abandoned == ["slow"]
+    assert ran == []
+
+
+def test_stop_when_false_or_raising_runs_on():
+    pipeline = Pipeline("test", [
+        Step("calm", lambda x: {"emergency": False}, inputs=["x"], stop_when=lambda out: out["emergency"]),
+        Step("odd", lambda x: None, inputs=["x"], stop_when=lambda out: out["emergency"]),
+        Step("plan", lambda calm, odd: "plan", inputs=["calm", "odd"]),
+    ])
+    run = pipeline.run(x=1)
+
+    assert run.stopped_by is None
+    assert run["plan"] == "plan"
+
+
+def test_step_listener_sees_status_changes():
+    events = []
+    pipeline = Pipeline("test", [
+        Step("ok", lambda x: x, inputs=["x"]),
+        Step("broken", _boom, inputs=["x"], on_error="skip"),
+    ])
+    with report_steps_to(lambda pipeline, step, status, output: events.append((step, status))):
+        pipeline.run(x=1)
+
+    assert [s for step, s in events if step == "ok"] == ["pending", "running", "done"]
+    assert [s for step, s in events if step == "broken"] == ["pending", "running", "failed"]
@@ -0,0 +1,183 @@
+"""
+Tests for the background report updates: debouncing, per-session ordering
+and flush().
+"""
+
+import contextvars
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from orchestrations.report_updates import BackgroundReportUpdates
+from session_manager import SessionManager
+
+
+@pytest.fixture
+def sessions():
+    sessions = SessionManager()
+    sessions.create_session('conv-1', 'p1')
+    return sessions
+
+
+def _turn(sessions, message):
+    sessions.append_to_history('conv-1', 'user', message)
+    sessions.increment_message_count('conv-1', 'initial_interview')
+
+
+def _rewrite(calls):
+    """update_fn writing the report from every user message in the session."""
+    def update(session):
+        answers = [msg for role, msg in session['conversation_history'] if role == 'user']
+        calls.append(len(answers))
+        return {'current_report': "; ".join(answers)}
+    return update
+
+
+def _wait_until(predicate, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.01)
+
+
+def test_rapid_turns_coalesce_into_one_update(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=0.1)
+    calls = []
+    for message in ("chest pain", "since yesterday", "worse on exertion"):
+        _turn(sessions, message)
+        updates.schedule('conv-1', _rewrite(calls))
+    assert updates.is_pending('conv-1')
+
+    _wait_until(lambda: not updates.is_pending('conv-1'))
+    session = sessions.get_session('conv-1')
+    assert calls == [3]
+    assert session['current_report'] == "chest pain; since yesterday; worse on exertion"
+    assert (session['report_version'], session['report_updated_through']) == (1, 3)
+
+
+def test_update_waits_for_the_debounce(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=0.3)
+    calls = []
+    _turn(sessions, "headache")
+    updates.schedule('conv-1', _rewrite(calls))
+    time.sleep(0.1)
+    assert calls == []
+    _wait_until(lambda: calls == [1])
+
+
+def test_flush_applies_the_pending_update_now(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=60)
+    calls = []
+    _turn(sessions, "fever")
+    updates.schedule('conv-1', _rewrite(calls))
+
+    updates.flush('conv-1')
+    assert calls == [1]
+    assert not updates.is_pending('conv-1')
+    assert sessions.get_session('conv-1')['report_version'] == 1
+
+    updates.flush('conv-1')                  # nothing pending: no second update
+    assert calls == [1]
+
+
+def test_the_latest_update_function_is_used(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=60)
+    _turn(sessions, "cough")
+    updates.schedule('conv-1', lambda session: {'current_report': "first"})
+    updates.schedule('conv-1', lambda session: {'current_report': "second"})
+    updates.flush('conv-1')
+    assert sessions.get_session('conv-1')['current_report'] == "second"
+
+
+def test_updates_run_one_at_a_time_in_order(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=0.01)
+    started = threading.Event()
+    release = threading.Event()
+    order = []
+
+    def slow(session):
+        order.append(('slow', session['message_counts']['total']))
+        started.set()
+        release.wait(5)
+        return {'current_report': "slow"}
+
+    _turn(sessions, "dizziness")
+    updates.schedule('conv-1', slow)
+    started.wait(5)
+
+    # A turn while the first update runs: its update starts only afterwards
+    _turn(sessions, "when standing up")
+    updates.schedule('conv-1', lambda session: order.append(('next', session['message_counts']['total']))
+                     or {'current_report': "next"})
+    time.sleep(0.1)
+    assert order == [('slow', 1)]
+
+    release.set()
+    updates.flush('conv-1')
+    session = sessions.get_session('conv-1')
+    assert order == [('slow', 1), ('next', 2)]
+    assert session['current_report'] == "next"
+    assert (session['report_version'], session['report_updated_through']) == (2, 2)
+
+
+def test_flush_waits_for_a_running_update(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=0.01)
+    started = threading.Event()
+
+    def slow(session):
+        started.set()
+        time.sleep(0.2)
+        return {'current_report': "done"}
+
+    _turn(sessions, "rash")
+    updates.schedule('conv-1', slow)
+    started.wait(5)
+    updates.flush('conv-1')
+    assert sessions.get_session('conv-1')['current_report'] == "done"
+
+
+def test_failed_update_keeps_the_previous_version(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=60)
+
+    def failing(session):
+        raise RuntimeError("model unavailable")
+
+    _turn(sessions, "nausea")
+    updates.schedule('conv-1', failing)
+    updates.flush('conv-1')
+    assert sessions.get_session('conv-1')['report_version'] == 0
+    assert not updates.is_pending('conv-1')
+
+    # The next turn tries again and covers both messages
+    calls = []
+    _turn(sessions, "and vomiting")
+    updates.schedule('conv-1', _rewrite(calls))
+    updates.flush('conv-1')
+    assert calls == [2]
+    assert sessions.get_session('conv-1')['report_version'] == 1
+
+
+def test_updates_run_outside_the_callers_context(sessions):
+    marker = contextvars.ContextVar("marker", default=None)
+    updates = BackgroundReportUpdates(sessions, debounce=60)
+    seen = []
+
+    marker.set("request-1")
+    _turn(sessions, "back pain")
+    updates.schedule('conv-1', lambda session: seen.append(marker.get()) or {})
+    updates.flush('conv-1')
+    assert seen == [None]
+
+
+def test_forget_and_unknown_sessions(sessions):
+    updates = BackgroundReportUpdates(sessions, debounce=60)
+    assert not updates.is_pending('conv-unknown')
+    _turn(sessions, "tired")
+    updates.schedule('conv-1', lambda session: {})
+    updates.forget('conv-1')
+    assert not updates.is_pending('conv-1')
@@ -0,0 +1,158 @@
+"""
+Tests for the speculative differential diagnosis and final report in the
+unified chat, with stubbed agents.
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from orchestrations import unified_chat_orchestrator as chat
+from orchestrations.report_updates import BackgroundReportUpdates
+from session_manager import SessionManager
+
+
+class _Agents:
+    """Stub agents recording what the DDx and final report were computed from."""
+
+    def __init__(self):
+        self.ddx_calls = []
+        self.final_calls = []
+
+    def interview(self, patient_id, user_message=None, conversation_history=None, conversation_id=None,
+                  current_report=None, update_report=True):
+        return {'conversation_id': conversation_id or 'conv-1', 'message': 'Next question?'}
+
+    def second_interview(self, patient_id, user_message=None, conversation_history=None, current_report=None,
+                         differential_diagnoses=None, conversation_id=None, update_report=True):
+        return {'conversation_id': conversation_id or 'conv-2', 'message': 'Follow-up question?'}
+
+    def update_report(self, patient_id, history, current_report, covered=0, consolidated=0):
+        answers = [msg for role, msg in history if role == 'user']
+        return "REPORT: " + "; ".join(answers), False
+
+    def inoutagent(self, patient_id, history, current_report, differential_diagnoses):
+        return differential_diagnoses
+
+    def ddx(self, patient_id, conversation_history, current_report):
+        self.ddx_calls.append((_speculative(), current_report))
+        return {'diagnoses': [current_report]}
+
+    def final_report(self, patient_id, conversation_history, current_report, differential_diagnoses):
+        self.final_calls.append((_speculative(), current_report))
+        return {'success': True, 'report': f"FINAL from {current_report}"}
+
+
+def _speculative() -> bool:
+    return threading.current_thread().name.startswith("speculation")
+
+
+@pytest.fixture
+def agents(monkeypatch):
+    stubs = _Agents()
+    monkeypatch.setattr(chat, 'interview_message', stubs.interview)
+    monkeypatch.setattr(chat, 'second_interview_message', stubs.second_interview)
+    monkeypatch.setattr(chat, 'update_report', stubs.update_report)
+    monkeypatch.setattr(chat, 'inoutagent', stubs.inoutagent)
+    monkeypatch.setattr(chat, 'generate_differential_diagnosis', stubs.ddx)
+    monkeypatch.setattr(chat, 'finalReporter', stubs.final_report)
+    monkeypatch.setattr(chat, '_speculative_results', chat.SpeculativeResults())
+    return stubs
+
+
+@pytest.fixture
+def orchestrator(agents):
+    orchestrator = chat.UnifiedChatOrchestrator()
+    orchestrator.session_manager = SessionManager()
+    orchestrator.report_updates = BackgroundReportUpdates(orchestrator.session_manager, debounce=0.05)
+    return orchestrator
+
+
+def _chat(orchestrator, messages):
+    reply = orchestrator.process_message(patient_id='p1')
+    for message in messages:
+        reply = orchestrator.process_message(conversation_id='conv-1', user_message=message)
+    return reply
+
+
+def _answers(n):
+    return [f"symptom {i}" for i in range(1, n + 1)]
+
+
+def _report(messages):
+    return "REPORT: " + "; ".join(messages)
+
+
+def test_ddx_is_reused_when_only_a_closing_reply_follows(orchestrator, agents):
+    reply = _chat(orchestrator, _answers(9) + ["No, that's all."])
+
+    assert reply['phase'] == 'second_interview'
+    # Nothing was computed at the transition: the speculative DDx was used
+    assert all(speculative for speculative, _ in agents.ddx_calls)
+    used = reply['differential_diagnoses']['diagnoses'][0]
+    assert used in (_report(_answers(9)), _report(_answers(9) + ["No, that's all."]))
+
+
+def test_ddx_is_recomputed_after_a_material_message(orchestrator, agents):
+    messages = _answers(9) + ["Also my left arm hurts"]
+    reply = _chat(orchestrator, messages)
+
+    # Either computed inline or by a speculation that already had the last message
+    assert reply['differential_diagnoses'] == {'diagnoses': [_report(messages)]}
+
+
+def _history(messages):
+    history = []
+    for message in messages:
+        history += [('assistant', 'Next question?'), ('user', message)]
+    return history
+
+
+def test_take_checks_only_the_messages_after_the_covered_ones():
+    results = chat.SpeculativeResults(max_workers=1)
+    basis = {'report_version': 3, 'covered': 2}
+
+    for expected, last in (("ddx", "thanks"), (None, "it hurts at night")):
+        results.start('conv-1', 'ddx', _history(["a", "b"]), lambda: (basis, "ddx"))
+        results._entries[('conv-1', 'ddx')][0].result()
+        assert results.take('conv-1', 'ddx', _history(["a", "b", last])) == expected
+    assert results.take('conv-1', 'ddx', _history(["a", "b"])) is None      # taken already
+
+
+def test_start_keeps_a_run_that_would_still_be_reused():
+    results = chat.SpeculativeResults(max_workers=1)
+    runs = []
+
+    def run(covered):
+        runs.append(covered)
+        return {'report_version': covered, 'covered': covered}, covered
+
+    assert results.start('conv-1', 'ddx', _history(["a"]), lambda: run(1))
+    assert not results.start('conv-1', 'ddx', _history(["a", "ok"]), lambda: run(2))
+    assert results.start('conv-1', 'ddx', _history(["a", "ok", "fever"]), lambda: run(3))
+    results._entries[('conv-1', 'ddx')][0].result()    # started, not still queued
+    assert results.take('conv-1', 'ddx', _history(["a", "ok", "fever", "thank you"])) == 3
+    assert runs == [1, 3]
+
+
+def test_final_report_is_reused_when_only_thanks_follows(orchestrator, agents):
+    second = [f"detail {i}" for i in range(1, 5)] + ["Thank you!"]
+    reply = _chat(orchestrator, _answers(10) + second)
+
+    assert reply['phase'] == 'completed'
+    assert all(speculative for speculative, _ in agents.final_calls)
+    assert reply['final_report'] in (f"FINAL from {_report(_answers(10) + second[:4])}",
+                                     f"FINAL from {_report(_answers(10) + second)}")
+
+
+def test_immaterial_replies():
+    assert not chat._is_material("Thanks!")
+    assert not chat._is_material("  no,  nothing else ")
+    assert not chat._is_material("")
+    assert chat._is_material("No")
+    assert chat._is_material("Yes, at night")
+    assert chat._is_material("thanks, and the pain is worse at rest")
@@ -4,8 +4,12 @@ Handles the complete differential diagnosis workflow in a stateful manner
 """
 import sys
 from pathlib import Path
+import contextvars
 import json
+import threading
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, Optional
 
 # Add paths for imports
@@ -22,6 +26,192 @@ from agents.sAgents.differentialdiagnosis.interviewer import interview_message
 from agents.sAgents.differentialdiagnosis.secondinterviewer import second_interview_message
 from agents.sAgents.differentialdiagnosis.ddGenerator import generate_differential_diagnosis
 from agents.sAgents.differentialdiagnosis.finalReporter import finalReporter
+from agents.sAgents.differentialdiagnosis.reportUpdater import update_report
+from agents.sAgents.differentialdiagnosis.dd_inOut import inoutagent
+from orchestrations.report_updates import get_report_updates
+
+# Update the report (and, in the second interview, the differential) in the
+# background after each turn instead of before replying (see report_updates)
+background_report_updates = True
+
+# Speculative precomputation: once an interview gets close to its end, the
+# phase-transition call (differential diagnosis after the initial interview,
+# final report after the second one) starts in the background. It first
+# flushes the pending report update, then works from that report version and
+# the conversation up to the last message the report covers. At the
+# transition the result is reused only if every user message after that one
+# is immaterial (a closing reply such as "no, that's all" or "thanks"); a
+# message with anything else in it means the call is made again with it.
+ddx_speculation_threshold = 8               # initial interview user messages (of 10); None = off
+final_report_speculation_threshold = 4      # second interview user messages (of 5); None = off
+speculation_max_age = 3600                  # seconds before an unused result is dropped
+
+# Replies that add nothing for the differential or the final report (compared
+# lowercased, without punctuation). Bare "yes"/"no" are not here: they answer
+# the question before them.
+immaterial_replies = {
+    "ok", "okay", "thanks", "thank you", "no thanks", "no thank you",
+    "that's all", "that is all", "no that's all", "nothing else", "no nothing else",
+    "nothing more", "no nothing more", "no more", "i think that's all", "that's everything"
+}
+
+
+class SpeculativeResults:
+    """Background results per (conversation, kind), kept with the report version they were computed from"""
+    
+    def __init__(self, max_workers: int = 4):
+        # (conversation_id, kind) → (future, user messages when started, started_at);
+        # the future returns (basis, result), basis = {'report_version', 'covered'}
+        self._entries: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="speculation")
+    
+    def start(self, conversation_id: str, kind: str, history: list, fn) -> bool:
+        """
+        Run fn() in the background unless the run already there would still
+        be reused for this conversation history.
+        
+        Args:
+            history: The conversation history now
+            fn: Returns (basis, result); see _speculate
+        
+        Returns:
+            bool: Whether a new run was started
+        """
+        key = (conversation_id, kind)
+        with self._lock:
+            self._drop_stale()
+            entry = self._entries.get(key)
+            if entry is not None and _immaterial_since(history, _covered(entry)):
+                return False
+            # A fresh context: the speculative call must not stream its tokens
+            # into, or count against the deadline of, the current request
+            future = self._pool.submit(contextvars.Context().run, fn)
+            self._entries[key] = (future, _user_messages(history), time.time())
+        return True
+    
+    def take(self, conversation_id: str, kind: str, history: list) -> Optional[Any]:
+        """
+        The speculative result if no material user message came after the
+        ones its report covers (waiting for it if it is still running), else None.
+        """
+        with self._lock:
+            entry = self._entries.pop((conversation_id, kind), None)
+        if entry is None:
+            return None
+        if entry[0].cancel():
+            # Still queued behind other sessions' speculations: computing it now is faster
+            return None
+        try:
+            basis, result = entry[0].result()
+        except Exception as e:
+            print(f"⚠️  Speculative {kind} failed, recomputing: {e}")
+            return None
+        if not _immaterial_since(history, basis['covered']):
+            print(f"↻ Speculative {kind} (report version {basis['report_version']}) missed later messages, recomputing")
+            return None
+        return result
+    
+    def _drop_stale(self):
+        cutoff = time.time() - speculation_max_age
+        for key in [k for k, (_, _, started_at) in self._entries.items() if started_at < cutoff]:
+            del self._entries[key]
+
+
+def _covered(entry: tuple) -> int:
+    """User messages a speculative run's report covers (at least those there when it started)"""
+    future, started_with, _ = entry
+    if future.done() and not future.cancelled() and future.exception() is None:
+        return future.result()[0]['covered']
+    return started_with
+
+
+def _user_messages(history: list) -> int:
+    return sum(role == 'user' for role, _ in history)
+
+
+def _normalize_reply(message: str) -> str:
+    return " ".join("".join(c for c in message.lower() if c.isalnum() or c.isspace()).split())
+
+
+def _is_material(message: str) -> bool:
+    text = _normalize_reply(message or "")
+    return bool(text) and text not in {_normalize_reply(reply) for reply in immaterial_replies}
+
+
+def _split_history(history: list, covered: int) -> tuple:
+    """(history up to the covered-th user message's reply, user messages after it)"""
+    seen = 0
+    for i, (role, _) in enumerate(history):
+        if role == 'user':
+            if seen == covered:
+                return list(history[:i]), [msg for role, msg in history[i:] if role == 'user']
+            seen += 1
+    return list(history), []
+
+
+def _immaterial_since(history: list, covered: int) -> bool:
+    """Whether every user message after the first `covered` is immaterial"""
+    return not any(_is_material(msg) for msg in _split_history(history, covered)[1])
+
+
+_speculative_results = SpeculativeResults()
+
+
+def _dd_string(dd: Any) -> str:
+    """Differential diagnoses as the agents take them"""
+    if isinstance(dd, dict):
+        return json.dumps(dd, indent=2)
+    return str(dd) if dd else ""
+
+
+def _history_string(conversation_history: list) -> str:
+    return "\n".join([
+        f"{role.upper()}: {msg}" for role, msg in conversation_history
+    ])
+
+
+def _speculative_ddx(session: Dict[str, Any], history: list) -> Dict[str, Any]:
+    return generate_differential_diagnosis(
+        patient_id=session['patient_id'],
+        conversation_history=history,
+        current_report=session['current_report']
+    )
+
+
+def _speculative_final_report(session: Dict[str, Any], history: list) -> Dict[str, Any]:
+    return finalReporter(
+        patient_id=session['patient_id'],
+        conversation_history=_history_string(history),
+        current_report=session['current_report'],
+        differential_diagnoses=_dd_string(session.get('differential_diagnoses'))
+    )
+
+
+def _report_update(session: Dict[str, Any], history: list) -> Dict[str, Any]:
+    """Incremental report update; the session fields to store"""
+    updated_report, was_full = update_report(
+        session['patient_id'], history, session['current_report'],
+        covered=session.get('report_history_covered', 0),
+        consolidated=session.get('report_consolidated_through', 0)
+    )
+    updates = {'current_report': updated_report, 'report_history_covered': len(history)}
+    if was_full:
+        updates['report_consolidated_through'] = len(history)
+    return updates
+
+
+def _initial_interview_report_update(session: Dict[str, Any]) -> Dict[str, Any]:
+    return _report_update(session, list(session['conversation_history']))
+
+
+def _second_interview_report_update(session: Dict[str, Any]) -> Dict[str, Any]:
+    history = list(session['conversation_history'])
+    updates = _report_update(session, history)
+    updates['differential_diagnoses'] = inoutagent(
+        session['patient_id'], history, updates['current_report'], _dd_string(session.get('differential_diagnoses'))
+    )
+    return updates
 
 
 class UnifiedChatOrchestrator:
@@ -29,6 +219,7 @@ class UnifiedChatOrchestrator:
     
     def __init__(self):
         self.session_manager = get_session_manager()
+        self.report_updates = get_report_updates()
     
     def process_message(
         self,
@@ -185,7 +376,8 @@ class UnifiedChatOrchestrator:
             user_message=user_message,
             conversation_history=session['conversation_history'],
             conversation_id=phase_conv_id,
-            current_report=session['current_report']
+            current_report=session['current_report'],
+            update_report=not background_report_updates
         )
         
         agent_response = result['message']
@@ -200,7 +392,9 @@ class UnifiedChatOrchestrator:
         
         if result.get('updated_report'):
             self.session_manager.update_session(conversation_id, {
-                'current_report': result['updated_report']
+                'current_report': result['updated_report'],
+                'report_version': session.get('report_version', 0) + 1,
+                'report_updated_through': session['message_counts']['total'] + (1 if user_message else 0)
             })
         
         # Add to conversation history
@@ -210,11 +404,25 @@ class UnifiedChatOrchestrator:
         
         self.session_manager.append_to_history(conversation_id, 'assistant', agent_response)
         
+        if background_report_updates and user_message:
+            self.report_updates.schedule(conversation_id, _initial_interview_report_update)
+        
         # Check if phase 1 is complete (10 user messages)
         session = self.session_manager.get_session(conversation_id)
         if session['message_counts']['initial_interview'] >= 10:
+            # The diagnosis needs the report with every answer in it
+            self.report_updates.flush(conversation_id)
+            session = self.session_manager.get_session(conversation_id)
             return self._transition_to_second_interview(session, conversation_id)
         
+        if (ddx_speculation_threshold is not None
+                and session['message_counts']['initial_interview'] >= ddx_speculation_threshold):
+            if _speculative_results.start(
+                conversation_id, 'differential_diagnosis', session['conversation_history'],
+                lambda: self._speculate(conversation_id, _speculative_ddx)
+            ):
+                print("🔮 Started speculative differential diagnosis")
+        
         return agent_response, "question", False
     
     def _transition_to_second_interview(
@@ -240,11 +448,17 @@ class UnifiedChatOrchestrator:
         print("🧠 Generating differential diagnosis...")
         
         try:
-            diagnosis_result = generate_differential_diagnosis(
-                patient_id=session['patient_id'],
-                conversation_history=session['conversation_history'],
-                current_report=session['current_report']
+            diagnosis_result = _speculative_results.take(
+                conversation_id, 'differential_diagnosis', session['conversation_history']
             )
+            if diagnosis_result is not None:
+                print("♻️  Reusing speculative differential diagnosis (no material messages since)")
+            else:
+                diagnosis_result = generate_differential_diagnosis(
+                    patient_id=session['patient_id'],
+                    conversation_history=session['conversation_history'],
+                    current_report=session['current_report']
+                )
             
             print(f"✅ Diagnosis generated successfully")
             
@@ -260,10 +474,7 @@ class UnifiedChatOrchestrator:
             session = self.session_manager.get_session(conversation_id)
             
             # Convert differential diagnoses to string format
-            if isinstance(diagnosis_result, dict):
-                dd_string = json.dumps(diagnosis_result, indent=2)
-            else:
-                dd_string = str(diagnosis_result)
+            dd_string = _dd_string(diagnosis_result)
             
             second_result = second_interview_message(
                 patient_id=session['patient_id'],
@@ -322,11 +533,7 @@ class UnifiedChatOrchestrator:
         phase_conv_id = session['phase_conversation_ids']['second_interview']
         
         # Convert differential diagnoses to string
-        dd = session.get('differential_diagnoses')
-        if isinstance(dd, dict):
-            dd_string = json.dumps(dd, indent=2)
-        else:
-            dd_string = str(dd) if dd else ""
+        dd_string = _dd_string(session.get('differential_diagnoses'))
         
         # Call second interviewer agent
         result = second_interview_message(
@@ -335,7 +542,8 @@ class UnifiedChatOrchestrator:
             conversation_history=session['conversation_history'],
             current_report=session['current_report'],
             differential_diagnoses=dd_string,
-            conversation_id=phase_conv_id
+            conversation_id=phase_conv_id,
+            update_report=not background_report_updates
         )
         
         agent_response = result['message']
@@ -350,7 +558,9 @@ class UnifiedChatOrchestrator:
         
         if result.get('updated_report'):
             self.session_manager.update_session(conversation_id, {
-                'current_report': result['updated_report']
+                'current_report': result['updated_report'],
+                'report_version': session.get('report_version', 0) + 1,
+                'report_updated_through': session['message_counts']['total'] + (1 if user_message else 0)
             })
         
         if result.get('updated_differential'):
@@ -365,13 +575,41 @@ class UnifiedChatOrchestrator:
         
         self.session_manager.append_to_history(conversation_id, 'assistant', agent_response)
         
+        if background_report_updates and user_message:
+            self.report_updates.schedule(conversation_id, _second_interview_report_update)
+        
         # Check if phase 3 is complete (10 user messages in second interview)
         session = self.session_manager.get_session(conversation_id)
         if session['message_counts']['second_interview'] >= 5:
+            self.report_updates.flush(conversation_id)
+            session = self.session_manager.get_session(conversation_id)
             return self._generate_final_report(session, conversation_id)
         
+        if (final_report_speculation_threshold is not None
+                and session['message_counts']['second_interview'] >= final_report_speculation_threshold):
+            if _speculative_results.start(
+                conversation_id, 'final_report', session['conversation_history'],
+                lambda: self._speculate(conversation_id, _speculative_final_report)
+            ):
+                print("🔮 Started speculative final report")
+        
         return agent_response, "question", False
     
+    def _speculate(self, conversation_id: str, compute) -> tuple:
+        """
+        Background part of a speculation: bring the report up to date, then
+        compute from that report version and the conversation it covers.
+        
+        Returns:
+            tuple: ({'report_version', 'covered'}, compute's result)
+        """
+        self.report_updates.flush(conversation_id)
+        session = dict(self.session_manager.get_session(conversation_id))
+        covered = session.get('report_updated_through', 0)
+        history, _ = _split_history(session['conversation_history'], covered)
+        basis = {'report_version': session.get('report_version', 0), 'covered': covered}
+        return basis, compute(session, history)
+    
     def _generate_final_report(
         self,
         session: Dict[str, Any],
@@ -395,23 +633,23 @@ class UnifiedChatOrchestrator:
         
         try:
             # Format conversation history as string
-            conv_history_str = "\n".join([
-                f"{role.upper()}: {msg}" for role, msg in session['conversation_history']
-            ])
+            conv_history_str = _history_string(session['conversation_history'])
             
             # Convert differential diagnoses to string
-            dd = session.get('differential_diagnoses')
-            if isinstance(dd, dict):
-                dd_string = json.dumps(dd, indent=2)
-            else:
-                dd_string = str(dd) if dd else ""
+            dd_string = _dd_string(session.get('differential_diagnoses'))
             
-            final_result = finalReporter(
-                patient_id=session['patient_id'],
-                conversation_history=conv_history_str,
-                current_report=session['current_report'],
-                differential_diagnoses=dd_string
+            final_result = _speculative_results.take(
+                conversation_id, 'final_report', session['conversation_history']
             )
+            if final_result is not None and final_result.get('success'):
+                print("♻️  Reusing speculative final report (no material messages since)")
+            else:
+                final_result = finalReporter(
+                    patient_id=session['patient_id'],
+                    conversation_history=conv_history_str,
+                    current_report=session['current_report'],
+                    differential_diagnoses=dd_string
+                )
             
             if final_result.get('success'):
                 print(f"✅ Final report generated successfully")
@@ -421,6 +659,7 @@ class UnifiedChatOrchestrator:
                     'final_report': final_result['report'],
                     'phase': 'completed'
                 })
+                self.report_updates.forget(conversation_id)
                 
                 agent_response = "Thank you for completing the interview. I have generated a comprehensive final medical report based on our conversation."
                 message_type = "final_report"
@@ -498,6 +737,9 @@ class UnifiedChatOrchestrator:
             'message': agent_response,
             'message_type': message_type,
             'updated_report': session.get('current_report'),
+            'report_version': session.get('report_version', 0),
+            'report_updated_through': session.get('report_updated_through', 0),
+            'report_pending': self.report_updates.is_pending(conversation_id),
             'differential_diagnoses': session.get('differential_diagnoses'),
             'final_report': session.get('final_report'),
             'expects_user_input': expects_user_input,
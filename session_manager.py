@@ -35,6 +35,10 @@ class SessionManager:
             },
             'conversation_history': [],
             'current_report': None,
+            'report_version': 0,          # bumped by every report update
+            'report_updated_through': 0,  # total message count the report covers
+            'report_history_covered': 0,       # conversation_history entries the report covers
+            'report_consolidated_through': 0,  # ... as of its last full (non-incremental) update
             'differential_diagnoses': None,
             'final_report': None,
             'phase_conversation_ids': {
@@ -0,0 +1,150 @@
+"""
+Tests for background jobs: submit, poll, failure, and the /async endpoints.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app as api
+from job_manager import JobManager, JobQueueFull
+from medgemma.resilience import timeout_for
+from orchestrations.pipeline_graph import report_step, report_steps_to
+
+
+def _wait(job, timeout=5.0):
+    end = time.monotonic() + timeout
+    while job.to_dict()['finished_at'] is None:
+        assert time.monotonic() < end, "job did not finish"
+        time.sleep(0.01)
+    return job.to_dict()
+
+
+def test_submit_and_poll_until_done():
+    manager = JobManager(max_workers=1)
+    release = threading.Event()
+
+    def run():
+        release.wait(5)
+        return 200, {'success': True, 'plan': '...'}
+
+    job = manager.submit('diet-plan', run)
+    assert manager.get(job.id) is job
+    assert job.to_dict()['status'] in ('queued', 'running')
+
+    release.set()
+    status = _wait(job)
+    assert status['status'] == 'succeeded'
+    assert (status['http_status'], status['result']) == (200, {'success': True, 'plan': '...'})
+    assert status['error'] is None
+    assert status['started_at'] <= status['finished_at']
+
+
+def test_step_progress_is_reported():
+    manager = JobManager(max_workers=1)
+
+    def run():
+        report_step('digital_twin', 'patient_context', 'done')
+        report_step('digital_twin', 'twin_state', 'running')
+        return 200, {'success': True}
+
+    progress = _wait(manager.submit('digital-twin', run))['progress']
+    assert progress == {
+        'steps_finished': 1,
+        'steps_total': 2,
+        'stages': {'digital_twin': {'patient_context': 'done', 'twin_state': 'running'}}
+    }
+
+
+def test_failures_are_recorded():
+    manager = JobManager(max_workers=2)
+
+    def crash():
+        raise RuntimeError("model unavailable")
+
+    crashed = manager.submit('diet-plan', crash)
+    rejected = manager.submit('diet-plan', lambda: (400, {'success': False, 'error': 'patient_id is required'}))
+
+    status = _wait(crashed)
+    assert (status['status'], status['http_status'], status['error']) == ('failed', 500, 'model unavailable')
+    status = _wait(rejected)
+    assert (status['status'], status['http_status'], status['error']) == ('failed', 400, 'patient_id is required')
+
+
+def test_queue_limit_and_expiry():
+    manager = JobManager(max_workers=1, max_queued=1, retention=0)
+    release = threading.Event()
+    running = manager.submit('a', lambda: (release.wait(5), (200, {}))[1])
+    while running.to_dict()['status'] != 'running':
+        time.sleep(0.01)
+    manager.submit('b', lambda: (200, {}))
+    with pytest.raises(JobQueueFull):
+        manager.submit('c', lambda: (200, {}))
+
+    release.set()
+    _wait(running)
+    time.sleep(0.01)
+    assert manager.get(running.id) is None
+
+
+def test_jobs_do_not_inherit_the_submitters_context():
+    manager = JobManager(max_workers=1)
+    seen = []
+    with report_steps_to(lambda *args: seen.append(args)):
+        job = manager.submit('a', lambda: (200, {'timeout': timeout_for(None)}))
+        _wait(job)
+    assert job.to_dict()['result'] == {'timeout': None}
+    assert seen == []
+
+
+@pytest.fixture
+def client(monkeypatch):
+    manager = JobManager(max_workers=1)
+    monkeypatch.setattr(api, 'get_job_manager', lambda: manager)
+    return api.app.test_client()
+
+
+def _poll(client, job_id, timeout=5.0):
+    end = time.monotonic() + timeout
+    while True:
+        body = client.get(f'/api/jobs/{job_id}').get_json()
+        if body['status'] in ('succeeded', 'failed'):
+            return body
+        assert time.monotonic() < end, "job did not finish"
+        time.sleep(0.01)
+
+
+def test_async_endpoint_runs_the_view_with_the_callers_timeout(client, monkeypatch):
+    def view():
+        return api.jsonify({'success': True, 'patient_id': api.request.get_json()['patient_id'],
+                            'budget': timeout_for(None)})
+
+    monkeypatch.setattr(api, 'generate_diet_plan', view)
+    reply = client.post('/api/diet-plan/async', json={'patient_id': 'p1'}, headers={'X-Request-Timeout': '5'})
+    assert reply.status_code == 202
+    body = _poll(client, reply.get_json()['job_id'])
+
+    assert body['http_status'] == 200
+    assert body['result']['patient_id'] == 'p1'
+    assert 0 < body['result']['budget'] <= 5
+
+
+def test_async_endpoint_reports_a_passed_deadline(client, monkeypatch):
+    def view():
+        time.sleep(0.1)
+        timeout_for(None)
+        raise AssertionError("deadline should have passed")
+
+    monkeypatch.setattr(api, 'generate_diet_plan', view)
+    reply = client.post('/api/diet-plan/async', json={'patient_id': 'p1'}, headers={'X-Request-Timeout': '0.05'})
+    body = _poll(client, reply.get_json()['job_id'])
+    assert (body['status'], body['http_status']) == ('failed', 504)
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/api/jobs/nope').status_code == 404
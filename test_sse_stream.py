@@ -0,0 +1,70 @@
+"""
+Tests for the streaming (SSE / NDJSON) endpoints' worker thread.
+"""
+
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import app as api
+from medgemma.resilience import remaining, timeout_for
+from orchestrations.pipeline_graph import report_step
+
+
+def _events(reply):
+    return [json.loads(line) for line in reply.get_data(as_text=True).splitlines() if line]
+
+
+def test_stream_reports_stages_and_the_result(monkeypatch):
+    def view():
+        report_step('first_aid', 'triage', 'done', '{"severity": "low"}')
+        api.g.run_id = 'run-1'
+        return api.jsonify({'success': True, 'patient_id': api.request.get_json()['patient_id'],
+                            'budget': remaining()})
+
+    monkeypatch.setattr(api, 'generate_first_aid', view)
+    reply = api.app.test_client().post('/api/first-aid/stream?format=ndjson&tokens=0',
+                                       json={'patient_id': 'p1'}, headers={'X-Request-Timeout': '30'})
+
+    assert reply.mimetype == 'application/x-ndjson'
+    stage, result = _events(reply)
+    assert stage == {'event': 'stage', 'pipeline': 'first_aid', 'stage': 'triage', 'status': 'done',
+                     'output': {'severity': 'low'}}
+    assert result['event'] == 'result' and result['status'] == 200
+    assert result['body']['patient_id'] == 'p1'
+    # The worker runs under the time left on the request's deadline
+    assert 0 < result['body']['budget'] <= 30
+
+
+def test_worker_deadline_is_the_requests(monkeypatch):
+    def view():
+        time.sleep(0.1)
+        timeout_for(None)
+        return api.jsonify({'success': True})
+
+    monkeypatch.setattr(api, 'generate_first_aid', view)
+    reply = api.app.test_client().post('/api/first-aid/stream', json={'patient_id': 'p1'},
+                                       headers={'X-Request-Timeout': '0.05'})
+
+    assert reply.mimetype == 'text/event-stream'
+    body = reply.get_data(as_text=True)
+    assert body.startswith(': stream open')
+    assert 'event: result' in body and '"status": 504' in body
+
+
+def test_worker_does_not_share_the_requests_g(monkeypatch):
+    seen = {}
+
+    def view():
+        seen['request_deadline'] = api.g.get('request_deadline')
+        return api.jsonify({'success': True})
+
+    monkeypatch.setattr(api, 'generate_first_aid', view)
+    client = api.app.test_client()
+    for _ in range(3):
+        reply = client.post('/api/first-aid/stream?format=ndjson', json={'patient_id': 'p1'})
+        assert _events(reply)[-1]['status'] == 200
+    assert seen == {'request_deadline': None}